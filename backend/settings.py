@@ -43,6 +43,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',           # 5) CSRF
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'crum.CurrentRequestUserMiddleware',
+    'sepultados_gestao.middleware.AuditoriaEmLoteMiddleware',  # auditoria em lote por requisição
     'django.contrib.messages.middleware.MessageMiddleware',
     'sepultados_gestao.middleware.PrefeituraAtivaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -83,7 +84,10 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-    )
+    ),
+    # Paginação por cursor (keyset); só entra em ação com ?cursor= ou ?page_size=
+    "DEFAULT_PAGINATION_CLASS": "sepultados_gestao.pagination.KeysetPagination",
+    "PAGE_SIZE": 100,
 }
 
 
@@ -10,6 +10,7 @@ urlpatterns = [
     path('translados/', api_views.relatorio_translados_api, name='relatorio_translados_api'),
     path('contratos/', api_views.relatorio_contratos_api, name='relatorio_contratos_api'),
     path('receitas/', api_views.relatorio_receitas_api, name='relatorio_receitas_api'),
+    path('receitas/resumo/', api_views.relatorio_receitas_resumo_api, name='relatorio_receitas_resumo_api'),
     path('tumulos/', api_views.relatorio_tumulos_api, name='relatorio_tumulos_api'),
 
     # URLs (JSON) que entregam o link absoluto do PDF
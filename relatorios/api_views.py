@@ -1,4 +1,6 @@
 # relatorios/api_views.py
+from functools import wraps
+
 from django.urls import reverse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
@@ -13,6 +15,7 @@ from sepultados_gestao.serializers import (
     SepultadoSerializer, ExumacaoSerializer, TransladoSerializer,
     ConcessaoContratoSerializer, ReceitaSerializer, TumuloSerializer
 )
+from sepultados_gestao.services import versoes
 
 # ---------------------------------------------------------------------
 # Helpers
@@ -46,6 +49,22 @@ def _get_prefeitura_id(request):
     return pref_id
 
 
+def _versionado(view):
+    """
+    ETag forte pela versão da prefeitura: If-None-Match com a versão atual
+    recebe 304 sem a listagem ser montada.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        pref_id = str(_get_prefeitura_id(request) or "")
+        return versoes.com_versao(
+            request, "prefeitura", int(pref_id) if pref_id.isdigit() else None,
+            lambda: view(request, *args, **kwargs),
+            prefixo=f"{view.__name__}-",
+        )
+    return wrapper
+
+
 def _pdf_url_with_params(request, name_candidates, fallback_path="/"):
     """
     Resolve a URL absoluta do endpoint de PDF e propaga parâmetros da requisição,
@@ -76,6 +95,7 @@ def _pdf_url_with_params(request, name_candidates, fallback_path="/"):
 # Listagens (JSON) usadas pelos relatórios
 # ---------------------------------------------------------------------
 @api_view(['GET'])
+@_versionado
 def relatorio_sepultados_api(request):
     pref_id = _get_prefeitura_id(request)
     if not pref_id:
@@ -86,6 +106,7 @@ def relatorio_sepultados_api(request):
 
 
 @api_view(['GET'])
+@_versionado
 def relatorio_exumacoes_api(request):
     pref_id = _get_prefeitura_id(request)
     if not pref_id:
@@ -96,6 +117,7 @@ def relatorio_exumacoes_api(request):
 
 
 @api_view(['GET'])
+@_versionado
 def relatorio_translados_api(request):
     pref_id = _get_prefeitura_id(request)
     if not pref_id:
@@ -107,6 +129,7 @@ def relatorio_translados_api(request):
 
 
 @api_view(['GET'])
+@_versionado
 def relatorio_contratos_api(request):
     pref_id = _get_prefeitura_id(request)
     if not pref_id:
@@ -117,6 +140,7 @@ def relatorio_contratos_api(request):
 
 
 @api_view(['GET'])
+@_versionado
 def relatorio_receitas_api(request):
     """
     Lista receitas. Aceita ?prefeitura=<id> (ou ?prefeitura_id=) ou header X-Prefeitura-Id.
@@ -131,6 +155,47 @@ def relatorio_receitas_api(request):
 
 
 @api_view(['GET'])
+def relatorio_receitas_resumo_api(request):
+    """
+    Totais das receitas por status, faixa de atraso (a vencer, 0-30, 31-60,
+    61-90, 90+ dias), mês de vencimento e tipo de serviço. Aceita
+    ?data_inicio=/?data_fim= (AAAA-MM-DD, sobre o vencimento) e ?cemiterio=.
+    """
+    from datetime import date
+
+    from django.utils.dateparse import parse_date
+    from sepultados_gestao.services.financeiro import resumo_receitas
+
+    pref_id = str(_get_prefeitura_id(request) or "")
+    if not pref_id.isdigit():
+        return Response({"detail": "Informe prefeitura_id (querystring ou header X-Prefeitura-Id)."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    datas = {}
+    for campo in ("data_inicio", "data_fim"):
+        valor = request.query_params.get(campo)
+        try:
+            datas[campo] = parse_date(valor) if valor else None
+        except ValueError:
+            datas[campo] = None
+        if valor and datas[campo] is None:
+            return Response({"detail": f"{campo} inválida (use AAAA-MM-DD)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    cem_id = str(request.query_params.get("cemiterio") or request.query_params.get("cemiterio_id") or "")
+    if cem_id and not cem_id.isdigit():
+        return Response({"detail": "cemiterio inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # a faixa de atraso muda com o dia: a data entra no ETag junto com a versão
+    return versoes.com_versao(
+        request, "prefeitura", int(pref_id),
+        lambda: Response(resumo_receitas(int(pref_id), cemiterio_id=int(cem_id) if cem_id else None, **datas)),
+        prefixo=f"receitas-resumo-{date.today():%Y%m%d}-",
+    )
+
+
+@api_view(['GET'])
+@_versionado
 def relatorio_tumulos_api(request):
     pref_id = _get_prefeitura_id(request)
     if not pref_id:
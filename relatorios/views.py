@@ -3,7 +3,6 @@ from datetime import datetime, date
 from urllib.parse import urlencode, urlparse, parse_qsl, urlunparse
 
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Q
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.shortcuts import render
 from django.template.loader import render_to_string
@@ -15,6 +14,7 @@ from sepultados_gestao.models import (
     Sepultado, Exumacao, Translado, ConcessaoContrato,
     Receita, Tumulo, Prefeitura, Cemiterio
 )
+from sepultados_gestao.services.financeiro import por_cemiterio
 
 # =============================================================================
 # Helpers STATeless (funcionam com frontend sem sessão do admin)
@@ -446,13 +446,7 @@ def relatorio_receitas(request):
     receitas = Receita.objects.filter(prefeitura_id=prefeitura_id)
 
     if cemiterio_id:
-        receitas = receitas.filter(
-            Q(contrato__tumulo__quadra__cemiterio_id=cemiterio_id) |
-            Q(sepultado__tumulo__quadra__cemiterio_id=cemiterio_id) |
-            Q(exumacao__tumulo__quadra__cemiterio_id=cemiterio_id) |
-            Q(translado__tumulo_destino__quadra__cemiterio_id=cemiterio_id) |
-            Q(contrato__isnull=True, sepultado__isnull=True, exumacao__isnull=True, translado__isnull=True)
-        ).distinct()
+        receitas = por_cemiterio(receitas, cemiterio_id)
 
     data_inicio = request.GET.get("data_inicio")
     data_fim = request.GET.get("data_fim")
@@ -491,13 +485,7 @@ def relatorio_receitas_pdf(request):
     receitas = Receita.objects.filter(prefeitura_id=pref_id)
 
     if cem_id:
-        receitas = receitas.filter(
-            Q(contrato__tumulo__quadra__cemiterio_id=cem_id) |
-            Q(sepultado__tumulo__quadra__cemiterio_id=cem_id) |
-            Q(exumacao__tumulo__quadra__cemiterio_id=cem_id) |
-            Q(translado__tumulo_destino__quadra__cemiterio_id=cem_id) |
-            Q(contrato__isnull=True, sepultado__isnull=True, exumacao__isnull=True, translado__isnull=True)
-        ).distinct()
+        receitas = por_cemiterio(receitas, cem_id)
 
     data_inicio = request.GET.get("data_inicio")
     data_fim = request.GET.get("data_fim")
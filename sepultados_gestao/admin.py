@@ -384,7 +384,7 @@ class QuadraAdmin(PrefeituraObrigatoriaAdminMixin, admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
         # Auditoria
-        RegistroAuditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             acao=("change" if change else "add"),
             modelo=obj.__class__.__name__,
@@ -402,7 +402,7 @@ class QuadraAdmin(PrefeituraObrigatoriaAdminMixin, admin.ModelAdmin):
             )
             return
 
-        RegistroAuditoria.objects.create(
+        registrar_auditoria(
             usuario=request.user,
             acao="delete",
             modelo=self.model.__name__,
@@ -811,6 +811,23 @@ class SepultadoAdmin(PrefeituraObrigatoriaAdminMixin, admin.ModelAdmin):
 
         return qs
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Além do icontains padrão, usa o índice de nomes (sem acento, por prefixo):
+        "joao" também acha "João".
+        """
+        from .services.busca import buscar
+
+        qs, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        cem_id = request.session.get("cemiterio_ativo_id") or getattr(
+            getattr(request, "cemiterio_ativo", None), "id", None
+        )
+        if search_term and cem_id:
+            ids = [sid for sid, _ in buscar(search_term, cemiterio_id=cem_id, limite=1000)]
+            if ids:
+                qs = qs | queryset.filter(pk__in=ids)
+        return qs, may_have_duplicates
+
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """
@@ -1326,7 +1343,7 @@ class TransladoAdmin(admin.ModelAdmin):
         sep.trasladado = False
         sep.data_translado = None
         sep.exumado = True
-        sep.save(update_fields=['trasladado', 'data_translado', 'exumado'])
+        sep.save(update_fields=['trasladado', 'data_translado', 'exumado', 'atualizado_em'])
 
         # Importante: limpa o cache da propriedade status_display
         if 'status_display' in sep.__dict__:
@@ -1651,15 +1668,28 @@ from django.contrib import admin
 from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils.encoding import force_str
-from .models import Receita
+from .models import Receita, Pagamento
 from .forms import ReceitaForm
 from .views import gerar_recibo_pdf 
 
 
+class PagamentoInline(admin.TabularInline):
+    """Razão de pagamentos da receita (só leitura: os lançamentos vêm do valor pago)."""
+    model = Pagamento
+    extra = 0
+    can_delete = False
+    fields = ('data_pagamento', 'valor', 'usuario', 'criado_em')
+    readonly_fields = fields
+    verbose_name_plural = "Pagamentos"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Receita)
 class ReceitaAdmin(admin.ModelAdmin):
     form = ReceitaForm
+    inlines = [PagamentoInline]
     list_display = (
         'numero_documento',
         'descricao_segura',
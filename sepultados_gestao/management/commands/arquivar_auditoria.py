@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from sepultados_gestao.services.arquivo_auditoria import arquivar_auditoria
+
+
+class Command(BaseCommand):
+    help = (
+        "Move os registros de auditoria antigos para os segmentos mensais compactados "
+        "(por prefeitura). A API e o PDF de auditorias continuam lendo esses registros."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias", type=int,
+            help="Idade mínima (em dias) para arquivar (padrão: AUDITORIA['ARQUIVAR_APOS_DIAS'] ou 365).",
+        )
+        parser.add_argument("--prefeitura", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--lote", type=int, default=5000, help="Registros por lote (padrão: 5000).")
+
+    def handle(self, *args, **opts):
+        total = arquivar_auditoria(
+            dias=opts.get("dias"),
+            prefeitura_id=opts.get("prefeitura"),
+            lote=max(1, opts["lote"]),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{total} registro(s) de auditoria arquivado(s)."))
@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localtime, now
+
+from sepultados_gestao.services.backup_completo import LOTE, gerar_dump
+
+
+class Command(BaseCommand):
+    help = (
+        "Backup completo do banco: um arquivo JSON-lines compactado (gzip) por modelo, "
+        "gerados em paralelo, e um manifesto com linhas e sha256 de cada arquivo. "
+        "Restaure com restaurar_backup_completo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("destino", nargs="?",
+                            help="Diretório de saída (padrão: backup_completo_<data> no diretório atual).")
+        parser.add_argument("--processos", type=int, help="Processos em paralelo (padrão: até 4).")
+        parser.add_argument("--lote", type=int, default=LOTE, help=f"Linhas por ida ao banco (padrão: {LOTE}).")
+
+    def handle(self, *args, **opts):
+        destino = opts.get("destino") or f"backup_completo_{localtime(now()).strftime('%Y%m%d_%H%M')}"
+        manifesto = gerar_dump(destino, processos=opts.get("processos"), chunk_size=max(1, opts["lote"]))
+        linhas = sum(m["linhas"] for m in manifesto["modelos"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(manifesto['modelos'])} modelo(s), {linhas} linha(s) em {os.path.abspath(destino)}."
+        ))
@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sepultados_gestao.services.pagamentos import conciliar_mes
+
+
+class Command(BaseCommand):
+    help = (
+        "Concilia os pagamentos lançados em um mês: totais por dia e receitas cujo valor pago "
+        "não bate com a soma do razão de pagamentos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mes", help="Mês AAAA-MM (padrão: o mês passado).")
+        parser.add_argument("--prefeitura", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--corrigir", action="store_true",
+                            help="Ajusta o valor pago das receitas divergentes pelo razão.")
+
+    def handle(self, *args, **opts):
+        if opts.get("mes"):
+            try:
+                ano, mes = (int(p) for p in opts["mes"].split("-"))
+                date(ano, mes, 1)
+            except ValueError:
+                raise CommandError("Use --mes no formato AAAA-MM.")
+        else:
+            hoje = date.today()
+            ano, mes = (hoje.year, hoje.month - 1) if hoje.month > 1 else (hoje.year - 1, 12)
+
+        r = conciliar_mes(ano, mes, prefeitura_id=opts.get("prefeitura"), corrigir=opts["corrigir"])
+        for dia, total in r["por_dia"].items():
+            self.stdout.write(f"{dia:%d/%m/%Y}  R$ {total}")
+        self.stdout.write(f"{r['pagamentos']} pagamento(s), R$ {r['valor']} em {mes:02d}/{ano}.")
+
+        for receita_id, pago, soma in r["divergentes"]:
+            self.stdout.write(self.style.WARNING(
+                f"Receita {receita_id}: valor pago R$ {pago}, razão R$ {soma}."
+            ))
+        if not r["divergentes"]:
+            self.stdout.write(self.style.SUCCESS("Nenhuma divergência."))
+        elif opts["corrigir"]:
+            self.stdout.write(self.style.SUCCESS(f"{len(r['divergentes'])} receita(s) corrigida(s)."))
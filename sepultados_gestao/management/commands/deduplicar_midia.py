@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from sepultados_gestao.services.midia import deduplicar, recontar
+
+
+class Command(BaseCommand):
+    help = (
+        "Passa anexos e brasões antigos para o armazenamento por conteúdo (um arquivo por "
+        "sha256; cópias iguais viram uma só) e refaz a contagem de referências."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--manter-antigos", action="store_true",
+                            help="Não apaga os arquivos antigos depois de convertidos.")
+        parser.add_argument("--so-recontar", action="store_true",
+                            help="Só refaz a contagem de referências (e apaga arquivos sem referência).")
+
+    def handle(self, *args, **opts):
+        if not opts["so_recontar"]:
+            r = deduplicar(apagar_antigos=not opts["manter_antigos"])
+            self.stdout.write(
+                f"{r['convertidos']} arquivo(s) convertido(s), {r['faltando']} não encontrado(s) no disco; "
+                f"{r['bytes_antes']} bytes -> {r['bytes_depois']} bytes."
+            )
+        referenciados, apagados = recontar()
+        self.stdout.write(self.style.SUCCESS(
+            f"{referenciados} arquivo(s) referenciado(s), {apagados} sem referência apagado(s)."
+        ))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sepultados_gestao.models import ImportacaoPlanilha
+from sepultados_gestao.services.importacao import LOTE, executar_importacao, retomar_importacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa as importações de planilha enviadas em segundo plano (assincrono=1), "
+        "lote a lote, gravando o ponto de retomada a cada lote. Com --retomar, "
+        "devolve à fila as que falharam ou pararam de avançar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", type=int, help="Processa só esta importação (id).")
+        parser.add_argument("--retomar", action="store_true",
+                            help="Retoma importações que falharam (ou paradas há mais de 10 min) do ponto salvo.")
+        parser.add_argument("--continuo", action="store_true", help="Fica esperando novas importações.")
+        parser.add_argument("--intervalo", type=int, default=5, help="Segundos entre consultas (padrão: 5).")
+        parser.add_argument("--lote", type=int, default=LOTE, help=f"Linhas por lote (padrão: {LOTE}).")
+
+    def handle(self, *args, **opts):
+        fila = ImportacaoPlanilha.objects.all()
+        if opts.get("job"):
+            fila = fila.filter(pk=opts["job"])
+            if not fila.exists():
+                raise CommandError(f"Importação {opts['job']} não encontrada.")
+
+        if opts["retomar"]:
+            for job in fila.filter(status__in=("falhou", "processando")):
+                if retomar_importacao(job):
+                    self.stdout.write(f"{job}: retomando da linha {job.linhas_processadas + 2}.")
+
+        while True:
+            processadas = 0
+            for job in fila.filter(status="pendente").order_by("criado_em", "pk"):
+                job = executar_importacao(job, tamanho=max(1, opts["lote"]))
+                processadas += 1
+                resumo = (
+                    f"{job}: {job.linhas_processadas} linha(s), {job.importados} importado(s), "
+                    f"{job.atualizados} atualizado(s), {job.total_erros} erro(s)."
+                )
+                if job.status == "concluida":
+                    self.stdout.write(self.style.SUCCESS(resumo))
+                else:
+                    self.stdout.write(self.style.ERROR(f"{resumo} {job.mensagem}"))
+
+            if not opts["continuo"]:
+                if not processadas:
+                    self.stdout.write("Nenhuma importação pendente.")
+                return
+            time.sleep(max(1, opts["intervalo"]))
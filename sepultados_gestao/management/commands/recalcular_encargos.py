@@ -0,0 +1,34 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sepultados_gestao.services.encargos import LOTE, recalcular_encargos
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula multa, juros, mora e valor em aberto de todas as receitas em aberto "
+        "(em lote, sem salvar uma a uma). Rode diariamente: depois do vencimento a mora muda todo dia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prefeitura", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--data", help="Data de referência AAAA-MM-DD (padrão: hoje).")
+        parser.add_argument("--lote", type=int, default=LOTE, help=f"Receitas por lote (padrão: {LOTE}).")
+
+    def handle(self, *args, **opts):
+        hoje = None
+        if opts.get("data"):
+            try:
+                hoje = date.fromisoformat(opts["data"])
+            except ValueError:
+                raise CommandError("Use --data no formato AAAA-MM-DD.")
+
+        inicio = time.monotonic()
+        lidas, alteradas = recalcular_encargos(
+            hoje=hoje, prefeitura_id=opts.get("prefeitura"), lote=max(1, opts["lote"]),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{lidas} receita(s) em aberto, {alteradas} atualizada(s) em {time.monotonic() - inicio:.1f}s."
+        ))
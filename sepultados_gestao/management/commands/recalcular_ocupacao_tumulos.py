@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from sepultados_gestao.models import Cemiterio, Tumulo
+from sepultados_gestao.services.estatisticas import recalcular_estatisticas
+from sepultados_gestao.services.ocupacao import recalcular_ocupacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o contador de ocupantes ativos (e o status) dos túmulos a partir "
+        "dos sepultados. Use após cargas/ajustes feitos direto no banco ou via queryset.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Túmulos por lote (padrão: 2000).")
+        parser.add_argument("--prefeitura", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--cemiterio", type=int, help="Restringe a um cemitério (id).")
+
+    def handle(self, *args, **opts):
+        qs = Tumulo.objects.all()
+        if opts.get("prefeitura"):
+            qs = qs.filter(cemiterio__prefeitura_id=opts["prefeitura"])
+        if opts.get("cemiterio"):
+            qs = qs.filter(cemiterio_id=opts["cemiterio"])
+
+        lidos, corrigidos = recalcular_ocupacao(qs, chunk_size=max(1, opts["chunk_size"]))
+        if corrigidos:
+            # o painel soma o contador: remonta os cemitérios afetados
+            recalcular_estatisticas(Cemiterio.objects.filter(pk__in=qs.values("cemiterio_id")))
+        self.stdout.write(self.style.SUCCESS(
+            f"{lidos} túmulo(s) verificados, {corrigidos} corrigido(s)."
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from sepultados_gestao.models import Cemiterio, Tumulo
+from sepultados_gestao.services.estatisticas import recalcular_estatisticas
+from sepultados_gestao.services.ocupacao import recalcular_ocupacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói a tabela de estatísticas do painel (por cemitério) a partir dos dados. "
+        "Com --ocupacao, recalcula antes o contador de ocupantes dos túmulos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=200, help="Cemitérios por lote (padrão: 200).")
+        parser.add_argument("--prefeitura", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--cemiterio", type=int, help="Restringe a um cemitério (id).")
+        parser.add_argument("--ocupacao", action="store_true", help="Recalcula Tumulo.ocupantes_ativos antes.")
+
+    def handle(self, *args, **opts):
+        cemiterios = Cemiterio.objects.all()
+        tumulos = Tumulo.objects.all()
+        if opts.get("prefeitura"):
+            cemiterios = cemiterios.filter(prefeitura_id=opts["prefeitura"])
+            tumulos = tumulos.filter(cemiterio__prefeitura_id=opts["prefeitura"])
+        if opts.get("cemiterio"):
+            cemiterios = cemiterios.filter(pk=opts["cemiterio"])
+            tumulos = tumulos.filter(cemiterio_id=opts["cemiterio"])
+
+        if opts["ocupacao"]:
+            lidos, corrigidos = recalcular_ocupacao(tumulos)
+            self.stdout.write(f"Ocupação: {lidos} túmulo(s) verificados, {corrigidos} corrigido(s).")
+
+        total = recalcular_estatisticas(cemiterios, chunk_size=max(1, opts["chunk_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Estatísticas recalculadas para {total} cemitério(s)."))
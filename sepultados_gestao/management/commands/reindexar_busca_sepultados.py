@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from sepultados_gestao.models import Sepultado
+from sepultados_gestao.services.busca import reindexar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o índice de busca por nome dos sepultados. Use após cargas "
+        "feitas direto no banco ou via bulk_create/queryset.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Sepultados por lote (padrão: 2000).")
+        parser.add_argument("--prefeitura", type=int, help="Restringe a uma prefeitura (id).")
+        parser.add_argument("--cemiterio", type=int, help="Restringe a um cemitério (id).")
+
+    def handle(self, *args, **opts):
+        qs = Sepultado.objects.all()
+        if opts.get("prefeitura"):
+            qs = qs.filter(tumulo__cemiterio__prefeitura_id=opts["prefeitura"])
+        if opts.get("cemiterio"):
+            qs = qs.filter(tumulo__cemiterio_id=opts["cemiterio"])
+
+        total = reindexar(qs, chunk_size=max(1, opts["chunk_size"]))
+        self.stdout.write(self.style.SUCCESS(f"{total} sepultado(s) indexados."))
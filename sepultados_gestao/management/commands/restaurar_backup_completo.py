@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sepultados_gestao.services.backup_completo import LOTE, ErroDump, restaurar_dump
+
+
+class Command(BaseCommand):
+    help = (
+        "Restaura um backup completo (diretório do backup_completo ou o ZIP baixado pelo "
+        "admin): SUBSTITUI os dados de todas as tabelas do backup, carregando os modelos "
+        "na ordem das dependências. O banco precisa estar migrado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("origem", help="Diretório com manifesto.json ou o ZIP do backup completo.")
+        parser.add_argument("--lote", type=int, default=LOTE, help=f"Registros por INSERT em lote (padrão: {LOTE}).")
+        parser.add_argument("--midia", action="store_true",
+                            help="Também extrai os arquivos de mídia do ZIP para o MEDIA_ROOT.")
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive",
+                            help="Não pede confirmação.")
+
+    def handle(self, *args, **opts):
+        origem = opts["origem"]
+        if not os.path.exists(origem):
+            raise CommandError(f"{origem} não encontrado.")
+
+        if opts["interactive"]:
+            resposta = input("Os dados atuais do banco serão SUBSTITUÍDOS pelos do backup. Digite 'sim' para continuar: ")
+            if resposta.strip().lower() != "sim":
+                raise CommandError("Restauração cancelada.")
+
+        arquivo_zip = origem if zipfile.is_zipfile(origem) else None
+        temporario = None
+        try:
+            if arquivo_zip:
+                temporario = tempfile.mkdtemp()
+                with zipfile.ZipFile(origem) as zf:
+                    for nome in zf.namelist():
+                        if nome.startswith("dados/") and not nome.endswith("/"):
+                            with zf.open(nome) as de, open(os.path.join(temporario, os.path.basename(nome)), "wb") as para:
+                                shutil.copyfileobj(de, para)
+                origem = temporario
+
+            resultado = restaurar_dump(
+                origem, chunk_size=max(1, opts["lote"]),
+                progresso=lambda modelo, linhas: self.stdout.write(f"{modelo}: {linhas}"),
+            )
+        except ErroDump as e:
+            raise CommandError(str(e))
+        finally:
+            if temporario:
+                shutil.rmtree(temporario, ignore_errors=True)
+
+        # mídia só depois do banco restaurado (se ele falhar, nada muda)
+        if arquivo_zip and opts["midia"]:
+            with zipfile.ZipFile(arquivo_zip) as zf:
+                self._extrair_midia(zf)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultado)} modelo(s), {sum(resultado.values())} linha(s) restaurada(s)."
+        ))
+
+    def _extrair_midia(self, zf):
+        raiz = os.path.realpath(settings.MEDIA_ROOT)
+        total = 0
+        for nome in zf.namelist():
+            if not nome.startswith("media/") or nome.endswith("/"):
+                continue
+            destino = os.path.realpath(os.path.join(raiz, nome[len("media/"):]))
+            if not destino.startswith(raiz + os.sep):
+                continue  # caminho fora do MEDIA_ROOT
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            with zf.open(nome) as de, open(destino, "wb") as para:
+                shutil.copyfileobj(de, para)
+            total += 1
+        self.stdout.write(f"{total} arquivo(s) de mídia extraído(s).")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sepultados_gestao.services.financeiro import LOTE_CEMITERIO, ressincronizar_cemiterios
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere o cemitério gravado em cada receita com o túmulo atual do serviço "
+        "(contrato, sepultamento, exumação, translado) e corrige as divergentes. "
+        "Use após cargas ou ajustes feitos direto no banco."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE_CEMITERIO,
+                            help=f"Receitas por faixa de ids (padrão: {LOTE_CEMITERIO}).")
+
+    def handle(self, *args, **opts):
+        inicio = time.monotonic()
+        conferidas, corrigidas = ressincronizar_cemiterios(lote=max(1, opts["lote"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"{conferidas} receita(s) conferida(s), {corrigidas} corrigida(s) em {time.monotonic() - inicio:.1f}s."
+        ))
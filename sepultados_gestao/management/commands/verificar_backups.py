@@ -0,0 +1,46 @@
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sepultados_gestao.services.backup import confirmar_backup, verificar_cadeia
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere backups da prefeitura (ZIP) contra o manifesto de cada um. "
+        "Vários arquivos, na ordem (completo, incremental, incremental...), "
+        "são conferidos como uma cadeia. Com --confirmar, os arquivos sem problema "
+        "marcam o backup como concluído (base para o próximo incremental)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivos", nargs="+", help="Arquivos ZIP, do completo ao último incremental.")
+        parser.add_argument("--confirmar", action="store_true",
+                            help="Confirma o recebimento dos backups conferidos sem problema.")
+
+    def handle(self, *args, **opts):
+        falhas = 0
+        try:
+            resultado = verificar_cadeia(opts["arquivos"])
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            raise CommandError(f"Não foi possível ler o backup: {e}")
+
+        for arquivo, problemas in resultado:
+            if problemas:
+                falhas += 1
+                self.stdout.write(self.style.ERROR(f"{arquivo}:"))
+                for problema in problemas:
+                    self.stdout.write(f"  - {problema}")
+                continue
+            if not opts["confirmar"]:
+                self.stdout.write(self.style.SUCCESS(f"{arquivo}: ok"))
+                continue
+            backup, problemas = confirmar_backup(arquivo)
+            if problemas:
+                falhas += 1
+                self.stdout.write(self.style.ERROR(f"{arquivo}: {' '.join(problemas)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{arquivo}: ok, backup #{backup.pk} confirmado"))
+
+        if falhas:
+            raise CommandError(f"{falhas} arquivo(s) com problema.")
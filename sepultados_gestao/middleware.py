@@ -56,4 +56,19 @@ class PrefeituraAtivaMiddleware(MiddlewareMixin):
                 # Exige cemitério ativo quando já tem prefeitura
                 if request.prefeitura_ativa and not request.cemiterio_ativo and not request.path.startswith("/admin/selecionar-cemiterio/"):
                     messages.warning(request, "Você precisa selecionar um cemitério antes de continuar.")
-                    return redirect("sepultados_gestao:selecionar_cemiterio_ativo")
\ No newline at end of file
+                    return redirect("sepultados_gestao:selecionar_cemiterio_ativo")
+
+from sepultados_gestao.services.auditoria import lote_auditoria
+
+
+class AuditoriaEmLoteMiddleware:
+    """
+    Abre um lote de auditoria por requisição: os registros gerados pelos
+    sinais são agrupados e gravados com um único bulk_create no final.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with lote_auditoria():
+            return self.get_response(request)
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.23 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0008_alter_quadra_grid_params_alter_quadra_poligono_mapa'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exumacao',
+            index=models.Index(fields=['-data', '-id'], name='exu_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroauditoria',
+            index=models.Index(fields=['prefeitura', '-data_hora', '-id'], name='aud_pref_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sepultado',
+            index=models.Index(fields=['-data_sepultamento', '-id'], name='sep_data_sep_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.23 on 2026-10-18 06:55
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+def preencher_ocupantes(apps, schema_editor):
+    Tumulo = apps.get_model('sepultados_gestao', 'Tumulo')
+    Sepultado = apps.get_model('sepultados_gestao', 'Sepultado')
+
+    ativos = (
+        Sepultado.objects.filter(tumulo_id=OuterRef('pk'), exumado=False, trasladado=False)
+        .order_by()
+        .values('tumulo_id')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Tumulo.objects.update(
+        ocupantes_ativos=Coalesce(Subquery(ativos, output_field=IntegerField()), Value(0))
+    )
+    Tumulo.objects.update(
+        status=Case(
+            When(reservado=True, then=Value('reservado')),
+            When(ocupantes_ativos__gte=F('capacidade'), then=Value('ocupado')),
+            default=Value('disponivel'),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0009_indices_paginacao_keyset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tumulo',
+            name='ocupantes_ativos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ocupantes ativos'),
+        ),
+        migrations.RunPython(preencher_ocupantes, migrations.RunPython.noop),
+    ]
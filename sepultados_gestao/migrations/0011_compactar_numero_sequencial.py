@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-18 06:56
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def compactar_historico(apps, schema_editor):
+    """
+    Mantém só a linha de maior número de cada (prefeitura, ano), que passa a
+    ser o contador. Os números já emitidos ficam gravados nos próprios documentos.
+    """
+    NumeroSequencialGlobal = apps.get_model('sepultados_gestao', 'NumeroSequencialGlobal')
+    grupos = (
+        NumeroSequencialGlobal.objects.order_by()
+        .values('prefeitura_id', 'ano')
+        .annotate(ultimo=Max('numero'))
+    )
+    for g in list(grupos):
+        NumeroSequencialGlobal.objects.filter(
+            prefeitura_id=g['prefeitura_id'], ano=g['ano'], numero__lt=g['ultimo']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0010_tumulo_ocupantes_ativos'),
+    ]
+
+    operations = [
+        migrations.RunPython(compactar_historico, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='numerosequencialglobal',
+            unique_together={('prefeitura', 'ano')},
+        ),
+        migrations.AlterField(
+            model_name='numerosequencialglobal',
+            name='numero',
+            field=models.PositiveIntegerField(verbose_name='Último número emitido'),
+        ),
+    ]
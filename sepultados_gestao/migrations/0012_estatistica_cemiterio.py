@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-18 06:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0011_compactar_numero_sequencial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaCemiterio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vagas_totais', models.IntegerField(default=0)),
+                ('vagas_ocupadas', models.IntegerField(default=0)),
+                ('tumulos_livres', models.IntegerField(default=0)),
+                ('total_sepultados', models.IntegerField(default=0)),
+                ('contratos_ativos', models.IntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cemiterio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estatistica', to='sepultados_gestao.cemiterio')),
+                ('prefeitura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sepultados_gestao.prefeitura')),
+            ],
+            options={
+                'verbose_name': 'Estatística do Cemitério',
+                'verbose_name_plural': 'Estatísticas dos Cemitérios',
+            },
+        ),
+    ]
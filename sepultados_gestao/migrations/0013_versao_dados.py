@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0012_estatistica_cemiterio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoDados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(max_length=30)),
+                ('referencia_id', models.PositiveIntegerField()),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+                ('alterado_em', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Versão dos Dados',
+                'verbose_name_plural': 'Versões dos Dados',
+                'unique_together': {('escopo', 'referencia_id')},
+            },
+        ),
+    ]
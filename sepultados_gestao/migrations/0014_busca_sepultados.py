@@ -0,0 +1,157 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:14
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Cópia congelada de services/busca.py e services/fonetica.py como estavam
+# nesta migration (a migration não pode depender do código vivo).
+FTS_TABELA = 'sepultados_gestao_busca_fts'
+FTS_CRIAR = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABELA} USING fts5('
+    "escopo, nome, familia, cpf, fonetico, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+PESO_NOME, PESO_FAMILIA, PESO_CPF = 10, 2, 5
+CAMPOS = (
+    'id', 'tumulo__cemiterio_id', 'tumulo__cemiterio__prefeitura_id',
+    'nome', 'nome_pai', 'nome_mae', 'nome_conjuge', 'cpf_sepultado',
+)
+TAMANHO_TERMO = 60
+
+PREPOSICOES = {'da', 'de', 'do', 'das', 'dos', 'e', 'di', 'du'}
+REGRAS = tuple((re.compile(padrao), troca) for padrao, troca in (
+    (r'ph', 'f'),
+    (r'th', 't'),
+    (r'sch|sh|ch', 'x'),
+    (r'lh', 'l'),
+    (r'nh', 'n'),
+    (r'h', ''),
+    (r'[sx]c(?=[eiy])', 's'),
+    (r'qu?(?=[eiy])', 'k'),
+    (r'qu?', 'k'),
+    (r'gu(?=[eiy])', 'G'),
+    (r'g(?=[eiy])', 'j'),
+    (r'G', 'g'),
+    (r'c(?=[eiy])', 's'),
+    (r'c', 'k'),
+    (r'y', 'i'),
+    (r'w', 'v'),
+    (r'z', 's'),
+    (r'l(?=[^aeiou]|$)', 'u'),
+    (r'm(?=[^aeiou]|$)', 'n'),
+    (r'([a-z])\1+', r'\1'),
+))
+VOGAIS = re.compile(r'[aeiou]+')
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', texto))
+
+
+def chaves(texto):
+    """Duas chaves por palavra: o esqueleto (vogais viram 'a') e a grafia com as vogais."""
+    texto = str(texto or '').lower().replace('ç', 's')
+    texto = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    vistas = []
+    for palavra in re.findall(r'[a-z]+', texto):
+        if palavra in PREPOSICOES:
+            continue
+        for padrao, troca in REGRAS:
+            palavra = padrao.sub(troca, palavra)
+        for chave in (VOGAIS.sub('a', palavra), palavra):
+            if chave and chave not in vistas:
+                vistas.append(chave)
+    return vistas
+
+
+def indexar_linhas(linhas, schema_editor, TermoBuscaSepultado):
+    docs = []
+    for sid, cem_id, pref_id, nome, pai, mae, conjuge, cpf in linhas:
+        familia = ' '.join(filter(None, (pai, mae, conjuge)))
+        docs.append((sid, cem_id, pref_id, normalizar(nome), normalizar(familia), re.sub(r'\D', '', cpf or ''),
+                     chaves(nome), chaves(familia)))
+
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as c:
+            c.executemany(
+                f'INSERT INTO {FTS_TABELA}(rowid, escopo, nome, familia, cpf, fonetico) '
+                'VALUES (%s, %s, %s, %s, %s, %s)',
+                [(sid, f'p{pref_id or 0} c{cem_id or 0}', nome, familia, cpf,
+                  ' '.join(dict.fromkeys(fon_nome + fon_familia)))
+                 for sid, cem_id, pref_id, nome, familia, cpf, fon_nome, fon_familia in docs],
+            )
+        return
+
+    termos = []
+    for sid, cem_id, pref_id, nome, familia, cpf, fon_nome, fon_familia in docs:
+        pesos = {}
+        for termo in familia.split():
+            pesos[termo] = max(pesos.get(termo, 0), PESO_FAMILIA)
+        for termo in nome.split():
+            pesos[termo] = max(pesos.get(termo, 0), PESO_NOME)
+        if cpf:
+            pesos[cpf] = max(pesos.get(cpf, 0), PESO_CPF)
+        foneticos = dict.fromkeys(fon_familia, PESO_FAMILIA)
+        foneticos.update(dict.fromkeys(fon_nome, PESO_NOME))
+        for lista, fonetico in ((pesos, False), (foneticos, True)):
+            termos.extend(
+                TermoBuscaSepultado(sepultado_id=sid, prefeitura_id=pref_id, cemiterio_id=cem_id,
+                                    termo=termo[:TAMANHO_TERMO], peso=peso, fonetico=fonetico)
+                for termo, peso in lista.items()
+            )
+    TermoBuscaSepultado.objects.using(schema_editor.connection.alias).bulk_create(termos, batch_size=1000)
+
+
+def criar_indice(apps, schema_editor):
+    Sepultado = apps.get_model('sepultados_gestao', 'Sepultado')
+    TermoBuscaSepultado = apps.get_model('sepultados_gestao', 'TermoBuscaSepultado')
+    using = schema_editor.connection.alias
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(FTS_CRIAR)
+
+    ultimo_id = 0
+    while True:
+        linhas = list(
+            Sepultado.objects.using(using).filter(pk__gt=ultimo_id).order_by('pk').values_list(*CAMPOS)[:2000]
+        )
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+        indexar_linhas(linhas, schema_editor, TermoBuscaSepultado)
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABELA}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0013_versao_dados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermoBuscaSepultado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sepultado_id', models.PositiveIntegerField(db_index=True)),
+                ('prefeitura_id', models.PositiveIntegerField(null=True)),
+                ('cemiterio_id', models.PositiveIntegerField(null=True)),
+                ('termo', models.CharField(max_length=60)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('fonetico', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Termo de Busca',
+                'verbose_name_plural': 'Termos de Busca',
+                'indexes': [models.Index(fields=['prefeitura_id', 'termo'], name='busca_sep_pref_termo_idx', opclasses=['int4_ops', 'varchar_pattern_ops']), models.Index(fields=['cemiterio_id', 'termo'], name='busca_sep_cem_termo_idx', opclasses=['int4_ops', 'varchar_pattern_ops'])],
+            },
+        ),
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
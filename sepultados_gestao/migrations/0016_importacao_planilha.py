@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sepultados_gestao', '0014_busca_sepultados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoPlanilha',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('quadras', 'Quadras'), ('tumulos', 'Túmulos'), ('sepultados', 'Sepultados')], max_length=12)),
+                ('arquivo', models.FileField(upload_to='importacoes/%Y/%m/')),
+                ('nome_arquivo', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], db_index=True, default='pendente', max_length=12)),
+                ('total_linhas', models.PositiveIntegerField(blank=True, null=True)),
+                ('linhas_processadas', models.PositiveIntegerField(default=0)),
+                ('linhas_no_inicio', models.PositiveIntegerField(default=0)),
+                ('importados', models.PositiveIntegerField(default=0)),
+                ('atualizados', models.PositiveIntegerField(default=0)),
+                ('erros', models.JSONField(blank=True, default=list)),
+                ('total_erros', models.PositiveIntegerField(default=0)),
+                ('mensagem', models.TextField(blank=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('cemiterio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importacoes', to='sepultados_gestao.cemiterio')),
+                ('prefeitura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sepultados_gestao.prefeitura')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Importação de Planilha',
+                'verbose_name_plural': 'Importações de Planilha',
+                'ordering': ('-criado_em',),
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.23 on 2026-10-18 08:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sepultados_gestao', '0016_importacao_planilha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='concessaocontrato',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='exumacao',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='receita',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='sepultado',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddField(
+            model_name='translado',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True, null=True, verbose_name='Atualizado em'),
+        ),
+        migrations.CreateModel(
+            name='BackupPrefeitura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('completo', 'Completo'), ('incremental', 'Incremental')], default='completo', max_length=12)),
+                ('status', models.CharField(choices=[('gerando', 'Gerando'), ('concluido', 'Concluído'), ('interrompido', 'Interrompido')], default='gerando', max_length=12)),
+                ('marca', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('desde', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('nome_arquivo', models.CharField(blank=True, max_length=255)),
+                ('tamanho', models.BigIntegerField(blank=True, null=True)),
+                ('manifesto_sha256', models.CharField(blank=True, max_length=64)),
+                ('resumo', models.JSONField(blank=True, default=dict)),
+                ('anterior', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sepultados_gestao.backupprefeitura')),
+                ('prefeitura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backups', to='sepultados_gestao.prefeitura')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Backup da Prefeitura',
+                'verbose_name_plural': 'Backups da Prefeitura',
+                'ordering': ('-marca',),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-18 08:48
+
+from django.db import migrations, models
+import sepultados_gestao.services.midia
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0017_backup_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoConteudo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Arquivo por Conteúdo',
+                'verbose_name_plural': 'Arquivos por Conteúdo',
+            },
+        ),
+        migrations.AlterField(
+            model_name='anexo',
+            name='arquivo',
+            field=models.FileField(storage=sepultados_gestao.services.midia.ArmazenamentoConteudo(), upload_to='anexos/%Y/%m/', verbose_name='Arquivo'),
+        ),
+        migrations.AlterField(
+            model_name='prefeitura',
+            name='brasao',
+            field=models.ImageField(blank=True, null=True, storage=sepultados_gestao.services.midia.ArmazenamentoConteudo(), upload_to='brasoes/', verbose_name='Brasão da Prefeitura'),
+        ),
+    ]
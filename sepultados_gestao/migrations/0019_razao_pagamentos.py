@@ -0,0 +1,83 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:10
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def lancar_pagamentos_existentes(apps, schema_editor):
+    """Um lançamento por receita já paga (total ou parcialmente), para o razão bater com valor_pago."""
+    Receita = apps.get_model('sepultados_gestao', 'Receita')
+    Pagamento = apps.get_model('sepultados_gestao', 'Pagamento')
+    using = schema_editor.connection.alias
+
+    ultimo_id = 0
+    while True:
+        linhas = list(
+            Receita.objects.using(using).filter(pk__gt=ultimo_id, valor_pago__gt=0).order_by('pk')
+            .values_list('pk', 'prefeitura_id', 'valor_pago', 'data_pagamento', 'atualizado_em')[:5000]
+        )
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+        Pagamento.objects.using(using).bulk_create([
+            Pagamento(
+                receita_id=pk, prefeitura_id=prefeitura_id, valor=valor_pago,
+                data_pagamento=data_pagamento or (atualizado_em.date() if atualizado_em else datetime.date.today()),
+            )
+            for pk, prefeitura_id, valor_pago, data_pagamento, atualizado_em in linhas
+        ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sepultados_gestao', '0018_midia_por_conteudo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Pagamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor')),
+                ('data_pagamento', models.DateField(default=datetime.date.today, verbose_name='Data de pagamento')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Registrado em')),
+            ],
+            options={
+                'verbose_name': 'Pagamento',
+                'verbose_name_plural': 'Pagamentos',
+                'ordering': ('data_pagamento', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['prefeitura', 'numero_documento'], name='receita_pref_documento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['prefeitura', 'cpf'], name='receita_pref_cpf_idx'),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='prefeitura',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='sepultados_gestao.prefeitura'),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='receita',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagamentos', to='sepultados_gestao.receita', verbose_name='Receita'),
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='usuario',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Registrado por'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['prefeitura', 'data_pagamento'], name='pagamento_pref_data_idx'),
+        ),
+        migrations.RunPython(lancar_pagamentos_existentes, migrations.RunPython.noop),
+    ]
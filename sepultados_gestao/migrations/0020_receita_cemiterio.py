@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+LOTE = 5000
+
+
+def preencher_cemiterio(apps, schema_editor):
+    """
+    Copia para a receita o cemitério do serviço (o mesmo caminho que os
+    relatórios juntavam), um UPDATE com subconsulta por serviço e por faixa de ids.
+    """
+    Receita = apps.get_model('sepultados_gestao', 'Receita')
+    using = schema_editor.connection.alias
+    servicos = (
+        ('contrato', apps.get_model('sepultados_gestao', 'ConcessaoContrato'), 'tumulo__quadra__cemiterio_id'),
+        ('sepultado', apps.get_model('sepultados_gestao', 'Sepultado'), 'tumulo__quadra__cemiterio_id'),
+        ('exumacao', apps.get_model('sepultados_gestao', 'Exumacao'), 'tumulo__quadra__cemiterio_id'),
+        ('translado', apps.get_model('sepultados_gestao', 'Translado'), 'tumulo_destino__quadra__cemiterio_id'),
+    )
+
+    ultimo = Receita.objects.using(using).aggregate(m=models.Max('pk'))['m'] or 0
+    for inicio in range(0, ultimo + 1, LOTE):
+        faixa = Receita.objects.using(using).filter(pk__gte=inicio, pk__lt=inicio + LOTE, cemiterio__isnull=True)
+        for campo, modelo, caminho in servicos:
+            cemiterio = modelo.objects.using(using).filter(pk=models.OuterRef(f'{campo}_id')).values(caminho)[:1]
+            faixa.filter(**{f'{campo}__isnull': False}).update(cemiterio_id=models.Subquery(cemiterio))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0019_razao_pagamentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receita',
+            name='cemiterio',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receitas', to='sepultados_gestao.cemiterio', verbose_name='Cemitério'),
+        ),
+        migrations.RunPython(preencher_cemiterio, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['cemiterio', 'data_vencimento'], name='receita_cemiterio_venc_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0020_receita_cemiterio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backupprefeitura',
+            name='status',
+            field=models.CharField(choices=[('gerando', 'Gerando'), ('gerado', 'Gerado (aguardando confirmação)'), ('concluido', 'Concluído'), ('interrompido', 'Interrompido')], default='gerando', max_length=12),
+        ),
+    ]
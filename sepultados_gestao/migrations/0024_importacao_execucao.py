@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepultados_gestao', '0023_backup_status_gerado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoplanilha',
+            name='execucao',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
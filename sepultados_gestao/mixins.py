@@ -147,10 +147,20 @@ class PrefeituraRestritaQuerysetMixin:
 
     def get_queryset(self):
         qs = super().get_queryset()
+        pref_id = self.get_prefeitura_id()
+        if pref_id is None:
+            return qs.none()
+
+        field = getattr(self, "prefeitura_field", "prefeitura")
+        key = field if field.endswith("_id") else f"{field}_id"
+        return qs.filter(**{key: pref_id})
+
+    def get_prefeitura_id(self):
+        """Prefeitura do contexto (ordem acima) ou None."""
         request = getattr(self, "request", None)
         user = getattr(request, "user", None)
         if not request or not user or not user.is_authenticated:
-            return qs.none()
+            return None
 
         pref_id = None
 
@@ -203,9 +213,100 @@ class PrefeituraRestritaQuerysetMixin:
             except Exception:
                 pref_id = None
 
-        if pref_id is None:
-            return qs.none()
+        return pref_id
 
-        field = getattr(self, "prefeitura_field", "prefeitura")
-        key = field if field.endswith("_id") else f"{field}_id"
-        return qs.filter(**{key: pref_id})
+
+# sepultados_gestao/mixins.py
+
+class VersaoETagMixin:
+    """
+    list/retrieve com ETag forte derivado da versão do cemitério/prefeitura
+    (services/versoes.py): If-None-Match com a versão atual recebe 304 sem
+    consultar o queryset.
+
+    A ViewSet define `escopo_versao()` -> ("cemiterio"|"prefeitura", id) ou None
+    (sem escopo conhecido, a resposta sai sem ETag).
+    """
+    versao_prefixo = ""
+
+    def escopo_versao(self):
+        return None
+
+    def _com_versao(self, request, gerar):
+        from .services import versoes
+
+        escopo = self.escopo_versao()
+        if not escopo:
+            return gerar()
+        return versoes.com_versao(request, escopo[0], escopo[1], gerar, prefixo=self.versao_prefixo)
+
+    def list(self, request, *args, **kwargs):
+        return self._com_versao(request, lambda: super(VersaoETagMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._com_versao(request, lambda: super(VersaoETagMixin, self).retrieve(request, *args, **kwargs))
+
+
+# sepultados_gestao/mixins.py
+
+class CamposEsparsosMixin:
+    """
+    Com ?fields= / ?omit= / ?perfil= (serializers.CamposDinamicosMixin), a
+    consulta de list/retrieve carrega só as colunas dos campos pedidos
+    (.only()), mais a chave e as colunas de ordenação/paginação.
+
+    Se algum campo pedido não puder ser ligado a colunas (propriedade do
+    modelo sem `dependencias` declaradas), a consulta fica completa.
+    """
+
+    acoes_campos_esparsos = ("list", "retrieve")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if getattr(self, "action", None) not in self.acoes_campos_esparsos:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, "campos_pedidos"):
+            return queryset
+
+        serializer = serializer_class(context={})
+        campos = serializer_class.campos_pedidos(self.request, serializer.fields.keys())
+        if campos is None:
+            return queryset
+        colunas = self._colunas(queryset, serializer, campos)
+        if colunas is None:
+            return queryset
+        # select_related não combina com FKs adiadas; os FKs saem só como id
+        return queryset.select_related(None).only(*colunas)
+
+    def _colunas(self, queryset, serializer, campos):
+        from django.core.exceptions import FieldDoesNotExist
+
+        meta = queryset.model._meta
+        colunas = {meta.pk.name}
+        ordenacao = list(getattr(self, "keyset_ordering", ())) + list(queryset.query.order_by)
+        fontes = [c.lstrip("-") for c in ordenacao if isinstance(c, str)]
+
+        for nome in campos:
+            campo = serializer.fields[nome]
+            if nome in serializer.dependencias:
+                fontes.extend(serializer.dependencias[nome])
+            elif campo.source in queryset.query.annotations:
+                continue
+            elif campo.source == "*" or "." in campo.source:
+                return None
+            else:
+                fontes.append(campo.source)
+
+        for fonte in fontes:
+            if fonte == "pk":
+                continue
+            try:
+                campo_modelo = meta.get_field(fonte)
+            except FieldDoesNotExist:
+                if fonte in queryset.query.annotations:
+                    continue
+                return None
+            if campo_modelo.concrete:
+                colunas.add(campo_modelo.name)
+        return colunas
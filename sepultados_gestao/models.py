@@ -10,6 +10,8 @@ from django.core.validators import FileExtensionValidator
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
+from .services.midia import ArmazenamentoConteudo
+
 
 
 
@@ -56,7 +58,9 @@ class Prefeitura(models.Model):
     )
     endereco_cep = models.CharField(max_length=10, verbose_name="CEP")
 
-    brasao = models.ImageField(upload_to='brasoes/', blank=True, null=True, verbose_name="Brasão da Prefeitura")
+    brasao = models.ImageField(
+        upload_to='brasoes/', storage=ArmazenamentoConteudo(), blank=True, null=True, verbose_name="Brasão da Prefeitura"
+    )
 
     # Campos de multa e juros
     multa_percentual = models.DecimalField(
@@ -106,12 +110,16 @@ class Prefeitura(models.Model):
     
 
 class NumeroSequencialGlobal(models.Model):
+    """
+    Contador da numeração XX/AAAA: uma única linha por (prefeitura, ano),
+    com o último número já emitido. Ver utils.reservar_numeros_sequenciais.
+    """
     prefeitura = models.ForeignKey('Prefeitura', on_delete=models.CASCADE)
-    numero = models.PositiveIntegerField()
+    numero = models.PositiveIntegerField(verbose_name="Último número emitido")
     ano = models.IntegerField()
 
     class Meta:
-        unique_together = ('prefeitura', 'numero', 'ano')
+        unique_together = ('prefeitura', 'ano')
         verbose_name = "Número Sequencial Global"
         verbose_name_plural = "Números Sequenciais Globais"
         app_label = "sepultados_gestao"
@@ -186,6 +194,232 @@ class Cemiterio(models.Model):
         app_label = "sepultados_gestao"
 
 
+class EstatisticaCemiterio(models.Model):
+    """
+    Números do painel por cemitério, mantidos por eventos (sepultamento,
+    exumação, translado, contratos, túmulos) em services/estatisticas.py.
+    O painel da prefeitura soma as linhas dos seus cemitérios.
+    Reconstrução: manage.py reconciliar_estatisticas.
+    """
+    cemiterio = models.OneToOneField(Cemiterio, on_delete=models.CASCADE, related_name="estatistica")
+    prefeitura = models.ForeignKey(Prefeitura, on_delete=models.CASCADE, related_name="+")
+
+    # tudo sem Ossário, exceto total_sepultados
+    vagas_totais = models.IntegerField(default=0)
+    vagas_ocupadas = models.IntegerField(default=0)
+    tumulos_livres = models.IntegerField(default=0)
+    total_sepultados = models.IntegerField(default=0)
+    contratos_ativos = models.IntegerField(default=0)
+    atualizado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Estatística - {self.cemiterio}"
+
+    class Meta:
+        verbose_name = "Estatística do Cemitério"
+        verbose_name_plural = "Estatísticas dos Cemitérios"
+        app_label = "sepultados_gestao"
+
+
+class VersaoDados(models.Model):
+    """
+    Contador de alterações por escopo (ex.: "cemiterio", 42). Sobe a cada
+    escrita relevante (services/versoes.py) e vira ETag/Last-Modified das leituras.
+    """
+    escopo = models.CharField(max_length=30)
+    referencia_id = models.PositiveIntegerField()
+    versao = models.PositiveBigIntegerField(default=0)
+    alterado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.escopo} {self.referencia_id} v{self.versao}"
+
+    class Meta:
+        unique_together = ("escopo", "referencia_id")
+        verbose_name = "Versão dos Dados"
+        verbose_name_plural = "Versões dos Dados"
+        app_label = "sepultados_gestao"
+
+
+class TermoBuscaSepultado(models.Model):
+    """
+    Índice de busca dos sepultados fora do SQLite (no SQLite a busca usa uma
+    tabela FTS5): um termo normalizado ou uma chave fonética por linha.
+    Mantido por services/busca.py.
+    """
+    sepultado_id = models.PositiveIntegerField(db_index=True)
+    prefeitura_id = models.PositiveIntegerField(null=True)
+    cemiterio_id = models.PositiveIntegerField(null=True)
+    termo = models.CharField(max_length=60)
+    peso = models.PositiveSmallIntegerField(default=1)
+    fonetico = models.BooleanField(default=False)  # termo é chave fonética (services/fonetica.py)
+
+    class Meta:
+        # varchar_pattern_ops: no PostgreSQL o LIKE 'x%' da busca por prefixo
+        # só usa o índice com essa classe (fora do locale C); os outros bancos
+        # ignoram as opclasses
+        indexes = [
+            models.Index(fields=["prefeitura_id", "termo"], name="busca_sep_pref_termo_idx",
+                         opclasses=["int4_ops", "varchar_pattern_ops"]),
+            models.Index(fields=["cemiterio_id", "termo"], name="busca_sep_cem_termo_idx",
+                         opclasses=["int4_ops", "varchar_pattern_ops"]),
+        ]
+        verbose_name = "Termo de Busca"
+        verbose_name_plural = "Termos de Busca"
+        app_label = "sepultados_gestao"
+
+
+class ImportacaoPlanilha(models.Model):
+    """
+    Importação de planilha em segundo plano (manage.py processar_importacoes).
+    O worker grava lote a lote; cada lote é confirmado junto com o ponto de
+    retomada (`linhas_processadas`), então uma importação que falhou pode ser
+    retomada dali sem repetir linhas. `execucao` identifica o worker dono do
+    job: um lote só confirma se o job ainda é dele, então o worker lento de
+    um job já retomado por outro desfaz o lote em andamento e para.
+    """
+    TIPO_CHOICES = (
+        ("quadras", "Quadras"),
+        ("tumulos", "Túmulos"),
+        ("sepultados", "Sepultados"),
+    )
+    STATUS_CHOICES = (
+        ("pendente", "Pendente"),
+        ("processando", "Processando"),
+        ("concluida", "Concluída"),
+        ("falhou", "Falhou"),
+    )
+    # "processando" sem avanço há mais que isso: o worker caiu, pode retomar
+    TEMPO_SEM_AVANCO = timedelta(minutes=10)
+
+    prefeitura = models.ForeignKey(Prefeitura, on_delete=models.CASCADE, related_name="+")
+    cemiterio = models.ForeignKey(Cemiterio, on_delete=models.CASCADE, related_name="importacoes")
+    usuario = models.ForeignKey(
+        "aaa_usuarios.Usuario", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    tipo = models.CharField(max_length=12, choices=TIPO_CHOICES)
+    arquivo = models.FileField(upload_to="importacoes/%Y/%m/")
+    nome_arquivo = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="pendente", db_index=True)
+
+    total_linhas = models.PositiveIntegerField(null=True, blank=True)
+    # ponto de retomada: índice (no DataFrame) da próxima linha a importar
+    linhas_processadas = models.PositiveIntegerField(default=0)
+    linhas_no_inicio = models.PositiveIntegerField(default=0)  # ponto de retomada quando esta execução começou
+    importados = models.PositiveIntegerField(default=0)
+    atualizados = models.PositiveIntegerField(default=0)
+    erros = models.JSONField(default=list, blank=True)  # os primeiros LIMITE_ERROS
+    total_erros = models.PositiveIntegerField(default=0)
+    mensagem = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    execucao = models.UUIDField(null=True, blank=True, editable=False)  # worker que assumiu o job
+
+    criado_em = models.DateTimeField(default=timezone.now)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    LIMITE_ERROS = 1000
+
+    @property
+    def linhas_por_segundo(self):
+        """Ritmo da execução atual (ou da última)."""
+        if not self.iniciado_em or not self.atualizado_em:
+            return None
+        segundos = (self.atualizado_em - self.iniciado_em).total_seconds()
+        linhas = self.linhas_processadas - self.linhas_no_inicio
+        return round(linhas / segundos, 1) if segundos > 0 and linhas > 0 else None
+
+    @property
+    def eta_segundos(self):
+        ritmo = self.linhas_por_segundo
+        if self.status != "processando" or not ritmo or self.total_linhas is None:
+            return None
+        return max(0, round((self.total_linhas - self.linhas_processadas) / ritmo))
+
+    @property
+    def pode_retomar(self):
+        if self.status == "falhou":
+            return True
+        ultimo_sinal = self.atualizado_em or self.iniciado_em
+        return (
+            self.status == "processando" and ultimo_sinal is not None
+            and timezone.now() - ultimo_sinal > self.TEMPO_SEM_AVANCO
+        )
+
+    def __str__(self):
+        return f"Importação de {self.get_tipo_display().lower()} #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ("-criado_em",)
+        verbose_name = "Importação de Planilha"
+        verbose_name_plural = "Importações de Planilha"
+        app_label = "sepultados_gestao"
+
+
+class BackupPrefeitura(models.Model):
+    """
+    Backup da prefeitura já gerado (services/backup.py). `marca` é o instante
+    em que começou: o próximo backup incremental exporta só o que mudou
+    desde ela. `manifesto_sha256` encadeia os arquivos: o manifesto de cada
+    incremental aponta para o hash do manifesto do backup anterior. Só o
+    backup "concluido" (arquivo conferido depois do download) serve de base
+    para o próximo incremental.
+    """
+    TIPO_CHOICES = (
+        ("completo", "Completo"),
+        ("incremental", "Incremental"),
+    )
+    STATUS_CHOICES = (
+        ("gerando", "Gerando"),
+        ("gerado", "Gerado (aguardando confirmação)"),
+        ("concluido", "Concluído"),
+        ("interrompido", "Interrompido"),
+    )
+
+    prefeitura = models.ForeignKey(Prefeitura, on_delete=models.CASCADE, related_name="backups")
+    tipo = models.CharField(max_length=12, choices=TIPO_CHOICES, default="completo")
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="gerando")
+    anterior = models.ForeignKey("self", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    usuario = models.ForeignKey(
+        "aaa_usuarios.Usuario", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    marca = models.DateTimeField(default=timezone.now, db_index=True)
+    desde = models.DateTimeField(null=True, blank=True)  # incremental: exportou o que mudou a partir daqui
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    nome_arquivo = models.CharField(max_length=255, blank=True)
+    tamanho = models.BigIntegerField(null=True, blank=True)
+    manifesto_sha256 = models.CharField(max_length=64, blank=True)
+    resumo = models.JSONField(default=dict, blank=True)  # linhas exportadas por planilha
+
+    def __str__(self):
+        return f"Backup {self.get_tipo_display().lower()} #{self.pk} de {self.prefeitura}"
+
+    class Meta:
+        ordering = ("-marca",)
+        verbose_name = "Backup da Prefeitura"
+        verbose_name_plural = "Backups da Prefeitura"
+        app_label = "sepultados_gestao"
+
+
+class ArquivoConteudo(models.Model):
+    """
+    Arquivo guardado pelo conteúdo (services/midia.py): um por sha256, com
+    quantos Anexos/brasões apontam para ele. Chega a zero -> o arquivo é apagado.
+    """
+    nome = models.CharField(max_length=255, unique=True)
+    referencias = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nome} ({self.referencias})"
+
+    class Meta:
+        verbose_name = "Arquivo por Conteúdo"
+        verbose_name_plural = "Arquivos por Conteúdo"
+        app_label = "sepultados_gestao"
+
+
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils.functional import cached_property
@@ -283,6 +517,8 @@ class Tumulo(models.Model):
         verbose_name="Capacidade de sepultamentos",
         help_text="Número máximo de sepultamentos simultâneos neste túmulo."
     )
+    # Sepultados ativos (não exumados/trasladados); mantido via F() por services.ocupacao
+    ocupantes_ativos = models.PositiveIntegerField(default=0, editable=False, verbose_name="Ocupantes ativos")
 
     # Coordenadas/geo
     localizacao = models.JSONField(null=True, blank=True)
@@ -356,30 +592,26 @@ class Tumulo(models.Model):
         return self.angulo_graus
 
     def calcular_status_dinamico(self):
-        from .models import Sepultado
-
-        if not self.pk:
-            return self.status  # ou 'disponivel'
-
         if self.reservado:
             return 'reservado'
-
-        sepultados_ativos = Sepultado.objects.filter(
-            tumulo=self,
-            exumado=False,
-            trasladado=False
-        ).count()
-
-        return 'ocupado' if sepultados_ativos >= self.capacidade else 'disponivel'
+        return 'ocupado' if self.ocupantes_ativos >= self.capacidade else 'disponivel'
 
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        from .services.ocupacao import status_ocupacao_expr
 
-        new_status = self.calcular_status_dinamico()
-        if new_status != self.status:
-            type(self).objects.filter(pk=self.pk).update(status=new_status)
-            self.status = new_status
+        self.full_clean()
+        self.status = self.calcular_status_dinamico()
+
+        # O contador é do banco (F-expressions); nunca regravar o valor em memória
+        if self.pk and not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ("ocupantes_ativos", "status")
+            ]
+            super().save(*args, **kwargs)
+            type(self).objects.filter(pk=self.pk).update(status=status_ocupacao_expr())
+        else:
+            super().save(*args, **kwargs)
 
     def __str__(self):
         partes = []
@@ -396,10 +628,10 @@ class Tumulo(models.Model):
         return " ".join(partes) or f"Túmulo {self.pk}"
 
     def atualizar_status(self):
-        new_status = self.calcular_status_dinamico()
-        if new_status != self.status:
-            type(self).objects.filter(pk=self.pk).update(status=new_status)
-            self.status = new_status
+        from .services.ocupacao import status_ocupacao_expr
+
+        type(self).objects.filter(pk=self.pk).update(status=status_ocupacao_expr())
+        self.refresh_from_db(fields=["status", "ocupantes_ativos"])
 
     class Meta:
         verbose_name = "Túmulo"
@@ -407,10 +639,11 @@ class Tumulo(models.Model):
         app_label = "sepultados_gestao"
 
 
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
+from .services.ocupacao import sepultado_ativo
 
 
 class Sepultado(models.Model):
@@ -523,6 +756,9 @@ class Sepultado(models.Model):
     )
 
     importado = models.BooleanField(default=False, verbose_name="Importado via planilha")
+    # backup incremental (services/backup.py); queryset.update()/bulk_update() não
+    # mexem em auto_now: quem gravar assim inclui atualizado_em=timezone.now()
+    atualizado_em = models.DateTimeField(auto_now=True, null=True, db_index=True, verbose_name="Atualizado em")
 
 
     from functools import cached_property
@@ -535,6 +771,22 @@ class Sepultado(models.Model):
             return None
 
 
+    def _ocupacao_anterior(self):
+        """
+        (tumulo_id, ativo) como está no banco, com a linha travada até o fim da
+        transação: dois saves simultâneos do mesmo sepultado não movem a vaga
+        duas vezes (o segundo espera e lê o que o primeiro gravou).
+        """
+        if self._state.adding:
+            return (None, False)
+        row = (
+            type(self).objects.select_for_update().filter(pk=self.pk)
+            .values("tumulo_id", "exumado", "trasladado").first()
+        )
+        if not row:
+            return (None, False)
+        return (row["tumulo_id"], bool(row["tumulo_id"]) and not row["exumado"] and not row["trasladado"])
+
     def calcular_idade(self):
         if self.data_nascimento and self.data_falecimento:
             return self.data_falecimento.year - self.data_nascimento.year - (
@@ -545,6 +797,7 @@ class Sepultado(models.Model):
     def save(self, *args, **kwargs):
         from .utils import gerar_receitas_para_servico, gerar_numero_sequencial_global
         from .models import Sepultado
+        from .services.ocupacao import atualizar_ocupacao_sepultado
         from django.core.exceptions import ValidationError
 
         ignorar_validacao = kwargs.pop("ignorar_validacao_contrato", False)
@@ -557,7 +810,15 @@ class Sepultado(models.Model):
             self.full_clean()  # Executa o clean completo, com validações de contrato
 
         self.idade_ao_falecer = self.calcular_idade()
-        super().save(*args, **kwargs)
+
+        # grava e move a vaga do túmulo (contador + status) na mesma transação;
+        # durante o save os sinais leem o estado anterior em _ocupacao_db
+        with transaction.atomic():
+            self._ocupacao_db = self._ocupacao_anterior()
+            super().save(*args, **kwargs)
+            atual = (self.tumulo_id, sepultado_ativo(self))
+            atualizar_ocupacao_sepultado(self._ocupacao_db, atual)
+            self._ocupacao_db = atual
 
         # Validação final para gratuito
         if criando:
@@ -575,11 +836,6 @@ class Sepultado(models.Model):
                 numero_documento=self.numero_sepultamento
             )
 
-        # Atualiza o status do túmulo
-        if self.tumulo:
-            self.tumulo.status = self.tumulo.calcular_status_dinamico()
-            self.tumulo.save(update_fields=["status"])
-
     def __str__(self):
         return self.nome
 
@@ -613,24 +869,13 @@ class Sepultado(models.Model):
                 'tumulo': "Este túmulo não possui contrato de concessão. O sepultamento não é permitido."
             })
 
-        # Verifica a capacidade do túmulo
+        # Verifica a capacidade do túmulo (contador mantido em Tumulo.ocupantes_ativos)
         tumulo = self.tumulo
         capacidade = tumulo.capacidade
 
-        # Filtra apenas os sepultados ainda ativos
-        from .models import Sepultado  # Importação defensiva
-        sepultados_ativos = Sepultado.objects.filter(
-            tumulo=tumulo,
-            exumado=False,
-            trasladado=False
-        )
-
-        if self.pk:
-            sepultados_ativos = sepultados_ativos.exclude(pk=self.pk)
-
         # Valida capacidade + exumações apenas se for um novo sepultamento
         if not self.pk:
-            if sepultados_ativos.count() >= capacidade:
+            if tumulo.ocupantes_ativos >= capacidade:
                 try:
                     cemit = tumulo.quadra.cemiterio
                 except Exception:
@@ -650,12 +895,6 @@ class Sepultado(models.Model):
                         f"É necessário que pelo menos uma exumação tenha ocorrido há mais de {meses_minimos} meses."
                     )
 
-    def delete(self, *args, **kwargs):
-        tumulo = self.tumulo
-        super().delete(*args, **kwargs)
-        if tumulo:
-            tumulo.status = tumulo.calcular_status_dinamico()
-            tumulo.save(update_fields=["status"])
     @property
     def status_display(self):
         if self.trasladado:
@@ -673,6 +912,10 @@ class Sepultado(models.Model):
     class Meta:
         verbose_name = "Sepultado"
         verbose_name_plural = "Sepultados"
+        indexes = [
+            # chave da paginação por cursor da API (-data_sepultamento, -id)
+            models.Index(fields=["-data_sepultamento", "-id"], name="sep_data_sep_id_idx"),
+        ]
 
 
 from .utils import gerar_receitas_para_servico
@@ -745,6 +988,7 @@ class ConcessaoContrato(models.Model):
         verbose_name="Usuário responsável",
         related_name="contratos_registrados"
     )
+    atualizado_em = models.DateTimeField(auto_now=True, null=True, db_index=True, verbose_name="Atualizado em")
     def clean(self):
         # precisa ter túmulo
         if not self.tumulo_id:
@@ -769,9 +1013,7 @@ class ConcessaoContrato(models.Model):
             # 2) BLOQUEIO PARA OCUPADO COM SEPULTADOS ATIVOS
             if status == "ocupado":
                 # considerar 'ativos' quem não foi exumado nem trasladado
-                sepultados_ativos = Sepultado.objects.filter(
-                    tumulo=self.tumulo, exumado=False, trasladado=False
-                ).exists()
+                sepultados_ativos = self.tumulo.ocupantes_ativos > 0
 
                 # se preferir preservar o 'histórico importado' também:
                 # tem_nao_importado = Sepultado.objects.filter(tumulo=self.tumulo, importado=False).exists()
@@ -825,9 +1067,6 @@ class ConcessaoContrato(models.Model):
 
         super().delete(*args, **kwargs)
 
-        self.tumulo.status = self.tumulo.calcular_status_dinamico()
-        self.tumulo.save(update_fields=["status"])
-
     def __str__(self):
         return f"{self.numero_contrato or 'Contrato'} - {self.nome} - {self.tumulo.identificador}"
 
@@ -873,6 +1112,7 @@ class Exumacao(models.Model):
     valor = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor", default=0.00)
 
     numero_documento = models.CharField(max_length=20, blank=True, editable=False)
+    atualizado_em = models.DateTimeField(auto_now=True, null=True, db_index=True, verbose_name="Atualizado em")
 
     def clean(self):
         super().clean()
@@ -964,6 +1204,9 @@ class Exumacao(models.Model):
     class Meta:
         verbose_name = "Exumação"
         verbose_name_plural = "Exumações"
+        indexes = [
+            models.Index(fields=["-data", "-id"], name="exu_data_id_idx"),
+        ]
 
 from django.db import models
 from django.utils import timezone
@@ -1002,6 +1245,7 @@ class Translado(models.Model):
     valor = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor", default=0.00)
 
     numero_documento = models.CharField(max_length=20, blank=True, editable=False)
+    atualizado_em = models.DateTimeField(auto_now=True, null=True, db_index=True, verbose_name="Atualizado em")
 
     def clean(self):
         super().clean()
@@ -1023,10 +1267,10 @@ class Translado(models.Model):
                     'tumulo_destino': "Este túmulo não possui contrato de concessão. A transferência não é permitida."
                 })
 
-            sepultados_no_destino = self.tumulo_destino.sepultado_set.filter(trasladado=False)
             capacidade = self.tumulo_destino.capacidade or 1
 
-            if sepultados_no_destino.count() >= capacidade:
+            if self.tumulo_destino.ocupantes_ativos >= capacidade:
+                sepultados_no_destino = self.tumulo_destino.sepultado_set.filter(trasladado=False)
                 # Se está cheio, verifica se existe exumação válida
                 cemit = self.tumulo_destino.quadra.cemiterio
                 meses_min = cemit.tempo_minimo_exumacao or 0
@@ -1082,7 +1326,7 @@ class Translado(models.Model):
             sep.exumado = True
             sep.data_translado = self.data
             # ⚠️ não altere sep.tumulo aqui – isso preserva o histórico no túmulo de origem
-            sep.save(update_fields=['trasladado', 'exumado', 'data_translado'])
+            sep.save(update_fields=['trasladado', 'exumado', 'data_translado', 'atualizado_em'])
 
     def delete(self, *args, **kwargs):
         from .models import Sepultado
@@ -1103,7 +1347,7 @@ class Translado(models.Model):
         ).exists()
 
         sep.exumado = True if havia_exumacao else False
-        sep.save(update_fields=["trasladado", "data_translado", "exumado"])
+        sep.save(update_fields=["trasladado", "data_translado", "exumado", "atualizado_em"])
 
         # Exclui o clone do túmulo de destino
         if self.destino == 'outro_tumulo' and self.tumulo_destino:
@@ -1241,7 +1485,7 @@ class Licenca(models.Model):
 
 
 
-from django.db import models, transaction
+from django.db import models
 from decimal import Decimal
 from datetime import date
 from .utils import gerar_numero_sequencial_global
@@ -1298,6 +1542,19 @@ class Receita(models.Model):
         related_name='receitas'
     )
 
+    # cemitério do serviço (túmulo do contrato/sepultado/exumação, destino do translado),
+    # gravado na receita para os relatórios filtrarem sem juntar as quatro tabelas
+    cemiterio = models.ForeignKey(
+        'Cemiterio',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False,  # coberto por receita_cemiterio_venc_idx
+        verbose_name="Cemitério",
+        related_name='receitas'
+    )
+
     nome = models.CharField(
         max_length=255,
         verbose_name="Nome",
@@ -1387,14 +1644,24 @@ class Receita(models.Model):
         editable=False,
         verbose_name="Mora Diária"
     )
+    atualizado_em = models.DateTimeField(auto_now=True, null=True, db_index=True, verbose_name="Atualizado em")
+
+    def cemiterio_id_do_servico(self):
+        """Cemitério do túmulo do serviço vinculado (None para receita diversa ou sem túmulo)."""
+        from .services.financeiro import CEMITERIO_DO_SERVICO, cemiterio_do_servico
+
+        for campo in CEMITERIO_DO_SERVICO:
+            servico_id = getattr(self, f"{campo}_id")
+            if servico_id:
+                return cemiterio_do_servico(campo, servico_id)
+        return None
 
     def calcular_multa_juros(self):
         if self.data_vencimento and date.today() > self.data_vencimento:
+            from .services.encargos import taxas  # as mesmas do recálculo em lote (recalcular_encargos)
+
             dias_atraso = (date.today() - self.data_vencimento).days
-            config = self.prefeitura
-            multa_percentual = getattr(config, 'multa_percentual', Decimal('2.00'))
-            juros_percentual = getattr(config, 'juros_percentual', Decimal('1.00'))
-            mora_diaria = getattr(config, 'mora_diaria', Decimal('0.10'))
+            multa_percentual, juros_percentual, mora_diaria = taxas(self.prefeitura)
             base = self.valor_total
             self.multa = (base * multa_percentual / 100).quantize(Decimal("0.01"))
             self.juros = (base * juros_percentual / 100).quantize(Decimal("0.01"))
@@ -1419,6 +1686,10 @@ class Receita(models.Model):
                 self.numero_documento = gerar_numero_sequencial_global(self.prefeitura)
                 self.descricao = "Receita Diversa"
 
+        # sempre pelo serviço atual (o vínculo pode ter mudado); trocas de túmulo do
+        # serviço chegam pelos sinais (services/financeiro.sincronizar_cemiterio)
+        self.cemiterio_id = self.cemiterio_id_do_servico()
+
         self.calcular_multa_juros()
 
         total_corrigido = (
@@ -1428,50 +1699,44 @@ class Receita(models.Model):
         valor_pago = (self.valor_pago or Decimal("0.00")).quantize(Decimal('0.01'))
         self.valor_em_aberto = max(total_corrigido - valor_pago, Decimal("0.00")).quantize(Decimal('0.01'))
 
-        # Status e pagamento
-        if valor_pago >= total_corrigido:
-            self.status = 'pago'
-            self.data_pagamento = date.today()
-        elif valor_pago > 0:
-            self.status = 'pago'  # pago parcial — gera nova receita
-            self.data_pagamento = date.today()
+        # Status e pagamento (o saldo fica nesta mesma receita; cada pagamento vira um lançamento em Pagamento)
+        lancado = getattr(self, "_pagamento_lancado", False)
+        if valor_pago > 0:
+            self.status = 'pago' if valor_pago >= total_corrigido else 'parcial'
+            if not (lancado and self.data_pagamento):
+                self.data_pagamento = date.today()
         else:
             self.status = 'aberto'
             self.data_pagamento = None
 
-        criar_nova = False
-        valor_restante = self.valor_em_aberto
-
-        if self.pk and valor_restante > 0 and valor_pago > 0:
-            from .models import Receita
-            existe = Receita.objects.filter(
-                numero_documento=self.numero_documento,
-                status="aberto",
-                valor_total=valor_restante
-            ).exists()
-            if not existe:
-                criar_nova = True
-                self.valor_em_aberto = Decimal("0.00")
-
         with transaction.atomic():
+            # valor_pago alterado direto (admin/API): a diferença entra no razão. O valor
+            # anterior é lido com a linha travada até o commit, senão duas edições
+            # simultâneas lançariam a mesma diferença duas vezes.
+            diferenca = Decimal("0.00")
+            if not lancado:
+                anterior = None
+                if self.pk:
+                    anterior = (
+                        Receita.objects.select_for_update().filter(pk=self.pk)
+                        .values_list("valor_pago", flat=True).first()
+                    )
+                diferenca = valor_pago - (anterior or Decimal("0.00"))
+
             super().save(*args, **kwargs)
 
-            if criar_nova:
-                Receita.objects.create(
-                    prefeitura=self.prefeitura,
-                    numero_documento=self.numero_documento,
-                    descricao=self.descricao,
-                    valor_total=valor_restante,
-                    valor_pago=Decimal("0.00"),
-                    desconto=Decimal("0.00"),
-                    data_vencimento=self.data_vencimento,
-                    status="aberto",
-                    nome=self.nome,
-                    cpf=self.cpf,
-                    contrato=self.contrato,
-                    exumacao=self.exumacao,
-                    translado=self.translado,
+            if diferenca:
+                from crum import get_current_user
+
+                usuario = get_current_user()
+                Pagamento.objects.create(
+                    receita=self,
+                    valor=diferenca,
+                    data_pagamento=self.data_pagamento or date.today(),
+                    usuario=usuario if usuario and usuario.is_authenticated else None,
                 )
+        self._pagamento_lancado = False
+
     @property
     def descricao_segura(self):
         if self.contrato:
@@ -1492,6 +1757,62 @@ class Receita(models.Model):
     class Meta:
         verbose_name = "Receita"
         verbose_name_plural = "Receitas"
+        indexes = [
+            # saldos por documento e por pessoa (services/pagamentos.py); por contrato usa o índice da FK
+            models.Index(fields=["prefeitura", "numero_documento"], name="receita_pref_documento_idx"),
+            models.Index(fields=["prefeitura", "cpf"], name="receita_pref_cpf_idx"),
+            # relatórios por cemitério e período de vencimento
+            models.Index(fields=["cemiterio", "data_vencimento"], name="receita_cemiterio_venc_idx"),
+        ]
+
+
+from django.conf import settings
+
+
+class Pagamento(models.Model):
+    """
+    Lançamento no razão de pagamentos de uma receita. Receita.valor_pago é o
+    saldo corrente (a soma dos lançamentos); estornos entram com valor negativo.
+    """
+    receita = models.ForeignKey(
+        Receita,
+        on_delete=models.CASCADE,
+        related_name="pagamentos",
+        verbose_name="Receita"
+    )
+    prefeitura = models.ForeignKey(
+        'Prefeitura',
+        on_delete=models.CASCADE,
+        editable=False
+    )
+    valor = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor")
+    data_pagamento = models.DateField(default=date.today, verbose_name="Data de pagamento")
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Registrado por"
+    )
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Registrado em")
+
+    def save(self, *args, **kwargs):
+        if not self.prefeitura_id:
+            self.prefeitura_id = self.receita.prefeitura_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.receita} - R$ {self.valor}"
+
+    class Meta:
+        verbose_name = "Pagamento"
+        verbose_name_plural = "Pagamentos"
+        ordering = ("data_pagamento", "id")
+        indexes = [
+            # conciliação mensal (manage.py conciliar_pagamentos)
+            models.Index(fields=["prefeitura", "data_pagamento"], name="pagamento_pref_data_idx"),
+        ]
 
 
 from django.db import models
@@ -1499,7 +1820,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 class Anexo(models.Model):
-    arquivo = models.FileField(upload_to='anexos/%Y/%m/', verbose_name="Arquivo")
+    arquivo = models.FileField(upload_to='anexos/%Y/%m/', storage=ArmazenamentoConteudo(), verbose_name="Arquivo")
     nome = models.CharField("Descrição ou Nome do Arquivo", max_length=255, blank=True, null=True)
     data_upload = models.DateTimeField(auto_now_add=True, verbose_name="Data do Envio")
 
@@ -1508,6 +1829,12 @@ class Anexo(models.Model):
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey("content_type", "object_id")  # ← Corrigido aqui
 
+    def save(self, *args, **kwargs):
+        # o arquivo é gravado pelo conteúdo (sha256) e perde o nome do envio: guarda em `nome`
+        if not self.nome and self.arquivo and not self.arquivo._committed:
+            self.nome = self.arquivo.name.replace("\\", "/").rsplit("/", 1)[-1][:255]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nome or self.arquivo.name
 
@@ -1548,6 +1875,9 @@ class RegistroAuditoria(models.Model):
         verbose_name = "Registro de Auditoria"
         verbose_name_plural = "Registros de Auditoria"
         ordering = ['-data_hora']
+        indexes = [
+            models.Index(fields=["prefeitura", "-data_hora", "-id"], name="aud_pref_data_id_idx"),
+        ]
 
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
@@ -1557,6 +1887,11 @@ from django.core.exceptions import ValidationError
 
 @receiver(pre_delete, sender=RegistroAuditoria)
 def bloquear_exclusao_auditoria(sender, instance, **kwargs):
+    from sepultados_gestao.services.arquivo_auditoria import exclusao_liberada
+
+    # única exceção: o arquivamento, que já gravou o registro no segmento frio
+    if exclusao_liberada():
+        return
     raise ValidationError("Os registros de auditoria não podem ser excluídos.")
 
 from sepultados_gestao.session_context.thread_local import get_prefeitura_ativa
@@ -1585,9 +1920,12 @@ def obter_prefeitura_robusta(instance, usuario):
 
 from sepultados_gestao.session_context.thread_local import get_prefeitura_ativa
 
+from sepultados_gestao.services.auditoria import deve_ignorar, registrar as registrar_auditoria_em_lote
+
 @receiver(post_save)
 def auditar_salvamento(sender, instance, created, **kwargs):
-    if sender == RegistroAuditoria:
+    # modelos de controle e saves só de status não entram (settings.AUDITORIA)
+    if sender == RegistroAuditoria or deve_ignorar(sender, kwargs.get("update_fields")):
         return
 
     usuario = get_current_user()
@@ -1609,7 +1947,7 @@ def auditar_salvamento(sender, instance, created, **kwargs):
     if not prefeitura:
         return  # Evita salvar auditoria inválida
 
-    RegistroAuditoria.objects.create(
+    registrar_auditoria_em_lote(
         usuario=usuario,
         acao=acao,
         modelo=modelo,
@@ -1620,7 +1958,7 @@ def auditar_salvamento(sender, instance, created, **kwargs):
 
 @receiver(post_delete)
 def auditar_exclusao(sender, instance, **kwargs):
-    if sender == RegistroAuditoria:
+    if sender == RegistroAuditoria or deve_ignorar(sender):
         return
 
     usuario = get_current_user()
@@ -1642,7 +1980,7 @@ def auditar_exclusao(sender, instance, **kwargs):
     if not prefeitura:
         return
 
-    RegistroAuditoria.objects.create(
+    registrar_auditoria_em_lote(
         usuario=usuario,
         acao=acao,
         modelo=modelo,
@@ -0,0 +1,249 @@
+# sepultados_gestao/pagination.py
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre as chaves de ordenação da ViewSet.
+
+    A ViewSet declara `keyset_ordering` (ex.: ("-data_sepultamento", "-id")).
+    O último campo precisa ser único (normalmente o id) para o cursor ser estável.
+    O cursor é opaco (base64 com os valores da última linha da página), então
+    a página 1.000 custa o mesmo que a primeira: é sempre um WHERE + LIMIT.
+
+    Só pagina quando o cliente pede (?cursor= ou ?page_size=); sem esses
+    parâmetros a resposta continua sendo a lista completa, como antes.
+    Total opcional com ?count=1 (faz um COUNT no queryset filtrado).
+
+    Os nulos ficam onde o banco os põe (PostgreSQL: maiores que tudo;
+    SQLite/MySQL: menores), para o ORDER BY ser o mesmo dos índices simples
+    (-campo, -id) e o banco percorrer o índice em vez de ordenar.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+    page_size = api_settings.PAGE_SIZE or 100
+    max_page_size = 500
+    default_ordering = ("-id",)
+
+    invalid_cursor_message = "Cursor inválido."
+
+    # ----------------- ativação / tamanho -----------------
+    def _ativa(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param) or self.page_size)
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, view):
+        ordering = tuple(getattr(view, "keyset_ordering", None) or self.default_ordering)
+        if ordering[-1].lstrip("-") not in ("id", "pk"):
+            ordering = ordering + (("-id",) if ordering[-1].startswith("-") else ("id",))
+        return ordering
+
+    # ----------------- cursor -----------------
+    @staticmethod
+    def _to_json(valor):
+        if isinstance(valor, (datetime, date, time)):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return str(valor)
+        return valor
+
+    def encode_cursor(self, valores):
+        raw = json.dumps([self._to_json(v) for v in valores], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, request, model, ordering):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+            valores = json.loads(raw)
+            if not isinstance(valores, list) or len(valores) != len(ordering):
+                raise ValueError
+            opts = model._meta
+            campos = [c.lstrip("-") for c in ordering]
+            return [
+                None if v is None else (opts.pk if nome == "pk" else opts.get_field(nome)).to_python(v)
+                for nome, v in zip(campos, valores)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    # ----------------- filtro keyset -----------------
+    def _nulos_antes(self, campo):
+        """Se os nulos vêm antes dos valores na ordem de `campo`, no banco em uso."""
+        return campo.startswith("-") == self.nulos_maiores
+
+    def _depois_de(self, campo, valor):
+        """Linhas estritamente depois de `valor` na ordem de `campo`."""
+        nome = campo.lstrip("-")
+        if valor is None:
+            # depois dos nulos só vêm os valores, se os nulos vêm antes
+            return Q(**{f"{nome}__isnull": False}) if self._nulos_antes(campo) else Q(pk__in=[])
+        lookup = "lt" if campo.startswith("-") else "gt"
+        depois = Q(**{f"{nome}__{lookup}": valor})
+        return depois if self._nulos_antes(campo) else depois | Q(**{f"{nome}__isnull": True})
+
+    @staticmethod
+    def _igual_a(campo, valor):
+        nome = campo.lstrip("-")
+        if valor is None:
+            return Q(**{f"{nome}__isnull": True})
+        return Q(**{nome: valor})
+
+    def _filtro_keyset(self, ordering, valores):
+        # (a > va) OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc) ...
+        filtro = Q(pk__in=[])
+        prefixo = Q()
+        for campo, valor in zip(ordering, valores):
+            filtro |= prefixo & self._depois_de(campo, valor)
+            prefixo &= self._igual_a(campo, valor)
+        return filtro
+
+    # ----------------- listas já materializadas -----------------
+    @staticmethod
+    def _valor(obj, campo):
+        nome = campo.lstrip("-")
+        return getattr(obj, "pk" if nome == "pk" else nome)
+
+    def _ordenar_lista(self, linhas, ordering):
+        # ordenação estável, da última chave para a primeira; nulos como no banco
+        for campo in reversed(ordering):
+            desc = campo.startswith("-")
+            nulo_maior = self._nulos_antes(campo) == desc
+
+            def chave(obj, campo=campo, nulo_maior=nulo_maior):
+                v = self._valor(obj, campo)
+                return (v is None, v) if nulo_maior else (v is not None, v)
+
+            linhas.sort(key=chave, reverse=desc)
+        return linhas
+
+    def _depois_do_cursor(self, obj, ordering, valores):
+        for campo, cursor in zip(ordering, valores):
+            v = self._valor(obj, campo)
+            if v == cursor:
+                continue
+            if cursor is None:
+                return self._nulos_antes(campo)
+            if v is None:
+                return not self._nulos_antes(campo)
+            return v < cursor if campo.startswith("-") else v > cursor
+        return False
+
+    # ----------------- janela de uma fonte -----------------
+    def _janela(self, fonte, request, view, contar):
+        """
+        Até page_size + 1 linhas de `fonte` depois do cursor, já na ordem, e o
+        total da fonte (ou None sem ?count=). QuerySet: filtro keyset + LIMIT
+        no SQL; lista: filtra pelo cursor antes de ordenar o que sobrou.
+        """
+        limite = self.page_size_atual + 1
+        if isinstance(fonte, QuerySet):
+            fonte = fonte.order_by(*self.ordering)
+            total = fonte.count() if contar else None
+            valores = self.decode_cursor(request, fonte.model, self.ordering)
+            if valores is not None:
+                fonte = fonte.filter(self._filtro_keyset(self.ordering, valores))
+            return list(fonte[:limite]), total
+
+        fonte = list(fonte)
+        total = len(fonte) if contar else None
+        valores = self.decode_cursor(request, view.queryset.model, self.ordering)
+        if valores is not None:
+            fonte = [o for o in fonte if self._depois_do_cursor(o, self.ordering, valores)]
+        return self._ordenar_lista(fonte, self.ordering)[:limite], total
+
+    def _preparar(self, request, view, fontes):
+        using = next((f.db for f in fontes if isinstance(f, QuerySet)), "default")
+        self.nulos_maiores = connections[using].features.nulls_order_largest
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size_atual = self.get_page_size(request)
+        self.count = None
+        return str(request.query_params.get(self.count_query_param, "")).lower() in ("1", "true", "sim")
+
+    def _pagina(self, linhas):
+        self.has_next = len(linhas) > self.page_size_atual
+        linhas = linhas[: self.page_size_atual]
+
+        self.next_cursor = None
+        if self.has_next and linhas:
+            ultimo = linhas[-1]
+            self.next_cursor = self.encode_cursor([self._valor(ultimo, c) for c in self.ordering])
+        return linhas
+
+    # ----------------- API do DRF -----------------
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Aceita QuerySet (filtro keyset no SQL) ou lista já montada pela view,
+        paginada em memória com o mesmo cursor.
+        """
+        if not self._ativa(request):
+            return None
+        contar = self._preparar(request, view, [queryset])
+        linhas, self.count = self._janela(queryset, request, view, contar)
+        return self._pagina(linhas)
+
+    def paginate_fontes(self, fontes, request, view=None):
+        """
+        Uma página sobre várias fontes na mesma ordem (ex.: auditoria quente +
+        arquivada): cada uma contribui só com as page_size + 1 linhas depois do
+        cursor, e a intercalação acontece entre essas janelas.
+        """
+        if not self._ativa(request):
+            return None
+        contar = self._preparar(request, view, fontes)
+        linhas, totais = [], []
+        for fonte in fontes:
+            janela, total = self._janela(fonte, request, view, contar)
+            linhas.extend(janela)
+            totais.append(total)
+        if contar:
+            self.count = sum(totais)
+        return self._pagina(self._ordenar_lista(linhas, self.ordering))
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size_atual)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "cursor": self.next_cursor}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "cursor": {"type": "string", "nullable": True},
+                "count": {"type": "integer"},
+                "results": schema,
+            },
+        }
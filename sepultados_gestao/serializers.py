@@ -3,6 +3,7 @@ from .models import (
     Cemiterio,
     ConcessaoContrato,
     Exumacao,
+    ImportacaoPlanilha,
     Quadra,
     Receita,
     RegistroAuditoria,
@@ -13,6 +14,58 @@ from .models import (
     Anexo,
 )
 
+
+def _lista_param(valor):
+    return [c.strip() for c in (valor or "").split(",") if c.strip()]
+
+
+class CamposDinamicosMixin:
+    """
+    Recorte de campos nas leituras (GET):
+      ?fields=a,b   só esses campos
+      ?omit=c,d     todos menos esses
+      ?perfil=lista perfil nomeado em `perfis` (as telas de tabela)
+    O "id" sempre vai junto. Escritas continuam com todos os campos.
+
+    `dependencias` lista as colunas de que um campo calculado precisa; a view
+    (mixins.CamposEsparsosMixin) usa isso para montar o .only() da consulta.
+    """
+    perfis = {}
+    dependencias = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = self.campos_pedidos(self.context.get("request"), self.fields.keys())
+        if campos is not None:
+            for nome in list(self.fields):
+                if nome not in campos:
+                    self.fields.pop(nome)
+
+    @classmethod
+    def campos_pedidos(cls, request, disponiveis):
+        """Campos a manter, na ordem do serializer; None = todos."""
+        if request is None or request.method not in ("GET", "HEAD"):
+            return None
+        params = getattr(request, "query_params", request.GET)
+        fields, omit, perfil = params.get("fields"), params.get("omit"), params.get("perfil")
+        if not (fields or omit or perfil):
+            return None
+
+        disponiveis = list(disponiveis)
+        if fields:
+            manter = set(_lista_param(fields))
+        elif perfil:
+            if perfil not in cls.perfis:
+                raise serializers.ValidationError(
+                    {"perfil": f"Perfil desconhecido. Opções: {', '.join(sorted(cls.perfis)) or 'nenhuma'}."}
+                )
+            manter = set(cls.perfis[perfil])
+        else:
+            manter = set(disponiveis)
+        manter = (manter - set(_lista_param(omit))) | {"id"}
+        return [c for c in disponiveis if c in manter]
+
+
 class CemiterioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cemiterio
@@ -112,7 +165,15 @@ class QuadraSerializer(serializers.ModelSerializer):
         model = Quadra
         fields = '__all__'
 
-class ReceitaSerializer(serializers.ModelSerializer):
+class ReceitaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    perfis = {
+        "lista": (
+            "numero_documento", "nome", "cpf", "descricao", "valor_total", "desconto",
+            "valor_pago", "valor_em_aberto", "data_vencimento", "data_pagamento", "status",
+            "multa", "juros",
+        ),
+    }
+
     class Meta:
         model = Receita
         fields = '__all__'
@@ -197,11 +258,20 @@ class RegistroAuditoriaSerializer(serializers.ModelSerializer):
 from rest_framework import serializers
 from sepultados_gestao.models import Sepultado
 
-class SepultadoSerializer(serializers.ModelSerializer):
+class SepultadoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Se o seu modelo já tem o campo cpf, manter essa linha continua ok:
     # ela apenas garante fallback para bases antigas onde o dado está em "documento".
     cpf = serializers.SerializerMethodField(read_only=True)
 
+    perfis = {
+        # tabela da tela de Sepultados
+        "lista": (
+            "numero_sepultamento", "nome", "cpf_sepultado", "cpf", "data_sepultamento",
+            "data_falecimento", "tumulo", "exumado", "trasladado",
+        ),
+    }
+    dependencias = {"cpf": ("cpf_sepultado", "cpf")}
+
     class Meta:
         model = Sepultado
         # IMPORTANTE: não liste só alguns campos aqui, senão o front perde colunas.
@@ -213,7 +283,11 @@ class SepultadoSerializer(serializers.ModelSerializer):
 
 
 
-class TransladoSerializer(serializers.ModelSerializer):
+class TransladoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    perfis = {
+        "lista": ("numero_documento", "data", "sepultado", "destino", "tumulo_destino", "cemiterio_nome"),
+    }
+
     class Meta:
         model = Translado
         fields = '__all__'
@@ -222,7 +296,14 @@ from rest_framework import serializers
 from .models import Tumulo
 
 
-class TumuloSerializer(serializers.ModelSerializer):
+class TumuloSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    perfis = {
+        "lista": (
+            "identificador", "quadra", "tipo_estrutura", "usar_linha", "linha", "capacidade",
+            "reservado", "motivo_reserva", "status", "tem_contrato_ativo", "contrato_id", "contrato_numero",
+        ),
+    }
+
     tem_contrato_ativo = serializers.BooleanField(read_only=True)
     contrato_id = serializers.IntegerField(read_only=True, allow_null=True)
     contrato_numero = serializers.CharField(read_only=True, allow_null=True)
@@ -318,6 +399,35 @@ class LicencaSerializer(serializers.ModelSerializer):
         return obj.expirada
 
 
+class ImportacaoPlanilhaSerializer(serializers.ModelSerializer):
+    """Acompanhamento de uma importação em segundo plano (somente leitura)."""
+    tipo_label = serializers.CharField(source="get_tipo_display", read_only=True)
+    status_label = serializers.CharField(source="get_status_display", read_only=True)
+    percentual = serializers.SerializerMethodField()
+    linhas_por_segundo = serializers.FloatField(read_only=True)
+    eta_segundos = serializers.IntegerField(read_only=True)
+    pode_retomar = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ImportacaoPlanilha
+        fields = [
+            "id", "cemiterio", "tipo", "tipo_label", "nome_arquivo",
+            "status", "status_label", "mensagem", "tentativas",
+            "total_linhas", "linhas_processadas", "percentual",
+            "linhas_por_segundo", "eta_segundos", "pode_retomar",
+            "importados", "atualizados", "total_erros", "erros",
+            "criado_em", "iniciado_em", "atualizado_em", "concluido_em",
+        ]
+        read_only_fields = fields
+
+    def get_percentual(self, obj):
+        if obj.status == "concluida":
+            return 100.0
+        if not obj.total_linhas:
+            return None
+        return round(min(100.0, 100.0 * obj.linhas_processadas / obj.total_linhas), 1)
+
+
 from aaa_usuarios.models import Usuario
 from sepultados_gestao.models import Prefeitura, Licenca, Plano
 from django.utils import timezone
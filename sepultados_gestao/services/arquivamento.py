@@ -114,4 +114,4 @@ def sync_sepultado_status(sepultado: "Sepultado"):
             updates.append("data_exumacao")
 
     if updates:
-        sepultado.save(update_fields=updates)
+        sepultado.save(update_fields=updates + ["atualizado_em"])
@@ -0,0 +1,251 @@
+"""
+Arquivo frio da auditoria.
+
+Registros mais antigos que settings.AUDITORIA["ARQUIVAR_APOS_DIAS"] saem da
+tabela quente e vão para segmentos mensais por prefeitura, em
+settings.AUDITORIA["ARQUIVO_DIR"]:
+
+    prefeitura_<id>/AAAA-MM.jsonl.gz    blocos gzip (um por execução), só acrescentados
+    prefeitura_<id>/AAAA-MM.idx.jsonl   uma linha por bloco: offset, tamanho, período,
+                                        usuários e modelos presentes
+
+Nada é apagado sem antes estar gravado (e sincronizado) no segmento; a exclusão
+da tabela só é liberada dentro de `arquivar_auditoria`. A leitura usa o índice
+para abrir apenas os blocos do período/usuário/modelo pedidos.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+PADRAO = {
+    "ARQUIVO_DIR": os.path.join(settings.BASE_DIR, "arquivo_auditoria"),
+    "ARQUIVAR_APOS_DIAS": 365,
+}
+
+_local = threading.local()
+
+
+def _config(chave):
+    return getattr(settings, "AUDITORIA", {}).get(chave, PADRAO[chave])
+
+
+@contextmanager
+def _exclusao_liberada():
+    _local.arquivando = True
+    try:
+        yield
+    finally:
+        _local.arquivando = False
+
+
+def exclusao_liberada() -> bool:
+    """True só durante o arquivamento (registros já gravados no segmento)."""
+    return getattr(_local, "arquivando", False)
+
+
+def _pasta(prefeitura_id):
+    return os.path.join(_config("ARQUIVO_DIR"), f"prefeitura_{prefeitura_id}")
+
+
+def _mes(dt):
+    return timezone.localtime(dt).strftime("%Y-%m")
+
+
+def _serializar(r):
+    u = r.usuario
+    return {
+        "id": r.pk,
+        "data_hora": r.data_hora.isoformat(),
+        "acao": r.acao,
+        "modelo": r.modelo,
+        "objeto_id": r.objeto_id,
+        "representacao": r.representacao,
+        "prefeitura_id": r.prefeitura_id,
+        "usuario_id": r.usuario_id,
+        # cópia do usuário na época (o FK é SET_NULL)
+        "usuario_email": getattr(u, "email", None),
+        "usuario_nome": " ".join(filter(None, [getattr(u, "first_name", ""), getattr(u, "last_name", "")])) or None,
+        "usuario_superuser": bool(getattr(u, "is_superuser", False)),
+    }
+
+
+def _gravar_bloco(prefeitura_id, mes, linhas):
+    pasta = _pasta(prefeitura_id)
+    os.makedirs(pasta, exist_ok=True)
+
+    corpo = "".join(json.dumps(l, ensure_ascii=False, separators=(",", ":")) + "\n" for l in linhas)
+    dados = gzip.compress(corpo.encode("utf-8"))
+
+    with open(os.path.join(pasta, f"{mes}.jsonl.gz"), "ab") as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(dados)
+        f.flush()
+        os.fsync(f.fileno())
+
+    entrada = {
+        "offset": offset,
+        "tamanho": len(dados),
+        "linhas": len(linhas),
+        "inicio": min(l["data_hora"] for l in linhas),
+        "fim": max(l["data_hora"] for l in linhas),
+        "usuarios": sorted({l["usuario_id"] for l in linhas if l["usuario_id"]}),
+        "modelos": sorted({(l["modelo"] or "").lower() for l in linhas}),
+    }
+    with open(os.path.join(pasta, f"{mes}.idx.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entrada, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def arquivar_auditoria(dias=None, prefeitura_id=None, lote: int = 5000):
+    """
+    Move para os segmentos os registros com mais de `dias` dias (padrão:
+    ARQUIVAR_APOS_DIAS), em lotes por data. Retorna quantos foram arquivados.
+    """
+    from sepultados_gestao.models import RegistroAuditoria
+
+    dias = _config("ARQUIVAR_APOS_DIAS") if dias is None else dias
+    corte = timezone.now() - timedelta(days=dias)
+
+    antigos = RegistroAuditoria.objects.filter(data_hora__lt=corte)
+    if prefeitura_id:
+        antigos = antigos.filter(prefeitura_id=prefeitura_id)
+
+    total = 0
+    while True:
+        registros = list(antigos.select_related("usuario").order_by("data_hora", "id")[:lote])
+        if not registros:
+            break
+
+        blocos = defaultdict(list)
+        for r in registros:
+            blocos[(r.prefeitura_id, _mes(r.data_hora))].append(_serializar(r))
+        for (pid, mes), linhas in blocos.items():
+            _gravar_bloco(pid, mes, linhas)
+
+        with transaction.atomic(), _exclusao_liberada():
+            RegistroAuditoria.objects.filter(pk__in=[r.pk for r in registros]).delete()
+        total += len(registros)
+
+    return total
+
+
+# ----------------- leitura -----------------
+def meses_arquivados(prefeitura_id):
+    pasta = _pasta(prefeitura_id)
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(n[:7] for n in os.listdir(pasta) if n.endswith(".idx.jsonl"))
+
+
+def _blocos(prefeitura_id, mes):
+    with open(os.path.join(_pasta(prefeitura_id), f"{mes}.idx.jsonl"), encoding="utf-8") as f:
+        for linha in f:
+            linha = linha.strip()
+            if linha:
+                yield json.loads(linha)
+
+
+def _ler_bloco(prefeitura_id, mes, bloco):
+    with open(os.path.join(_pasta(prefeitura_id), f"{mes}.jsonl.gz"), "rb") as f:
+        f.seek(bloco["offset"])
+        dados = gzip.decompress(f.read(bloco["tamanho"]))
+    for linha in dados.decode("utf-8").splitlines():
+        if linha:
+            yield json.loads(linha)
+
+
+def _data_local(iso):
+    return timezone.localtime(parse_datetime(iso)).date()
+
+
+def buscar_arquivados(prefeitura_id, inicio, fim=None, acoes=None, usuario=None, modelo=None, q=None,
+                      excluir_superusuarios=True):
+    """
+    Registros arquivados da prefeitura entre as datas `inicio` e `fim` (inclusive),
+    já como instâncias (não salvas) de RegistroAuditoria, do mais novo para o
+    mais antigo. Sem `inicio`, não lê nada: só consultas que alcançam o
+    período arquivado abrem os segmentos.
+
+    acoes: códigos aceitos (comparação sem caixa); usuario: id ou e-mail;
+    modelo: nome exato (sem caixa); q: trecho em modelo/representação/objeto/e-mail.
+    """
+    from sepultados_gestao.models import RegistroAuditoria
+
+    if not inicio or not prefeitura_id:
+        return []
+    fim = fim or timezone.localdate()
+    if isinstance(inicio, datetime):
+        inicio = inicio.date()
+
+    usuario = (str(usuario).strip() if usuario else "")
+    usuario_id = int(usuario) if usuario.isdigit() else None
+    usuario_email = usuario.lower() if usuario and usuario_id is None else None
+    modelo = (modelo or "").strip().lower() or None
+    acoes = {a.lower() for a in acoes} if acoes else None
+    q = (q or "").strip().lower() or None
+
+    linhas, vistos = [], set()
+    for mes in meses_arquivados(prefeitura_id):
+        primeiro = date(int(mes[:4]), int(mes[5:7]), 1)
+        if primeiro > fim or (primeiro + timedelta(days=31)).replace(day=1) <= inicio:
+            continue
+        for bloco in _blocos(prefeitura_id, mes):
+            if _data_local(bloco["fim"]) < inicio or _data_local(bloco["inicio"]) > fim:
+                continue
+            if usuario_id and usuario_id not in bloco["usuarios"]:
+                continue
+            if modelo and modelo not in bloco["modelos"]:
+                continue
+            for l in _ler_bloco(prefeitura_id, mes, bloco):
+                if l["id"] in vistos or not (inicio <= _data_local(l["data_hora"]) <= fim):
+                    continue
+                if acoes and (l["acao"] or "").lower() not in acoes:
+                    continue
+                if usuario_id and l["usuario_id"] != usuario_id:
+                    continue
+                if usuario_email and (l["usuario_email"] or "").lower() != usuario_email:
+                    continue
+                if modelo and (l["modelo"] or "").lower() != modelo:
+                    continue
+                if q and not any(q in (l[c] or "").lower()
+                                 for c in ("modelo", "representacao", "objeto_id", "usuario_email")):
+                    continue
+                vistos.add(l["id"])
+                linhas.append(l)
+
+    # usuários atuais quando ainda existem; senão, a cópia gravada no segmento
+    User = get_user_model()
+    atuais = User.objects.in_bulk({l["usuario_id"] for l in linhas if l["usuario_id"]})
+
+    registros = []
+    for l in linhas:
+        u = atuais.get(l["usuario_id"])
+        if u is None and l["usuario_email"]:
+            u = User(email=l["usuario_email"], first_name=l["usuario_nome"] or "",
+                     is_superuser=l["usuario_superuser"])
+        if excluir_superusuarios and u is not None and u.is_superuser:
+            continue
+        r = RegistroAuditoria(
+            id=l["id"], acao=l["acao"], modelo=l["modelo"], objeto_id=l["objeto_id"],
+            representacao=l["representacao"], prefeitura_id=l["prefeitura_id"],
+            data_hora=parse_datetime(l["data_hora"]),
+        )
+        r.usuario = u  # usuário excluído fica sem id, como no SET_NULL
+        r.arquivado = True
+        registros.append(r)
+
+    registros.sort(key=lambda r: (r.data_hora, r.pk), reverse=True)
+    return registros
@@ -0,0 +1,132 @@
+"""
+Auditoria gravada em lote.
+
+Os sinais globais (models.auditar_salvamento/auditar_exclusao) e o
+utils.registrar_auditoria não inserem direto: entregam o registro ao lote
+aberto (por requisição, via AuditoriaEmLoteMiddleware, ou com
+`with lote_auditoria():` em comandos/rotinas). O lote:
+  - só recebe o registro quando a transação que o gerou confirma
+    (rollback/savepoint desfeito descarta o registro);
+  - junta alterações repetidas do mesmo objeto num único registro;
+  - grava tudo com um bulk_create ao fechar (ou no commit da transação externa).
+
+Regras de descarte configuráveis em settings.AUDITORIA:
+  IGNORAR_MODELOS: rótulos "app.Modelo" que nunca são auditados;
+  IGNORAR_CAMPOS:  save(update_fields=...) só com esses campos não é auditado.
+"""
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+
+PADRAO = {
+    "IGNORAR_MODELOS": (
+        "sepultados_gestao.RegistroAuditoria",
+        "sepultados_gestao.NumeroSequencialGlobal",
+        "sepultados_gestao.EstatisticaCemiterio",
+        "sepultados_gestao.VersaoDados",
+        "sepultados_gestao.TermoBuscaSepultado",
+        "sepultados_gestao.ImportacaoPlanilha",
+        "sepultados_gestao.BackupPrefeitura",
+        "sepultados_gestao.ArquivoConteudo",
+        "sessions.Session",
+        "contenttypes.ContentType",
+        "auth.Permission",
+        "admin.LogEntry",
+    ),
+    "IGNORAR_CAMPOS": ("status", "last_login"),
+}
+
+_local = threading.local()
+
+
+def _config(chave):
+    return getattr(settings, "AUDITORIA", {}).get(chave, PADRAO[chave])
+
+
+def deve_ignorar(sender, update_fields=None) -> bool:
+    meta = getattr(sender, "_meta", None)
+    if meta is None or meta.label in _config("IGNORAR_MODELOS"):
+        return True
+    if update_fields and set(update_fields) <= set(_config("IGNORAR_CAMPOS")):
+        return True
+    return False
+
+
+class LoteAuditoria:
+    def __init__(self):
+        self.registros = {}  # (modelo, objeto_id, prefeitura, usuario) -> [RegistroAuditoria]
+        self.avulsos = []    # registros sem objeto_id (resumos, etc.) não são agrupados
+
+    def adicionar(self, registro):
+        if not registro.objeto_id:
+            self.avulsos.append(registro)
+            return
+
+        chave = (registro.modelo, registro.objeto_id, registro.prefeitura_id, registro.usuario_id)
+        lista = self.registros.setdefault(chave, [])
+        ultimo = lista[-1] if lista else None
+
+        if ultimo is not None and registro.acao == "change" and ultimo.acao in ("add", "change"):
+            # add+change continua "add"; change+change vira um só (com a representação mais recente)
+            ultimo.representacao = registro.representacao
+        elif ultimo is not None and registro.acao == "delete" and ultimo.acao == "change":
+            lista[-1] = registro
+        elif ultimo is not None and registro.acao == ultimo.acao == "delete":
+            pass
+        else:
+            lista.append(registro)
+
+    def gravar(self):
+        from sepultados_gestao.models import RegistroAuditoria
+
+        registros = [r for lista in self.registros.values() for r in lista] + self.avulsos
+        self.registros, self.avulsos = {}, []
+        if registros:
+            RegistroAuditoria.objects.bulk_create(registros)
+
+
+@contextmanager
+def lote_auditoria():
+    """Abre um lote de auditoria (lotes aninhados usam o de fora)."""
+    atual = getattr(_local, "lote", None)
+    if atual is not None:
+        yield atual
+        return
+
+    lote = _local.lote = LoteAuditoria()
+    try:
+        yield lote
+    finally:
+        _local.lote = None
+        # Dentro de transação, os registros ainda pendentes entram no lote no
+        # commit (on_commit roda em ordem), então a gravação vai para o fim da fila.
+        transaction.on_commit(lote.gravar, robust=True)
+
+
+def registrar(usuario, acao, modelo, objeto_id=None, representacao=None, prefeitura=None):
+    from sepultados_gestao.models import RegistroAuditoria
+
+    if prefeitura is None:
+        return  # Evita salvar auditoria inválida
+
+    registro = RegistroAuditoria(
+        usuario=usuario,
+        acao=acao,
+        modelo=modelo,
+        objeto_id=str(objeto_id) if objeto_id else "",
+        representacao=representacao or "",
+        prefeitura=prefeitura,
+    )
+
+    lote = getattr(_local, "lote", None)
+    if lote is None:
+        # sem lote aberto: grava sozinho, mas só se a transação confirmar
+        lote = LoteAuditoria()
+        lote.adicionar(registro)
+        transaction.on_commit(lote.gravar, robust=True)
+        return
+    transaction.on_commit(partial(lote.adicionar, registro))
@@ -0,0 +1,343 @@
+"""
+Backup da prefeitura em fluxo.
+
+O ZIP é montado aos pedaços enquanto é enviado (StreamingHttpResponse):
+  - cada planilha é uma pasta write-only do openpyxl (as linhas vão direto
+    para o disco) alimentada por um queryset lido com .iterator(), e é
+    gerada só quando chega a vez dela no ZIP;
+  - planilhas e anexos entram no ZIP em blocos de BLOCO bytes.
+A memória fica no tamanho de um bloco (+ um lote do iterator), não no do backup.
+
+Backups completos e incrementais (gerar_backup):
+  - cada backup fica registrado (BackupPrefeitura) com a marca de quando
+    começou; ZIP gerado até o fim fica "gerado" (o servidor não sabe se o
+    cliente recebeu o último byte) e passa a "concluido" quando o arquivo
+    baixado é conferido (confirmar_backup, `manage.py verificar_backups
+    --confirmar`). Só backups concluídos entram na cadeia; o incremental exporta só as linhas alteradas
+    (atualizado_em) e os anexos enviados desde a marca do anterior, com uma
+    FOLGA para cobrir transações que ainda não tinham confirmado;
+  - ids/<planilha>.txt: o id de cada linha da planilha, na ordem;
+    existentes/<planilha>.txt (incremental): todos os ids atuais, para
+    saber o que foi excluído;
+  - manifesto.json: tipo, marcas, linhas por planilha, sha256 de cada
+    arquivo e o sha256 do manifesto anterior — a cadeia completo ->
+    incremental -> ... é conferida por verificar_cadeia().
+"""
+import hashlib
+import io
+import json
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+
+from openpyxl import Workbook
+
+
+BLOCO = 1024 * 1024
+# planilha pronta fica na memória até este tamanho; acima, vai para arquivo temporário
+LIMITE_MEMORIA_PLANILHA = 8 * BLOCO
+
+
+class _Saida(io.RawIOBase):
+    """Destino do ZIP: guarda o que foi escrito até o gerador repassar (não é "seekable")."""
+
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def coletar(self):
+        dados = b"".join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+def planilha(titulo, cabecalho, linhas):
+    """Planilha .xlsx (write-only, linha a linha) num arquivo temporário, pronta para ler."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    ws.append(cabecalho)
+    for linha in linhas:
+        ws.append(linha)
+    arquivo = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_PLANILHA)
+    wb.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
+
+
+def zip_em_fluxo(entradas, bloco=BLOCO, hashes=None):
+    """
+    Gera os bytes de um ZIP, aos pedaços. `entradas`: iterável de
+    (nome no ZIP, função que abre o conteúdo em binário — ou devolve None
+    para pular a entrada). Cada conteúdo só é aberto na vez dele.
+    `hashes` (dict), se informado, recebe {nome: {"sha256", "bytes"}} de cada entrada.
+    """
+    saida = _Saida()
+    with zipfile.ZipFile(saida, "w") as zf:
+        for nome, abrir in entradas:
+            origem = abrir()
+            if origem is None:
+                continue
+            with origem:
+                info = zipfile.ZipInfo(nome, date_time=time.localtime()[:6])
+                try:
+                    info.file_size = origem.seek(0, io.SEEK_END)
+                    origem.seek(0)
+                    zip64 = False
+                except (AttributeError, OSError):
+                    zip64 = True  # tamanho desconhecido: já reserva os campos de 64 bits
+                sha, tamanho = hashlib.sha256(), 0
+                with zf.open(info, "w", force_zip64=zip64) as destino:
+                    while True:
+                        dados = origem.read(bloco)
+                        if not dados:
+                            break
+                        destino.write(dados)
+                        sha.update(dados)
+                        tamanho += len(dados)
+                        pedaco = saida.coletar()
+                        if pedaco:
+                            yield pedaco
+                if hashes is not None:
+                    hashes[nome] = {"sha256": sha.hexdigest(), "bytes": tamanho}
+            pedaco = saida.coletar()
+            if pedaco:
+                yield pedaco
+    yield saida.coletar()
+
+
+# ----------------- completo / incremental -----------------
+FOLGA = timedelta(minutes=10)
+MANIFESTO = "manifesto.json"
+FORMATO = 1
+
+
+class Planilha:
+    """Uma planilha do backup: `linha(obj)` formata cada objeto do queryset."""
+
+    def __init__(self, arquivo, titulo, cabecalho, queryset, linha, campo_alteracao="atualizado_em"):
+        self.arquivo, self.titulo, self.cabecalho = arquivo, titulo, cabecalho
+        self.queryset, self.linha, self.campo_alteracao = queryset, linha, campo_alteracao
+
+    @property
+    def nome(self):
+        return self.arquivo.rsplit(".", 1)[0]
+
+    def alteradas(self, desde):
+        return self.queryset.filter(**{f"{self.campo_alteracao}__gte": desde})
+
+
+def _arquivo_temporario():
+    return tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_PLANILHA)
+
+
+def _lista_ids(queryset):
+    arquivo = _arquivo_temporario()
+    for pk in queryset.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=5000):
+        arquivo.write(b"%d\n" % pk)
+    arquivo.seek(0)
+    return arquivo
+
+
+def _reabrir(arquivo):
+    arquivo.seek(0)
+    return arquivo
+
+
+def ultimo_backup(prefeitura):
+    from sepultados_gestao.models import BackupPrefeitura
+
+    return (
+        BackupPrefeitura.objects.filter(prefeitura=prefeitura, status="concluido")
+        .order_by("-marca", "-pk").first()
+    )
+
+
+def gerar_backup(prefeitura, planilhas, anexos, incremental=False, usuario=None, nome_arquivo=""):
+    """
+    Gera o ZIP do backup (bytes, aos pedaços) e registra o BackupPrefeitura.
+    `planilhas`: [Planilha]; `anexos`: queryset de Anexo (entram como
+    midia/<id>_<nome>; os guardados pelo conteúdo, como midia/<sha256><ext>,
+    uma vez só). Sem backup anterior concluído, o incremental vira
+    completo. O registro fica "gerado" se o ZIP foi gerado até o fim
+    ("interrompido" se não); "concluido" só com confirmar_backup().
+    """
+    from django.utils import timezone
+
+    from sepultados_gestao.models import BackupPrefeitura
+    from .midia import e_conteudo
+
+    anterior = ultimo_backup(prefeitura) if incremental else None
+    backup = BackupPrefeitura.objects.create(
+        prefeitura=prefeitura,
+        tipo="incremental" if anterior else "completo",
+        anterior=anterior,
+        usuario=usuario if getattr(usuario, "is_authenticated", False) else None,
+        desde=anterior.marca - FOLGA if anterior else None,
+        nome_arquivo=nome_arquivo[:255],
+    )
+    hashes, linhas_por_planilha = {}, {}
+
+    def linhas(planilha_, queryset, ids):
+        n = 0
+        for obj in queryset.iterator(chunk_size=2000):
+            ids.write(b"%d\n" % obj.pk)
+            n += 1
+            yield planilha_.linha(obj)
+        linhas_por_planilha[planilha_.arquivo] = n
+
+    def entradas():
+        for p in planilhas:
+            queryset = p.alteradas(backup.desde) if anterior else p.queryset
+            ids = _arquivo_temporario()
+            yield p.arquivo, lambda p=p, queryset=queryset, ids=ids: planilha(
+                p.titulo, p.cabecalho, linhas(p, queryset, ids)
+            )
+            yield f"ids/{p.nome}.txt", lambda ids=ids: _reabrir(ids)
+            if anterior:
+                yield f"existentes/{p.nome}.txt", lambda p=p: _lista_ids(p.queryset)
+
+        novos = anexos.filter(data_upload__gte=backup.desde) if anterior else anexos
+        ids = _arquivo_temporario()
+        n, gravados = 0, set()
+        for anexo in novos.iterator(chunk_size=2000):
+            arquivo = anexo.arquivo
+            if arquivo and arquivo.storage.exists(arquivo.name):
+                base = arquivo.name.rsplit("/", 1)[-1]
+                # guardado pelo conteúdo (services/midia.py): o nome já é o sha256, vai uma vez só
+                nome = f"midia/{base}" if e_conteudo(arquivo.name) else f"midia/{anexo.pk}_{base}"
+                ids.write(f"{anexo.pk}\t{nome}\n".encode())
+                n += 1
+                if nome not in gravados:
+                    gravados.add(nome)
+                    yield nome, lambda arquivo=arquivo: arquivo.storage.open(arquivo.name, "rb")
+        linhas_por_planilha["midia"] = n
+        yield "ids/midia.txt", lambda: _reabrir(ids)
+        if anterior:
+            yield "existentes/midia.txt", lambda: _lista_ids(anexos)
+
+        yield MANIFESTO, lambda: io.BytesIO(manifesto())
+
+    def manifesto():
+        dados = {
+            "formato": FORMATO,
+            "backup_id": backup.pk,
+            "prefeitura": {"id": prefeitura.pk, "nome": prefeitura.nome},
+            "tipo": backup.tipo,
+            "marca": backup.marca.isoformat(),
+            "desde": backup.desde.isoformat() if backup.desde else None,
+            "anterior": {
+                "backup_id": anterior.pk,
+                "marca": anterior.marca.isoformat(),
+                "manifesto_sha256": anterior.manifesto_sha256,
+            } if anterior else None,
+            "linhas": linhas_por_planilha,
+            "arquivos": dict(hashes),
+        }
+        conteudo = json.dumps(dados, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8")
+        backup.manifesto_sha256 = hashlib.sha256(conteudo).hexdigest()
+        return conteudo
+
+    tamanho, concluido = 0, False
+    try:
+        for pedaco in zip_em_fluxo(entradas(), hashes=hashes):
+            tamanho += len(pedaco)
+            yield pedaco
+        concluido = True
+    finally:
+        backup.status = "gerado" if concluido else "interrompido"
+        backup.concluido_em = timezone.now()
+        backup.tamanho = tamanho
+        backup.resumo = linhas_por_planilha
+        backup.save(update_fields=["status", "concluido_em", "tamanho", "resumo", "manifesto_sha256"])
+
+
+# ----------------- verificação -----------------
+def confirmar_backup(arquivo):
+    """
+    Confere o ZIP baixado (verificar_backup) e, sem problemas, marca como
+    "concluido" o BackupPrefeitura do manifesto — o mesmo id, prefeitura e
+    sha256 do manifesto registrados na geração. Retorna (backup, [problemas]).
+    """
+    from sepultados_gestao.models import BackupPrefeitura
+
+    manifesto, sha, problemas = verificar_backup(arquivo)
+    if problemas:
+        return None, problemas
+    backup = BackupPrefeitura.objects.filter(
+        pk=manifesto.get("backup_id"),
+        prefeitura_id=manifesto.get("prefeitura", {}).get("id"),
+        manifesto_sha256=sha,
+    ).first()
+    if backup is None:
+        return None, ["nenhum backup registrado com este manifesto."]
+    if backup.status not in ("gerado", "concluido"):
+        return None, [f"o backup #{backup.pk} está \"{backup.get_status_display()}\"."]
+    if backup.status != "concluido":
+        backup.status = "concluido"
+        backup.save(update_fields=["status"])
+    return backup, []
+
+
+
+def verificar_backup(arquivo):
+    """
+    Confere o ZIP contra o próprio manifesto (sha256 e tamanho de cada
+    arquivo, nada faltando nem sobrando). Retorna (manifesto, sha256 do
+    manifesto, [problemas]).
+    """
+    problemas = []
+    with zipfile.ZipFile(arquivo) as zf:
+        try:
+            conteudo = zf.read(MANIFESTO)
+        except KeyError:
+            return None, None, [f"{MANIFESTO} ausente."]
+        manifesto = json.loads(conteudo)
+        esperados = manifesto.get("arquivos", {})
+        presentes = set(zf.namelist()) - {MANIFESTO}
+        for nome in sorted(presentes - set(esperados)):
+            problemas.append(f"{nome}: não consta no manifesto.")
+        for nome, esperado in esperados.items():
+            if nome not in presentes:
+                problemas.append(f"{nome}: ausente.")
+                continue
+            sha, tamanho = hashlib.sha256(), 0
+            with zf.open(nome) as origem:
+                for dados in iter(lambda: origem.read(BLOCO), b""):
+                    sha.update(dados)
+                    tamanho += len(dados)
+            if sha.hexdigest() != esperado["sha256"] or tamanho != esperado["bytes"]:
+                problemas.append(f"{nome}: conteúdo diferente do manifesto.")
+    return manifesto, hashlib.sha256(conteudo).hexdigest(), problemas
+
+
+def verificar_cadeia(arquivos):
+    """
+    Confere uma sequência de backups (completo, incremental, incremental...):
+    cada arquivo contra o próprio manifesto e cada incremental contra o
+    anterior da sequência. Retorna [(arquivo, [problemas])].
+    """
+    resultado = []
+    anterior = None  # (manifesto, sha256)
+    for n, arquivo in enumerate(arquivos):
+        manifesto, sha, problemas = verificar_backup(arquivo)
+        if manifesto is not None:
+            elo = manifesto.get("anterior")
+            if n == 0 and manifesto.get("tipo") != "completo":
+                problemas.append("a cadeia precisa começar por um backup completo.")
+            elif n > 0 and manifesto.get("tipo") == "completo":
+                problemas.append("backup completo no meio da cadeia (ele começa uma cadeia nova).")
+            elif n > 0 and anterior is not None:
+                if not elo or elo.get("manifesto_sha256") != anterior[1]:
+                    problemas.append("não continua o backup anterior da sequência (manifesto diferente).")
+                elif manifesto.get("prefeitura", {}).get("id") != anterior[0].get("prefeitura", {}).get("id"):
+                    problemas.append("prefeitura diferente da do backup anterior.")
+        resultado.append((arquivo, problemas))
+        anterior = (manifesto, sha) if manifesto is not None else None
+    return resultado
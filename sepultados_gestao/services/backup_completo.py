@@ -0,0 +1,315 @@
+"""
+Backup completo do banco (superusuário), no lugar do `dumpdata`.
+
+Cada modelo vai para o próprio arquivo dados/<app>.<modelo>.jsonl.gz:
+  - uma linha JSON compacta por registro, com os valores na ordem de
+    "campos" do manifesto (nomes de coluna: fk_id, não objetos);
+  - lido com .iterator(chunk_size) — no PostgreSQL, cursor no servidor;
+  - os modelos são despejados em paralelo, em processos separados
+    (`processos`); no PostgreSQL todos leem o mesmo snapshot
+    (pg_export_snapshot), então o dump é consistente entre as tabelas.
+dados/manifesto.json lista os modelos na ordem de dependência (FKs), com
+linhas, bytes e sha256 de cada arquivo.
+
+restaurar_dump() confere o manifesto, esvazia as tabelas e carrega tudo
+com INSERTs em lote (executemany), nessa ordem, numa transação só.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+LOTE = 5000
+# abaixo disso (linhas no banco), subir processos custa mais do que despejar aqui mesmo
+LIMITE_PARALELO = 200_000
+FORMATO = 1
+MANIFESTO = "manifesto.json"
+BLOCO = 1024 * 1024
+
+
+class ErroDump(Exception):
+    pass
+
+
+class _Encoder(DjangoJSONEncoder):
+    """
+    Como o do Django, mas datas/horas com os microssegundos (o do Django
+    corta em milissegundos) e BinaryField em base64 (BinaryField.to_python desfaz).
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, (bytes, memoryview)):
+            import base64
+
+            return base64.b64encode(bytes(o)).decode("ascii")
+        return super().default(o)
+
+
+def _campos(model):
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+def _arquivo_do_modelo(model):
+    return f"{model._meta.label_lower}.jsonl.gz"
+
+
+def _sha256(caminho):
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as origem:
+        for dados in iter(lambda: origem.read(BLOCO), b""):
+            sha.update(dados)
+    return sha.hexdigest()
+
+
+def modelos_em_ordem():
+    """
+    Modelos com tabela própria (inclui as tabelas de M2M), cada um depois
+    dos que ele referencia por FK. Ciclos (e FKs para o próprio modelo)
+    ficam para as constraints adiadas da transação.
+    """
+    modelos = [
+        m for m in apps.get_models(include_auto_created=True)
+        if m._meta.managed and not m._meta.proxy
+    ]
+    if any(m._meta.parents for m in modelos):
+        raise ErroDump("Herança multi-tabela não é suportada pelo backup completo.")
+
+    dependencias = {
+        m: {
+            f.related_model for f in m._meta.concrete_fields
+            if f.is_relation and f.related_model is not m and f.related_model in modelos
+        }
+        for m in modelos
+    }
+    ordem, feitos = [], set()
+    pendentes = sorted(modelos, key=lambda m: m._meta.label_lower)
+    while pendentes:
+        prontos = [m for m in pendentes if dependencias[m] <= feitos] or pendentes[:1]
+        for m in prontos:
+            ordem.append(m)
+            feitos.add(m)
+        pendentes = [m for m in pendentes if m not in feitos]
+    return ordem
+
+
+# ----------------- dump -----------------
+def _iniciar_processo():
+    """Processo novo (spawn): sobe o Django com o mesmo settings."""
+    import django
+
+    django.setup()
+
+
+def despejar_modelo(label, destino, chunk_size=LOTE, using=DEFAULT_DB_ALIAS, snapshot=None):
+    """Grava um modelo em destino/<label>.jsonl.gz; retorna a entrada dele no manifesto."""
+    model = apps.get_model(label)
+    campos = _campos(model)
+    arquivo = _arquivo_do_modelo(model)
+    caminho = os.path.join(destino, arquivo)
+    encoder = _Encoder(ensure_ascii=False, separators=(",", ":"))
+
+    linhas = 0
+    with transaction.atomic(using=using):
+        if snapshot:
+            with connections[using].cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SET TRANSACTION SNAPSHOT %s", [snapshot])
+        registros = (
+            model._base_manager.using(using).order_by("pk")
+            .values_list(*campos).iterator(chunk_size=chunk_size)
+        )
+        with gzip.open(caminho, "wt", encoding="utf-8", compresslevel=6) as saida:
+            for valores in registros:
+                saida.write(encoder.encode(valores))
+                saida.write("\n")
+                linhas += 1
+
+    return {
+        "modelo": model._meta.label_lower,
+        "arquivo": arquivo,
+        "campos": campos,
+        "linhas": linhas,
+        "bytes": os.path.getsize(caminho),
+        "sha256": _sha256(caminho),
+    }
+
+
+def gerar_dump(destino, processos=None, chunk_size=LOTE, using=DEFAULT_DB_ALIAS):
+    """
+    Despeja o banco em `destino` (diretório) e grava o manifesto. Com
+    processos=1 (ou banco SQLite em memória) roda tudo neste processo;
+    sem `processos`, usa até 4 quando o banco passa de LIMITE_PARALELO linhas.
+    Retorna o manifesto.
+    """
+    from django.utils import timezone
+
+    os.makedirs(destino, exist_ok=True)
+    modelos = modelos_em_ordem()
+    conexao = connections[using]
+
+    # maiores primeiro: o último processo não fica sozinho com a tabela grande
+    tamanhos = {m: m._base_manager.using(using).count() for m in modelos}
+    if processos is None:
+        processos = min(4, os.cpu_count() or 1) if sum(tamanhos.values()) > LIMITE_PARALELO else 1
+    if conexao.vendor == "sqlite" and conexao.is_in_memory_db():
+        processos = 1
+    labels = [m._meta.label for m in sorted(modelos, key=lambda m: -tamanhos[m])]
+
+    criado_em = timezone.now()
+    if processos <= 1:
+        entradas = [despejar_modelo(label, destino, chunk_size, using) for label in labels]
+    else:
+        with transaction.atomic(using=using):
+            snapshot = None
+            if conexao.vendor == "postgresql":
+                with conexao.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    cursor.execute("SELECT pg_export_snapshot()")
+                    snapshot = cursor.fetchone()[0]
+            # spawn: os processos abrem as próprias conexões (não herdam a deste)
+            with ProcessPoolExecutor(
+                max_workers=processos,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_iniciar_processo,
+            ) as pool:
+                futuros = [
+                    pool.submit(despejar_modelo, label, destino, chunk_size, using, snapshot)
+                    for label in labels
+                ]
+                entradas = [f.result() for f in futuros]
+
+    por_modelo = {e["modelo"]: e for e in entradas}
+    manifesto = {
+        "formato": FORMATO,
+        "criado_em": criado_em.isoformat(),
+        "banco": conexao.vendor,
+        "modelos": [por_modelo[m._meta.label_lower] for m in modelos],
+    }
+    with open(os.path.join(destino, MANIFESTO), "w", encoding="utf-8") as saida:
+        json.dump(manifesto, saida, ensure_ascii=False, indent=1)
+    return manifesto
+
+
+# ----------------- restauração -----------------
+def ler_manifesto(origem):
+    try:
+        with open(os.path.join(origem, MANIFESTO), encoding="utf-8") as arquivo:
+            manifesto = json.load(arquivo)
+    except FileNotFoundError:
+        raise ErroDump(f"{MANIFESTO} não encontrado em {origem}.")
+    if manifesto.get("formato") != FORMATO:
+        raise ErroDump(f"Formato de backup não suportado: {manifesto.get('formato')}.")
+    return manifesto
+
+
+def verificar_dump(origem):
+    """Confere tamanho e sha256 de cada arquivo do manifesto; retorna [problemas]."""
+    problemas = []
+    for entrada in ler_manifesto(origem)["modelos"]:
+        caminho = os.path.join(origem, entrada["arquivo"])
+        if not os.path.exists(caminho):
+            problemas.append(f"{entrada['arquivo']}: ausente.")
+        elif os.path.getsize(caminho) != entrada["bytes"] or _sha256(caminho) != entrada["sha256"]:
+            problemas.append(f"{entrada['arquivo']}: conteúdo diferente do manifesto.")
+    return problemas
+
+
+def _carregar_modelo(model, entrada, origem, chunk_size, using):
+    """
+    INSERT direto (executemany), sem instanciar o modelo nem passar pelo
+    compilador do bulk_create: cada valor só passa por to_python e
+    get_db_prep_save do campo. auto_now/auto_now_add ficam com o valor do backup.
+    """
+    conexao = connections[using]
+    campos = {f.attname: f for f in model._meta.concrete_fields}
+    desconhecidos = set(entrada["campos"]) - set(campos)
+    if desconhecidos:
+        raise ErroDump(f"{entrada['modelo']}: campos que não existem mais: {', '.join(sorted(desconhecidos))}.")
+    lidos = [campos[nome] for nome in entrada["campos"]]
+    # campos criados depois do backup entram com o default
+    novos = [f for nome, f in campos.items() if nome not in entrada["campos"]]
+    padroes = [f.get_db_prep_save(f.get_default(), conexao) for f in novos]
+
+    qn = conexao.ops.quote_name
+    colunas = [f.column for f in lidos + novos]
+    sql = (
+        f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(qn(c) for c in colunas)}) "
+        f"VALUES ({', '.join(['%s'] * len(colunas))})"
+    )
+    conversores = [(f.to_python, f.get_db_prep_save) for f in lidos]
+
+    lote, total = [], 0
+    with conexao.cursor() as cursor, \
+            gzip.open(os.path.join(origem, entrada["arquivo"]), "rt", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            valores = [
+                None if valor is None else preparar(converter(valor), conexao)
+                for (converter, preparar), valor in zip(conversores, json.loads(linha))
+            ]
+            lote.append(valores + padroes)
+            if len(lote) >= chunk_size:
+                cursor.executemany(sql, lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            cursor.executemany(sql, lote)
+            total += len(lote)
+    if total != entrada["linhas"]:
+        raise ErroDump(f"{entrada['modelo']}: {total} linha(s) lidas, o manifesto diz {entrada['linhas']}.")
+    return total
+
+
+def restaurar_dump(origem, chunk_size=LOTE, using=DEFAULT_DB_ALIAS, progresso=None):
+    """
+    Substitui o conteúdo das tabelas do manifesto pelo do backup (o banco
+    já precisa estar migrado). Tudo numa transação: se algo falhar, nada
+    muda. `progresso(modelo, linhas)` é chamado a cada modelo carregado.
+    Retorna {modelo: linhas}.
+    """
+    from django.core.management.color import no_style
+
+    manifesto = ler_manifesto(origem)
+    problemas = verificar_dump(origem)
+    if problemas:
+        raise ErroDump("Backup com problemas: " + " ".join(problemas))
+    try:
+        modelos = [(apps.get_model(e["modelo"]), e) for e in manifesto["modelos"]]
+    except LookupError as e:
+        raise ErroDump(str(e))
+
+    conexao = connections[using]
+    resultado = {}
+    with transaction.atomic(using=using):
+        tabelas = [model._meta.db_table for model, _ in modelos]
+        conexao.ops.execute_sql_flush(conexao.ops.sql_flush(no_style(), tabelas, allow_cascade=True))
+        for model, entrada in modelos:
+            resultado[entrada["modelo"]] = _carregar_modelo(model, entrada, origem, chunk_size, using)
+            if progresso:
+                progresso(entrada["modelo"], resultado[entrada["modelo"]])
+
+        # ids gravados explicitamente: as sequências precisam continuar do maior
+        comandos = conexao.ops.sequence_reset_sql(no_style(), [model for model, _ in modelos])
+        if comandos:
+            with conexao.cursor() as cursor:
+                for sql in comandos:
+                    cursor.execute(sql)
+
+        # a tabela FTS da busca (SQLite) não é um modelo: reconstrói a partir dos sepultados
+        from sepultados_gestao.models import Sepultado
+        from . import busca
+
+        if busca.usa_fts(using):
+            with conexao.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {busca.FTS_TABELA}")
+            busca.reindexar(Sepultado.objects.using(using).all())
+    return resultado
@@ -0,0 +1,260 @@
+"""
+Índice de busca dos sepultados por nome.
+
+Por sepultado guarda nome; pai/mãe/cônjuge; CPF — já normalizados (sem
+acento, minúsculos, só letras/dígitos) —, as chaves fonéticas dos nomes
+(services/fonetica.py) e o escopo do túmulo (cemitério/prefeitura):
+  - SQLite: tabela virtual FTS5 FTS_TABELA (rowid = id do sepultado), com
+    índice de prefixo e ordenação por bm25;
+  - outros bancos: TermoBuscaSepultado, um termo (ou chave fonética) por
+    linha, com índice em (prefeitura_id, termo)/(cemiterio_id, termo).
+Os sinais do Sepultado (signals.py) mantêm o índice; `reindexar()` reconstrói.
+"""
+import re
+import unicodedata
+
+from django.db import connections
+
+from . import fonetica
+
+
+FTS_TABELA = "sepultados_gestao_busca_fts"
+FTS_CRIAR = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABELA} USING fts5("
+    "escopo, nome, familia, cpf, fonetico, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+# pesos no ranking (FTS: bm25 por coluna; tabela de termos: soma dos pesos)
+PESO_NOME, PESO_FAMILIA, PESO_CPF = 10, 2, 5
+
+# colunas lidas do Sepultado, na ordem usada por _documento()
+CAMPOS = (
+    "id", "tumulo__cemiterio_id", "tumulo__cemiterio__prefeitura_id",
+    "nome", "nome_pai", "nome_mae", "nome_conjuge", "cpf_sepultado",
+)
+MAX_TERMOS = 8
+TAMANHO_TERMO = 60
+
+
+def normalizar(texto) -> str:
+    """'João  da Conceição' -> 'joao da conceicao'."""
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", texto))
+
+
+def usa_fts(using="default") -> bool:
+    return connections[using].vendor == "sqlite"
+
+
+def _documento(linha):
+    sid, cem_id, pref_id, nome, pai, mae, conjuge, cpf = linha
+    return {
+        "id": sid,
+        "cemiterio_id": cem_id,
+        "prefeitura_id": pref_id,
+        "nome": normalizar(nome),
+        "familia": normalizar(" ".join(filter(None, (pai, mae, conjuge)))),
+        "cpf": re.sub(r"\D", "", cpf or ""),
+        "fonetico_nome": fonetica.chaves(nome),
+        "fonetico_familia": fonetica.chaves(" ".join(filter(None, (pai, mae, conjuge)))),
+    }
+
+
+def _em_lotes(valores, tamanho=500):
+    valores = list(valores)
+    for i in range(0, len(valores), tamanho):
+        yield valores[i:i + tamanho]
+
+
+# ----------------- escrita -----------------
+def remover(sepultado_ids, using="default", tabela_termos=None):
+    conn = connections[using]
+    tabela = FTS_TABELA if usa_fts(using) else (tabela_termos or _tabela_termos())
+    coluna = "rowid" if usa_fts(using) else "sepultado_id"
+    with conn.cursor() as c:
+        for lote in _em_lotes(sepultado_ids):
+            marcas = ", ".join(["%s"] * len(lote))
+            c.execute(f"DELETE FROM {tabela} WHERE {coluna} IN ({marcas})", lote)
+
+
+def indexar_linhas(linhas, using="default", modelo_termo=None):
+    """
+    (Re)indexa os sepultados de `linhas` (tuplas na ordem de CAMPOS).
+    `modelo_termo` permite usar o modelo histórico nas migrations.
+    """
+    docs = [_documento(l) for l in linhas]
+    if not docs:
+        return
+    if modelo_termo is None:
+        from sepultados_gestao.models import TermoBuscaSepultado as modelo_termo
+
+    remover([d["id"] for d in docs], using, tabela_termos=modelo_termo._meta.db_table)
+
+    if usa_fts(using):
+        with connections[using].cursor() as c:
+            c.executemany(
+                f"INSERT INTO {FTS_TABELA}(rowid, escopo, nome, familia, cpf, fonetico) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [
+                    (d["id"], f"p{d['prefeitura_id'] or 0} c{d['cemiterio_id'] or 0}",
+                     d["nome"], d["familia"], d["cpf"],
+                     " ".join(dict.fromkeys(d["fonetico_nome"] + d["fonetico_familia"])))
+                    for d in docs
+                ],
+            )
+        return
+
+    termos = []
+    for d in docs:
+        pesos = {}
+        for termo in d["familia"].split():
+            pesos[termo] = max(pesos.get(termo, 0), PESO_FAMILIA)
+        for termo in d["nome"].split():
+            pesos[termo] = max(pesos.get(termo, 0), PESO_NOME)
+        if d["cpf"]:
+            pesos[d["cpf"]] = max(pesos.get(d["cpf"], 0), PESO_CPF)
+        foneticos = dict.fromkeys(d["fonetico_familia"], PESO_FAMILIA)
+        foneticos.update(dict.fromkeys(d["fonetico_nome"], PESO_NOME))
+        for lista, fonetico in ((pesos, False), (foneticos, True)):
+            termos.extend(
+                modelo_termo(
+                    sepultado_id=d["id"], prefeitura_id=d["prefeitura_id"], cemiterio_id=d["cemiterio_id"],
+                    termo=termo[:TAMANHO_TERMO], peso=peso, fonetico=fonetico,
+                )
+                for termo, peso in lista.items()
+            )
+    modelo_termo.objects.using(using).bulk_create(termos, batch_size=1000)
+
+
+def indexar(sepultado_ids, using="default"):
+    from sepultados_gestao.models import Sepultado
+
+    ids = [i for i in sepultado_ids if i]
+    for lote in _em_lotes(ids):
+        indexar_linhas(Sepultado.objects.using(using).filter(pk__in=lote).values_list(*CAMPOS), using)
+
+
+def reindexar(queryset=None, chunk_size: int = 2000):
+    """Reconstrói o índice dos sepultados do queryset (padrão: todos). Retorna quantos."""
+    from sepultados_gestao.models import Sepultado
+
+    if queryset is None:
+        queryset = Sepultado.objects.all()
+    total = 0
+    ultimo_id = 0
+    while True:
+        linhas = list(queryset.filter(pk__gt=ultimo_id).order_by("pk").values_list(*CAMPOS)[:chunk_size])
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+        indexar_linhas(linhas, queryset.db)
+        total += len(linhas)
+    return total
+
+
+def _tabela_termos():
+    from sepultados_gestao.models import TermoBuscaSepultado
+
+    return TermoBuscaSepultado._meta.db_table
+
+
+# ----------------- leitura -----------------
+def buscar(q, cemiterio_id=None, prefeitura_id=None, limite: int = 20, using="default"):
+    """
+    Sepultados cujos termos começam com cada palavra de `q` (todas precisam
+    casar), no cemitério ou na prefeitura. Retorna [(sepultado_id, relevancia)],
+    do mais relevante para o menos.
+    """
+    termos = normalizar(q).split()[:MAX_TERMOS]
+    if not termos or not (cemiterio_id or prefeitura_id):
+        return []
+    escopo = f"c{int(cemiterio_id)}" if cemiterio_id else f"p{int(prefeitura_id)}"
+
+    if usa_fts(using):
+        # termos só têm [a-z0-9]: aspas bastam para o MATCH
+        prefixos = " AND ".join(f'"{t}"*' for t in termos)
+        expressao = f"escopo:{escopo} AND {{nome familia cpf}}: ({prefixos})"
+        with connections[using].cursor() as c:
+            c.execute(
+                f"SELECT rowid, bm25({FTS_TABELA}, 0, %s, %s, %s, 0) AS r FROM {FTS_TABELA} "
+                f"WHERE {FTS_TABELA} MATCH %s ORDER BY r LIMIT %s",
+                [PESO_NOME, PESO_FAMILIA, PESO_CPF, expressao, limite],
+            )
+            return [(sid, round(-r, 6)) for sid, r in c.fetchall()]
+
+    from django.db.models import Case, IntegerField, Max, Q, Sum, Value, When
+    from sepultados_gestao.models import TermoBuscaSepultado
+
+    qs = TermoBuscaSepultado.objects.using(using).filter(
+        fonetico=False,
+        **({"cemiterio_id": cemiterio_id} if cemiterio_id else {"prefeitura_id": prefeitura_id}),
+    )
+    casa = Q()
+    for t in termos:
+        casa |= Q(termo__startswith=t)
+    marcas = {
+        f"t{i}": Max(Case(When(termo__startswith=t, then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, t in enumerate(termos)
+    }
+    linhas = (
+        qs.filter(casa).values("sepultado_id")
+        .annotate(relevancia=Sum("peso"), **marcas)
+        .filter(**{m: 1 for m in marcas})
+        .order_by("-relevancia", "sepultado_id")
+        .values_list("sepultado_id", "relevancia")[:limite]
+    )
+    return list(linhas)
+
+
+def buscar_aproximado(q, cemiterio_id=None, prefeitura_id=None, limite: int = 20, candidatos: int = 200,
+                      using="default"):
+    """
+    Busca tolerante a erros de grafia (Sousa/Souza, Luis/Luiz, Ellen/Helen).
+    O índice fonético escolhe até `candidatos` sepultados com chaves em comum
+    com `q`, primeiro os que batem mais chaves (a grafia com vogais separa
+    Maria de Mario antes do corte); só eles recebem a nota (0 a 1): fração das chaves de `q`
+    encontradas + similaridade de trigramas com o nome (ou, com desconto,
+    com pai/mãe/cônjuge). Retorna [(sepultado_id, nota)], maior nota primeiro.
+    """
+    from sepultados_gestao.models import Sepultado
+
+    chaves = fonetica.chaves(q)[:2 * MAX_TERMOS]  # até duas chaves por palavra
+    if not chaves or not (cemiterio_id or prefeitura_id):
+        return []
+
+    if usa_fts(using):
+        escopo = f"c{int(cemiterio_id)}" if cemiterio_id else f"p{int(prefeitura_id)}"
+        alternativas = " OR ".join(f'"{c}"' for c in chaves)
+        with connections[using].cursor() as c:
+            c.execute(
+                f"SELECT rowid, fonetico FROM {FTS_TABELA} WHERE {FTS_TABELA} MATCH %s "
+                f"ORDER BY bm25({FTS_TABELA}, 0, 0, 0, 0, 1) LIMIT %s",
+                [f"escopo:{escopo} AND fonetico: ({alternativas})", candidatos],
+            )
+            encontradas = {sid: len(set(chaves) & set(fon.split())) for sid, fon in c.fetchall()}
+    else:
+        from django.db.models import Count
+        from sepultados_gestao.models import TermoBuscaSepultado
+
+        encontradas = dict(
+            TermoBuscaSepultado.objects.using(using)
+            .filter(fonetico=True, termo__in=chaves,
+                    **({"cemiterio_id": cemiterio_id} if cemiterio_id else {"prefeitura_id": prefeitura_id}))
+            .values("sepultado_id").annotate(n=Count("id"))
+            .order_by("-n", "sepultado_id")
+            .values_list("sepultado_id", "n")[:candidatos]
+        )
+
+    notas = []
+    for sid, nome, *familia in (
+        Sepultado.objects.using(using).filter(pk__in=list(encontradas))
+        .values_list("id", "nome", "nome_pai", "nome_mae", "nome_conjuge")
+    ):
+        semelhanca = max(
+            [fonetica.similaridade(q, nome)] + [0.8 * fonetica.similaridade(q, f) for f in familia if f]
+        )
+        nota = 0.4 * encontradas[sid] / len(chaves) + 0.6 * semelhanca
+        notas.append((sid, round(nota, 4)))
+    notas.sort(key=lambda n: (-n[1], n[0]))
+    return notas[:limite]
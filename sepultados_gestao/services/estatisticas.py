@@ -0,0 +1,237 @@
+import re
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+CAMPOS = ("vagas_totais", "vagas_ocupadas", "tumulos_livres", "total_sepultados", "contratos_ativos")
+
+# Ossário (identificador "Ossário"/"Ossario") não entra em vagas/ocupação
+OSSARIO_RE = re.compile(r"^\s*oss[aá]rio\s*$", re.IGNORECASE)
+OSSARIO_Q = Q(identificador__iregex=r"^\s*oss[aá]rio\s*$")
+
+
+def eh_ossario(identificador) -> bool:
+    return bool(OSSARIO_RE.match(str(identificador or "")))
+
+
+def contribuicao_tumulo(identificador, capacidade, ocupantes) -> dict:
+    """Quanto um túmulo soma em vagas/ocupação/livres no painel."""
+    if eh_ossario(identificador):
+        return {}
+    capacidade = capacidade or 0
+    ocupantes = ocupantes or 0
+    return {
+        "vagas_totais": capacidade,
+        "vagas_ocupadas": ocupantes,
+        "tumulos_livres": int(capacidade > ocupantes),
+    }
+
+
+def _diferenca(antes: dict, depois: dict) -> dict:
+    return {c: depois.get(c, 0) - antes.get(c, 0) for c in set(antes) | set(depois)}
+
+
+def aplicar_delta(cemiterio_id, **deltas):
+    """
+    Soma os deltas na linha de estatística do cemitério (um UPDATE com F).
+    Sem linha ainda, não faz nada: ela é montada do zero na primeira leitura.
+    """
+    from sepultados_gestao.models import EstatisticaCemiterio
+
+    deltas = {c: v for c, v in deltas.items() if v}
+    if not cemiterio_id or not deltas:
+        return
+    EstatisticaCemiterio.objects.filter(cemiterio_id=cemiterio_id).update(
+        atualizado_em=timezone.now(),
+        **{c: F(c) + v for c, v in deltas.items()},
+    )
+
+
+def _cemiterio_do_tumulo(tumulo_id):
+    from sepultados_gestao.models import Tumulo
+
+    if not tumulo_id:
+        return None
+    return Tumulo.objects.filter(pk=tumulo_id).values_list("cemiterio_id", flat=True).first()
+
+
+# ----------------- eventos de domínio -----------------
+def registrar_ocupacao(tumulo_id, delta: int):
+    """
+    Chamado logo após o contador do túmulo mudar `delta` (ver ocupacao.ajustar_ocupacao).
+    Devolve o cemitério do túmulo.
+    """
+    from sepultados_gestao.models import Tumulo
+
+    row = (
+        Tumulo.objects.filter(pk=tumulo_id)
+        .values_list("cemiterio_id", "identificador", "capacidade", "ocupantes_ativos")
+        .first()
+    )
+    if not row:
+        return None
+    cemiterio_id, identificador, capacidade, ocupantes = row
+    antes = contribuicao_tumulo(identificador, capacidade, max(ocupantes - delta, 0))
+    depois = contribuicao_tumulo(identificador, capacidade, ocupantes)
+    aplicar_delta(cemiterio_id, **_diferenca(antes, depois))
+    return cemiterio_id
+
+
+def _mover(campo, tumulo_antes, tumulo_depois):
+    if tumulo_antes == tumulo_depois:
+        return
+    cem_antes = _cemiterio_do_tumulo(tumulo_antes)
+    cem_depois = _cemiterio_do_tumulo(tumulo_depois)
+    if cem_antes == cem_depois:
+        return
+    aplicar_delta(cem_antes, **{campo: -1})
+    aplicar_delta(cem_depois, **{campo: +1})
+
+
+def registrar_sepultado(tumulo_antes, tumulo_depois):
+    """Sepultado entrou/saiu/mudou de túmulo (None = sem túmulo/excluído)."""
+    _mover("total_sepultados", tumulo_antes, tumulo_depois)
+
+
+def registrar_contrato(tumulo_antes, tumulo_depois):
+    """Contrato criado/excluído/trocado de túmulo (None = inexistente)."""
+    _mover("contratos_ativos", tumulo_antes, tumulo_depois)
+
+
+def registrar_tumulo(antes, depois, tumulo_id=None):
+    """
+    Túmulo criado, alterado ou excluído. `antes`/`depois` são
+    (cemiterio_id, identificador, capacidade) ou None.
+    """
+    from sepultados_gestao.models import ConcessaoContrato, Sepultado, Tumulo
+
+    if antes == depois:
+        return
+
+    ocupantes = 0
+    if tumulo_id and antes:
+        ocupantes = (
+            Tumulo.objects.filter(pk=tumulo_id).values_list("ocupantes_ativos", flat=True).first() or 0
+        )
+
+    if antes:
+        remover = contribuicao_tumulo(antes[1], antes[2], ocupantes)
+        if depois is None or depois[0] != antes[0]:
+            # sai do cemitério: leva os sepultados junto (na exclusão eles só
+            # perdem o túmulo via SET_NULL, sem sinal). Contratos excluídos em
+            # cascata já descontam a si mesmos no post_delete.
+            remover["total_sepultados"] = Sepultado.objects.filter(tumulo_id=tumulo_id).count()
+            if depois is not None:
+                remover["contratos_ativos"] = ConcessaoContrato.objects.filter(tumulo_id=tumulo_id).count()
+    else:
+        remover = {}
+
+    if depois:
+        somar = contribuicao_tumulo(depois[1], depois[2], ocupantes)
+        if antes and antes[0] != depois[0]:
+            somar["total_sepultados"] = remover.get("total_sepultados", 0)
+            somar["contratos_ativos"] = remover.get("contratos_ativos", 0)
+    else:
+        somar = {}
+
+    if antes and depois and antes[0] == depois[0]:
+        aplicar_delta(depois[0], **_diferenca(remover, somar))
+        return
+    if antes:
+        aplicar_delta(antes[0], **{c: -v for c, v in remover.items()})
+    if depois:
+        aplicar_delta(depois[0], **somar)
+
+
+# ----------------- reconstrução / leitura -----------------
+def recalcular_estatisticas(cemiterios=None, chunk_size: int = 200):
+    """
+    Remonta as linhas de estatística a partir das tabelas (usa o contador
+    Tumulo.ocupantes_ativos). Processa os cemitérios em lotes e grava com
+    bulk_create/bulk_update. Retorna quantos cemitérios foram recalculados.
+    """
+    from sepultados_gestao.models import Cemiterio, ConcessaoContrato, EstatisticaCemiterio, Sepultado, Tumulo
+
+    if cemiterios is None:
+        cemiterios = Cemiterio.objects.all()
+
+    total = 0
+    ultimo_id = 0
+    while True:
+        lote = list(
+            cemiterios.filter(pk__gt=ultimo_id).order_by("pk").values_list("pk", "prefeitura_id")[:chunk_size]
+        )
+        if not lote:
+            break
+        ultimo_id = lote[-1][0]
+        ids = [pk for pk, _ in lote]
+
+        valores = {pk: dict.fromkeys(CAMPOS, 0) for pk in ids}
+        for row in (
+            Tumulo.objects.filter(cemiterio_id__in=ids).exclude(OSSARIO_Q)
+            .order_by().values("cemiterio_id")
+            .annotate(
+                vagas_totais=Coalesce(Sum("capacidade"), Value(0, output_field=IntegerField())),
+                vagas_ocupadas=Coalesce(Sum("ocupantes_ativos"), Value(0, output_field=IntegerField())),
+                tumulos_livres=Count("id", filter=Q(capacidade__gt=F("ocupantes_ativos"))),
+            )
+        ):
+            valores[row.pop("cemiterio_id")].update(row)
+        for cem_id, n in (
+            Sepultado.objects.filter(tumulo__cemiterio_id__in=ids)
+            .order_by().values_list("tumulo__cemiterio_id").annotate(n=Count("id"))
+        ):
+            valores[cem_id]["total_sepultados"] = n
+        for cem_id, n in (
+            ConcessaoContrato.objects.filter(tumulo__cemiterio_id__in=ids)
+            .order_by().values_list("tumulo__cemiterio_id").annotate(n=Count("id"))
+        ):
+            valores[cem_id]["contratos_ativos"] = n
+
+        agora = timezone.now()
+        with transaction.atomic():
+            existentes = {e.cemiterio_id: e for e in EstatisticaCemiterio.objects.filter(cemiterio_id__in=ids)}
+            novos, alterados = [], []
+            for cem_id, pref_id in lote:
+                est = existentes.get(cem_id)
+                if est is None:
+                    novos.append(EstatisticaCemiterio(
+                        cemiterio_id=cem_id, prefeitura_id=pref_id, atualizado_em=agora, **valores[cem_id]
+                    ))
+                    continue
+                for campo, v in valores[cem_id].items():
+                    setattr(est, campo, v)
+                est.atualizado_em = agora
+                alterados.append(est)
+            # ignore_conflicts: outra requisição pode ter criado a linha no meio-tempo
+            EstatisticaCemiterio.objects.bulk_create(novos, ignore_conflicts=True)
+            EstatisticaCemiterio.objects.bulk_update(alterados, list(CAMPOS) + ["atualizado_em"])
+        total += len(lote)
+
+    return total
+
+
+def obter_estatisticas(cemiterio_id=None, prefeitura_id=None) -> dict:
+    """
+    Números do painel: uma linha (cemitério) ou a soma das linhas dos
+    cemitérios da prefeitura. Linhas que ainda não existem são montadas aqui.
+    """
+    from sepultados_gestao.models import Cemiterio, EstatisticaCemiterio
+
+    if cemiterio_id:
+        linha = EstatisticaCemiterio.objects.filter(cemiterio_id=cemiterio_id)
+        dados = linha.values(*CAMPOS).first()
+        if dados is None:
+            recalcular_estatisticas(Cemiterio.objects.filter(pk=cemiterio_id))
+            dados = linha.values(*CAMPOS).first()
+        return dados or dict.fromkeys(CAMPOS, 0)
+
+    faltando = Cemiterio.objects.filter(prefeitura_id=prefeitura_id, estatistica__isnull=True)
+    if faltando.exists():
+        recalcular_estatisticas(faltando)
+    return EstatisticaCemiterio.objects.filter(prefeitura_id=prefeitura_id).aggregate(
+        **{c: Coalesce(Sum(c), Value(0, output_field=IntegerField())) for c in CAMPOS}
+    )
@@ -0,0 +1,212 @@
+"""
+Resumo financeiro das receitas de uma prefeitura: totais por status, por
+faixa de atraso, por mês de vencimento e por tipo de serviço.
+
+Uma consulta só, agrupada no banco por (status, faixa, mês, serviço) — o
+resultado tem no máximo algumas centenas de linhas mesmo com milhões de
+parcelas; as quatro visões saem dessas linhas em Python. resumo_receitas()
+guarda o resultado no cache sob a versão da prefeitura (versoes.em_cache):
+qualquer receita salva, paga ou recalculada sobe a versão.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, CharField, Count, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import versoes
+
+
+# (rótulo, dias de atraso até) — "a_vencer" antes, "90+" depois
+FAIXAS_ATRASO = (("0-30", 30), ("31-60", 60), ("61-90", 90))
+SERVICOS = (
+    ("contrato", "contrato"),
+    ("exumacao", "exumacao"),
+    ("translado", "translado"),
+    ("sepultado", "sepultamento"),
+)
+VALORES = ("valor_total", "valor_pago", "valor_em_aberto")
+# campo da Receita -> (modelo do serviço, caminho até o cemitério do túmulo dele)
+CEMITERIO_DO_SERVICO = {
+    "contrato": ("ConcessaoContrato", "tumulo__quadra__cemiterio_id"),
+    "sepultado": ("Sepultado", "tumulo__quadra__cemiterio_id"),
+    "exumacao": ("Exumacao", "tumulo__quadra__cemiterio_id"),
+    "translado": ("Translado", "tumulo_destino__quadra__cemiterio_id"),
+}
+LOTE_CEMITERIO = 5000
+
+
+def _modelo_servico(campo):
+    from django.apps import apps
+
+    nome, caminho = CEMITERIO_DO_SERVICO[campo]
+    return apps.get_model("sepultados_gestao", nome), caminho
+
+
+def cemiterio_do_servico(campo, servico_id):
+    """Cemitério do túmulo do serviço (uma consulta); None se ele não tem túmulo."""
+    modelo, caminho = _modelo_servico(campo)
+    return modelo.objects.filter(pk=servico_id).values_list(caminho, flat=True).first()
+
+
+def sincronizar_cemiterio(campo, servico_id):
+    """
+    Regrava Receita.cemiterio das receitas do serviço depois que o túmulo dele
+    mudou (sinais em signals.py). Retorna quantas receitas mudaram.
+    """
+    from sepultados_gestao.models import Receita
+
+    novo = cemiterio_do_servico(campo, servico_id)
+    alvo = Receita.objects.filter(**{f"{campo}_id": servico_id})
+    alvo = alvo.exclude(cemiterio_id=novo) if novo else alvo.filter(cemiterio__isnull=False)
+    prefeituras = set(alvo.values_list("prefeitura_id", flat=True))
+    if not prefeituras:
+        return 0
+    with transaction.atomic():
+        # atualizado_em à mão: o UPDATE não passa pelo auto_now (backup incremental)
+        alteradas = alvo.update(cemiterio_id=novo, atualizado_em=timezone.now())
+        for pref_id in prefeituras:
+            versoes.tocar("prefeitura", pref_id)
+    return alteradas
+
+
+def ressincronizar_cemiterios(lote=LOTE_CEMITERIO):
+    """
+    Confere Receita.cemiterio de todas as receitas com serviço, em faixas de
+    ids (`manage.py sincronizar_cemiterio_receitas`), e corrige as que
+    divergem (mudanças feitas direto no banco, túmulo trocado de quadra...).
+    Retorna (conferidas, corrigidas).
+    """
+    from sepultados_gestao.models import Receita
+
+    conferidas = corrigidas = 0
+    ultimo = Receita.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+    for inicio in range(0, ultimo + 1, lote):
+        faixa = Receita.objects.filter(pk__gte=inicio, pk__lt=inicio + lote)
+        for campo in CEMITERIO_DO_SERVICO:
+            modelo, caminho = _modelo_servico(campo)
+            cemiterio = modelo.objects.filter(pk=OuterRef(f"{campo}_id")).values(caminho)[:1]
+            linhas = (
+                faixa.filter(**{f"{campo}__isnull": False}).annotate(novo=Subquery(cemiterio))
+                .values_list("pk", "prefeitura_id", "cemiterio_id", "novo")
+            )
+            mudar, prefeituras = defaultdict(list), set()
+            for pk, pref_id, atual, novo in linhas:
+                conferidas += 1
+                if atual != novo:
+                    mudar[novo].append(pk)
+                    prefeituras.add(pref_id)
+            if not mudar:
+                continue
+            with transaction.atomic():
+                agora = timezone.now()
+                for novo, pks in mudar.items():
+                    corrigidas += Receita.objects.filter(pk__in=pks).update(cemiterio_id=novo, atualizado_em=agora)
+                for pref_id in prefeituras:
+                    versoes.tocar("prefeitura", pref_id)
+    return conferidas, corrigidas
+
+
+def por_cemiterio(receitas, cemiterio_id):
+    """
+    Receitas do cemitério (Receita.cemiterio, um intervalo do índice) mais as
+    diversas, sem serviço vinculado, que entram em todos os cemitérios.
+    """
+    return receitas.filter(
+        Q(cemiterio_id=cemiterio_id)
+        | Q(cemiterio__isnull=True, contrato__isnull=True, sepultado__isnull=True,
+            exumacao__isnull=True, translado__isnull=True)
+    )
+
+
+def _faixa(hoje):
+    return Case(
+        When(data_vencimento__gt=hoje, then=Value("a_vencer")),
+        *(When(data_vencimento__gte=hoje - timedelta(days=dias), then=Value(rotulo))
+          for rotulo, dias in FAIXAS_ATRASO),
+        default=Value("90+"),
+        output_field=CharField(),
+    )
+
+
+def _servico():
+    return Case(
+        *(When(Q(**{f"{campo}__isnull": False}), then=Value(rotulo)) for campo, rotulo in SERVICOS),
+        default=Value("diversa"),
+        output_field=CharField(),
+    )
+
+
+def _grupo():
+    return {"quantidade": 0, **{v: Decimal("0.00") for v in VALORES}}
+
+
+def _somar(grupo, linha):
+    grupo["quantidade"] += linha["quantidade"]
+    for v in VALORES:
+        grupo[v] += linha[v] or 0
+
+
+def _fechar(grupos):
+    return {
+        chave: {**g, **{v: Decimal(g[v]).quantize(Decimal("0.01")) for v in VALORES}}
+        for chave, g in grupos.items()
+    }
+
+
+def calcular_resumo(prefeitura_id, hoje=None, data_inicio=None, data_fim=None, cemiterio_id=None):
+    """
+    {"por_status", "por_atraso", "por_mes", "por_servico", "total"}; cada
+    grupo com quantidade, valor_total, valor_pago e valor_em_aberto. A faixa
+    de atraso conta só o que não está pago (dias desde data_vencimento).
+    """
+    from sepultados_gestao.models import Receita
+
+    hoje = hoje or date.today()
+    receitas = Receita.objects.filter(prefeitura_id=prefeitura_id)
+    if cemiterio_id:
+        receitas = por_cemiterio(receitas, cemiterio_id)
+    if data_inicio:
+        receitas = receitas.filter(data_vencimento__gte=data_inicio)
+    if data_fim:
+        receitas = receitas.filter(data_vencimento__lte=data_fim)
+
+    linhas = (
+        receitas.order_by()
+        .annotate(faixa=_faixa(hoje), mes=TruncMonth("data_vencimento"), servico=_servico())
+        .values("status", "faixa", "mes", "servico")
+        .annotate(quantidade=Count("pk"), **{v: Sum(v) for v in VALORES})
+    )
+
+    total = _grupo()
+    por_status, por_atraso, por_mes, por_servico = (defaultdict(_grupo) for _ in range(4))
+    for linha in linhas:
+        _somar(total, linha)
+        _somar(por_status[linha["status"]], linha)
+        _somar(por_mes[f"{linha['mes']:%Y-%m}"], linha)
+        _somar(por_servico[linha["servico"]], linha)
+        if linha["status"] != "pago":
+            _somar(por_atraso[linha["faixa"]], linha)
+
+    ordem_atraso = ["a_vencer", *(rotulo for rotulo, _ in FAIXAS_ATRASO), "90+"]
+    return {
+        "data_referencia": hoje.isoformat(),
+        "total": _fechar({"": total})[""],
+        "por_status": _fechar(por_status),
+        "por_atraso": _fechar({f: por_atraso[f] for f in ordem_atraso}),
+        "por_mes": _fechar(dict(sorted(por_mes.items()))),
+        "por_servico": _fechar(por_servico),
+    }
+
+
+def resumo_receitas(prefeitura_id, data_inicio=None, data_fim=None, cemiterio_id=None):
+    """calcular_resumo() pelo cache da versão da prefeitura (a faixa de atraso muda com o dia)."""
+    hoje = date.today()
+    chave = f"receitas-resumo:{hoje.isoformat()}:{data_inicio or ''}:{data_fim or ''}:{cemiterio_id or ''}"
+    return versoes.em_cache(
+        "prefeitura", prefeitura_id, chave,
+        lambda: calcular_resumo(prefeitura_id, hoje, data_inicio, data_fim, cemiterio_id),
+    )
@@ -0,0 +1,93 @@
+"""
+Chave fonética (português do Brasil) e similaridade por trigramas.
+
+A chave junta grafias que soam igual: Sousa/Souza, Luis/Luiz, Ellen/Helen,
+Filipe/Phelipe, Xavier/Chavier, Conceição/Conseisão, Walter/Valter. Cada
+palavra gera duas chaves: o "esqueleto", com os grupos de vogais trocados
+por um só "a" (acha Felipe/Filipe), e a mesma grafia com as vogais (separa
+Maria/Mario/Mauro, que têm o mesmo esqueleto). Quem bate as duas sobe no
+ranking antes do corte de candidatos; o resto desempata a similaridade por
+trigramas.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+
+PREPOSICOES = {"da", "de", "do", "das", "dos", "e", "di", "du"}
+
+# aplicadas em ordem sobre a palavra já sem acento e minúscula
+REGRAS = (
+    (r"ph", "f"),
+    (r"th", "t"),
+    (r"sch|sh|ch", "x"),
+    (r"lh", "l"),
+    (r"nh", "n"),
+    (r"h", ""),
+    (r"[sx]c(?=[eiy])", "s"),
+    (r"qu?(?=[eiy])", "k"),
+    (r"qu?", "k"),
+    (r"gu(?=[eiy])", "G"),   # Guilherme: "g" duro, não vira "j" abaixo
+    (r"g(?=[eiy])", "j"),
+    (r"G", "g"),
+    (r"c(?=[eiy])", "s"),
+    (r"c", "k"),
+    (r"y", "i"),
+    (r"w", "v"),
+    (r"z", "s"),
+    (r"l(?=[^aeiou]|$)", "u"),   # Brasil/Brasiu
+    (r"m(?=[^aeiou]|$)", "n"),   # Adam/Adan
+    (r"([a-z])\1+", r"\1"),
+)
+REGRAS = tuple((re.compile(padrao), troca) for padrao, troca in REGRAS)
+VOGAIS = re.compile(r"[aeiou]+")
+
+
+def _sem_acento(texto) -> str:
+    # ç vira "s" antes de tirar o acento (senão vira "c" e soa "k")
+    texto = str(texto or "").lower().replace("ç", "s")
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=20000)  # nomes se repetem muito (Maria, Silva, Oliveira...)
+def chaves_palavra(palavra) -> tuple:
+    """(esqueleto, grafia com vogais) — só o esqueleto se as duas coincidem."""
+    p = re.sub(r"[^a-z]", "", _sem_acento(palavra))
+    for padrao, troca in REGRAS:
+        p = padrao.sub(troca, p)
+    esqueleto = VOGAIS.sub("a", p)
+    return (esqueleto, p) if p != esqueleto else (esqueleto,)
+
+
+def chave_fonetica(palavra) -> str:
+    return chaves_palavra(palavra)[0]
+
+
+def chaves(texto) -> list:
+    """Chaves das palavras do texto (sem preposições), sem repetir."""
+    vistas = []
+    for palavra in re.findall(r"[a-z]+", _sem_acento(texto)):
+        if palavra in PREPOSICOES:
+            continue
+        for chave in chaves_palavra(palavra):
+            if chave and chave not in vistas:
+                vistas.append(chave)
+    return vistas
+
+
+def trigramas(texto) -> set:
+    palavras = re.findall(r"[a-z0-9]+", _sem_acento(texto))
+    grams = set()
+    for p in palavras:
+        p = f"  {p} "
+        grams.update(p[i:i + 3] for i in range(len(p) - 2))
+    return grams
+
+
+def similaridade(a, b) -> float:
+    """Coeficiente de Dice entre os trigramas de `a` e `b` (0 a 1)."""
+    ta, tb = trigramas(a), trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
@@ -0,0 +1,1171 @@
+"""
+Importação de planilhas em lote.
+
+Em vez de uma consulta + um save() por linha, cada importação:
+  1. carrega de uma vez o que precisa do banco (quadras, túmulos existentes);
+  2. converte e valida as colunas com operações do pandas sobre a coluna inteira;
+  3. grava em lotes: bulk_create nos novos e, nos existentes, só as colunas
+     que mudaram (um savepoint por lote);
+  4. refaz no fim, uma vez, o que os save()/sinais fariam por linha
+     (status, estatísticas, versão do cemitério, auditoria).
+Os erros continuam por linha da planilha ("Linha N: motivo"); se um lote
+falhar no banco, as linhas dele são regravadas uma a uma pelo caminho normal.
+
+A planilha é lida em lotes de linhas (`ler_planilha`): a memória fica
+limitada ao tamanho do lote, não ao do arquivo.
+"""
+import json
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .auditoria import deve_ignorar, registrar
+from .estatisticas import recalcular_estatisticas
+from .ocupacao import status_ocupacao_expr
+from .versoes import tocar_cemiterios
+
+
+LOTE = 1000
+LOTE_SIMULACAO = 20000  # o dry run não monta objetos: lotes maiores diluem o custo fixo do pandas
+
+# ----------------- leitura em lotes -----------------
+def ler_planilha(arquivo, tamanho=LOTE, minusculas=False, inicio=0):
+    """
+    Gera DataFrames de até `tamanho` linhas a partir de um .csv/.xlsx,
+    a partir da linha de índice `inicio` (retomada de uma importação).
+      - CSV: read_csv(chunksize=...);
+      - XLSX: openpyxl em modo somente leitura (linha a linha, sem carregar a
+        pasta inteira); o índice é a linha da planilha - 2, como no read_excel,
+        então "Linha N" continua apontando para a linha certa;
+      - XLS (formato antigo) é recusado: não tem leitura em fluxo e obrigaria a
+        carregar a planilha inteira na memória.
+    Sem linhas de dados, gera um DataFrame vazio só com o cabeçalho.
+    """
+    nome = arquivo.name.lower()
+    if nome.endswith(".csv"):
+        lotes = pd.read_csv(arquivo, chunksize=tamanho)
+    elif nome.endswith(".xlsx"):
+        lotes = _ler_xlsx(arquivo, tamanho, inicio)
+    elif nome.endswith(".xls"):
+        raise ValueError("Planilhas .xls (Excel 97-2003) não são aceitas. Salve como .xlsx ou .csv e envie de novo.")
+    else:
+        raise ValueError("Formato de arquivo não suportado. Use .csv ou .xlsx.")
+
+    for df in lotes:
+        if inicio and len(df):
+            df = df[df.index >= inicio]
+            if not len(df):
+                continue
+        if minusculas:
+            df.columns = [str(c).strip().lower() for c in df.columns]
+        yield df
+
+
+def _ler_xlsx(arquivo, tamanho, inicio=0):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None) or ()
+        colunas = [str(c) if c is not None else f"Unnamed: {n}" for n, c in enumerate(cabecalho)]
+        largura = len(colunas)
+
+        vazio = True
+        lote, indices, brancas = [], [], []
+        for n, valores in enumerate(linhas):
+            if n < inicio:
+                continue  # já importadas (sem montar DataFrame)
+            valores = tuple(valores[:largura]) + (None,) * (largura - len(valores))
+            if all(v is None or (isinstance(v, str) and not v.strip()) for v in valores):
+                # como no read_excel: linhas em branco no meio contam, as do fim não
+                brancas.append((n, valores))
+                continue
+            for n_branca, branca in brancas + [(n, valores)]:
+                lote.append(branca)
+                indices.append(n_branca)
+                if len(lote) == tamanho:
+                    yield pd.DataFrame(lote, columns=colunas, index=indices).infer_objects()
+                    vazio = False
+                    lote, indices = [], []
+            brancas = []
+        if lote or vazio:
+            yield pd.DataFrame(lote, columns=colunas, index=indices).infer_objects()
+    finally:
+        wb.close()
+
+
+def primeiro_lote(lotes):
+    """(primeiro DataFrame, iterador com todos os lotes) — para checar o cabeçalho antes de gravar."""
+    lotes = iter(lotes)
+    primeiro = next(lotes)
+    return primeiro, chain([primeiro], lotes)
+
+
+def iterar_lotes(planilha, erros_leitura):
+    """
+    Aceita um DataFrame ou um iterável de DataFrames (ler_planilha). Se a
+    leitura falhar no meio do arquivo, para ali e anota o erro: o que já foi
+    gravado continua valendo e os passos finais da importação ainda rodam.
+    """
+    if isinstance(planilha, pd.DataFrame):
+        yield planilha
+        return
+    lotes = iter(planilha)
+    while True:
+        try:
+            df = next(lotes)
+        except StopIteration:
+            return
+        except Exception as e:
+            erros_leitura.append(f"Erro ao ler planilha: {e}")
+            return
+        yield df
+
+
+# ----------------- colunas (vetorizado) -----------------
+_NUM_RE = r"[-+]?\d+(?:\.\d+)?"
+_VERDADEIRO = {"1", "true", "t", "sim", "s", "yes", "y"}
+
+
+def texto(col: pd.Series) -> pd.Series:
+    """Coluna como texto sem espaços nas pontas; vazio para células em branco."""
+    txt = col.where(col.notna(), "").astype(str).str.strip()
+    if pd.api.types.is_float_dtype(col):
+        # coluna numérica com células vazias vira float: 12.0 -> "12"
+        inteiros = col.notna() & (col % 1 == 0)
+        txt[inteiros] = col[inteiros].astype("int64").astype(str)
+    return txt
+
+
+def numero(txt: pd.Series):
+    """(valores float, máscara de preenchidos-mas-inválidos) de uma coluna texto."""
+    valores = pd.to_numeric(txt.str.replace(",", ".", regex=False), errors="coerce")
+    valores = valores.where(valores.abs() != float("inf"))
+    return valores, txt.ne("") & valores.isna()
+
+
+def booleano(txt: pd.Series) -> pd.Series:
+    return txt.str.lower().isin(_VERDADEIRO)
+
+
+def coordenadas(txt: pd.Series):
+    """(lat, lng, máscara de inválidas) a partir de '-23.44, -51.92' / '(-23.4; -51.9)'."""
+    nums = txt.str.replace(r"[,;/]", " ", regex=True).str.findall(_NUM_RE)
+    validas = nums.str.len() >= 2
+    lat = pd.to_numeric(nums.str[0].where(validas), errors="coerce")
+    lng = pd.to_numeric(nums.str[1].where(validas), errors="coerce")
+    return lat, lng, txt.ne("") & ~validas
+
+
+class Erros:
+    """Primeiro erro de cada linha (na ordem em que as checagens rodam)."""
+
+    def __init__(self, index):
+        self.msgs = pd.Series("", index=index, dtype=object)
+
+    def marcar(self, mascara, mensagem):
+        """`mensagem`: texto fixo ou função(índice) -> texto (só para as linhas marcadas)."""
+        alvo = mascara & self.msgs.eq("")
+        if not alvo.any():
+            return
+        if callable(mensagem):
+            self.msgs[alvo] = [mensagem(i) for i in alvo[alvo].index]
+        else:
+            self.msgs[alvo] = mensagem
+
+    def marcar_linha(self, i, mensagem):
+        if not self.msgs[i]:
+            self.msgs[i] = mensagem
+
+    @property
+    def ok(self):
+        return self.msgs.eq("")
+
+    def listar(self, linha_de):
+        return [f"Linha {linha_de(i)}: {m}" for i, m in self.msgs[self.msgs.ne("")].items()]
+
+
+def _validar_campo(modelo, campo, valor):
+    """Mensagens do full_clean() para um valor (validadores do campo), ou []."""
+    try:
+        modelo._meta.get_field(campo).clean(valor, None)
+    except ValidationError as e:
+        return e.messages
+    return []
+
+
+def _decimal(v):
+    try:
+        return Decimal(str(v).replace(",", "."))
+    except InvalidOperation:
+        return None
+
+
+def _em_lotes(itens, tamanho=LOTE):
+    itens = list(itens)
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+# ----------------- túmulos -----------------
+TIPOS_TUMULO = {
+    "túmulo": "tumulo", "tumulo": "tumulo",
+    "perpétua": "perpetua", "perpetua": "perpetua",
+    "sepultura": "sepultura", "jazigo": "jazigo", "gaveta": "gaveta",
+    "outro": "outro",
+}
+COLUNAS_TUMULOS = {
+    "tipo_estrutura", "identificador", "capacidade", "quadra_codigo",
+    "usar_linha", "linha", "angulo", "comprimento_m", "largura_m", "coordenada",
+}
+# campos gravados pela importação
+CAMPOS_TUMULO = (
+    "tipo_estrutura", "capacidade", "usar_linha", "linha", "quadra_id",
+    "angulo_graus", "comprimento_m", "largura_m", "localizacao",
+)
+# coluna da planilha -> campo decimal do túmulo (opcionais: vazio mantém o valor atual)
+_DECIMAIS_TUMULO = {"angulo": "angulo_graus", "comprimento_m": "comprimento_m", "largura_m": "largura_m"}
+
+
+def _preparar_tumulos(df, quadras):
+    """
+    Converte/valida a planilha inteira. Retorna (registros, erros), em que
+    registros é [(índice, identificador, campos)] das linhas válidas, na ordem.
+    """
+    from sepultados_gestao.models import Tumulo
+
+    erros = Erros(df.index)
+    ident = texto(df["identificador"])
+    qcod = texto(df["quadra_codigo"])
+    quadra_id = qcod.str.lower().map(quadras)
+
+    erros.marcar(ident.eq(""), "identificador vazio")
+    erros.marcar(qcod.eq(""), "quadra_codigo vazio")
+    erros.marcar(quadra_id.isna(), lambda i: f"quadra '{qcod[i]}' não encontrada neste cemitério")
+
+    tipo = texto(df["tipo_estrutura"]).str.lower().map(TIPOS_TUMULO).fillna("tumulo")
+
+    cap_txt = texto(df["capacidade"])
+    cap, cap_invalida = numero(cap_txt)
+    erros.marcar(cap_invalida, lambda i: f"inteiro inválido: {df['capacidade'][i]!r}")
+    cap = cap.fillna(0).apply(int).replace(0, 1)  # int() trunca como antes; vazio/0 -> 1
+
+    usar_linha = booleano(texto(df["usar_linha"]))
+    linha_txt = texto(df["linha"])
+    linha, linha_invalida = numero(linha_txt)
+    erros.marcar(usar_linha & linha_invalida, lambda i: f"inteiro inválido: {df['linha'][i]!r}")
+
+    decimais = {}
+    for coluna, campo in _DECIMAIS_TUMULO.items():
+        txt = texto(df[coluna])
+        _, invalido = numero(txt)
+        erros.marcar(invalido, lambda i, c=coluna: f"número inválido: {df[c][i]!r}")
+        decimais[campo] = txt
+
+    lat, lng, coord_invalida = coordenadas(texto(df["coordenada"]))
+    erros.marcar(coord_invalida, lambda i: f"coordenada inválida: {df['coordenada'][i]!r}. Use '-23.44, -51.92'")
+
+    # o que o full_clean() do túmulo recusaria
+    erros.marcar(ident.str.len() > Tumulo._meta.get_field("identificador").max_length,
+                 lambda i: str(ValidationError({"identificador": _validar_campo(Tumulo, "identificador", ident[i])})))
+
+    # daqui em diante, por linha: listas do Python (indexar a Series linha a linha é caro)
+    indices = erros.ok[erros.ok].index
+    colunas = {
+        "ident": ident, "tipo": tipo, "cap": cap, "usar_linha": usar_linha, "linha": linha,
+        "quadra_id": quadra_id, "lat": lat, "lng": lng,
+        **{campo: txt for campo, txt in decimais.items()},
+    }
+    valores = {nome: col[indices].tolist() for nome, col in colunas.items()}
+    registros = []
+    for n, i in enumerate(indices):
+        v = {nome: lista[n] for nome, lista in valores.items()}
+        n_linha = int(v["linha"]) if v["usar_linha"] and pd.notna(v["linha"]) else None
+        campos = {
+            "tipo_estrutura": v["tipo"],
+            "capacidade": int(v["cap"]),
+            "usar_linha": bool(v["usar_linha"]),
+            "linha": n_linha,
+            "quadra_id": int(v["quadra_id"]),
+        }
+        problemas = {}
+        if campos["capacidade"] < 0:
+            problemas["capacidade"] = _validar_campo(Tumulo, "capacidade", campos["capacidade"])
+        if campos["usar_linha"] and not n_linha:
+            problemas["linha"] = ["Informe o número da linha."]
+        elif n_linha is not None and n_linha < 0:
+            problemas["linha"] = _validar_campo(Tumulo, "linha", n_linha)
+        for campo in decimais:
+            if v[campo]:
+                valor = _decimal(v[campo])
+                msgs = _validar_campo(Tumulo, campo, valor)
+                if msgs:
+                    problemas[campo] = msgs
+                campos[campo] = valor
+        if pd.notna(v["lat"]):
+            campos["localizacao"] = {"lat": float(v["lat"]), "lng": float(v["lng"])}
+        problemas = {campo: msgs for campo, msgs in problemas.items() if msgs}
+        if problemas:
+            erros.marcar_linha(i, str(ValidationError(problemas)))
+            continue
+        registros.append((i, v["ident"], campos))
+
+    return registros, erros
+
+
+class ImportadorTumulos:
+    """
+    Importação de túmulos lote a lote (para quem controla as transações, como
+    o worker de importações): processar(df) a cada lote, finalizar() no fim.
+    O estado que atravessa os lotes (quadras, túmulos conhecidos) é carregado uma vez.
+    """
+    colunas = COLUNAS_TUMULOS
+    contadores = ("importados", "atualizados")
+
+    def __init__(self, cemiterio, usuario=None, linha_de=lambda i: i + 2):
+        from sepultados_gestao.models import Quadra, Tumulo
+
+        self.cemiterio, self.usuario, self.linha_de = cemiterio, usuario, linha_de
+        self.quadras, self.quadras_obj = {}, {}
+        for quadra in Quadra.objects.filter(cemiterio_id=cemiterio.pk).order_by("id"):
+            self.quadras.setdefault(str(quadra.codigo).strip().lower(), quadra.pk)  # como o .first() do iexact
+            self.quadras_obj[quadra.pk] = quadra
+
+        # túmulos do cemitério: identificador -> [(pk, {campo: valor atual})]; atualizado a cada lote
+        self.existentes = {}
+        for ident, pk, *valores in (
+            Tumulo.objects.filter(cemiterio_id=cemiterio.pk).values_list("identificador", "id", *CAMPOS_TUMULO)
+        ):
+            self.existentes.setdefault(ident, []).append((pk, dict(zip(CAMPOS_TUMULO, valores))))
+        self.padroes = {campo: Tumulo._meta.get_field(campo).get_default() for campo in CAMPOS_TUMULO}
+        self.alterou = False
+
+    def processar(self, df):
+        """Grava um lote. Retorna {"importados", "atualizados", "erros"} do lote."""
+        from sepultados_gestao.models import Tumulo
+        from sepultados_gestao.session_context.thread_local import get_prefeitura_ativa
+
+        importados, atualizados, erros, gravados = _gravar_tumulos(
+            df, self.cemiterio, self.quadras, self.existentes, self.padroes
+        )
+        # o que o save()/sinais fariam por túmulo
+        for lote in _em_lotes(pk for pk, _, _ in gravados):
+            Tumulo.objects.filter(pk__in=lote).update(status=status_ocupacao_expr())
+        self.alterou = self.alterou or bool(gravados)
+
+        # auditoria como a do post_save (um registro por túmulo; o lote de
+        # auditoria junta "add" + "change" do mesmo túmulo)
+        usuario = self.usuario
+        if gravados and usuario is not None and usuario.is_authenticated and not deve_ignorar(Tumulo):
+            prefeitura = get_prefeitura_ativa() or self.cemiterio.prefeitura
+            for pk, acao, campos in gravados:
+                t = Tumulo(pk=pk, **campos)
+                t.quadra = self.quadras_obj.get(campos["quadra_id"])
+                registrar(usuario=usuario, acao=acao, modelo="Tumulo", objeto_id=str(pk),
+                          representacao=str(t), prefeitura=prefeitura)
+
+        return {"importados": importados, "atualizados": atualizados, "erros": erros.listar(self.linha_de)}
+
+    def finalizar(self):
+        """Estatísticas e versão do cemitério, uma vez só."""
+        from sepultados_gestao.models import Cemiterio
+
+        if self.alterou:
+            recalcular_estatisticas(Cemiterio.objects.filter(pk=self.cemiterio.pk))
+            tocar_cemiterios(self.cemiterio.pk)
+
+
+def importar_tumulos(planilha, cemiterio, usuario=None, linha_de=lambda i: i + 2):
+    """
+    Cria/atualiza os túmulos da planilha no cemitério (chave: identificador).
+    `planilha`: DataFrame ou lotes de ler_planilha(), gravados um a um.
+    Mesma regra do update_or_create linha a linha: colunas opcionais vazias não
+    apagam o valor atual; identificador repetido na planilha atualiza o mesmo túmulo.
+    Retorna {"importados", "atualizados", "erros"}.
+    """
+    importador = ImportadorTumulos(cemiterio, usuario, linha_de)
+    return _importar(importador, planilha)
+
+
+def _importar(importador, planilha):
+    """Passa os lotes da planilha pelo importador e soma os resultados."""
+    resultado = dict.fromkeys(importador.contadores, 0)
+    erros, leitura = [], []
+    try:
+        for df in iterar_lotes(planilha, leitura):
+            parcial = importador.processar(df)
+            erros += parcial.pop("erros")
+            for chave, n in parcial.items():
+                resultado[chave] += n
+    finally:
+        importador.finalizar()
+    resultado["erros"] = erros + leitura
+    return resultado
+
+
+def _gravar_tumulos(df, cemiterio, quadras, existentes, padroes):
+    """
+    Um lote da planilha: valida, junta as linhas do mesmo identificador e grava.
+    Atualiza `existentes` com o que gravou. Retorna (importados, atualizados,
+    erros, gravados), em que gravados é [(pk, "add"/"change", campos)].
+    """
+    from sepultados_gestao.models import Tumulo
+
+    registros, erros = _preparar_tumulos(df, quadras)
+    gravados = []
+
+    # junta as linhas do mesmo identificador (a última vence, campo a campo)
+    alvos, linhas, importados, atualizados = {}, {}, 0, 0
+    for i, ident, campos in registros:
+        if len(existentes.get(ident, ())) > 1:
+            erros.marcar_linha(i, f"mais de um túmulo com o identificador '{ident}' neste cemitério")
+            continue
+        if ident in alvos or ident in existentes:
+            atualizados += 1
+        alvos.setdefault(ident, {}).update(campos)
+        linhas.setdefault(ident, []).append(i)
+        importados += 1
+
+    novos = [ident for ident in alvos if ident not in existentes]
+    alterados = [ident for ident in alvos if ident in existentes]
+    falhas = set()
+
+    for lote in _em_lotes(novos):
+        objs = [Tumulo(cemiterio_id=cemiterio.pk, identificador=ident, **alvos[ident]) for ident in lote]
+        try:
+            with transaction.atomic():
+                Tumulo.objects.bulk_create(objs)
+        except DatabaseError:
+            falhas.update(lote)
+            continue
+        if any(t.pk is None for t in objs):
+            # nem todo banco devolve o id no bulk_create (MySQL): relê pelo identificador
+            ids = dict(Tumulo.objects.filter(cemiterio_id=cemiterio.pk, identificador__in=lote)
+                       .values_list("identificador", "id"))
+            for t in objs:
+                t.pk = ids.get(t.identificador)
+        for t in objs:
+            existentes[t.identificador] = [(t.pk, {**padroes, **alvos[t.identificador]})]
+            gravados.append((t.pk, "add", {"identificador": t.identificador, **alvos[t.identificador]}))
+
+    # só o que mudou; por coluna, um UPDATE por valor (colunas com muitos
+    # valores distintos, como a coordenada, vão por bulk_update)
+    mudancas, dono = {}, {}
+    for ident in alterados:
+        pk, atuais = existentes[ident][0]
+        dono[pk] = ident
+        for campo, valor in alvos[ident].items():
+            if atuais[campo] != valor:
+                mudancas.setdefault(campo, {})[pk] = valor
+    for campo, valores in mudancas.items():
+        grupos = {}
+        for pk, valor in valores.items():
+            grupos.setdefault(repr(valor), (valor, []))[1].append(pk)
+        try:
+            with transaction.atomic():
+                if len(grupos) * 20 <= len(valores):
+                    for valor, pks in grupos.values():
+                        for lote in _em_lotes(pks):
+                            Tumulo.objects.filter(pk__in=lote).update(**{campo: valor})
+                else:
+                    Tumulo.objects.bulk_update(
+                        [Tumulo(pk=pk, **{campo: valor}) for pk, valor in valores.items()], [campo], batch_size=LOTE
+                    )
+        except DatabaseError:
+            falhas.update(dono[pk] for pk in valores)
+    for ident in alterados:
+        if ident not in falhas:
+            pk, atuais = existentes[ident][0]
+            atuais.update(alvos[ident])
+            gravados.append((pk, "change", {"identificador": ident, **atuais}))
+
+    # lote que o banco recusou: linha a linha, pelo caminho normal (save/full_clean, com sinais)
+    for ident in falhas:
+        try:
+            with transaction.atomic():
+                t, _ = Tumulo.objects.update_or_create(
+                    cemiterio_id=cemiterio.pk, identificador=ident, defaults=alvos[ident]
+                )
+            existentes[ident] = [(t.pk, {campo: getattr(t, campo) for campo in CAMPOS_TUMULO})]
+        except Exception as e:
+            for i in linhas[ident]:
+                erros.marcar_linha(i, str(e))
+            importados -= len(linhas[ident])
+            atualizados -= len(linhas[ident]) - (ident not in existentes)
+
+    return importados, atualizados, erros, gravados
+
+
+# ----------------- sepultados (modo lote) -----------------
+# coluna da planilha -> campo de texto opcional do sepultado
+_TEXTOS_SEPULTADO = (
+    "cpf_sepultado", "local_nascimento", "local_falecimento", "nome_pai", "nome_mae",
+)
+_DATAS_SEPULTADO = ("data_nascimento", "data_falecimento", "data_sepultamento")
+
+
+def _coluna(df, nome):
+    return df[nome] if nome in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+
+def datas(col: pd.Series) -> pd.Series:
+    """Coluna de datas (dia primeiro); inválidas/vazias viram None."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        convertidas = col
+    else:
+        txt = texto(col)
+        convertidas = pd.to_datetime(txt.where(txt.ne("")), dayfirst=True, errors="coerce")
+        # formatos misturados: o que o formato inferido não leu vai célula a célula
+        faltando = convertidas.isna() & txt.ne("")
+        if faltando.any():
+            convertidas[faltando] = pd.to_datetime(txt[faltando], dayfirst=True, errors="coerce", format="mixed")
+    return pd.Series([d.date() if pd.notna(d) else None for d in convertidas], index=col.index, dtype=object)
+
+
+def _preparar_sepultados(df, quadras, tumulos):
+    """
+    Converte/valida a planilha. `tumulos`: (quadra_id, identificador minúsculo)
+    -> (id, usar_linha, linha). Retorna (registros, erros); registros é
+    [(índice, tumulo_id, campos)] das linhas válidas, na ordem.
+    Linhas sem quadra ou sem identificador do túmulo são ignoradas (como antes).
+    """
+    erros = Erros(df.index)
+    qcod = texto(_coluna(df, "quadra"))
+    ident = texto(_coluna(df, "identificador_tumulo"))
+    presentes = qcod.ne("") & ident.ne("")
+
+    quadra_id = qcod.str.lower().map(quadras)
+    erros.marcar(presentes & quadra_id.isna(), lambda i: f"Quadra '{qcod[i]}' não encontrada.")
+
+    chaves = pd.Series(list(zip(quadra_id, ident.str.lower())), index=df.index)
+    tumulo = chaves.map(lambda c: tumulos.get(c))
+    erros.marcar(
+        presentes & quadra_id.notna() & tumulo.isna(),
+        lambda i: f"Túmulo '{ident[i]}' não encontrado na quadra '{qcod[i]}'.",
+    )
+
+    linha, _ = numero(texto(_coluna(df, "linha")))
+    usa_linha = tumulo.map(lambda t: bool(t and t[1])).astype(bool)
+    linha_tumulo = tumulo.map(lambda t: int(t[2] or 0) if t else 0)
+    erros.marcar(
+        presentes & usa_linha & linha.isna(),
+        lambda i: f"Túmulo '{ident[i]}' usa linha ({tumulo[i][2]}), mas a planilha não informou 'linha'.",
+    )
+    erros.marcar(
+        presentes & usa_linha & linha.notna() & (linha.fillna(0).apply(int) != linha_tumulo),
+        lambda i: f"Linha informada ({int(linha[i])}) difere da linha do túmulo ({tumulo[i][2]}).",
+    )
+
+    nome = texto(_coluna(df, "nome"))
+    sexo = texto(_coluna(df, "sexo")).str[:2].str.upper().replace("", "NI")
+    textos = {campo: texto(_coluna(df, campo)) for campo in _TEXTOS_SEPULTADO}
+    datas_ = {campo: datas(_coluna(df, campo)) for campo in _DATAS_SEPULTADO}
+
+    validas = presentes & erros.ok
+    # daqui em diante, por linha: listas do Python (indexar a Series linha a linha é caro)
+    colunas = {"nome": nome, "sexo": sexo, **textos, **datas_}
+    indices = validas[validas].index
+    valores = {campo: col[indices].tolist() for campo, col in colunas.items()}
+    opcionais = set(textos)
+    registros = []
+    for n, i in enumerate(indices):
+        campos = {campo: lista[n] for campo, lista in valores.items()}
+        for campo in opcionais:
+            campos[campo] = campos[campo] or None
+        registros.append((i, tumulo[i][0], campos))
+    return registros, erros
+
+
+class ImportadorSepultados:
+    """
+    Importação em lote de sepultados antigos (sem contrato), sem os efeitos
+    por linha do Sepultado.save(). A cada lote (processar):
+      - os números de sepultamento do lote são reservados de uma vez;
+      - os sepultados entram com bulk_create, um savepoint por lote (se o banco
+        recusar o lote, as linhas dele entram uma a uma para isolar o erro);
+      - não gera receitas (registro histórico, sem cobrança);
+      - contador/status dos túmulos: um UPDATE por quantidade de novos ocupantes;
+      - índice de busca montado com o que já está em memória.
+    No fim (finalizar): estatísticas, versão do cemitério e um único registro
+    de auditoria resumindo a importação.
+    """
+    colunas = ()
+    contadores = ("importados",)
+
+    def __init__(self, cemiterio, usuario=None, linha_de=lambda i: i + 2):
+        from sepultados_gestao.models import Quadra, Tumulo
+
+        self.cemiterio, self.usuario, self.linha_de = cemiterio, usuario, linha_de
+        self.quadras = {}
+        for qid, codigo in Quadra.objects.filter(cemiterio_id=cemiterio.pk).order_by("id").values_list("id", "codigo"):
+            self.quadras.setdefault(str(codigo).strip().lower(), qid)
+        self.tumulos = {}
+        for tid, qid, ident, usar_linha, linha in (
+            Tumulo.objects.filter(cemiterio_id=cemiterio.pk).order_by("id")
+            .values_list("id", "quadra_id", "identificador", "usar_linha", "linha")
+        ):
+            self.tumulos.setdefault((qid, str(ident).lower()), (tid, usar_linha, linha))  # como o .first() do iexact
+        self.total = 0
+        self.primeiro = self.ultimo = None  # números gravados (para a auditoria)
+
+    def processar(self, df):
+        """Grava um lote. Retorna {"importados", "erros"} do lote."""
+        from . import busca
+
+        gravados, erros = _gravar_sepultados(df, self.cemiterio, self.quadras, self.tumulos)
+        if gravados:
+            self.total += len(gravados)
+            self.primeiro = self.primeiro or gravados[0].numero_sepultamento
+            self.ultimo = gravados[-1].numero_sepultamento
+            for lote in _em_lotes(gravados):
+                busca.indexar_linhas([
+                    (sep.pk, self.cemiterio.pk, self.cemiterio.prefeitura_id, sep.nome, sep.nome_pai,
+                     sep.nome_mae, sep.nome_conjuge, sep.cpf_sepultado)
+                    for sep in lote
+                ])
+        return {"importados": len(gravados), "erros": erros.listar(self.linha_de)}
+
+    def finalizar(self):
+        from sepultados_gestao.models import Cemiterio, Sepultado
+        from sepultados_gestao.session_context.thread_local import get_prefeitura_ativa
+
+        if not self.total:
+            return
+        recalcular_estatisticas(Cemiterio.objects.filter(pk=self.cemiterio.pk))
+        tocar_cemiterios(self.cemiterio.pk)
+
+        usuario = self.usuario
+        if usuario is not None and usuario.is_authenticated and not deve_ignorar(Sepultado):
+            registrar(
+                usuario=usuario,
+                acao="add",
+                modelo="Sepultado",
+                representacao=(
+                    f"Importação em lote: {self.total} sepultado(s) em {self.cemiterio} "
+                    f"(nº {self.primeiro} a {self.ultimo})"
+                ),
+                prefeitura=get_prefeitura_ativa() or self.cemiterio.prefeitura,
+            )
+
+
+# ----------------- quadras -----------------
+# colunas de polígono aceitas, em ordem de preferência (vale a primeira preenchida)
+COLUNAS_POLIGONO = ("poligono_mapa", "limites", "polygon", "wkt", "latlng", "lat_lng")
+_NUM = re.compile(_NUM_RE)
+
+
+def _pares(s):
+    """Todos os números agrupados de 2 em 2 (lat,lng), com qualquer separador entre eles."""
+    nums = _NUM.findall(s)
+    return [{"lat": float(nums[i]), "lng": float(nums[i + 1])} for i in range(0, len(nums) - 1, 2)]
+
+
+def _wkt(s):
+    """POLYGON((lng lat, lng lat, ...)) — o WKT é LON,LAT."""
+    if s.upper().startswith("POLYGON"):
+        s = s[s.find("((") + 2 : s.rfind("))")]
+    pontos = []
+    for par in s.split(","):
+        nums = _NUM.findall(par)
+        if len(nums) >= 2:
+            pontos.append({"lat": float(nums[1]), "lng": float(nums[0])})
+    return pontos
+
+
+def poligono(celula):
+    """list[{'lat','lng'}] de uma célula: JSON, WKT ou texto com pares "lat,lng lat,lng"; [] se vazia."""
+    if isinstance(celula, list):
+        if celula and isinstance(celula[0], dict) and "lat" in celula[0] and "lng" in celula[0]:
+            return [{"lat": float(p["lat"]), "lng": float(p["lng"])} for p in celula]
+        if celula and isinstance(celula[0], (list, tuple)) and len(celula[0]) >= 2:
+            return [{"lat": float(p[0]), "lng": float(p[1])} for p in celula]
+    s = str(celula or "").strip()
+    if not s:
+        return []
+    if s[0] in "[{":
+        try:
+            return poligono(json.loads(s))
+        except (ValueError, TypeError, KeyError, IndexError):
+            pass
+    if s.upper().startswith("POLYGON"):
+        return _wkt(s)
+    return _pares(s)
+
+
+def _preparar_quadras(df):
+    """
+    Converte/valida a planilha inteira. Retorna (registros, erros), em que
+    registros é [(índice, codigo, defaults)] das linhas válidas, na ordem;
+    defaults só tem poligono_mapa/grid_params preenchidos na linha. Linhas
+    sem código são puladas (não são erro).
+    """
+    from sepultados_gestao.models import Quadra
+
+    vazia = pd.Series("", index=df.index, dtype=object)
+
+    def coluna(nome):
+        return texto(df[nome]) if nome in df.columns else vazia
+
+    erros = Erros(df.index)
+    codigo = coluna("codigo")
+    tem_codigo = codigo.ne("")
+
+    # primeira coluna de polígono preenchida na linha
+    pol = vazia
+    for nome in reversed(COLUNAS_POLIGONO):
+        if nome in df.columns:
+            txt = texto(df[nome])
+            pol = txt.where(txt.ne(""), pol)
+
+    cols, _ = numero(coluna("grid_cols"))  # inválido é ignorado, como sempre foi
+    rows, _ = numero(coluna("grid_rows"))
+    # 'angulo' tem prioridade sobre 'grid_angulo'; normalizado para 0..360
+    angulo_txt = coluna("angulo")
+    angulo_txt = angulo_txt.where(angulo_txt.ne(""), coluna("grid_angulo"))
+    angulo, angulo_invalido = numero(angulo_txt)
+    erros.marcar(tem_codigo & angulo_invalido, lambda i: f"número inválido: {angulo_txt[i]!r}")
+    angulo = angulo % 360.0
+
+    limite = Quadra._meta.get_field("codigo").max_length
+    erros.marcar(tem_codigo & (codigo.str.len() > limite),
+                 lambda i: str(ValidationError({"codigo": _validar_campo(Quadra, "codigo", codigo[i])})))
+
+    indices = codigo[tem_codigo & erros.ok].index
+    poligonos = pol[indices][pol[indices].ne("")].map(poligono)
+    valores = {nome: col[indices].tolist() for nome, col in
+               {"codigo": codigo, "cols": cols, "rows": rows, "angulo": angulo}.items()}
+    registros = []
+    for n, i in enumerate(indices):
+        grid = {}
+        if pd.notna(valores["cols"][n]):
+            grid["cols"] = int(valores["cols"][n])
+        if pd.notna(valores["rows"][n]):
+            grid["rows"] = int(valores["rows"][n])
+        if pd.notna(valores["angulo"][n]):
+            grid["angulo"] = float(valores["angulo"][n])
+        defaults = {}
+        if poligonos.get(i):
+            defaults["poligono_mapa"] = poligonos[i]
+        if grid:
+            defaults["grid_params"] = grid
+        registros.append((i, valores["codigo"][n], defaults))
+    return registros, erros
+
+
+def _quadras_repetidas(cemiterio_id):
+    """Códigos com mais de uma quadra no cemitério (o update_or_create não sabe qual atualizar)."""
+    from django.db.models import Count
+    from sepultados_gestao.models import Quadra
+
+    return set(
+        Quadra.objects.filter(cemiterio_id=cemiterio_id).values("codigo").annotate(n=Count("pk"))
+        .filter(n__gt=1).values_list("codigo", flat=True)
+    )
+
+
+def _quadra_repetida(codigo):
+    return f"mais de uma quadra com o código '{codigo}' neste cemitério"
+
+
+class ImportadorQuadras:
+    """
+    Cria/atualiza quadras (chave: codigo exato no cemitério). A planilha é
+    convertida por coluna (_preparar_quadras); a gravação continua um
+    update_or_create por quadra — são poucas, e assim passam pelos sinais de
+    auditoria e versão como no cadastro manual.
+    """
+    colunas = ()
+    contadores = ("importados", "atualizados")
+
+    def __init__(self, cemiterio, usuario=None, linha_de=lambda i: i + 2):
+        self.cemiterio, self.linha_de = cemiterio, linha_de
+        self.repetidas = _quadras_repetidas(cemiterio.pk)
+
+    def processar(self, df):
+        from sepultados_gestao.models import Quadra
+
+        registros, erros = _preparar_quadras(df)
+        importados = atualizados = 0
+        for i, codigo, defaults in registros:
+            if codigo in self.repetidas:
+                erros.marcar_linha(i, _quadra_repetida(codigo))
+                continue
+            try:
+                with transaction.atomic():
+                    _, criada = Quadra.objects.update_or_create(
+                        cemiterio_id=self.cemiterio.pk, codigo=codigo, defaults=defaults,
+                    )
+            except (DatabaseError, ValidationError) as e:
+                erros.marcar_linha(i, str(e))
+                continue
+            importados += 1
+            if not criada and defaults:
+                atualizados += 1
+        return {"importados": importados, "atualizados": atualizados, "erros": erros.listar(self.linha_de)}
+
+    def finalizar(self):
+        pass
+
+
+def importar_quadras(planilha, cemiterio, usuario=None, linha_de=lambda i: i + 2):
+    """
+    Importação de quadras (ImportadorQuadras). `planilha`: DataFrame ou lotes
+    de ler_planilha(). Retorna {"importados", "atualizados", "erros"}.
+    """
+    return _importar(ImportadorQuadras(cemiterio, usuario, linha_de), planilha)
+
+
+def importar_sepultados(planilha, cemiterio, usuario=None, linha_de=lambda i: i + 2):
+    """
+    Importação em lote de sepultados (ImportadorSepultados). `planilha`:
+    DataFrame ou lotes de ler_planilha(). Retorna {"importados", "erros"}.
+    """
+    return _importar(ImportadorSepultados(cemiterio, usuario, linha_de), planilha)
+
+
+def _gravar_sepultados(df, cemiterio, quadras, tumulos):
+    """Um lote da planilha: valida, grava e ocupa as vagas. Retorna (sepultados gravados, erros)."""
+    from django.db.models import F
+
+    from sepultados_gestao.models import Sepultado, Tumulo
+    from sepultados_gestao.utils import reservar_numeros_sequenciais
+
+    registros, erros = _preparar_sepultados(df, quadras, tumulos)
+    numeros = reservar_numeros_sequenciais(cemiterio.prefeitura, len(registros))
+
+    sepultados = []
+    for (i, tumulo_id, campos), numero_sep in zip(registros, numeros):
+        sep = Sepultado(tumulo_id=tumulo_id, numero_sepultamento=numero_sep, importado=True, **campos)
+        sep.idade_ao_falecer = sep.calcular_idade()
+        sepultados.append((i, sep))
+
+    gravados = []
+    for lote in _em_lotes(sepultados):
+        try:
+            with transaction.atomic():
+                Sepultado.objects.bulk_create([sep for _, sep in lote])
+            gravados.extend(sep for _, sep in lote)
+        except DatabaseError:
+            for i, sep in lote:
+                sep.pk = None
+                try:
+                    with transaction.atomic():
+                        Sepultado.objects.bulk_create([sep])
+                    gravados.append(sep)
+                except DatabaseError as e:
+                    erros.marcar_linha(i, str(e))
+
+    # nem todo banco devolve o id no bulk_create (MySQL): aí relê pelo número
+    sem_id = [sep for sep in gravados if sep.pk is None]
+    for lote in _em_lotes(sem_id):
+        ids = dict(
+            Sepultado.objects.filter(numero_sepultamento__in=[sep.numero_sepultamento for sep in lote],
+                                     importado=True, tumulo__cemiterio_id=cemiterio.pk)
+            .values_list("numero_sepultamento", "id")
+        )
+        for sep in lote:
+            sep.pk = ids.get(sep.numero_sepultamento)
+
+    # vagas: os túmulos agrupados pela quantidade de novos ocupantes
+    novos_por_tumulo = {}
+    for sep in gravados:
+        novos_por_tumulo[sep.tumulo_id] = novos_por_tumulo.get(sep.tumulo_id, 0) + 1
+    por_quantidade = {}
+    for tumulo_id, n in novos_por_tumulo.items():
+        por_quantidade.setdefault(n, []).append(tumulo_id)
+    with transaction.atomic():
+        for n, tumulo_ids in por_quantidade.items():
+            for lote in _em_lotes(tumulo_ids):
+                # status antes do contador (MySQL avalia o SET da esquerda p/ direita)
+                Tumulo.objects.filter(pk__in=lote).update(
+                    status=status_ocupacao_expr(n),
+                    ocupantes_ativos=F("ocupantes_ativos") + n,
+                )
+
+    return gravados, erros
+
+
+# ----------------- importação em segundo plano -----------------
+IMPORTADORES = {
+    "quadras": ImportadorQuadras,
+    "tumulos": ImportadorTumulos,
+    "sepultados": ImportadorSepultados,
+}
+
+
+def contar_linhas(arquivo):
+    """Linhas de dados da planilha (para progresso/ETA); None se não der para saber barato."""
+    nome = arquivo.name.lower()
+    try:
+        if nome.endswith(".csv"):
+            arquivo.seek(0)
+            total = sum(1 for _ in arquivo) - 1  # aproximado se houver quebra de linha dentro de célula
+            return max(total, 0)
+        if nome.endswith(".xlsx"):
+            from openpyxl import load_workbook
+
+            arquivo.seek(0)
+            wb = load_workbook(arquivo, read_only=True)
+            try:
+                return max((wb.worksheets[0].max_row or 1) - 1, 0)
+            finally:
+                wb.close()
+    except Exception:
+        return None
+    finally:
+        try:
+            arquivo.seek(0)
+        except Exception:
+            pass
+    return None
+
+
+class ExecucaoSubstituida(Exception):
+    """Outro worker retomou o job: o lote em andamento é desfeito e esta execução para."""
+
+
+def executar_importacao(job, tamanho=LOTE):
+    """
+    Processa uma ImportacaoPlanilha pendente (ou retomada). Cada lote é gravado
+    numa transação junto com o ponto de retomada (`linhas_processadas`) e os
+    contadores do job: se o processo cair, o que foi confirmado fica e a
+    próxima execução começa na linha seguinte. Retorna o job atualizado.
+    Só executa se o job estiver pendente e conseguir marcá-lo como
+    "processando" (um worker por job; para retomar, ver retomar_importacao).
+
+    O job é assumido com um token novo (`execucao`) e cada lote só confirma
+    se o token ainda é o mesmo: um lote mais longo que TEMPO_SEM_AVANCO deixa
+    o job retomável, mas se outro worker o retomar, o lote antigo é desfeito
+    (linhas e ponto de retomada juntos) em vez de duplicar as linhas.
+    """
+    from django.utils import timezone
+
+    from sepultados_gestao.models import ImportacaoPlanilha
+    from .auditoria import lote_auditoria
+
+    agora = timezone.now()
+    execucao = uuid.uuid4()
+    assumiu = ImportacaoPlanilha.objects.filter(pk=job.pk, status="pendente").update(status="processando", iniciado_em=agora, atualizado_em=agora,
+             linhas_no_inicio=job.linhas_processadas, tentativas=job.tentativas + 1, mensagem="", execucao=execucao)
+    job.refresh_from_db()
+    if not assumiu:
+        return job
+    do_worker = ImportacaoPlanilha.objects.filter(pk=job.pk, execucao=execucao)
+
+    def gravar(*campos):
+        if not do_worker.update(**{campo: getattr(job, campo) for campo in campos}):
+            raise ExecucaoSubstituida()
+
+    cemiterio = job.cemiterio
+    importador = IMPORTADORES[job.tipo](cemiterio, job.usuario)
+    try:
+        if job.total_linhas is None:
+            with job.arquivo.open("rb") as f:
+                job.total_linhas = contar_linhas(f)
+            gravar("total_linhas")
+
+        with job.arquivo.open("rb") as arquivo:
+            lotes = ler_planilha(arquivo, tamanho, minusculas=job.tipo != "sepultados",
+                                 inicio=job.linhas_processadas)
+            for df in lotes:
+                if not len(df):
+                    continue
+                with transaction.atomic(), lote_auditoria():
+                    parcial = importador.processar(df)
+                    erros = parcial.pop("erros")
+                    job.importados += parcial.get("importados", 0)
+                    job.atualizados += parcial.get("atualizados", 0)
+                    job.total_erros += len(erros)
+                    job.erros = (job.erros + erros)[:ImportacaoPlanilha.LIMITE_ERROS]
+                    job.linhas_processadas = int(df.index[-1]) + 1
+                    job.atualizado_em = timezone.now()
+                    gravar("importados", "atualizados", "total_erros", "erros",
+                           "linhas_processadas", "atualizado_em")
+    except ExecucaoSubstituida:
+        job.refresh_from_db()
+        return job
+    except Exception as e:
+        job.status, job.mensagem = "falhou", str(e)[:2000] or e.__class__.__name__
+    else:
+        job.status, job.concluido_em = "concluida", timezone.now()
+        if job.total_linhas is None or job.total_linhas < job.linhas_processadas:
+            job.total_linhas = job.linhas_processadas
+    finally:
+        importador.finalizar()
+    job.atualizado_em = timezone.now()
+    try:
+        gravar("status", "mensagem", "concluido_em", "total_linhas", "atualizado_em")
+    except ExecucaoSubstituida:
+        job.refresh_from_db()
+    return job
+
+
+def retomar_importacao(job):
+    """Volta um job que falhou (ou parou de avançar) para a fila, a partir do ponto de retomada."""
+    from sepultados_gestao.models import ImportacaoPlanilha
+
+    if not job.pode_retomar:
+        return False
+    ImportacaoPlanilha.objects.filter(pk=job.pk, status=job.status).update(status="pendente")
+    job.refresh_from_db()
+    return job.status == "pendente"
+
+
+# ----------------- simulação (dry run) -----------------
+class _Simulacao:
+    """
+    Base das simulações: o que a importação faria com a planilha, sem gravar.
+    Carrega uma vez as chaves existentes do cemitério; cada linha válida é
+    comparada com esse retrato (atualizado em memória com as linhas anteriores
+    da própria planilha, como a importação faria).
+    """
+    contadores = ("criados", "atualizados", "inalterados", "rejeitados")
+
+    def __init__(self, cemiterio, linha_de=lambda i: i + 2):
+        self.cemiterio, self.linha_de = cemiterio, linha_de
+        self.resultado = dict.fromkeys(self.contadores, 0)
+        self.erros = []
+
+    def _rejeitar(self, erros):
+        mensagens = erros.listar(self.linha_de)
+        self.resultado["rejeitados"] += len(mensagens)
+        self.erros += mensagens
+
+    def _comparar(self, previsto, chave, campos, padroes):
+        """Conta a linha como criada/atualizada/inalterada e atualiza o retrato."""
+        atual = previsto.get(chave)
+        if atual is None:
+            self.resultado["criados"] += 1
+            previsto[chave] = {**padroes, **campos}
+            return
+        novo = {**atual, **campos}
+        self.resultado["atualizados" if novo != atual else "inalterados"] += 1
+        previsto[chave] = novo
+
+
+class SimulacaoQuadras(_Simulacao):
+    """Chave: codigo (exato, como o update_or_create da importação)."""
+
+    def __init__(self, cemiterio, linha_de=lambda i: i + 2):
+        from sepultados_gestao.models import Quadra
+
+        super().__init__(cemiterio, linha_de)
+        self.repetidas = _quadras_repetidas(cemiterio.pk)
+        self.previsto = {
+            codigo: {"poligono_mapa": poligono_mapa, "grid_params": grid}
+            for codigo, poligono_mapa, grid in (
+                Quadra.objects.filter(cemiterio_id=cemiterio.pk).values_list("codigo", "poligono_mapa", "grid_params")
+            )
+        }
+
+    def processar(self, df):
+        registros, erros = _preparar_quadras(df)
+        for i, codigo, defaults in registros:
+            if codigo in self.repetidas:
+                erros.marcar_linha(i, _quadra_repetida(codigo))
+                continue
+            self._comparar(self.previsto, codigo, defaults, {"poligono_mapa": None, "grid_params": None})
+        self._rejeitar(erros)
+
+
+class SimulacaoTumulos(_Simulacao):
+    """Chave: identificador no cemitério (a mesma da importação); mesmas validações de _preparar_tumulos."""
+
+    def __init__(self, cemiterio, linha_de=lambda i: i + 2):
+        from sepultados_gestao.models import Quadra, Tumulo
+
+        super().__init__(cemiterio, linha_de)
+        self.quadras = {}
+        for qid, codigo in Quadra.objects.filter(cemiterio_id=cemiterio.pk).order_by("id").values_list("id", "codigo"):
+            self.quadras.setdefault(str(codigo).strip().lower(), qid)
+        self.previsto, self.repetidos = {}, set()
+        for ident, *valores in (
+            Tumulo.objects.filter(cemiterio_id=cemiterio.pk).values_list("identificador", *CAMPOS_TUMULO)
+        ):
+            if ident in self.previsto:
+                self.repetidos.add(ident)
+            self.previsto[ident] = dict(zip(CAMPOS_TUMULO, valores))
+        self.padroes = {campo: Tumulo._meta.get_field(campo).get_default() for campo in CAMPOS_TUMULO}
+
+    def processar(self, df):
+        registros, erros = _preparar_tumulos(df, self.quadras)
+        for i, ident, campos in registros:
+            if ident in self.repetidos:
+                erros.marcar_linha(i, f"mais de um túmulo com o identificador '{ident}' neste cemitério")
+                continue
+            self._comparar(self.previsto, ident, campos, self.padroes)
+        self._rejeitar(erros)
+
+
+class SimulacaoSepultados(_Simulacao):
+    """
+    Mesmas validações da importação em lote (_preparar_sepultados). A
+    importação só cria sepultados (não atualiza nem deduplica): toda linha
+    válida conta como criada; `duplicados` diz quantas delas batem com um
+    sepultado já existente (ou com uma linha anterior da planilha) pela
+    chave nome + datas de falecimento/sepultamento + túmulo. `ignorados`:
+    linhas sem quadra ou sem identificador do túmulo (a importação pula).
+    """
+    contadores = _Simulacao.contadores + ("duplicados", "ignorados")
+
+    def __init__(self, cemiterio, linha_de=lambda i: i + 2):
+        from sepultados_gestao.models import Quadra, Sepultado, Tumulo
+        from .busca import normalizar
+
+        super().__init__(cemiterio, linha_de)
+        self.normalizar = normalizar
+        self.quadras = {}
+        for qid, codigo in Quadra.objects.filter(cemiterio_id=cemiterio.pk).order_by("id").values_list("id", "codigo"):
+            self.quadras.setdefault(str(codigo).strip().lower(), qid)
+        self.tumulos = {}
+        for tid, qid, ident, usar_linha, linha in (
+            Tumulo.objects.filter(cemiterio_id=cemiterio.pk).order_by("id")
+            .values_list("id", "quadra_id", "identificador", "usar_linha", "linha")
+        ):
+            self.tumulos.setdefault((qid, str(ident).lower()), (tid, usar_linha, linha))
+        self.chaves = {
+            (normalizar(nome), falecimento, sepultamento, tumulo_id)
+            for nome, falecimento, sepultamento, tumulo_id in (
+                Sepultado.objects.filter(tumulo__cemiterio_id=cemiterio.pk)
+                .values_list("nome", "data_falecimento", "data_sepultamento", "tumulo_id").iterator(chunk_size=5000)
+            )
+        }
+
+    def processar(self, df):
+        registros, erros = _preparar_sepultados(df, self.quadras, self.tumulos)
+        self.resultado["ignorados"] += len(df) - len(registros) - int((~erros.ok).sum())
+        for _, tumulo_id, campos in registros:
+            chave = (self.normalizar(campos["nome"]), campos["data_falecimento"],
+                     campos["data_sepultamento"], tumulo_id)
+            self.resultado["criados"] += 1
+            if chave in self.chaves:
+                self.resultado["duplicados"] += 1
+            else:
+                self.chaves.add(chave)
+        self._rejeitar(erros)
+
+
+SIMULACOES = {
+    "quadras": SimulacaoQuadras,
+    "tumulos": SimulacaoTumulos,
+    "sepultados": SimulacaoSepultados,
+}
+
+
+def simular_importacao(tipo, planilha, cemiterio, linha_de=lambda i: i + 2):
+    """
+    Dry run: quantas linhas a importação `tipo` criaria, atualizaria, deixaria
+    como estão ou rejeitaria (com os erros por linha). Não grava nada.
+    `planilha`: DataFrame ou lotes de ler_planilha().
+    """
+    simulacao = SIMULACOES[tipo](cemiterio, linha_de)
+    leitura = []
+    for df in iterar_lotes(planilha, leitura):
+        simulacao.processar(df)
+    return {**simulacao.resultado, "erros": simulacao.erros + leitura, "simulacao": True}
@@ -0,0 +1,176 @@
+"""
+Mídia guardada pelo conteúdo (Anexo.arquivo e Prefeitura.brasao).
+
+ArmazenamentoConteudo grava cada arquivo como conteudo/<ab>/<sha256><ext>:
+o mesmo conteúdo enviado de novo (outro anexo, o mesmo brasão outra vez)
+reaproveita o arquivo que já existe em vez de virar "brasao1_n1iIiQB.jpg".
+ArquivoConteudo conta quantos registros apontam para cada arquivo; os
+sinais (signals.py) sobem/descem a conta e o arquivo é apagado quando ela
+chega a zero. Arquivos antigos (fora de conteudo/) não entram na conta —
+`manage.py deduplicar_midia` os converte e recalcula as contas.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+PASTA = "conteudo"
+TAMANHO_EXTENSAO = 10
+# (modelo, campo) com arquivos guardados pelo conteúdo
+CAMPOS = (
+    ("sepultados_gestao.Anexo", "arquivo"),
+    ("sepultados_gestao.Prefeitura", "brasao"),
+)
+
+
+def sha256_do_arquivo(conteudo):
+    sha = hashlib.sha256()
+    for pedaco in conteudo.chunks():
+        sha.update(pedaco)
+    return sha.hexdigest()
+
+
+def nome_por_conteudo(sha, nome_original):
+    extensao = os.path.splitext(nome_original)[1].lower()[:TAMANHO_EXTENSAO]
+    return f"{PASTA}/{sha[:2]}/{sha}{extensao}"
+
+
+def e_conteudo(nome):
+    return bool(nome) and nome.startswith(PASTA + "/")
+
+
+@deconstructible
+class ArmazenamentoConteudo(FileSystemStorage):
+    """FileSystemStorage que nomeia o arquivo pelo sha256 e não grava o mesmo conteúdo duas vezes."""
+
+    def _save(self, name, content):
+        nome = nome_por_conteudo(sha256_do_arquivo(content), name)
+        if self.exists(nome):
+            if self.size(nome) == content.size:
+                return nome
+            self.delete(nome)  # sobra de uma gravação interrompida
+        salvo = super()._save(nome, content)
+        if salvo != nome:
+            # outro envio gravou o mesmo conteúdo ao mesmo tempo: fica o dele
+            self.delete(salvo)
+        return nome
+
+
+# ----------------- contagem de referências -----------------
+def referenciar(nome):
+    """Mais um registro aponta para `nome` (um UPDATE com F; cria a linha na primeira vez)."""
+    from sepultados_gestao.models import ArquivoConteudo
+
+    if not e_conteudo(nome):
+        return
+    linha = ArquivoConteudo.objects.filter(nome=nome)
+    if linha.update(referencias=F("referencias") + 1):
+        return
+    try:
+        with transaction.atomic():
+            ArquivoConteudo.objects.create(nome=nome, referencias=1)
+    except IntegrityError:
+        linha.update(referencias=F("referencias") + 1)
+
+
+def liberar(nome, storage):
+    """Um registro deixou de apontar para `nome`; sem nenhum, o arquivo é apagado após o commit."""
+    from sepultados_gestao.models import ArquivoConteudo
+
+    if not e_conteudo(nome):
+        return
+    ArquivoConteudo.objects.filter(nome=nome, referencias__gt=0).update(referencias=F("referencias") - 1)
+    transaction.on_commit(lambda: _apagar_se_orfao(nome, storage))
+
+
+def _apagar_se_orfao(nome, storage):
+    from sepultados_gestao.models import ArquivoConteudo
+
+    apagados, _ = ArquivoConteudo.objects.filter(nome=nome, referencias=0).delete()
+    if apagados:
+        storage.delete(nome)
+
+
+def _campos():
+    from django.apps import apps
+
+    for label, campo in CAMPOS:
+        model = apps.get_model(label)
+        yield model, model._meta.get_field(campo)
+
+
+def recontar():
+    """
+    Refaz as contas a partir dos registros (depois de bulk_create,
+    queryset.update(), restauração...). Arquivos sem nenhuma referência
+    são apagados. Retorna (arquivos referenciados, arquivos apagados).
+    """
+    from collections import Counter
+
+    from sepultados_gestao.models import ArquivoConteudo
+
+    contas, storage = Counter(), None
+    for model, field in _campos():
+        storage = field.storage
+        nomes = (
+            model._base_manager.filter(**{f"{field.name}__startswith": PASTA + "/"})
+            .values_list(field.name, flat=True).iterator(chunk_size=5000)
+        )
+        contas.update(nomes)
+
+    with transaction.atomic():
+        existentes = dict(ArquivoConteudo.objects.values_list("nome", "referencias"))
+        for nome, n in contas.items():
+            if nome not in existentes:
+                ArquivoConteudo.objects.create(nome=nome, referencias=n)
+            elif existentes[nome] != n:
+                ArquivoConteudo.objects.filter(nome=nome).update(referencias=n)
+        orfaos = [nome for nome in existentes if nome not in contas]
+        ArquivoConteudo.objects.filter(nome__in=orfaos).delete()
+
+    apagados = 0
+    if storage is not None:
+        for nome in orfaos:
+            if storage.exists(nome):
+                storage.delete(nome)
+                apagados += 1
+    return len(contas), apagados
+
+
+def deduplicar(apagar_antigos=True):
+    """
+    Passa os arquivos antigos (fora de conteudo/) para o armazenamento por
+    conteúdo: cópias iguais viram um arquivo só. Com `apagar_antigos`, os
+    originais saem do disco. Retorna {"convertidos", "faltando", "bytes_antes",
+    "bytes_depois"} (bytes dos arquivos antigos e dos que ficaram no lugar deles).
+    """
+    resultado = {"convertidos": 0, "faltando": 0, "bytes_antes": 0, "bytes_depois": 0}
+    antigos, novos = {}, {}  # nome -> storage
+    for model, field in _campos():
+        storage = field.storage
+        registros = (
+            model._base_manager.exclude(**{field.name: ""}).exclude(**{f"{field.name}__isnull": True})
+            .exclude(**{f"{field.name}__startswith": PASTA + "/"})
+            .values_list("pk", field.name).iterator(chunk_size=2000)
+        )
+        for pk, nome in registros:
+            if not storage.exists(nome):
+                resultado["faltando"] += 1
+                continue
+            with storage.open(nome, "rb") as arquivo:
+                novo = storage.save(nome, arquivo)
+            model._base_manager.filter(pk=pk).update(**{field.name: novo})
+            antigos[nome], novos[novo] = storage, storage
+            resultado["convertidos"] += 1
+
+    recontar()
+    resultado["bytes_antes"] = sum(storage.size(nome) for nome, storage in antigos.items())
+    resultado["bytes_depois"] = sum(storage.size(nome) for nome, storage in novos.items())
+    if apagar_antigos:
+        for nome, storage in antigos.items():
+            storage.delete(nome)
+    return resultado
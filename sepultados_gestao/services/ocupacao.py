@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .estatisticas import registrar_ocupacao, registrar_sepultado
+from .versoes import tocar_cemiterios
+
+
+# Sepultado que ainda ocupa vaga no túmulo
+ATIVO_Q = Q(exumado=False, trasladado=False)
+
+
+def sepultado_ativo(sepultado) -> bool:
+    return bool(sepultado.tumulo_id) and not sepultado.exumado and not sepultado.trasladado
+
+
+def status_ocupacao_expr(delta: int = 0):
+    """
+    Expressão SQL do status do túmulo a partir das colunas do próprio túmulo
+    (reservado, capacidade, ocupantes_ativos). Com `delta`, considera o contador
+    já ajustado em `delta` (útil no mesmo UPDATE que altera o contador).
+    """
+    return Case(
+        When(reservado=True, then=Value("reservado")),
+        When(ocupantes_ativos__gte=F("capacidade") - delta, then=Value("ocupado")),
+        default=Value("disponivel"),
+    )
+
+
+def ajustar_ocupacao(tumulo_id, delta: int):
+    """
+    Soma `delta` ao contador de ocupantes do túmulo e recalcula o status
+    no mesmo UPDATE (F-expression, sem COUNT). Deve rodar na transação da escrita.
+    """
+    from sepultados_gestao.models import Tumulo
+
+    if not tumulo_id or not delta:
+        return
+    # status vem antes do contador: no MySQL o SET é avaliado da esquerda p/ direita
+    Tumulo.objects.filter(pk=tumulo_id).update(
+        status=status_ocupacao_expr(delta),
+        ocupantes_ativos=Greatest(F("ocupantes_ativos") + delta, Value(0)),
+    )
+    # a linha do túmulo já está travada pelo UPDATE: o painel lê o valor final
+    cemiterio_id = registrar_ocupacao(tumulo_id, delta)
+    # status do túmulo pode ter mudado: invalida mapa/listagens do cemitério
+    tocar_cemiterios(cemiterio_id)
+
+
+def atualizar_ocupacao_sepultado(estado_anterior, estado_atual):
+    """
+    Recebe (tumulo_id, ativo) antes/depois da escrita e move a vaga se preciso.
+    """
+    tumulo_antes, ativo_antes = estado_anterior or (None, False)
+    tumulo_depois, ativo_depois = estado_atual or (None, False)
+    registrar_sepultado(tumulo_antes, tumulo_depois)
+    if (tumulo_antes, ativo_antes) == (tumulo_depois, ativo_depois):
+        return
+    if ativo_antes:
+        ajustar_ocupacao(tumulo_antes, -1)
+    if ativo_depois:
+        ajustar_ocupacao(tumulo_depois, +1)
+
+
+def recalcular_ocupacao(queryset=None, chunk_size: int = 2000):
+    """
+    Reconstrói `ocupantes_ativos` e `status` a partir dos sepultados, em lotes
+    de túmulos por faixa de id. Retorna (túmulos lidos, túmulos corrigidos).
+    """
+    from sepultados_gestao.models import Sepultado, Tumulo
+
+    if queryset is None:
+        queryset = Tumulo.objects.all()
+
+    lidos = corrigidos = 0
+    ultimo_id = 0
+    while True:
+        lote = list(
+            queryset.filter(pk__gt=ultimo_id)
+            .order_by("pk")
+            .only("pk", "capacidade", "reservado", "status", "ocupantes_ativos")[:chunk_size]
+        )
+        if not lote:
+            break
+        ultimo_id = lote[-1].pk
+        lidos += len(lote)
+
+        contagem = dict(
+            Sepultado.objects.filter(ATIVO_Q, tumulo_id__in=[t.pk for t in lote])
+            .values("tumulo_id")
+            .annotate(n=Count("id"))
+            .values_list("tumulo_id", "n")
+        )
+
+        alterados = []
+        for t in lote:
+            ocupantes = contagem.get(t.pk, 0)
+            if t.reservado:
+                status = "reservado"
+            elif ocupantes >= t.capacidade:
+                status = "ocupado"
+            else:
+                status = "disponivel"
+            if t.ocupantes_ativos != ocupantes or t.status != status:
+                t.ocupantes_ativos = ocupantes
+                t.status = status
+                alterados.append(t)
+
+        if alterados:
+            with transaction.atomic():
+                Tumulo.objects.bulk_update(alterados, ["ocupantes_ativos", "status"])
+            corrigidos += len(alterados)
+
+    return lidos, corrigidos
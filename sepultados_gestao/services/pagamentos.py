@@ -0,0 +1,135 @@
+"""
+Razão de pagamentos das receitas.
+
+Cada pagamento (ou estorno, com valor negativo) é uma linha de Pagamento
+ligada à receita; Receita.valor_pago/valor_em_aberto guardam o saldo
+corrente, então um pagamento parcial não gera mais outra receita com o
+restante: a receita fica "parcial" até ser quitada.
+
+Saldos por documento, contrato ou pessoa são uma agregação só, pelos
+índices de Receita (prefeitura+numero_documento, contrato, prefeitura+cpf).
+conciliar_mes() confere o razão de um mês contra os saldos das receitas
+(`manage.py conciliar_pagamentos`).
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+ZERO = Decimal("0.00")
+
+
+def _centavos(valor):
+    # o SQLite devolve as somas sem as casas decimais
+    return Decimal(valor).quantize(Decimal("0.01"))
+
+
+def registrar_pagamento(receita, valor, data=None, usuario=None):
+    """
+    Lança um pagamento de `valor` (negativo = estorno) na receita e atualiza
+    o saldo dela. Retorna o Pagamento criado.
+    """
+    from sepultados_gestao.models import Pagamento, Receita
+
+    valor = Decimal(valor).quantize(Decimal("0.01"))
+    if not valor:
+        raise ValueError("O valor do pagamento não pode ser zero.")
+
+    with transaction.atomic():
+        receita = Receita.objects.select_for_update().get(pk=getattr(receita, "pk", receita))
+        pago = receita.valor_pago + valor
+        if pago < 0:
+            raise ValueError("O estorno é maior que o valor pago da receita.")
+
+        pagamento = Pagamento.objects.create(
+            receita=receita,
+            prefeitura_id=receita.prefeitura_id,
+            valor=valor,
+            data_pagamento=data or date.today(),
+            usuario=usuario if usuario and usuario.is_authenticated else None,
+        )
+        receita.valor_pago = pago
+        receita.data_pagamento = pagamento.data_pagamento
+        receita._pagamento_lancado = True  # o save() não lança a diferença de novo
+        receita.save()
+    return pagamento
+
+
+def _saldo(receitas):
+    saldo = receitas.aggregate(
+        receitas=Count("pk"),
+        valor_total=Coalesce(Sum("valor_total"), ZERO),
+        valor_pago=Coalesce(Sum("valor_pago"), ZERO),
+        valor_em_aberto=Coalesce(Sum("valor_em_aberto"), ZERO),
+    )
+    return {chave: _centavos(v) if chave != "receitas" else v for chave, v in saldo.items()}
+
+
+def saldo_documento(prefeitura_id, numero_documento):
+    from sepultados_gestao.models import Receita
+
+    return _saldo(Receita.objects.filter(prefeitura_id=prefeitura_id, numero_documento=numero_documento))
+
+
+def saldo_contrato(contrato_id):
+    from sepultados_gestao.models import Receita
+
+    return _saldo(Receita.objects.filter(contrato_id=contrato_id))
+
+
+def saldo_pessoa(prefeitura_id, cpf):
+    from sepultados_gestao.models import Receita
+
+    return _saldo(Receita.objects.filter(prefeitura_id=prefeitura_id, cpf=cpf))
+
+
+def conciliar_mes(ano, mes, prefeitura_id=None, corrigir=False):
+    """
+    Confere as receitas com pagamentos lançados no mês: valor_pago de cada
+    uma deve ser a soma de todos os seus lançamentos. Com `corrigir`, as
+    divergentes recebem o valor do razão (e o status/saldo recalculados).
+
+    Retorna {"pagamentos", "valor", "por_dia": {data: valor},
+    "divergentes": [(receita_id, valor_pago, soma_do_razao)]}.
+    """
+    from sepultados_gestao.models import Pagamento, Receita
+
+    inicio = date(ano, mes, 1)
+    fim = date(ano + mes // 12, mes % 12 + 1, 1)
+    do_mes = Pagamento.objects.filter(data_pagamento__gte=inicio, data_pagamento__lt=fim)
+    if prefeitura_id:
+        do_mes = do_mes.filter(prefeitura_id=prefeitura_id)
+
+    por_dia = {
+        dia: _centavos(total)
+        for dia, total in do_mes.order_by().values("data_pagamento").annotate(total=Sum("valor"))
+        .values_list("data_pagamento", "total").order_by("data_pagamento")
+    }
+    resumo = do_mes.aggregate(pagamentos=Count("pk"), valor=Coalesce(Sum("valor"), ZERO))
+    resumo["valor"] = _centavos(resumo["valor"])
+
+    # razão completo (não só o mês) de cada receita com lançamento no mês, numa consulta agrupada
+    receita_ids = do_mes.order_by().values("receita_id").distinct()
+    razao = {
+        pk: _centavos(soma)
+        for pk, soma in Pagamento.objects.filter(receita_id__in=receita_ids).order_by().values("receita_id")
+        .annotate(soma=Sum("valor")).values_list("receita_id", "soma")
+    }
+    divergentes = [
+        (pk, pago, razao[pk])
+        for pk, pago in Receita.objects.filter(pk__in=receita_ids).values_list("pk", "valor_pago").iterator()
+        if pago != razao[pk]
+    ]
+
+    if corrigir:
+        for pk, _pago, soma in divergentes:
+            with transaction.atomic():
+                receita = Receita.objects.select_for_update().get(pk=pk)
+                receita.valor_pago = soma
+                receita._pagamento_lancado = True
+                receita.save()
+
+    return {**resumo, "por_dia": por_dia, "divergentes": divergentes}
@@ -0,0 +1,185 @@
+"""
+Versões de dados por escopo ("prefeitura" / "cemiterio").
+
+Toda escrita em Quadra, Túmulo, Sepultado, Contrato, Exumação, Translado ou
+Receita sobe a versão do cemitério afetado e da prefeitura (sinais em
+signals.py). As leituras derivam dela um ETag forte e respondem 304 sem
+consultar as tabelas principais quando o cliente já tem a versão atual.
+
+Como na auditoria, a subida fica pendente até a transação confirmar: um save
+que passa por vários sinais (sepultado, vaga do túmulo, receita) marca o mesmo
+cemitério/prefeitura várias vezes e grava um UPDATE por escopo no commit.
+Túmulos só viram cemitério/prefeitura nessa hora, numa consulta para todos.
+obter() grava as pendentes antes de ler, para a própria transação ver a versão nova.
+"""
+import hashlib
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+_local = threading.local()
+
+
+def _pendentes():
+    pendentes = getattr(_local, "pendentes", None)
+    if pendentes is None:
+        pendentes = _local.pendentes = {"tumulo": set(), "cemiterio": set(), "prefeitura": set()}
+    return pendentes
+
+
+def _adiar(tipo, ids):
+    ids = {i for i in ids if i}
+    if not ids:
+        return
+    _pendentes()[tipo].update(ids)
+    # fora de transação roda na hora; dentro, no commit (rollback descarta o
+    # callback, e o que sobrar marcado só custa uma subida a mais depois)
+    transaction.on_commit(gravar_pendentes, robust=True)
+
+
+def gravar_pendentes():
+    """Sobe, uma vez cada, as versões marcadas desde a última gravação."""
+    from sepultados_gestao.models import Cemiterio, Tumulo
+
+    pendentes = getattr(_local, "pendentes", None)
+    if not pendentes or not any(pendentes.values()):
+        return
+    _local.pendentes = None
+    cemiterios, prefeituras = set(pendentes["cemiterio"]), set(pendentes["prefeitura"])
+    resolvidos = set()
+    if pendentes["tumulo"]:
+        for cem_id, pref_id in Tumulo.objects.filter(pk__in=pendentes["tumulo"]).values_list(
+            "cemiterio_id", "cemiterio__prefeitura_id"
+        ):
+            resolvidos.add(cem_id)
+            prefeituras.add(pref_id)
+    cemiterios.discard(None)
+    if cemiterios - resolvidos:
+        prefeituras |= set(
+            Cemiterio.objects.filter(pk__in=cemiterios - resolvidos).values_list("prefeitura_id", flat=True)
+        )
+    cemiterios |= resolvidos
+    cemiterios.discard(None)
+    prefeituras.discard(None)
+    with transaction.atomic():
+        for cem_id in sorted(cemiterios):
+            _subir("cemiterio", cem_id)
+        for pref_id in sorted(prefeituras):
+            _subir("prefeitura", pref_id)
+
+
+def tocar(escopo, referencia_id):
+    """Marca a versão do escopo para subir quando a transação confirmar."""
+    _adiar(escopo, [referencia_id])
+
+
+def _subir(escopo, referencia_id):
+    """Sobe a versão do escopo (um UPDATE com F; cria a linha na primeira vez)."""
+    from sepultados_gestao.models import VersaoDados
+
+    agora = timezone.now()
+    linha = VersaoDados.objects.filter(escopo=escopo, referencia_id=referencia_id)
+    if linha.update(versao=F("versao") + 1, alterado_em=agora):
+        return
+    try:
+        with transaction.atomic():
+            VersaoDados.objects.create(escopo=escopo, referencia_id=referencia_id, versao=1, alterado_em=agora)
+    except IntegrityError:
+        linha.update(versao=F("versao") + 1, alterado_em=agora)
+
+
+def tocar_cemiterios(*cemiterio_ids):
+    """Sobe a versão dos cemitérios e das prefeituras deles."""
+    _adiar("cemiterio", cemiterio_ids)
+
+
+def tocar_tumulos(*tumulo_ids):
+    """Sobe a versão dos cemitérios (e prefeituras) dos túmulos."""
+    _adiar("tumulo", tumulo_ids)
+
+
+def obter(escopo, referencia_id):
+    """(versao, alterado_em) do escopo; (0, None) se nunca foi alterado."""
+    from sepultados_gestao.models import VersaoDados
+
+    gravar_pendentes()
+    row = (
+        VersaoDados.objects.filter(escopo=escopo, referencia_id=referencia_id)
+        .values_list("versao", "alterado_em")
+        .first()
+    )
+    return row or (0, None)
+
+
+def em_cache(escopo, referencia_id, chave, gerar, timeout=24 * 60 * 60):
+    """
+    Valor de `gerar()` guardado no cache (settings.CACHES) sob a versão atual
+    do escopo: qualquer escrita sobe a versão e a próxima leitura recalcula;
+    as chaves antigas só expiram.
+    """
+    from django.core.cache import cache
+
+    versao, _ = obter(escopo, referencia_id)
+    chave_cache = f"versao:{escopo}:{referencia_id}:v{versao}:{chave}"
+    valor = cache.get(chave_cache)
+    if valor is None:
+        valor = gerar()
+        cache.set(chave_cache, valor, timeout)
+    return valor
+
+
+def chave_requisicao(request):
+    """
+    Resumo do que, além da versão, muda a resposta: caminho + querystring
+    (filtros, página, cursor) e o formato pedido.
+    """
+    request = getattr(request, "_request", request)
+    base = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:16]
+
+
+def validadores(escopo, referencia_id, prefixo="", chave=""):
+    """ETag e Last-Modified (timestamp) derivados da versão do escopo."""
+    versao, alterado_em = obter(escopo, referencia_id)
+    etag = quote_etag(f"{prefixo}{escopo[:1]}{referencia_id}-v{versao}" + (f"-{chave}" if chave else ""))
+    last_modified = int(alterado_em.timestamp()) if alterado_em else None
+    return etag, last_modified
+
+
+def resposta_condicional(request, etag, last_modified=None):
+    """304 (ou 412) se o cliente já tem essa versão; senão None."""
+    return get_conditional_response(getattr(request, "_request", request), etag=etag, last_modified=last_modified)
+
+
+def aplicar_validadores(response, etag, last_modified=None):
+    from django.utils.http import http_date
+
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # dado por prefeitura/usuário: o navegador revalida sempre, proxies não guardam
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def com_versao(request, escopo, referencia_id, gerar, prefixo=""):
+    """
+    Responde 304 se o cliente já tem a versão atual do escopo; senão chama
+    `gerar()` e marca a resposta com ETag/Last-Modified. Sem escopo, só gera.
+    """
+    if not referencia_id:
+        return gerar()
+    etag, last_modified = validadores(escopo, referencia_id, prefixo=prefixo, chave=chave_requisicao(request))
+    nao_mudou = resposta_condicional(request, etag, last_modified)
+    if nao_mudou is not None:
+        return nao_mudou
+    response = gerar()
+    if 200 <= response.status_code < 300:
+        aplicar_validadores(response, etag, last_modified)
+    return response
@@ -1,21 +1,25 @@
 # signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Sepultado, Tumulo
+from .models import Sepultado
+from .services.estatisticas import registrar_sepultado
+from .services.ocupacao import ajustar_ocupacao, sepultado_ativo
 
-def _touch_tumulo(tumulo_id):
-    if tumulo_id:
-        t = Tumulo.objects.filter(pk=tumulo_id).first()
-        if t:
-            t.atualizar_status()
-
-@receiver(post_save, sender=Sepultado)
-def sepultado_saved(sender, instance, **kwargs):
-    _touch_tumulo(getattr(instance, "tumulo_id", None))
+# O contador/status do túmulo acompanha o Sepultado.save(); aqui cobrimos só a
+# exclusão (inclusive via queryset.delete(), que não passa pelo model.delete()).
+@receiver(pre_delete, sender=Sepultado)
+def sepultado_pre_delete(sender, instance, **kwargs):
+    # já dentro da transação da exclusão: trava a linha e lê a vaga do banco
+    instance._ocupacao_db = instance._ocupacao_anterior()
 
 @receiver(post_delete, sender=Sepultado)
 def sepultado_deleted(sender, instance, **kwargs):
-    _touch_tumulo(getattr(instance, "tumulo_id", None))
+    tumulo_id, ativo = getattr(instance, "_ocupacao_db", None) or (
+        instance.tumulo_id, sepultado_ativo(instance)
+    )
+    if ativo:
+        ajustar_ocupacao(tumulo_id, -1)
+    registrar_sepultado(tumulo_id, None)
 
 # --- imports para os sinais de Exumacao ---
 from .models import Exumacao
@@ -24,13 +28,169 @@ from .services.arquivamento import sync_sepultado_status
 @receiver(post_save, sender=Exumacao)
 def exumacao_saved(sender, instance, **kwargs):
     # mantém o campo exumado/status do sepultado coerente
-    sep = getattr(instance, "sepultado", None)
-    sync_sepultado_status(sep)
-    # atualiza o status do túmulo para refletir na listagem
-    _touch_tumulo(getattr(sep, "tumulo_id", None) if sep else None)
+    # (o save do sepultado já move a vaga do túmulo)
+    sync_sepultado_status(getattr(instance, "sepultado", None))
 
 @receiver(post_delete, sender=Exumacao)
 def exumacao_deleted(sender, instance, **kwargs):
-    sep = getattr(instance, "sepultado", None)
-    sync_sepultado_status(sep)
-    _touch_tumulo(getattr(sep, "tumulo_id", None) if sep else None)
+    sync_sepultado_status(getattr(instance, "sepultado", None))
+
+# --- estatísticas do painel: túmulos e contratos ---
+from django.db.models.signals import pre_save
+from .models import Tumulo, ConcessaoContrato
+from .services.estatisticas import registrar_tumulo, registrar_contrato
+
+def _estado_tumulo(tumulo_id):
+    return Tumulo.objects.filter(pk=tumulo_id).values_list("cemiterio_id", "identificador", "capacidade").first()
+
+@receiver(pre_save, sender=Tumulo)
+def tumulo_pre_save(sender, instance, **kwargs):
+    instance._estatistica_antes = None if instance._state.adding else _estado_tumulo(instance.pk)
+
+@receiver(post_save, sender=Tumulo)
+def tumulo_saved(sender, instance, **kwargs):
+    depois = (instance.cemiterio_id, instance.identificador, instance.capacidade)
+    registrar_tumulo(getattr(instance, "_estatistica_antes", None), depois, tumulo_id=instance.pk)
+
+@receiver(pre_delete, sender=Tumulo)
+def tumulo_pre_delete(sender, instance, **kwargs):
+    # antes da exclusão: os sepultados ainda apontam p/ o túmulo (depois viram SET_NULL)
+    registrar_tumulo(_estado_tumulo(instance.pk), None, tumulo_id=instance.pk)
+
+@receiver(pre_save, sender=ConcessaoContrato)
+def contrato_pre_save(sender, instance, **kwargs):
+    instance._tumulo_antes = None if instance._state.adding else (
+        ConcessaoContrato.objects.filter(pk=instance.pk).values_list("tumulo_id", flat=True).first()
+    )
+
+@receiver(post_save, sender=ConcessaoContrato)
+def contrato_saved(sender, instance, **kwargs):
+    registrar_contrato(getattr(instance, "_tumulo_antes", None), instance.tumulo_id)
+
+@receiver(post_delete, sender=ConcessaoContrato)
+def contrato_deleted(sender, instance, **kwargs):
+    registrar_contrato(instance.tumulo_id, None)
+
+# --- versões por cemitério/prefeitura (ETag das leituras) ---
+from .models import Cemiterio, Quadra, Translado, Receita
+from .services.versoes import tocar, tocar_cemiterios, tocar_tumulos
+
+@receiver(post_save, sender=Tumulo)
+@receiver(post_delete, sender=Tumulo)
+def tumulo_versao(sender, instance, **kwargs):
+    antes = getattr(instance, "_estatistica_antes", None)
+    tocar_cemiterios(instance.cemiterio_id, antes[0] if antes else None)
+
+@receiver(post_save, sender=Cemiterio)
+@receiver(post_delete, sender=Cemiterio)
+def cemiterio_versao(sender, instance, **kwargs):
+    # o resumo da prefeitura soma os cemitérios
+    tocar("cemiterio", instance.pk)
+    tocar("prefeitura", instance.prefeitura_id)
+
+@receiver(post_save, sender=Quadra)
+@receiver(post_delete, sender=Quadra)
+def quadra_versao(sender, instance, **kwargs):
+    tocar_cemiterios(instance.cemiterio_id)
+
+@receiver(post_save, sender=ConcessaoContrato)
+@receiver(post_delete, sender=ConcessaoContrato)
+def contrato_versao(sender, instance, **kwargs):
+    tocar_tumulos(instance.tumulo_id, getattr(instance, "_tumulo_antes", None))
+    tocar("prefeitura", instance.prefeitura_id)
+
+@receiver(post_save, sender=Sepultado)
+@receiver(post_delete, sender=Sepultado)
+def sepultado_versao(sender, instance, **kwargs):
+    # no post_save, _ocupacao_db ainda é o estado anterior (o save o atualiza depois)
+    anterior = getattr(instance, "_ocupacao_db", None)
+    tocar_tumulos(instance.tumulo_id, anterior[0] if anterior else None)
+
+@receiver(post_save, sender=Exumacao)
+@receiver(post_delete, sender=Exumacao)
+def exumacao_versao(sender, instance, **kwargs):
+    tocar_tumulos(instance.tumulo_id)
+    tocar("prefeitura", instance.prefeitura_id)
+
+@receiver(post_save, sender=Translado)
+@receiver(post_delete, sender=Translado)
+def translado_versao(sender, instance, **kwargs):
+    origem = Sepultado.objects.filter(pk=instance.sepultado_id).values_list("tumulo_id", flat=True).first()
+    tocar_tumulos(origem, instance.tumulo_destino_id)
+
+@receiver(post_save, sender=Receita)
+@receiver(post_delete, sender=Receita)
+def receita_versao(sender, instance, **kwargs):
+    tocar("prefeitura", instance.prefeitura_id)
+
+# --- índice de busca por nome (services/busca.py) ---
+from .services import busca
+
+@receiver(post_save, sender=Sepultado)
+def sepultado_indexar(sender, instance, **kwargs):
+    busca.indexar([instance.pk])
+
+@receiver(post_delete, sender=Sepultado)
+def sepultado_desindexar(sender, instance, **kwargs):
+    busca.remover([instance.pk])
+
+@receiver(post_save, sender=Tumulo)
+def tumulo_reindexar_busca(sender, instance, created, **kwargs):
+    # o escopo (cemitério/prefeitura) dos sepultados vem do túmulo
+    antes = getattr(instance, "_estatistica_antes", None)
+    if not created and antes and antes[0] != instance.cemiterio_id:
+        busca.indexar(Sepultado.objects.filter(tumulo_id=instance.pk).values_list("pk", flat=True))
+
+# --- mídia guardada pelo conteúdo: contagem de referências (services/midia.py) ---
+from django.db.models.signals import post_init
+from .models import Anexo, Prefeitura
+from .services import midia
+
+def _nome_arquivo(instance, campo):
+    valor = instance.__dict__.get(campo)  # sem abrir o FieldFile (e nada, se o campo foi adiado)
+    return getattr(valor, "name", valor) or ""
+
+def _campo_midia(sender):
+    return "arquivo" if sender is Anexo else "brasao"
+
+@receiver(post_init, sender=Anexo)
+@receiver(post_init, sender=Prefeitura)
+def midia_inicial(sender, instance, **kwargs):
+    instance._midia_antes = _nome_arquivo(instance, _campo_midia(sender))
+
+@receiver(post_save, sender=Anexo)
+@receiver(post_save, sender=Prefeitura)
+def midia_saved(sender, instance, created, **kwargs):
+    campo = _campo_midia(sender)
+    if campo not in instance.__dict__:
+        return
+    antes = "" if created else getattr(instance, "_midia_antes", "")
+    agora = _nome_arquivo(instance, campo)
+    if agora != antes:
+        midia.referenciar(agora)
+        midia.liberar(antes, sender._meta.get_field(campo).storage)
+        instance._midia_antes = agora
+
+@receiver(post_delete, sender=Anexo)
+@receiver(post_delete, sender=Prefeitura)
+def midia_deleted(sender, instance, **kwargs):
+    campo = _campo_midia(sender)
+    midia.liberar(_nome_arquivo(instance, campo), sender._meta.get_field(campo).storage)
+
+# --- cemitério gravado na receita (Receita.cemiterio) acompanha o túmulo do serviço ---
+from .services.financeiro import sincronizar_cemiterio
+
+@receiver(post_save, sender=ConcessaoContrato)
+@receiver(post_save, sender=Sepultado)
+@receiver(post_save, sender=Exumacao)
+@receiver(post_save, sender=Translado)
+def servico_cemiterio_receitas(sender, instance, created, **kwargs):
+    # recém-criado ainda não tem receitas (geradas depois do save do serviço)
+    if created:
+        return
+    if sender is Sepultado and instance._ocupacao_db[0] == instance.tumulo_id:
+        return  # túmulo não mudou: as receitas continuam no mesmo cemitério
+    campo = {
+        ConcessaoContrato: "contrato", Sepultado: "sepultado", Exumacao: "exumacao", Translado: "translado",
+    }[sender]
+    sincronizar_cemiterio(campo, instance.pk)
@@ -1,3 +1,1478 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from aaa_usuarios.models import Usuario
+
+from .models import Cemiterio, ConcessaoContrato, ImportacaoPlanilha, Pagamento, Prefeitura, Quadra, Receita, Tumulo
+
+
+def criar_prefeitura(nome="Prefeitura Teste", **extra):
+    # recarregada do banco: os defaults de multa/juros no modelo são float
+    prefeitura = Prefeitura.objects.create(
+        nome=nome, cnpj=str(Prefeitura.objects.count() + 1), responsavel="Responsável",
+        logradouro="Rua A", endereco_numero="1", endereco_cidade="Cidade", endereco_estado="PR",
+        endereco_cep="87000-000", **extra,
+    )
+    return Prefeitura.objects.get(pk=prefeitura.pk)
+
+
+class EncargosTests(TestCase):
+    """recalcular_encargos() em lote tem de chegar aos mesmos valores do Receita.save()."""
+
+    def test_lote_igual_ao_save_por_receita(self):
+        from .services.encargos import recalcular_encargos
+
+        hoje = date.today()
+        prefeituras = [
+            criar_prefeitura("P1", multa_percentual=Decimal("2.50")),
+            criar_prefeitura("P2", multa_percentual=Decimal("0.00")),
+            criar_prefeitura("P3", multa_percentual=Decimal("12.75")),
+        ]
+        receitas = []
+        for i, (centavos, dias, desconto) in enumerate([
+            (25, -1, 0), (75, -31, 0), (125, -400, 0), (1, -900, 0), (9999999, -45, 500),
+            (50, 10, 0), (3333, -7, 33), (100000, -61, 0), (12345, 0, 0),
+        ]):
+            receitas.append(Receita(
+                prefeitura=prefeituras[i % len(prefeituras)], numero_documento=f"{i}/2026", descricao="d",
+                valor_total=Decimal(centavos) / 100, desconto=Decimal(desconto) / 100,
+                valor_pago=Decimal("0.00"), valor_em_aberto=Decimal("999.00"), multa=Decimal("1.00"),
+                data_vencimento=hoje + timedelta(days=dias), status="aberto",
+            ))
+        Receita.objects.bulk_create(receitas)
+
+        lidas, alteradas = recalcular_encargos(hoje=hoje)
+        self.assertEqual(lidas, len(receitas))
+        self.assertGreater(alteradas, 0)
+
+        campos = ("multa", "juros", "mora_diaria", "valor_em_aberto", "status")
+        em_lote = {r["pk"]: r for r in Receita.objects.values("pk", *campos)}
+        for receita in Receita.objects.select_related("prefeitura"):
+            receita.save()
+        por_save = {r["pk"]: r for r in Receita.objects.values("pk", *campos)}
+        self.assertEqual(em_lote, por_save)
+
+        # nada mudou desde o último recálculo: nenhuma gravação
+        self.assertEqual(recalcular_encargos(hoje=hoje), (len(receitas), 0))
+
+    def test_ignora_receitas_pagas(self):
+        from .services.encargos import recalcular_encargos
+
+        prefeitura = criar_prefeitura()
+        receita = Receita.objects.create(
+            prefeitura=prefeitura, descricao="d", valor_total=Decimal("100.00"),
+            data_vencimento=date.today() - timedelta(days=30),
+        )
+        Receita.objects.filter(pk=receita.pk).update(status="pago", valor_em_aberto=Decimal("0.00"))
+        self.assertEqual(recalcular_encargos(), (0, 0))
+
+
+class PagamentosTests(TestCase):
+    def setUp(self):
+        self.prefeitura = criar_prefeitura()
+        self.usuario = Usuario.objects.create(email="caixa@teste.com", first_name="Caixa", prefeitura=self.prefeitura)
+        self.receita = Receita.objects.create(
+            prefeitura=self.prefeitura, descricao="Taxa", valor_total=Decimal("100.00"),
+            data_vencimento=date.today() + timedelta(days=5), cpf="111", numero_documento="9/2026",
+        )
+
+    def test_parcial_estorno_e_quitacao(self):
+        from .services.pagamentos import registrar_pagamento
+
+        pagamento = registrar_pagamento(self.receita, "30", data=date(2026, 9, 3), usuario=self.usuario)
+        self.receita.refresh_from_db()
+        self.assertEqual((self.receita.status, self.receita.valor_pago, self.receita.valor_em_aberto),
+                         ("parcial", Decimal("30.00"), Decimal("70.00")))
+        self.assertEqual(self.receita.data_pagamento, date(2026, 9, 3))
+        self.assertEqual((pagamento.prefeitura_id, pagamento.usuario), (self.prefeitura.pk, self.usuario))
+
+        registrar_pagamento(self.receita, "-10")
+        registrar_pagamento(self.receita.pk, "80")
+        self.receita.refresh_from_db()
+        self.assertEqual((self.receita.status, self.receita.valor_pago, self.receita.valor_em_aberto),
+                         ("pago", Decimal("100.00"), Decimal("0.00")))
+        self.assertEqual(list(self.receita.pagamentos.values_list("valor", flat=True)),
+                         [Decimal("30.00"), Decimal("-10.00"), Decimal("80.00")])
+        # o pagamento parcial não gera mais outra receita com o restante
+        self.assertEqual(Receita.objects.count(), 1)
+
+    def test_valores_invalidos(self):
+        from .services.pagamentos import registrar_pagamento
+
+        with self.assertRaises(ValueError):
+            registrar_pagamento(self.receita, "0")
+        with self.assertRaises(ValueError):
+            registrar_pagamento(self.receita, "-1")
+        self.assertFalse(Pagamento.objects.exists())
+
+    def test_save_lanca_a_diferenca_no_razao(self):
+        self.receita.valor_pago = Decimal("40.00")
+        self.receita.save()
+        self.receita.valor_pago = Decimal("25.00")
+        self.receita.save()
+        self.assertEqual(list(Pagamento.objects.values_list("valor", flat=True)),
+                         [Decimal("40.00"), Decimal("-15.00")])
+
+    def test_conciliar_mes(self):
+        from .services.pagamentos import conciliar_mes, registrar_pagamento
+
+        outra = Receita.objects.create(
+            prefeitura=self.prefeitura, descricao="Outra", valor_total=Decimal("50.00"),
+            data_vencimento=date.today(),
+        )
+        registrar_pagamento(self.receita, "20", data=date(2026, 3, 2))
+        registrar_pagamento(self.receita, "5", data=date(2026, 3, 2))
+        registrar_pagamento(outra, "50", data=date(2026, 3, 15))
+        registrar_pagamento(self.receita, "1", data=date(2026, 4, 1))
+
+        resumo = conciliar_mes(2026, 3)
+        self.assertEqual((resumo["pagamentos"], resumo["valor"]), (3, Decimal("75.00")))
+        self.assertEqual(resumo["por_dia"], {date(2026, 3, 2): Decimal("25.00"), date(2026, 3, 15): Decimal("50.00")})
+        self.assertEqual(resumo["divergentes"], [])
+        self.assertEqual(conciliar_mes(2026, 3, prefeitura_id=self.prefeitura.pk + 1)["pagamentos"], 0)
+
+        # valor_pago alterado por fora do razão: aparece e é corrigido pela soma do razão
+        Receita.objects.filter(pk=self.receita.pk).update(valor_pago=Decimal("99.00"))
+        resumo = conciliar_mes(2026, 3, corrigir=True)
+        self.assertEqual(resumo["divergentes"], [(self.receita.pk, Decimal("99.00"), Decimal("26.00"))])
+        self.receita.refresh_from_db()
+        self.assertEqual((self.receita.valor_pago, self.receita.status), (Decimal("26.00"), "parcial"))
+        self.assertEqual(conciliar_mes(2026, 3)["divergentes"], [])
+        self.assertEqual(Pagamento.objects.filter(receita=self.receita).count(), 3)
+
+
+class ImportacaoRetomadaTests(TestCase):
+    CABECALHO = "tipo_estrutura,identificador,capacidade,quadra_codigo,usar_linha,linha,angulo,comprimento_m,largura_m,coordenada\n"
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=self.media)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.prefeitura = criar_prefeitura()
+        self.cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=self.prefeitura)
+        Quadra.objects.create(codigo="Q1", cemiterio=self.cemiterio)
+        self.usuario = Usuario.objects.create(email="imp@teste.com", first_name="Imp", prefeitura=self.prefeitura)
+
+    def _job(self, linhas):
+        job = ImportacaoPlanilha(
+            prefeitura=self.prefeitura, cemiterio=self.cemiterio, usuario=self.usuario,
+            tipo="tumulos", nome_arquivo="tumulos.csv",
+        )
+        conteudo = self.CABECALHO + "".join(f",T{i},2,Q1,,,,,,\n" for i in range(linhas))
+        job.arquivo.save("tumulos.csv", ContentFile(conteudo.encode()), save=False)
+        job.save()
+        return job
+
+    def test_retoma_do_ponto_de_retomada(self):
+        from .services import importacao
+
+        job = self._job(250)
+        processar = importacao.ImportadorTumulos.processar
+        chamadas = []
+
+        def quebra_no_segundo_lote(importador, df):
+            chamadas.append(len(df))
+            if len(chamadas) == 2:
+                raise RuntimeError("disco cheio")
+            return processar(importador, df)
+
+        with mock.patch.object(importacao.ImportadorTumulos, "processar", quebra_no_segundo_lote):
+            job = importacao.executar_importacao(job, tamanho=100)
+        self.assertEqual((job.status, job.mensagem), ("falhou", "disco cheio"))
+        self.assertEqual((job.linhas_processadas, job.importados), (100, 100))
+        self.assertEqual(Tumulo.objects.count(), 100)
+
+        self.assertTrue(job.pode_retomar)
+        self.assertTrue(importacao.retomar_importacao(job))
+        job = importacao.executar_importacao(job, tamanho=100)
+        self.assertEqual(job.status, "concluida")
+        self.assertEqual((job.linhas_processadas, job.importados, job.tentativas), (250, 250, 2))
+        self.assertEqual(job.linhas_no_inicio, 100)
+        identificadores = list(Tumulo.objects.values_list("identificador", flat=True))
+        self.assertEqual(len(identificadores), 250)
+        self.assertEqual(len(set(identificadores)), 250)
+
+    def test_lote_de_execucao_substituida_e_desfeito(self):
+        import uuid
+
+        from .services import importacao
+
+        job = self._job(250)
+        ler_planilha = importacao.ler_planilha
+        outro_worker = uuid.uuid4()
+
+        def ler_e_perder_o_job(*args, **kwargs):
+            for n, df in enumerate(ler_planilha(*args, **kwargs)):
+                if n == 1:  # job retomado por outro worker depois do 1º lote
+                    ImportacaoPlanilha.objects.filter(pk=job.pk).update(execucao=outro_worker)
+                yield df
+
+        with mock.patch.object(importacao, "ler_planilha", ler_e_perder_o_job):
+            job = importacao.executar_importacao(job, tamanho=100)
+        self.assertEqual((job.status, job.linhas_processadas, job.execucao), ("processando", 100, outro_worker))
+        self.assertEqual(Tumulo.objects.count(), 100)
+
+    def test_processando_sem_avanco_pode_retomar(self):
+        from django.utils import timezone
+
+        job = self._job(1)
+        job.status = "processando"
+        job.atualizado_em = timezone.now()
+        self.assertFalse(job.pode_retomar)
+        job.atualizado_em -= ImportacaoPlanilha.TEMPO_SEM_AVANCO + timedelta(seconds=1)
+        self.assertTrue(job.pode_retomar)
+
+
+class BackupCompletoTests(TestCase):
+    def setUp(self):
+        self.destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.destino, ignore_errors=True)
+
+        self.prefeitura = criar_prefeitura("Prefeitura de Ção")
+        cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=self.prefeitura)
+        quadra = Quadra.objects.create(codigo="Q1", cemiterio=cemiterio)
+        Tumulo.objects.bulk_create([
+            Tumulo(cemiterio=cemiterio, quadra=quadra, identificador=f"T{i}", capacidade=3) for i in range(5)
+        ])
+        receita = Receita.objects.create(
+            prefeitura=self.prefeitura, nome="José", descricao="Taxa", valor_total=Decimal("10.55"),
+            data_vencimento=date(2099, 1, 1),
+        )
+        from .services.pagamentos import registrar_pagamento
+        registrar_pagamento(receita, "3.05", data=date(2026, 1, 2))
+
+    def _foto(self):
+        from .services.backup_completo import modelos_em_ordem
+
+        return {m._meta.label: list(m._base_manager.order_by("pk").values_list()) for m in modelos_em_ordem()}
+
+    def test_dump_e_restauracao(self):
+        from .services.backup_completo import gerar_dump, restaurar_dump, verificar_dump
+
+        antes = self._foto()
+        manifesto = gerar_dump(self.destino, processos=1)
+        self.assertEqual(verificar_dump(self.destino), [])
+        linhas = {e["modelo"]: e["linhas"] for e in manifesto["modelos"]}
+        self.assertEqual(linhas["sepultados_gestao.tumulo"], 5)
+        self.assertEqual(linhas["sepultados_gestao.pagamento"], 1)
+
+        Tumulo.objects.filter(identificador__in=["T1", "T2"]).delete()
+        Receita.objects.update(descricao="alterada")
+        criar_prefeitura("Outra")
+
+        restaurar_dump(self.destino)
+        self.assertEqual(self._foto(), antes)
+
+        # as sequências continuam depois dos ids restaurados
+        nova = criar_prefeitura("Nova")
+        self.assertGreater(nova.pk, max(p.pk for p in Prefeitura.objects.exclude(pk=nova.pk)))
+
+    def test_dump_adulterado_nao_restaura(self):
+        import os
+
+        from .services.backup_completo import ErroDump, gerar_dump, restaurar_dump
+
+        manifesto = gerar_dump(self.destino, processos=1)
+        entrada = next(e for e in manifesto["modelos"] if e["modelo"] == "sepultados_gestao.tumulo")
+        with open(os.path.join(self.destino, entrada["arquivo"]), "ab") as arquivo:
+            arquivo.write(b"x")
+        Tumulo.objects.filter(identificador="T0").delete()
+
+        with self.assertRaises(ErroDump):
+            restaurar_dump(self.destino)
+        self.assertEqual(Tumulo.objects.count(), 4)
+
+
+class KeysetPaginacaoTests(TestCase):
+    """Percorrer todas as páginas pelo cursor dá a mesma ordem do ORDER BY, nulos incluídos."""
+
+    ORDENACAO = ("-data_pagamento", "-id")
+
+    def setUp(self):
+        prefeitura = criar_prefeitura()
+        datas = [date(2026, 1, 5), None, date(2026, 1, 5), date(2026, 2, 1), None, None, date(2025, 12, 31)] * 3
+        Receita.objects.bulk_create([
+            Receita(prefeitura=prefeitura, descricao=f"R{i}", valor_total=Decimal("1.00"),
+                    valor_em_aberto=Decimal("1.00"), data_vencimento=date(2026, 1, 1), data_pagamento=d)
+            for i, d in enumerate(datas)
+        ])
+        self.view = mock.Mock(keyset_ordering=self.ORDENACAO, queryset=Receita.objects.all())
+
+    def _percorrer(self, fonte, page_size):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        from .pagination import KeysetPagination
+
+        ids, cursor, paginas = [], None, 0
+        while True:
+            params = {"page_size": page_size, "count": 1}
+            if cursor:
+                params["cursor"] = cursor
+            paginador = KeysetPagination()
+            pagina = paginador.paginate_queryset(fonte(), Request(APIRequestFactory().get("/", params)), self.view)
+            self.assertEqual(paginador.count, Receita.objects.count())
+            ids += [r.pk for r in pagina]
+            paginas += 1
+            cursor = paginador.next_cursor
+            if not cursor:
+                return ids, paginas
+
+    def test_paginas_cobrem_tudo_na_ordem_do_banco(self):
+        esperado = list(Receita.objects.order_by(*self.ORDENACAO).values_list("pk", flat=True))
+        for page_size in (1, 4, 7, 100):
+            ids, paginas = self._percorrer(Receita.objects.all, page_size)
+            self.assertEqual(ids, esperado, page_size)
+            self.assertEqual(paginas, max(1, -(-len(esperado) // page_size)))
+
+    def test_lista_em_memoria_pagina_como_o_queryset(self):
+        esperado = list(Receita.objects.order_by(*self.ORDENACAO).values_list("pk", flat=True))
+        ids, _ = self._percorrer(lambda: list(Receita.objects.all()), 5)
+        self.assertEqual(ids, esperado)
+
+    def test_sem_parametros_nao_pagina_e_cursor_invalido_da_404(self):
+        from rest_framework.exceptions import NotFound
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        from .pagination import KeysetPagination
+
+        fabrica = APIRequestFactory()
+        self.assertIsNone(KeysetPagination().paginate_queryset(
+            Receita.objects.all(), Request(fabrica.get("/")), self.view))
+        with self.assertRaises(NotFound):
+            KeysetPagination().paginate_queryset(
+                Receita.objects.all(), Request(fabrica.get("/", {"cursor": "lixo"})), self.view)
+
+
+class OcupacaoTumuloTests(TestCase):
+    """Tumulo.ocupantes_ativos/status acompanham sepultamento, exumação, translado, mudança e exclusão."""
+
+    def setUp(self):
+        self.prefeitura = criar_prefeitura()
+        cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=self.prefeitura, tempo_minimo_exumacao=0)
+        quadra = Quadra.objects.create(codigo="Q1", cemiterio=cemiterio)
+        self.tumulo = Tumulo.objects.create(cemiterio=cemiterio, quadra=quadra, identificador="T1", capacidade=2)
+        self.outro = Tumulo.objects.create(cemiterio=cemiterio, quadra=quadra, identificador="T2", capacidade=1)
+        # sem receita nem numeração: só o que a validação do sepultamento exige
+        ConcessaoContrato.objects.bulk_create([
+            ConcessaoContrato(numero_contrato=f"C{t.pk}", nome="Titular", cpf="52998224725", tumulo=t,
+                              prefeitura=self.prefeitura, valor_total=0, quantidade_parcelas=1)
+            for t in (self.tumulo, self.outro)
+        ])
+
+    def _sepultar(self, nome, tumulo):
+        from .models import Sepultado
+
+        sepultado = Sepultado(nome=nome, tumulo=tumulo, data_falecimento=date(2020, 1, 1),
+                              data_sepultamento=date(2020, 1, 2))
+        sepultado.save()
+        return sepultado
+
+    def _ocupacao(self, tumulo):
+        tumulo.refresh_from_db()
+        return tumulo.ocupantes_ativos, tumulo.status
+
+    def test_ciclo_de_vida(self):
+        from .models import Exumacao, Sepultado, Translado
+        from .services.ocupacao import recalcular_ocupacao
+
+        primeiro = self._sepultar("Primeiro", self.tumulo)
+        self.assertEqual(self._ocupacao(self.tumulo), (1, "disponivel"))
+        segundo = self._sepultar("Segundo", self.tumulo)
+        self.assertEqual(self._ocupacao(self.tumulo), (2, "ocupado"))
+
+        Exumacao.objects.create(sepultado=primeiro, tumulo=self.tumulo, prefeitura=self.prefeitura,
+                                data=date(2026, 1, 1))
+        self.assertEqual(self._ocupacao(self.tumulo), (1, "disponivel"))
+
+        # translado depois da exumação: a vaga já tinha sido liberada
+        Translado.objects.create(sepultado=primeiro, destino="outro_cemiterio", cemiterio_nome="Outro",
+                                 data=date(2026, 2, 1))
+        self.assertEqual(self._ocupacao(self.tumulo), (1, "disponivel"))
+
+        copia = Sepultado.objects.get(pk=segundo.pk)
+        segundo.tumulo = self.outro
+        segundo.save()
+        self.assertEqual(self._ocupacao(self.tumulo), (0, "disponivel"))
+        self.assertEqual(self._ocupacao(self.outro), (1, "ocupado"))
+
+        # instância carregada antes da mudança: a vaga não é movida duas vezes
+        copia.tumulo = self.outro
+        copia.save()
+        self.assertEqual(self._ocupacao(self.tumulo), (0, "disponivel"))
+        self.assertEqual(self._ocupacao(self.outro), (1, "ocupado"))
+
+        Receita.objects.filter(sepultado=segundo).delete()
+        segundo.delete()
+        self.assertEqual(self._ocupacao(self.outro), (0, "disponivel"))
+
+        terceiro = self._sepultar("Terceiro", self.tumulo)
+        Receita.objects.filter(sepultado=terceiro).delete()
+        Sepultado.objects.filter(pk=terceiro.pk).delete()
+        self.assertEqual(self._ocupacao(self.tumulo), (0, "disponivel"))
+
+        # o contador mantido pelos saves bate com a recontagem completa
+        self.assertEqual(recalcular_ocupacao(), (2, 0))
+
+
+class NumeroSequencialTests(TestCase):
+    def test_reserva_em_bloco(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .utils import gerar_numero_sequencial_global, reservar_numeros_sequenciais
+
+        ano = date.today().year
+        prefeitura, outra = criar_prefeitura("P1"), criar_prefeitura("P2")
+
+        self.assertEqual(reservar_numeros_sequenciais(prefeitura, 3), [f"{n}/{ano}" for n in (1, 2, 3)])
+        self.assertEqual(gerar_numero_sequencial_global(prefeitura), f"4/{ano}")
+        self.assertEqual(reservar_numeros_sequenciais(outra.pk, 2), [f"1/{ano}", f"2/{ano}"])
+        self.assertEqual(reservar_numeros_sequenciais(prefeitura, 0), [])
+
+        # um bloco custa as mesmas consultas que um número só
+        with CaptureQueriesContext(connection) as um:
+            reservar_numeros_sequenciais(prefeitura, 1)
+        with CaptureQueriesContext(connection) as bloco:
+            numeros = reservar_numeros_sequenciais(prefeitura, 500)
+        self.assertEqual(len(bloco), len(um))
+        self.assertEqual((numeros[0], numeros[-1]), (f"6/{ano}", f"505/{ano}"))
+        self.assertEqual(gerar_numero_sequencial_global(prefeitura), f"506/{ano}")
+
+
+class AuditoriaEmLoteTests(TestCase):
+    def setUp(self):
+        self.prefeitura = criar_prefeitura()
+        self.usuario = Usuario.objects.create(email="aud@teste.com", first_name="Aud", prefeitura=self.prefeitura)
+
+    def _registrar(self, acao, modelo, objeto_id, representacao):
+        from .services.auditoria import registrar
+
+        registrar(self.usuario, acao, modelo, objeto_id, representacao, self.prefeitura)
+
+    def _gravados(self):
+        from .models import RegistroAuditoria
+
+        return list(RegistroAuditoria.objects.order_by("pk").values_list("acao", "modelo", "objeto_id", "representacao"))
+
+    def test_junta_alteracoes_do_mesmo_objeto(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .services.auditoria import lote_auditoria
+
+        with CaptureQueriesContext(connection) as consultas, \
+                self.captureOnCommitCallbacks(execute=True), lote_auditoria():
+            self._registrar("add", "Tumulo", 1, "T1")
+            self._registrar("change", "Tumulo", 1, "T1 alterado")
+            self._registrar("change", "Tumulo", 2, "T2")
+            self._registrar("change", "Tumulo", 2, "T2 alterado")
+            self._registrar("delete", "Tumulo", 2, "T2 excluído")
+            self._registrar("delete", "Tumulo", 2, "T2 excluído")
+            self._registrar("change", "Quadra", 1, "Q1")  # mesmo id, outro modelo
+            self._registrar("change", "Quadra", 1, "Q1 alterada")
+            self._registrar("add", "Resumo", None, "importação")  # sem objeto_id: nunca junta
+            self._registrar("add", "Resumo", None, "importação")
+            self.assertEqual(self._gravados(), [])  # nada é gravado antes do commit
+
+        inserts = [q for q in consultas.captured_queries
+                   if q["sql"].startswith("INSERT") and "registroauditoria" in q["sql"]]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self._gravados(), [
+            ("add", "Tumulo", "1", "T1 alterado"),
+            ("delete", "Tumulo", "2", "T2 excluído"),
+            ("change", "Quadra", "1", "Q1 alterada"),
+            ("add", "Resumo", "", "importação"),
+            ("add", "Resumo", "", "importação"),
+        ])
+
+    def test_rollback_descarta_o_registro(self):
+        from django.db import transaction
+
+        from .services.auditoria import lote_auditoria
+
+        with self.captureOnCommitCallbacks(execute=True), lote_auditoria():
+            try:
+                with transaction.atomic():
+                    self._registrar("change", "Tumulo", 1, "desfeito")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self._registrar("change", "Tumulo", 2, "confirmado")
+        self.assertEqual(self._gravados(), [("change", "Tumulo", "2", "confirmado")])
+
+
+class ArquivoAuditoriaTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        from .models import RegistroAuditoria
+
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        configuracao = override_settings(AUDITORIA={"ARQUIVO_DIR": pasta, "ARQUIVAR_APOS_DIAS": 30})
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.prefeitura = criar_prefeitura()
+        self.usuario = Usuario.objects.create(email="aud@teste.com", first_name="Aud", prefeitura=self.prefeitura)
+        self.agora = timezone.now()
+        self.datas = [self.agora - timedelta(days=d) for d in (400, 200, 120, 60, 5)]
+        for i, quando in enumerate(self.datas):
+            registro = RegistroAuditoria.objects.create(
+                acao="change" if i % 2 else "add", usuario=self.usuario, modelo="Tumulo" if i < 3 else "Quadra",
+                objeto_id=str(i), representacao=f"R{i}", prefeitura=self.prefeitura,
+            )
+            RegistroAuditoria.objects.filter(pk=registro.pk).update(data_hora=quando)
+
+    def test_arquiva_e_le_de_volta(self):
+        from django.utils import timezone
+
+        from .models import RegistroAuditoria
+        from .services.arquivo_auditoria import arquivar_auditoria, buscar_arquivados, meses_arquivados
+
+        antes = {r.pk: (r.acao, r.modelo, r.objeto_id, r.representacao, r.data_hora)
+                 for r in RegistroAuditoria.objects.all()}
+        self.assertEqual(arquivar_auditoria(lote=2), 4)
+        self.assertEqual(list(RegistroAuditoria.objects.values_list("representacao", flat=True)), ["R4"])
+        self.assertEqual(len(meses_arquivados(self.prefeitura.pk)), 4)
+        self.assertEqual(arquivar_auditoria(), 0)
+
+        inicio = timezone.localdate(self.agora - timedelta(days=500))
+        lidos = buscar_arquivados(self.prefeitura.pk, inicio)
+        self.assertEqual([r.representacao for r in lidos], ["R3", "R2", "R1", "R0"])
+        for r in lidos:
+            self.assertTrue(r.arquivado)
+            self.assertEqual(r.usuario, self.usuario)
+            self.assertEqual((r.acao, r.modelo, r.objeto_id, r.representacao, r.data_hora), antes[r.pk])
+
+        # filtros pelo índice e pelas linhas
+        self.assertEqual([r.representacao for r in buscar_arquivados(self.prefeitura.pk, inicio, modelo="tumulo")],
+                         ["R2", "R1", "R0"])
+        self.assertEqual([r.representacao for r in buscar_arquivados(self.prefeitura.pk, inicio, acoes=["change"])],
+                         ["R3", "R1"])
+        periodo = buscar_arquivados(self.prefeitura.pk, timezone.localdate(self.datas[1]),
+                                    timezone.localdate(self.datas[2]))
+        self.assertEqual([r.representacao for r in periodo], ["R2", "R1"])
+        self.assertEqual(buscar_arquivados(self.prefeitura.pk, None), [])
+
+        # usuário excluído: vem a cópia gravada no segmento, sem id
+        Usuario.objects.filter(pk=self.usuario.pk).delete()
+        lidos = buscar_arquivados(self.prefeitura.pk, inicio, usuario="aud@teste.com")
+        self.assertEqual(len(lidos), 4)
+        self.assertEqual((lidos[0].usuario.email, lidos[0].usuario.pk), ("aud@teste.com", None))
+
+    def test_exclusao_fora_do_arquivamento_e_bloqueada(self):
+        from django.core.exceptions import ValidationError
+
+        from .models import RegistroAuditoria
+
+        with self.assertRaises(ValidationError):
+            RegistroAuditoria.objects.first().delete()
+
+
+class VersaoETagTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        prefeitura = criar_prefeitura()
+        self.cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=prefeitura)
+        self.outro = Cemiterio.objects.create(nome="Outro", prefeitura=prefeitura)
+        self.quadra = Quadra.objects.create(codigo="Q1", cemiterio=self.cemiterio)
+        Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.quadra, identificador="T1", capacidade=2)
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Usuario.objects.create(email="api@teste.com", first_name="Api", prefeitura=prefeitura))
+
+    def _get(self, url, etag=None):
+        extra = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, {"cemiterio": self.cemiterio.pk}, **extra)
+
+    def test_304_ate_a_proxima_escrita_do_cemiterio(self):
+        for url in ("/api/tumulos/", "/api/quadras/", "/api/dashboard/resumo/"):
+            with self.subTest(url=url):
+                primeira = self._get(url)
+                self.assertEqual(primeira.status_code, 200)
+                etag = primeira["ETag"]
+                self.assertEqual(self._get(url, etag).status_code, 304)
+
+                # escrita em outro cemitério não invalida
+                Quadra.objects.create(codigo=f"X{url}", cemiterio=self.outro)
+                self.assertEqual(self._get(url, etag).status_code, 304)
+
+                Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.quadra,
+                                      identificador=f"N{url}", capacidade=1)
+                nova = self._get(url, etag)
+                self.assertEqual(nova.status_code, 200)
+                self.assertNotEqual(nova["ETag"], etag)
+                self.assertEqual(self._get(url, nova["ETag"]).status_code, 304)
+
+    def test_etag_depende_da_querystring(self):
+        primeira = self._get("/api/tumulos/")
+        outra = self.client.get("/api/tumulos/", {"cemiterio": self.cemiterio.pk, "page_size": 1},
+                                HTTP_IF_NONE_MATCH=primeira["ETag"])
+        self.assertEqual(outra.status_code, 200)
+        self.assertNotEqual(outra["ETag"], primeira["ETag"])
+
+
+class BuscaSepultadosTests(TestCase):
+    """Índice de busca (services/busca.py) nos dois formatos: FTS5 (SQLite) e tabela de termos."""
+
+    def _cenario(self):
+        from .models import Sepultado
+
+        prefeitura = criar_prefeitura()
+        cemiterios = [Cemiterio.objects.create(nome=f"C{i}", prefeitura=prefeitura) for i in range(2)]
+        tumulos = []
+        for cemiterio in cemiterios:
+            quadra = Quadra.objects.create(codigo="Q1", cemiterio=cemiterio)
+            tumulos.append(Tumulo.objects.create(cemiterio=cemiterio, quadra=quadra, identificador="T1", capacidade=20))
+        ConcessaoContrato.objects.bulk_create([
+            ConcessaoContrato(numero_contrato=f"C{t.pk}", nome="Titular", cpf="52998224725", tumulo=t,
+                              prefeitura=prefeitura, valor_total=0, quantidade_parcelas=1)
+            for t in tumulos
+        ])
+
+        def sepultar(nome, tumulo=tumulos[0], **extra):
+            return Sepultado.objects.create(nome=nome, tumulo=tumulo, data_falecimento=date(2020, 1, 1),
+                                            data_sepultamento=date(2020, 1, 2), **extra)
+
+        self.prefeitura, self.cemiterio, self.outro_cemiterio = prefeitura, cemiterios[0], cemiterios[1]
+        self.sepultar = sepultar
+        return {
+            "joao": sepultar("João da Conceição", nome_mae="Maria Silva", cpf_sepultado="111.222.333-44"),
+            "joana": sepultar("Joana Silva", nome_pai="José Conceição"),
+            "pedro": sepultar("JOAO PEDRO", tumulos[1]),
+        }
+
+    def _nos_dois_indices(self):
+        from .services import busca
+
+        for fts in (True, False):
+            with self.subTest(fts=fts), mock.patch.object(busca, "usa_fts", return_value=fts):
+                yield self._cenario()
+
+    def _nomes(self, ranking):
+        from .models import Sepultado
+
+        nomes = dict(Sepultado.objects.filter(pk__in=[sid for sid, _ in ranking]).values_list("pk", "nome"))
+        return [nomes[sid] for sid, _ in ranking]
+
+    def test_prefixo_sem_acento_e_escopo(self):
+        from .services.busca import buscar
+
+        for s in self._nos_dois_indices():
+            cem = self.cemiterio.pk
+            self.assertEqual(self._nomes(buscar("joao", cemiterio_id=cem)), ["João da Conceição"])
+            self.assertEqual(set(self._nomes(buscar("JOÃO", prefeitura_id=self.prefeitura.pk))),
+                             {"João da Conceição", "JOAO PEDRO"})
+            # nome pesa mais que pai/mãe/cônjuge
+            self.assertEqual(self._nomes(buscar("concei", cemiterio_id=cem)), ["João da Conceição", "Joana Silva"])
+            self.assertEqual(self._nomes(buscar("silva", cemiterio_id=cem)), ["Joana Silva", "João da Conceição"])
+            # todas as palavras precisam casar
+            self.assertEqual(self._nomes(buscar("jo pedro", cemiterio_id=cem)), [])
+            self.assertEqual(self._nomes(buscar("111222", cemiterio_id=cem)), ["João da Conceição"])
+            self.assertEqual(buscar("joao"), [])
+
+            # os sinais mantêm o índice
+            s["joao"].nome = "Antônio"
+            s["joao"].save()
+            self.assertEqual(self._nomes(buscar("anto", cemiterio_id=cem)), ["Antônio"])
+            self.assertEqual(buscar("joao conceicao", cemiterio_id=cem), [])
+            Receita.objects.filter(sepultado=s["joana"]).delete()
+            s["joana"].delete()
+            self.assertEqual(buscar("joana", cemiterio_id=cem), [])
+
+    def test_reindexar_reconstroi(self):
+        from .services import busca
+
+        for s in self._nos_dois_indices():
+            antes = busca.buscar("silva", prefeitura_id=self.prefeitura.pk)
+            busca.remover([sid for sid, _ in antes])
+            self.assertEqual(busca.buscar("silva", prefeitura_id=self.prefeitura.pk), [])
+            busca.reindexar()
+            self.assertEqual(busca.buscar("silva", prefeitura_id=self.prefeitura.pk), antes)
+
+    def test_endpoint(self):
+        from rest_framework.test import APIClient
+
+        self._cenario()
+        cliente = APIClient()
+        cliente.force_authenticate(
+            Usuario.objects.create(email="busca@teste.com", first_name="Busca", prefeitura=self.prefeitura))
+        resposta = cliente.get("/api/sepultados/busca/", {"q": "conceicao", "cemiterio": self.cemiterio.pk})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([r["nome"] for r in resposta.data["results"]], ["João da Conceição", "Joana Silva"])
+        self.assertGreater(resposta.data["results"][0]["relevancia"], resposta.data["results"][1]["relevancia"])
+        self.assertEqual(cliente.get("/api/sepultados/busca/", {"q": "j", "cemiterio": self.cemiterio.pk}).status_code,
+                         400)
+
+    def test_chaves_foneticas(self):
+        from .services import fonetica
+
+        for a, b in (("Sousa", "Souza"), ("Luis", "Luiz"), ("Ellen", "Helen"), ("Filipe", "Phelipe"),
+                     ("Xavier", "Chavier"), ("Conceição", "Conseisão"), ("Walter", "Valter"), ("Felipe", "Filipe")):
+            self.assertEqual(fonetica.chave_fonetica(a), fonetica.chave_fonetica(b), (a, b))
+        self.assertNotEqual(fonetica.chave_fonetica("Guilherme"), fonetica.chave_fonetica("Jilherme"))
+        # mesmo esqueleto, grafias com vogais diferentes
+        self.assertEqual(fonetica.chaves("Maria")[0], fonetica.chaves("Mario")[0])
+        self.assertNotEqual(fonetica.chaves("Maria"), fonetica.chaves("Mario"))
+        self.assertEqual(fonetica.chaves("Maria da Silva"), fonetica.chaves("MARIA SILVA"))
+
+    def test_busca_aproximada(self):
+        from .services.busca import buscar_aproximado
+
+        for s in self._nos_dois_indices():
+            cem = self.cemiterio.pk
+            self.sepultar("Luiz Souza", nome_mae="Helen Sousa")
+            self.sepultar("Ellen Rodrigues")
+            self.sepultar("Guilherme Xavier")
+            self.sepultar("Mário Lima")
+            self.sepultar("Maria Lima")
+
+            def nomes(q, **escopo):
+                return self._nomes(buscar_aproximado(q, **(escopo or {"cemiterio_id": cem})))
+
+            self.assertEqual(nomes("luis sousa")[0], "Luiz Souza")
+            self.assertEqual(nomes("gilherme chavier"), ["Guilherme Xavier"])
+            self.assertEqual(nomes("conseisão")[:2], ["João da Conceição", "Joana Silva"])
+            self.assertEqual(set(nomes("helen")), {"Ellen Rodrigues", "Luiz Souza"})  # pela mãe
+            self.assertEqual(nomes("mario lima")[:2], ["Mário Lima", "Maria Lima"])
+            self.assertEqual(nomes("pedru"), [])
+            self.assertEqual(nomes("pedru", prefeitura_id=self.prefeitura.pk), ["JOAO PEDRO"])
+            self.assertEqual(nomes("zzz"), [])
+
+            notas = [nota for _, nota in buscar_aproximado("luis sousa", cemiterio_id=cem)]
+            self.assertEqual(notas, sorted(notas, reverse=True))
+            self.assertTrue(all(0 < nota <= 1 for nota in notas))
+
+
+class ImportacaoEmLoteTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.prefeitura = criar_prefeitura()
+        self.cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=self.prefeitura)
+        self.q1 = Quadra.objects.create(codigo="Q1", cemiterio=self.cemiterio)
+        Quadra.objects.create(codigo="q2", cemiterio=self.cemiterio)
+        self.usuario = Usuario.objects.create(email="imp@teste.com", first_name="Imp", prefeitura=self.prefeitura)
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _enviar(self, tipo, conteudo, **params):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        arquivo = SimpleUploadedFile(f"{tipo}.csv", conteudo.encode(), content_type="text/csv")
+        return self.client.post(f"/api/importar/{tipo}/?cemiterio={self.cemiterio.pk}",
+                                {"arquivo": arquivo, **params}, format="multipart")
+
+    def test_tumulos(self):
+        Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.q1, identificador="5", capacidade=2,
+                              angulo_graus=Decimal("10"))
+        resposta = self._enviar("tumulos", ImportacaoRetomadaTests.CABECALHO + (
+            'jazigo,1,3,Q1,sim,2,,,,"-23.4, -51.9"\n'
+            ',2,,Q2,,,,"2,5",1.2,\n'
+            ",,1,Q1,,,,,,\n"
+            ",4,1,ZZ,,,,,,\n"
+            ",6,x,Q1,,,,,,\n"
+            ",7,1,Q1,,,abc,,,\n"
+            ",9,1,Q1,sim,,,,,\n"
+            ",5,4,Q1,,,,,,\n"
+            ",1,2,Q1,,,,,,\n"  # identificador repetido: atualiza o túmulo da linha 2
+        ))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data, {
+            "importados": 4,
+            "atualizados": 2,
+            "erros": [
+                "Linha 4: identificador vazio",
+                "Linha 5: quadra 'ZZ' não encontrada neste cemitério",
+                "Linha 6: inteiro inválido: 'x'",
+                "Linha 7: número inválido: 'abc'",
+                "Linha 8: {'linha': ['Informe o número da linha.']}",
+            ],
+        })
+
+        tumulos = {t.identificador: t for t in Tumulo.objects.filter(cemiterio=self.cemiterio)}
+        self.assertEqual(sorted(tumulos), ["1", "2", "5"])
+        # a última linha vence campo a campo; colunas opcionais vazias não apagam
+        self.assertEqual((tumulos["1"].capacidade, tumulos["1"].usar_linha, tumulos["1"].localizacao),
+                         (2, False, {"lat": -23.4, "lng": -51.9}))
+        self.assertEqual((tumulos["2"].capacidade, tumulos["2"].quadra.codigo, tumulos["2"].comprimento_m),
+                         (1, "q2", Decimal("2.50")))
+        self.assertEqual((tumulos["5"].capacidade, tumulos["5"].angulo_graus), (4, Decimal("10.00")))
+        self.assertEqual({t.status for t in tumulos.values()}, {"disponivel"})
+
+    def test_linha_recusada_pelo_banco_nao_derruba_o_lote(self):
+        resposta = self._enviar("tumulos", ImportacaoRetomadaTests.CABECALHO + (
+            ",A,1,Q1,,,,,,\n"
+            ",B,-1,Q1,,,,,,\n"  # no SQLite, só o CHECK da capacidade recusa
+            ",C,1,Q1,,,,,,\n"
+        ))
+        self.assertEqual((resposta.data["importados"], resposta.data["atualizados"]), (2, 0))
+        self.assertEqual(len(resposta.data["erros"]), 1)
+        self.assertTrue(resposta.data["erros"][0].startswith("Linha 3: "))
+        self.assertEqual(sorted(Tumulo.objects.values_list("identificador", flat=True)), ["A", "C"])
+
+    def test_sepultados_em_lote(self):
+        from .models import RegistroAuditoria, Sepultado
+        from .services.busca import buscar
+
+        t1 = Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.q1, identificador="T1", capacidade=2)
+        t2 = Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.q1, identificador="T2", capacidade=3,
+                                   usar_linha=True, linha=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self._enviar("sepultados", (
+                "identificador_tumulo,quadra,linha,nome,data_falecimento,data_sepultamento,cpf_sepultado,sexo,nome_mae\n"
+                "T1,Q1,,Ana Souza,01/02/2020,03/02/2020,111.222.333-44,F,\n"
+                "t1,q1,,Bruno Lima,06/05/2021,,,M,Maria Lima\n"
+                "T9,Q1,,Sem Túmulo,,,,,\n"
+                "T1,ZZ,,Sem Quadra,,,,,\n"
+                "T2,Q1,,Sem Linha,,,,,\n"
+                "T2,Q1,4,Linha Errada,,,,,\n"
+                "T2,Q1,3,Carla Dias,,,,,\n"
+                ",,,Ignorada,,,,,\n"
+            ), modo="lote")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data, {
+            "importados": 3,
+            "erros": [
+                "Linha 4: Túmulo 'T9' não encontrado na quadra 'Q1'.",
+                "Linha 5: Quadra 'ZZ' não encontrada.",
+                "Linha 6: Túmulo 'T2' usa linha (3), mas a planilha não informou 'linha'.",
+                "Linha 7: Linha informada (4) difere da linha do túmulo (3).",
+            ],
+        })
+
+        sepultados = {s.nome: s for s in Sepultado.objects.all()}
+        self.assertEqual(sorted(sepultados), ["Ana Souza", "Bruno Lima", "Carla Dias"])
+        ana = sepultados["Ana Souza"]
+        self.assertEqual((ana.tumulo_id, ana.data_falecimento, ana.data_sepultamento, ana.sexo, ana.importado),
+                         (t1.pk, date(2020, 2, 1), date(2020, 2, 3), "F", True))
+        self.assertEqual(sepultados["Bruno Lima"].data_falecimento, date(2021, 5, 6))
+        numeros = {s.numero_sepultamento for s in sepultados.values()}
+        self.assertEqual(len(numeros), 3)
+
+        # efeitos adiados: vagas, índice de busca e uma auditoria só; sem receitas
+        t1.refresh_from_db()
+        t2.refresh_from_db()
+        self.assertEqual((t1.ocupantes_ativos, t1.status, t2.ocupantes_ativos, t2.status),
+                         (2, "ocupado", 1, "disponivel"))
+        self.assertEqual(len(buscar("carla", cemiterio_id=self.cemiterio.pk)), 1)
+        self.assertEqual(len(buscar("maria", cemiterio_id=self.cemiterio.pk)), 1)
+        self.assertFalse(Receita.objects.exists())
+        auditoria = RegistroAuditoria.objects.filter(modelo="Sepultado")
+        self.assertEqual(auditoria.count(), 1)
+        self.assertIn("3 sepultado(s)", auditoria.get().representacao)
+
+    def _sem_escrita(self, tipo, conteudo, **params):
+        """Resposta do dry run; falha se alguma tabela do app for escrita."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            resposta = self._enviar(tipo, conteudo, dry_run="1", **params)
+        escritas = [q["sql"] for q in consultas.captured_queries
+                    if q["sql"].split(" ", 1)[0] in ("INSERT", "UPDATE", "DELETE")]
+        self.assertEqual(escritas, [])
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.data.pop("simulacao"))
+        return resposta.data
+
+    def test_simulacao_tumulos(self):
+        Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.q1, identificador="5", capacidade=2)
+        planilha = ImportacaoRetomadaTests.CABECALHO + (
+            ",1,3,Q1,,,,,,\n"
+            ",5,4,Q1,,,,,,\n"
+            ",5,4,Q1,,,,,,\n"  # igual ao que a linha anterior deixaria
+            ",,1,Q1,,,,,,\n"
+            ",8,1,ZZ,,,,,,\n"
+        )
+        previsto = self._sem_escrita("tumulos", planilha)
+        self.assertEqual(previsto, {
+            "criados": 1, "atualizados": 1, "inalterados": 1, "rejeitados": 2,
+            "erros": ["Linha 5: identificador vazio", "Linha 6: quadra 'ZZ' não encontrada neste cemitério"],
+        })
+        self.assertEqual(Tumulo.objects.count(), 1)
+
+        # a importação de verdade confirma a previsão
+        feito = self._enviar("tumulos", planilha).data
+        self.assertEqual(feito["importados"], previsto["criados"] + previsto["atualizados"] + previsto["inalterados"])
+        self.assertEqual(feito["erros"], previsto["erros"])
+        self.assertEqual(Tumulo.objects.count(), 2)
+
+    def test_simulacao_quadras(self):
+        previsto = self._sem_escrita("quadras", (
+            "codigo,grid_cols\n"
+            "Q1,4\n"
+            "Q3,2\n"
+            "Q3,2\n"
+            ",1\n"  # sem código: pulada, como na importação
+        ))
+        self.assertEqual(previsto, {"criados": 1, "atualizados": 1, "inalterados": 1, "rejeitados": 0, "erros": []})
+        self.assertEqual(Quadra.objects.filter(cemiterio=self.cemiterio).count(), 2)
+
+    def test_simulacao_sepultados(self):
+        from .models import NumeroSequencialGlobal, Sepultado
+
+        Tumulo.objects.create(cemiterio=self.cemiterio, quadra=self.q1, identificador="T1", capacidade=9)
+        previsto = self._sem_escrita("sepultados", (
+            "identificador_tumulo,quadra,nome,data_falecimento,data_sepultamento\n"
+            "T1,Q1,Ana Souza,01/02/2020,03/02/2020\n"
+            "T1,Q1,ANA SOUZA,01/02/2020,03/02/2020\n"
+            "T1,Q1,Bruno Lima,,\n"
+            "T9,Q1,Sem Túmulo,,\n"
+            ",,Ignorada,,\n"
+        ), modo="lote")
+        self.assertEqual(previsto, {
+            "criados": 3, "atualizados": 0, "inalterados": 0, "rejeitados": 1, "duplicados": 1, "ignorados": 1,
+            "erros": ["Linha 5: Túmulo 'T9' não encontrado na quadra 'Q1'."],
+        })
+        self.assertFalse(Sepultado.objects.exists())
+        self.assertFalse(NumeroSequencialGlobal.objects.exists())
+
+    def test_colunas_faltando(self):
+        resposta = self._enviar("tumulos", "identificador,capacidade\nT1,1\n")
+        self.assertEqual(resposta.status_code, 400)
+        self.assertFalse(Tumulo.objects.exists())
+
+
+class BackupIncrementalTests(TestCase):
+    def setUp(self):
+        from .models import Anexo
+        from .services.backup import Planilha
+
+        self.prefeitura = criar_prefeitura()
+        self.receitas = [
+            Receita.objects.create(prefeitura=self.prefeitura, descricao=f"R{i}", valor_total=Decimal("10.00"),
+                                   data_vencimento=date(2099, 1, 1))
+            for i in range(4)
+        ]
+        self.planilhas = [Planilha("receitas.xlsx", "Receitas", ["id", "descricao"],
+                                   Receita.objects.filter(prefeitura=self.prefeitura).order_by("pk"),
+                                   lambda r: [r.pk, r.descricao])]
+        self.anexos = Anexo.objects.none()
+
+    def _gerar(self):
+        import io
+
+        from .services.backup import gerar_backup
+
+        return io.BytesIO(b"".join(gerar_backup(self.prefeitura, self.planilhas, self.anexos, incremental=True)))
+
+    @staticmethod
+    def _ler(arquivo, nome):
+        import zipfile
+
+        with zipfile.ZipFile(arquivo) as zf:
+            return zf.read(nome).decode()
+
+    def _envelhecer(self):
+        # o que já estava no backup anterior fica antes da marca dele (e da folga)
+        from django.utils import timezone
+
+        from .models import BackupPrefeitura
+
+        BackupPrefeitura.objects.update(marca=timezone.now() - timedelta(days=1))
+        Receita.objects.update(atualizado_em=timezone.now() - timedelta(days=2))
+
+    def test_cadeia_completo_incrementais(self):
+        import json
+
+        from .models import BackupPrefeitura
+        from .services.backup import MANIFESTO, confirmar_backup, verificar_cadeia
+
+        completo = self._gerar()
+        manifesto = json.loads(self._ler(completo, MANIFESTO))
+        self.assertEqual((manifesto["tipo"], manifesto["anterior"], manifesto["linhas"]["receitas.xlsx"]),
+                         ("completo", None, 4))
+        self.assertEqual(BackupPrefeitura.objects.get().status, "gerado")
+
+        # sem backup concluído (arquivo conferido), o próximo ainda é completo
+        self.assertEqual(json.loads(self._ler(self._gerar(), MANIFESTO))["tipo"], "completo")
+        BackupPrefeitura.objects.exclude(pk=manifesto["backup_id"]).delete()
+        backup, problemas = confirmar_backup(completo)
+        self.assertEqual((backup.pk, backup.status, problemas), (manifesto["backup_id"], "concluido", []))
+
+        self._envelhecer()
+        alterada, excluida = self.receitas[1], self.receitas[2]
+        alterada.descricao = "alterada"
+        alterada.save()
+        excluida.delete()
+        nova = Receita.objects.create(prefeitura=self.prefeitura, descricao="nova", valor_total=Decimal("1.00"),
+                                      data_vencimento=date(2099, 1, 1))
+
+        incremental = self._gerar()
+        dados = json.loads(self._ler(incremental, MANIFESTO))
+        self.assertEqual(dados["tipo"], "incremental")
+        self.assertEqual(dados["anterior"]["backup_id"], manifesto["backup_id"])
+        self.assertEqual(self._ler(incremental, "ids/receitas.txt").split(), [str(alterada.pk), str(nova.pk)])
+        self.assertEqual(self._ler(incremental, "existentes/receitas.txt").split(),
+                         [str(r.pk) for r in Receita.objects.order_by("pk")])
+        self.assertEqual(confirmar_backup(incremental)[1], [])
+
+        # o próximo incremental continua do último concluído
+        self._envelhecer()
+        segundo = self._gerar()
+        elo = json.loads(self._ler(segundo, MANIFESTO))["anterior"]
+        self.assertEqual(elo["backup_id"], dados["backup_id"])
+        self.assertEqual(self._ler(segundo, "ids/receitas.txt").split(), [])
+
+        self.assertEqual([p for _, p in verificar_cadeia([completo, incremental, segundo])], [[], [], []])
+        fora_de_ordem = verificar_cadeia([completo, segundo])
+        self.assertEqual(len(fora_de_ordem[1][1]), 1)
+        self.assertIn("não continua", fora_de_ordem[1][1][0])
+        self.assertTrue(verificar_cadeia([incremental])[0][1])
+
+
+class BackupEmFluxoTests(TestCase):
+    def test_zip_em_fluxo_abre_cada_entrada_na_vez_dela(self):
+        import hashlib
+        import io
+        import zipfile
+
+        from .services.backup import zip_em_fluxo
+
+        grande = bytes(range(256)) * 20  # 5 blocos de 1 KiB
+        abertas = []
+
+        class SemTamanho(io.RawIOBase):  # fluxo que não sabe o próprio tamanho (sem seek)
+            def __init__(self):
+                self.dados = io.BytesIO(b"fim")
+
+            def readable(self):
+                return True
+
+            def readinto(self, b):
+                return self.dados.readinto(b)
+
+        def abrir(nome, conteudo):
+            abertas.append(nome)
+            return conteudo
+
+        entradas = [
+            ("grande.bin", lambda: abrir("grande.bin", io.BytesIO(grande))),
+            ("pulada.bin", lambda: abrir("pulada.bin", None)),
+            ("fluxo.txt", lambda: abrir("fluxo.txt", SemTamanho())),
+        ]
+        hashes = {}
+        pedacos = []
+        for pedaco in zip_em_fluxo(iter(entradas), bloco=1024, hashes=hashes):
+            pedacos.append(pedaco)
+            if len(pedacos) == 2:
+                self.assertEqual(abertas, ["grande.bin"])  # a próxima entrada ainda não foi aberta
+        self.assertGreater(len(pedacos), 5)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(pedacos))) as zf:
+            self.assertEqual(zf.namelist(), ["grande.bin", "fluxo.txt"])
+            self.assertEqual((zf.read("grande.bin"), zf.read("fluxo.txt")), (grande, b"fim"))
+        self.assertEqual(hashes["grande.bin"], {"sha256": hashlib.sha256(grande).hexdigest(), "bytes": len(grande)})
+
+    def test_endpoint_responde_em_fluxo(self):
+        import io
+        import zipfile
+
+        from openpyxl import load_workbook
+        from rest_framework.test import APIClient
+
+        from .services.backup import verificar_backup
+
+        prefeitura = criar_prefeitura()
+        Receita.objects.create(prefeitura=prefeitura, descricao="Taxa", valor_total=Decimal("10.00"),
+                               data_vencimento=date(2099, 1, 1))
+        cliente = APIClient()
+        cliente.force_authenticate(Usuario.objects.create(email="bkp@teste.com", first_name="Bkp",
+                                                          prefeitura=prefeitura, is_staff=True))
+        resposta = cliente.get("/api/backup/prefeitura/", {"prefeitura": prefeitura.pk})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        arquivo = io.BytesIO(b"".join(resposta.streaming_content))
+
+        manifesto, _, problemas = verificar_backup(arquivo)
+        self.assertEqual(problemas, [])
+        self.assertEqual(manifesto["linhas"]["receitas.xlsx"], 1)
+        with zipfile.ZipFile(arquivo) as zf:
+            linhas = list(load_workbook(io.BytesIO(zf.read("receitas.xlsx")), read_only=True).active.values)
+        self.assertEqual(len(linhas), 2)
+        self.assertIn("01/01/2099", linhas[1])
+
+
+class MidiaPorConteudoTests(TestCase):
+    """Anexos com o mesmo conteúdo dividem um arquivo; o último a sair o apaga (services/midia.py)."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.prefeitura = criar_prefeitura()
+
+    def _anexo(self, conteudo, nome="doc.PDF"):
+        from django.contrib.contenttypes.models import ContentType
+
+        from .models import Anexo
+
+        return Anexo.objects.create(
+            arquivo=ContentFile(conteudo, name=nome),
+            content_type=ContentType.objects.get_for_model(Prefeitura), object_id=self.prefeitura.pk,
+        )
+
+    def _existe(self, nome):
+        import os
+
+        return os.path.exists(os.path.join(self.media, nome))
+
+    def test_referencias_e_exclusao(self):
+        from .models import ArquivoConteudo
+
+        a = self._anexo(b"mesmo conteudo", "ata.PDF")
+        b = self._anexo(b"mesmo conteudo", "copia.pdf")
+        outro = self._anexo(b"outro conteudo")
+        self.assertEqual(a.arquivo.name, b.arquivo.name)
+        self.assertTrue(a.arquivo.name.startswith("conteudo/") and a.arquivo.name.endswith(".pdf"))
+        self.assertEqual((a.nome, b.nome), ("ata.PDF", "copia.pdf"))
+        nome = a.arquivo.name
+        self.assertEqual(ArquivoConteudo.objects.get(nome=nome).referencias, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        self.assertTrue(self._existe(nome))
+        self.assertEqual(ArquivoConteudo.objects.get(nome=nome).referencias, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            type(b).objects.filter(pk=b.pk).delete()
+        self.assertFalse(self._existe(nome))
+        self.assertFalse(ArquivoConteudo.objects.filter(nome=nome).exists())
+        self.assertTrue(self._existe(outro.arquivo.name))
+
+    def test_troca_de_arquivo_libera_o_anterior(self):
+        from .models import Anexo, ArquivoConteudo
+
+        anexo = self._anexo(b"versao 1")
+        antigo = anexo.arquivo.name
+        anexo = Anexo.objects.get(pk=anexo.pk)
+        anexo.arquivo = ContentFile(b"versao 2", name="doc.pdf")
+        with self.captureOnCommitCallbacks(execute=True):
+            anexo.save()
+        self.assertNotEqual(anexo.arquivo.name, antigo)
+        self.assertFalse(self._existe(antigo))
+        self.assertEqual(list(ArquivoConteudo.objects.values_list("nome", "referencias")),
+                         [(anexo.arquivo.name, 1)])
+
+    def test_recontar_e_deduplicar(self):
+        import os
+
+        from .models import Anexo, ArquivoConteudo
+        from .services import midia
+
+        # dois anexos antigos (antes do armazenamento por conteúdo) com o mesmo arquivo
+        os.makedirs(os.path.join(self.media, "anexos"))
+        for nome in ("a.txt", "b.txt"):
+            with open(os.path.join(self.media, "anexos", nome), "wb") as f:
+                f.write(b"repetido")
+        a, b = self._anexo(b"x"), self._anexo(b"y")
+        Anexo.objects.filter(pk=a.pk).update(arquivo="anexos/a.txt")
+        Anexo.objects.filter(pk=b.pk).update(arquivo="anexos/b.txt")
+        faltando = self._anexo(b"z")
+        Anexo.objects.filter(pk=faltando.pk).update(arquivo="anexos/sumiu.txt")
+
+        # os update() passaram por fora dos sinais: recontar apaga os três arquivos sem dono
+        self.assertEqual(midia.recontar(), (0, 3))
+        self.assertFalse(ArquivoConteudo.objects.exists())
+
+        resultado = midia.deduplicar()
+        self.assertEqual(resultado, {"convertidos": 2, "faltando": 1, "bytes_antes": 16, "bytes_depois": 8})
+        nomes = set(Anexo.objects.filter(pk__in=[a.pk, b.pk]).values_list("arquivo", flat=True))
+        self.assertEqual(len(nomes), 1)
+        nome = nomes.pop()
+        self.assertTrue(self._existe(nome))
+        self.assertFalse(self._existe("anexos/a.txt") or self._existe("anexos/b.txt"))
+        self.assertEqual(ArquivoConteudo.objects.get(nome=nome).referencias, 2)
+
+
+class ParcelasEmLoteTests(TestCase):
+    """gerar_receitas_para_servico(..., 'parcelado'): um INSERT para todas as parcelas."""
+
+    def setUp(self):
+        self.prefeitura = criar_prefeitura()
+        cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=self.prefeitura)
+        tumulo = Tumulo.objects.create(cemiterio=cemiterio, quadra=Quadra.objects.create(codigo="Q1", cemiterio=cemiterio),
+                                       identificador="T1")
+        ConcessaoContrato.objects.bulk_create([ConcessaoContrato(
+            numero_contrato="C-1", nome="Titular", cpf="52998224725", tumulo=tumulo, prefeitura=self.prefeitura,
+            valor_total=0, quantidade_parcelas=1,
+        )])
+        self.contrato = ConcessaoContrato.objects.get(numero_contrato="C-1")
+        self.cemiterio = cemiterio
+
+    def _gerar(self, valor, parcelas):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .utils import gerar_receitas_para_servico
+
+        with CaptureQueriesContext(connection) as consultas:
+            gerar_receitas_para_servico(self.contrato, "Concessão", "parcelado", Decimal(valor), parcelas=parcelas,
+                                        nome="Titular", cpf="52998224725", numero_documento="C-1")
+        return [q["sql"] for q in consultas.captured_queries if "sepultados_gestao_receita" in q["sql"]]
+
+    def test_parcelas(self):
+        from dateutil.relativedelta import relativedelta
+
+        sql = self._gerar("100.00", 3)
+        self.assertEqual(sum(q.startswith("INSERT") for q in sql), 1)
+        self.assertFalse(any(q.startswith("UPDATE") for q in sql))
+
+        receitas = list(Receita.objects.order_by("data_vencimento"))
+        hoje = date.today()
+        self.assertEqual([r.valor_total for r in receitas], [Decimal("33.33"), Decimal("33.33"), Decimal("33.34")])
+        self.assertEqual([r.data_vencimento for r in receitas], [hoje + relativedelta(months=i) for i in range(3)])
+        for r in receitas:
+            self.assertEqual((r.contrato_id, r.cemiterio_id, r.numero_documento, r.status),
+                             (self.contrato.pk, self.cemiterio.pk, "C-1", "aberto"))
+            self.assertEqual(r.valor_em_aberto, r.valor_total)
+
+        # os valores gravados sem save() são os mesmos que o save() calcularia
+        for r in receitas:
+            antes = (r.valor_em_aberto, r.multa, r.juros, r.mora_diaria, r.status)
+            r.save()
+            r.refresh_from_db()
+            self.assertEqual((r.valor_em_aberto, r.multa, r.juros, r.mora_diaria, r.status), antes)
+
+    def test_auditoria_e_versao(self):
+        from django.db.models import Sum
+
+        from .models import RegistroAuditoria
+        from .services.versoes import obter
+
+        usuario = Usuario.objects.create(email="parc@teste.com", first_name="Parc", prefeitura=self.prefeitura)
+        antes, _ = obter("prefeitura", self.prefeitura.pk)
+        with mock.patch("crum.get_current_user", return_value=usuario), \
+                self.captureOnCommitCallbacks(execute=True):
+            self._gerar("10.00", 12)
+
+        self.assertEqual(Receita.objects.count(), 12)
+        self.assertEqual(Receita.objects.aggregate(t=Sum("valor_total"))["t"], Decimal("10.00"))
+        self.assertEqual(obter("prefeitura", self.prefeitura.pk)[0], antes + 1)
+        registro = RegistroAuditoria.objects.get()
+        self.assertEqual((registro.acao, registro.modelo, registro.usuario, registro.prefeitura),
+                         ("add", "Receita", usuario, self.prefeitura))
+        self.assertIn("12 parcela(s) de C-1", registro.representacao)
+
+
+class ResumoReceitasTests(TestCase):
+    """Faixas de atraso e totais do resumo financeiro (services/financeiro.py)."""
+
+    HOJE = date(2030, 6, 30)
+
+    def setUp(self):
+        self.prefeitura = criar_prefeitura()
+
+    def _receita(self, dias_atraso, valor="10.00", pago="0.00", **extra):
+        valor, pago = Decimal(valor), Decimal(pago)
+        return Receita(
+            prefeitura=self.prefeitura, descricao="Taxa", valor_total=valor, valor_pago=pago,
+            valor_em_aberto=valor - pago, data_vencimento=self.HOJE - timedelta(days=dias_atraso),
+            status="pago" if pago >= valor else ("parcial" if pago else "aberto"), **extra,
+        )
+
+    def test_faixas_de_atraso(self):
+        from .services.financeiro import calcular_resumo
+
+        # as bordas de cada faixa, com valores distintos para conferir as somas
+        Receita.objects.bulk_create([
+            self._receita(-1, "1.00"), self._receita(0, "2.00"), self._receita(30, "4.00"),
+            self._receita(31, "8.00"), self._receita(60, "16.00", pago="6.00"), self._receita(61, "32.00"),
+            self._receita(90, "64.00"), self._receita(91, "128.00"),
+            self._receita(400, "256.00", pago="256.00"),  # paga: fica fora do atraso
+        ])
+
+        resumo = calcular_resumo(self.prefeitura.pk, hoje=self.HOJE)
+        self.assertEqual(resumo["data_referencia"], "2030-06-30")
+        self.assertEqual(
+            {faixa: (g["quantidade"], g["valor_total"]) for faixa, g in resumo["por_atraso"].items()},
+            {"a_vencer": (1, Decimal("1.00")), "0-30": (2, Decimal("6.00")), "31-60": (2, Decimal("24.00")),
+             "61-90": (2, Decimal("96.00")), "90+": (1, Decimal("128.00"))},
+        )
+        self.assertEqual(list(resumo["por_atraso"]), ["a_vencer", "0-30", "31-60", "61-90", "90+"])
+        self.assertEqual(resumo["por_atraso"]["31-60"]["valor_em_aberto"], Decimal("18.00"))
+        self.assertEqual(resumo["total"], {"quantidade": 9, "valor_total": Decimal("511.00"),
+                                           "valor_pago": Decimal("262.00"), "valor_em_aberto": Decimal("249.00")})
+        self.assertEqual({s: g["quantidade"] for s, g in resumo["por_status"].items()},
+                         {"aberto": 7, "parcial": 1, "pago": 1})
+        self.assertEqual(resumo["por_mes"]["2029-05"]["valor_total"], Decimal("256.00"))
+        self.assertEqual(list(resumo["por_mes"]), sorted(resumo["por_mes"]))
+
+        # o filtro de datas é sobre o vencimento
+        filtrado = calcular_resumo(self.prefeitura.pk, hoje=self.HOJE, data_inicio=self.HOJE - timedelta(days=30),
+                                   data_fim=self.HOJE)
+        self.assertEqual(filtrado["total"]["quantidade"], 2)
+        self.assertEqual(filtrado["por_atraso"]["a_vencer"]["quantidade"], 0)
+
+    def test_por_servico_e_cemiterio(self):
+        from .services.financeiro import calcular_resumo
+
+        cemiterio = Cemiterio.objects.create(nome="Cemitério", prefeitura=self.prefeitura)
+        outro = Cemiterio.objects.create(nome="Outro", prefeitura=self.prefeitura)
+        tumulos = [
+            Tumulo.objects.create(cemiterio=c, quadra=Quadra.objects.create(codigo="Q1", cemiterio=c),
+                                  identificador="T1")
+            for c in (cemiterio, outro)
+        ]
+        ConcessaoContrato.objects.bulk_create([
+            ConcessaoContrato(numero_contrato=f"C-{i}", nome="Titular", cpf="52998224725", tumulo=t,
+                              prefeitura=self.prefeitura, valor_total=0, quantidade_parcelas=1)
+            for i, t in enumerate(tumulos)
+        ])
+        c0, c1 = ConcessaoContrato.objects.order_by("numero_contrato")
+        Receita.objects.bulk_create([
+            self._receita(10, "5.00", contrato=c0, cemiterio=cemiterio),
+            self._receita(10, "7.00", contrato=c1, cemiterio=outro),
+            self._receita(10, "3.00"),
+        ])
+
+        resumo = calcular_resumo(self.prefeitura.pk, hoje=self.HOJE)
+        self.assertEqual({s: g["valor_total"] for s, g in resumo["por_servico"].items()},
+                         {"contrato": Decimal("12.00"), "diversa": Decimal("3.00")})
+        # a receita diversa entra em todos os cemitérios
+        do_cemiterio = calcular_resumo(self.prefeitura.pk, hoje=self.HOJE, cemiterio_id=cemiterio.pk)
+        self.assertEqual(do_cemiterio["total"]["valor_total"], Decimal("8.00"))
+
+    def test_endpoint_cache_e_etag(self):
+        from rest_framework.test import APIClient
+
+        Receita.objects.bulk_create([Receita(
+            prefeitura=self.prefeitura, descricao="Taxa", valor_total=Decimal("10.00"),
+            valor_em_aberto=Decimal("10.00"), data_vencimento=date.today() - timedelta(days=45),
+        )])
+        cliente = APIClient()
+        cliente.force_authenticate(Usuario.objects.create(email="fin@teste.com", first_name="Fin",
+                                                          prefeitura=self.prefeitura))
+        url = "/api/relatorios/receitas/resumo/"
+        parametros = {"prefeitura": self.prefeitura.pk}
+
+        resposta = cliente.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data["por_atraso"]["31-60"]["quantidade"], 1)
+        etag = resposta["ETag"]
+        self.assertEqual(cliente.get(url, parametros, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # uma receita nova sobe a versão: nem 304 nem o resumo antigo do cache
+        with self.captureOnCommitCallbacks(execute=True):
+            Receita.objects.create(prefeitura=self.prefeitura, descricao="Taxa", valor_total=Decimal("5.00"),
+                                   data_vencimento=date.today() + timedelta(days=5))
+        resposta = cliente.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data["por_atraso"]["a_vencer"]["quantidade"], 1)
+        self.assertEqual(resposta.data["total"]["quantidade"], 2)
+
+        self.assertEqual(cliente.get(url).status_code, 400)
+        self.assertEqual(cliente.get(url, {**parametros, "data_inicio": "31/12/2030"}).status_code, 400)
+
+
+class CemiterioDaReceitaTests(TestCase):
+    """Receita.cemiterio: preenchido na migration, acompanha o túmulo do serviço e é conferido pelo comando."""
+
+    def setUp(self):
+        self.prefeitura = criar_prefeitura()
+        self.cemiterios, self.tumulos = [], []
+        for nome in ("Norte", "Sul"):
+            cemiterio = Cemiterio.objects.create(nome=nome, prefeitura=self.prefeitura)
+            quadra = Quadra.objects.create(codigo="Q1", cemiterio=cemiterio)
+            self.cemiterios.append(cemiterio)
+            self.tumulos += [Tumulo.objects.create(cemiterio=cemiterio, quadra=quadra, identificador=f"T{i}")
+                             for i in (1, 2)]
+        ConcessaoContrato.objects.bulk_create([
+            ConcessaoContrato(numero_contrato=f"C-{i}", nome="Titular", cpf="52998224725", tumulo=t,
+                              prefeitura=self.prefeitura, valor_total=0, quantidade_parcelas=1)
+            for i, t in enumerate(self.tumulos)
+        ])
+        self.contrato = ConcessaoContrato.objects.get(numero_contrato="C-0")
+
+    def _receitas(self, **servico):
+        criadas = Receita.objects.bulk_create([
+            Receita(prefeitura=self.prefeitura, descricao="Parcela", valor_total=Decimal("10.00"),
+                    valor_em_aberto=Decimal("10.00"), data_vencimento=date(2099, 1, d), **servico)
+            for d in (1, 2)
+        ])
+        return Receita.objects.filter(pk__in=[r.pk for r in criadas])
+
+    def _cemiterios(self, receitas):
+        return set(receitas.values_list("cemiterio_id", flat=True))
+
+    def test_migration_preenche(self):
+        import importlib
+        from types import SimpleNamespace
+
+        from django.apps import apps
+        from django.db import connection
+
+        preencher = importlib.import_module("sepultados_gestao.migrations.0020_receita_cemiterio").preencher_cemiterio
+        do_contrato = self._receitas(contrato=self.contrato)
+        diversas = self._receitas()
+        self.assertEqual(self._cemiterios(do_contrato), {None})
+
+        with mock.patch.dict(preencher.__globals__, LOTE=1):
+            preencher(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self._cemiterios(do_contrato), {self.cemiterios[0].pk})
+        self.assertEqual(self._cemiterios(diversas), {None})
+
+    def test_troca_de_tumulo_acompanha(self):
+        from .models import Sepultado
+
+        receitas = self._receitas(contrato=self.contrato)
+        for r in receitas:
+            r.save()  # o save() grava o cemitério do serviço
+        self.assertEqual(self._cemiterios(receitas), {self.cemiterios[0].pk})
+        atualizado_antes = set(receitas.values_list("atualizado_em", flat=True))
+
+        # o contrato passa para um túmulo do outro cemitério: um UPDATE nas receitas dele
+        ConcessaoContrato.objects.filter(tumulo=self.tumulos[3]).delete()
+        self.contrato.tumulo = self.tumulos[3]
+        self.contrato.save()
+        self.assertEqual(self._cemiterios(receitas), {self.cemiterios[1].pk})
+        self.assertTrue(set(receitas.values_list("atualizado_em", flat=True)).isdisjoint(atualizado_antes))
+
+        # sepultado mudado de túmulo: a receita do sepultamento vai junto
+        sepultado = Sepultado(nome="Fulano", tumulo=self.tumulos[1], data_falecimento=date(2020, 1, 1),
+                              data_sepultamento=date(2020, 1, 2))
+        sepultado.save()
+        do_sepultado = self._receitas(sepultado=sepultado)
+        Receita.objects.filter(sepultado=sepultado).update(cemiterio=self.cemiterios[0])
+        sepultado.tumulo = self.tumulos[2]
+        sepultado.save()
+        self.assertEqual(self._cemiterios(do_sepultado), {self.cemiterios[1].pk})
+
+    def test_comando_ressincroniza(self):
+        import io
+
+        from django.core.management import call_command
+
+        receitas = self._receitas(contrato=self.contrato)
+        diversas = self._receitas()
+        # ajustes direto no banco (sem sinais): túmulo trocado de quadra e uma receita com cemitério errado
+        Tumulo.objects.filter(pk=self.tumulos[0].pk).update(quadra=self.tumulos[2].quadra,
+                                                            cemiterio=self.cemiterios[1])
+        Receita.objects.filter(pk=diversas.first().pk).update(cemiterio=self.cemiterios[0])
+
+        saida = io.StringIO()
+        call_command("sincronizar_cemiterio_receitas", "--lote", "1", stdout=saida)
+        self.assertIn("2 receita(s) conferida(s), 2 corrigida(s)", saida.getvalue())
+        self.assertEqual(self._cemiterios(receitas), {self.cemiterios[1].pk})
+        # sem serviço a receita não é conferida (fica como estava)
+        self.assertEqual(self._cemiterios(diversas), {self.cemiterios[0].pk, None})
+
+        saida = io.StringIO()
+        call_command("sincronizar_cemiterio_receitas", stdout=saida)
+        self.assertIn("2 receita(s) conferida(s), 0 corrigida(s)", saida.getvalue())
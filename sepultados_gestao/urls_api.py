@@ -27,6 +27,7 @@ from .views_api import (
     ImportQuadrasAPIView,
     ImportTumulosAPIView,
     ImportSepultadosAPIView,
+    ImportacaoPlanilhaViewSet,
     # Seleção cemitério
     selecionar_cemiterio_api,
     # PDF auditorias (retorna URL)
@@ -47,6 +48,7 @@ router.register(r"sepultados", SepultadoViewSet)
 router.register(r"traslados", TransladoViewSet, basename="traslados")
 router.register(r"tumulos", TumuloViewSet)
 router.register(r"anexos", AnexoViewSet, basename="anexo")
+router.register(r"importacoes", ImportacaoPlanilhaViewSet)
 
 urlpatterns = [
     # rotas “soltas” antes do router
@@ -1,33 +1,51 @@
 from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from .models import NumeroSequencialGlobal
 
 
-@transaction.atomic
-def gerar_numero_sequencial_global(prefeitura):
+def reservar_numeros_sequenciais(prefeitura, quantidade=1):
     """
-    Gera um número sequencial único no formato XX/AAAA para qualquer serviço da prefeitura.
+    Reserva `quantidade` números seguidos da sequência XX/AAAA da prefeitura
+    e devolve a lista já formatada.
+
+    A sequência é uma linha-contador por (prefeitura, ano), incrementada com
+    um único UPDATE (F-expression); o UPDATE trava a linha até o fim da
+    transação, então a leitura seguinte enxerga só o nosso incremento.
+    Um bloco de N números custa o mesmo que um número só.
     """
+    quantidade = int(quantidade)
+    if quantidade < 1:
+        return []
+
+    prefeitura_id = getattr(prefeitura, "pk", prefeitura)
     ano = datetime.now().year
-    ultimo = (
-        NumeroSequencialGlobal.objects
-        .select_for_update()
-        .filter(prefeitura=prefeitura, ano=ano)
-        .order_by('-numero')
-        .first()
-    )
+    contador = NumeroSequencialGlobal.objects.filter(prefeitura_id=prefeitura_id, ano=ano)
 
-    proximo = 1 if not ultimo else ultimo.numero + 1
+    with transaction.atomic():
+        if not contador.update(numero=F("numero") + quantidade):
+            # primeiro número do ano: cria a linha; se outra transação criou
+            # ao mesmo tempo, cai no UPDATE normal
+            try:
+                with transaction.atomic():
+                    NumeroSequencialGlobal.objects.create(
+                        prefeitura_id=prefeitura_id, ano=ano, numero=quantidade
+                    )
+            except IntegrityError:
+                contador.update(numero=F("numero") + quantidade)
+        ultimo = contador.values_list("numero", flat=True).get()
 
-    NumeroSequencialGlobal.objects.create(
-        prefeitura=prefeitura,
-        numero=proximo,
-        ano=ano
-    )
+    primeiro = ultimo - quantidade + 1
+    return [f"{n}/{ano}" for n in range(primeiro, ultimo + 1)]
 
-    return f"{proximo}/{ano}"
+
+def gerar_numero_sequencial_global(prefeitura):
+    """
+    Gera um número sequencial único no formato XX/AAAA para qualquer serviço da prefeitura.
+    """
+    return reservar_numeros_sequenciais(prefeitura, 1)[0]
 
 
 from datetime import date
@@ -63,6 +81,8 @@ def gerar_receitas_para_servico(servico, descricao, forma_pagamento, valor_total
     else:
         raise ValueError("Tipo de serviço não suportado.")
 
+    dados_comuns["cemiterio_id"] = Receita(**dados_comuns).cemiterio_id_do_servico()
+
     if forma_pagamento == 'gratuito':
         Receita.objects.create(
             **dados_comuns,
@@ -82,22 +102,62 @@ def gerar_receitas_para_servico(servico, descricao, forma_pagamento, valor_total
         )
 
     elif forma_pagamento == 'parcelado':
-        valor_parcela = (valor_total / parcelas).quantize(Decimal("0.01"))
-        valor_total_calculado = valor_parcela * parcelas
-        diferenca = valor_total - valor_total_calculado
-
-        for i in range(parcelas):
-            valor_final = valor_parcela
-            if i == parcelas - 1:
-                valor_final += diferenca
-
-            Receita.objects.create(
-                **dados_comuns,
-                valor_total=valor_final,
-                valor_em_aberto=valor_final,
-                status='aberto',
-                data_vencimento=date.today() + relativedelta(months=i)
-            )
+        _gerar_parcelas(Receita, dados_comuns, valor_total, parcelas)
+
+
+def _gerar_parcelas(Receita, dados_comuns, valor_total, parcelas):
+    """
+    Monta todas as parcelas em memória e grava com um único bulk_create.
+
+    Vencimentos a partir de hoje: o save() da Receita não teria encargos a
+    calcular (multa/juros/mora ficam zerados e valor_em_aberto = valor_total),
+    então os valores já saem prontos daqui. Como o bulk_create não dispara os
+    sinais, a versão da prefeitura é tocada aqui e a auditoria vira um único
+    registro com o resumo das parcelas.
+    """
+    from crum import get_current_user
+    from .services.auditoria import deve_ignorar, registrar
+    from .services.versoes import tocar
+    from .session_context.thread_local import get_prefeitura_ativa
+
+    hoje = date.today()
+    valor_parcela = (valor_total / parcelas).quantize(Decimal("0.01"))
+    valor_total_calculado = valor_parcela * parcelas
+    diferenca = valor_total - valor_total_calculado
+
+    receitas = []
+    for i in range(parcelas):
+        valor_final = valor_parcela
+        if i == parcelas - 1:
+            valor_final += diferenca
+
+        receitas.append(Receita(
+            **dados_comuns,
+            valor_total=valor_final,
+            valor_em_aberto=max(valor_final, Decimal("0.00")).quantize(Decimal("0.01")),
+            status='aberto',
+            data_vencimento=hoje + relativedelta(months=i)
+        ))
+
+    with transaction.atomic():
+        Receita.objects.bulk_create(receitas)
+        tocar("prefeitura", dados_comuns["prefeitura"].pk)
+
+        usuario = get_current_user()
+        if deve_ignorar(Receita) or not usuario or not usuario.is_authenticated:
+            return receitas
+        prefeitura = get_prefeitura_ativa() or dados_comuns["prefeitura"] or getattr(usuario, "prefeitura", None)
+        registrar(
+            usuario=usuario,
+            acao="add",
+            modelo="Receita",
+            representacao=(
+                f"{parcelas} parcela(s) de {dados_comuns['numero_documento']} "
+                f"(R$ {valor_total}, vencimentos de {hoje:%d/%m/%Y} a {receitas[-1].data_vencimento:%d/%m/%Y})"
+            ),
+            prefeitura=prefeitura,
+        )
+    return receitas
 
 def obter_prefeitura_ativa_do_request(request):
     from .models import Prefeitura
@@ -119,18 +179,16 @@ def validar_prefeitura_obrigatoria(instance):
         raise ValidationError("A prefeitura vinculada é obrigatória para este registro.")
 
 
-from django.utils.timezone import now
-
 def registrar_auditoria(usuario, acao, modelo, objeto_id=None, representacao=None, prefeitura=None):
-    from .models import RegistroAuditoria  # <-- IMPORTAÇÃO LOCAL
+    from .services.auditoria import registrar  # <-- IMPORTAÇÃO LOCAL
 
-    RegistroAuditoria.objects.create(
+    # entra no lote de auditoria aberto (gravado com bulk_create no fim)
+    registrar(
         usuario=usuario,
         acao=acao,
         modelo=modelo,
-        objeto_id=str(objeto_id) if objeto_id else "",
-        representacao=representacao or "",
-        data_hora=now(),
+        objeto_id=objeto_id,
+        representacao=representacao,
         prefeitura=prefeitura
     )
 
@@ -30,6 +30,7 @@ from .models import (
     Cemiterio,
     ConcessaoContrato,
     Exumacao,
+    ImportacaoPlanilha,
     Quadra,
     Receita,
     RegistroAuditoria,
@@ -50,6 +51,7 @@ from .serializers import (
     QuadraSerializer,
     ReceitaSerializer,
     RegistroAuditoriaSerializer,
+    ImportacaoPlanilhaSerializer,
     SepultadoSerializer,
     TransladoSerializer,
     TumuloSerializer,
@@ -170,12 +172,27 @@ class CemiterioViewSet(PrefeituraRestritaQuerysetMixin, viewsets.ModelViewSet):
 # views_api.py
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from .mixins import VersaoETagMixin
 
-class QuadraViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
+class QuadraViewSet(VersaoETagMixin, ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
     queryset = Quadra.objects.all()
     serializer_class = QuadraSerializer
     cemiterio_field = "cemiterio"
     prefeitura_field = "cemiterio__prefeitura"
+    versao_prefixo = "quadras-"
+
+    def escopo_versao(self):
+        # mesmo contexto do get_queryset: ?cemiterio / sessão, senão prefeitura
+        req = self.request
+        if not req.user.is_authenticated:
+            return None
+        cem_id = req.query_params.get("cemiterio") or req.session.get("cemiterio_ativo")
+        if cem_id and str(cem_id).isdigit():
+            return ("cemiterio", int(cem_id))
+        pref_id = req.query_params.get("prefeitura") or getattr(getattr(req, "prefeitura_ativa", None), "id", None)
+        if pref_id and str(pref_id).isdigit():
+            return ("prefeitura", int(pref_id))
+        return None
 
     # 🔓 Leitura pública; gravação exige login
     def get_permissions(self):
@@ -208,23 +225,28 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 # MODELOS / SERIALIZERS
-from .models import Tumulo, ConcessaoContrato  # <— garante o import do contrato
+from .models import Tumulo, ConcessaoContrato, Quadra, Cemiterio  # <— garante o import do contrato
 from .serializers import TumuloSerializer
+from .services import versoes
+from .mixins import CamposEsparsosMixin, VersaoETagMixin
 
 # mesma view de PDF usada no admin (views.py)
 from .views import gerar_pdf_sepultados_tumulo as pdf_view
 
 
-class TumuloViewSet(viewsets.ModelViewSet):
+class TumuloViewSet(CamposEsparsosMixin, VersaoETagMixin, viewsets.ModelViewSet):
     """
     ViewSet dos Túmulos com:
       - filtro por quadra/cemitério/prefeitura (via querystring ou sessão)
       - anotação de informações de contrato (tem_contrato_ativo / id / numero)
       - action GET /api/tumulos/<id>/pdf_sepultados/ para abrir o mesmo PDF do admin
+      - ETag pela versão do cemitério/prefeitura (304 em If-None-Match)
     """
     queryset = Tumulo.objects.all()
     serializer_class = TumuloSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ("id",)  # paginação por cursor (?cursor= / ?page_size=)
+    versao_prefixo = "tumulos-"
 
     # campos relacionais para facilitar filtros
     _cemiterio_field = "quadra__cemiterio_id"
@@ -255,6 +277,17 @@ class TumuloViewSet(viewsets.ModelViewSet):
 
         return pref_id, cem_id, quadra_id
 
+    def escopo_versao(self):
+        pref_id, cem_id, quadra_id = self._context_ids(self.request)
+        if quadra_id:
+            cem_id = Quadra.objects.filter(pk=quadra_id).values_list("cemiterio_id", flat=True).first()
+            return ("cemiterio", cem_id) if cem_id else None
+        if cem_id:
+            return ("cemiterio", cem_id)
+        if pref_id:
+            return ("prefeitura", pref_id)
+        return None
+
     # ----------------- queryset -----------------
     def get_queryset(self):
         qs = super().get_queryset().select_related("quadra", "quadra__cemiterio")
@@ -322,6 +355,92 @@ class TumuloViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"detail": f"Erro ao gerar PDF: {e}"}, status=500)
 
+    # ----------------- mapa (payload colunar) -----------------
+    STATUS_CODIGOS = ("disponivel", "ocupado", "reservado")
+
+    def _parse_bbox(self, txt):
+        """?bbox=oeste,sul,leste,norte (lng/lat em graus)."""
+        try:
+            oeste, sul, leste, norte = (float(x) for x in str(txt).split(","))
+        except Exception:
+            return None
+        return min(oeste, leste), min(sul, norte), max(oeste, leste), max(sul, norte)
+
+    @action(detail=False, methods=["get"], url_path="mapa")
+    def mapa(self, request):
+        """
+        GET /api/tumulos/mapa/?cemiterio=<id>[&quadra=<id>][&bbox=oeste,sul,leste,norte]
+
+        Só os túmulos com localização, em colunas paralelas (mesmo índice = mesmo túmulo):
+        id, lat, lng, angulo (do túmulo ou, se vazio, da quadra), comprimento, largura,
+        status (índice em `status_codigos`) e contrato (1/0).
+        ETag/Last-Modified vêm da versão do cemitério: sem alteração, responde 304.
+        """
+        pref_id, cem_id, quadra_id = self._context_ids(request)
+        if not cem_id and quadra_id:
+            cem_id = Quadra.objects.filter(pk=quadra_id).values_list("cemiterio_id", flat=True).first()
+        if not cem_id:
+            return Response({"detail": "Informe ?cemiterio=<id> (ou selecione no sistema)."}, status=400)
+        if pref_id and not Cemiterio.objects.filter(pk=cem_id, prefeitura_id=pref_id).exists():
+            return Response({"detail": "Acesso negado para este cemitério (prefeitura)."}, status=403)
+
+        bbox = None
+        if request.query_params.get("bbox"):
+            bbox = self._parse_bbox(request.query_params["bbox"])
+            if bbox is None:
+                return Response({"detail": "bbox inválido. Use oeste,sul,leste,norte."}, status=400)
+
+        etag, last_modified = versoes.validadores("cemiterio", cem_id, prefixo="mapa-")
+        nao_mudou = versoes.resposta_condicional(request, etag, last_modified)
+        if nao_mudou is not None:
+            return nao_mudou
+
+        qs = Tumulo.objects.filter(cemiterio_id=cem_id, localizacao__isnull=False)
+        if quadra_id:
+            qs = qs.filter(quadra_id=quadra_id)
+        if bbox:
+            oeste, sul, leste, norte = bbox
+            qs = qs.filter(
+                localizacao__lng__gte=oeste, localizacao__lng__lte=leste,
+                localizacao__lat__gte=sul, localizacao__lat__lte=norte,
+            )
+
+        angulo_quadra = {}
+        for q_id, grid in Quadra.objects.filter(cemiterio_id=cem_id).values_list("id", "grid_params"):
+            try:
+                angulo_quadra[q_id] = float((grid or {}).get("angulo"))
+            except (TypeError, ValueError, AttributeError):
+                angulo_quadra[q_id] = 0.0
+        com_contrato = set(
+            ConcessaoContrato.objects.filter(tumulo__cemiterio_id=cem_id).values_list("tumulo_id", flat=True)
+        )
+        codigo = {s: i for i, s in enumerate(self.STATUS_CODIGOS)}
+
+        colunas = {c: [] for c in ("id", "lat", "lng", "angulo", "comprimento", "largura", "status", "contrato")}
+        for t_id, loc, ang, comp, larg, st, q_id in qs.order_by("id").values_list(
+            "id", "localizacao", "angulo_graus", "comprimento_m", "largura_m", "status", "quadra_id"
+        ):
+            try:
+                lat, lng = float(loc["lat"]), float(loc["lng"])
+            except (TypeError, ValueError, KeyError):
+                continue
+            colunas["id"].append(t_id)
+            colunas["lat"].append(lat)
+            colunas["lng"].append(lng)
+            colunas["angulo"].append(float(ang) if ang is not None else angulo_quadra.get(q_id, 0.0))
+            colunas["comprimento"].append(float(comp or Tumulo.PADRAO_COMPRIMENTO_M))
+            colunas["largura"].append(float(larg or Tumulo.PADRAO_LARGURA_M))
+            colunas["status"].append(codigo.get(st, 0))
+            colunas["contrato"].append(1 if t_id in com_contrato else 0)
+
+        payload = {
+            "cemiterio": cem_id,
+            "total": len(colunas["id"]),
+            "status_codigos": list(self.STATUS_CODIGOS),
+            **colunas,
+        }
+        return versoes.aplicar_validadores(Response(payload), etag, last_modified)
+
 
 # views_api.py
 from rest_framework import viewsets
@@ -331,14 +450,18 @@ from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from .views import gerar_guia_sepultamento_pdf  # <- função correta do views.py
+from .mixins import CamposEsparsosMixin
+from .services import busca
 
-class SepultadoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
+class SepultadoViewSet(CamposEsparsosMixin, ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
     queryset = Sepultado.objects.all()
     serializer_class = SepultadoSerializer
     cemiterio_field = "tumulo__quadra__cemiterio"
     prefeitura_field = "tumulo__quadra__cemiterio__prefeitura"
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
+    keyset_ordering = ("-data_sepultamento", "-id")
+    acoes_campos_esparsos = ("list", "retrieve", "buscar", "busca_aproximada")
 
     def get_queryset(self):
         qs = (
@@ -353,6 +476,66 @@ class SepultadoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
             qs = qs.filter(tumulo_id=tumulo_id)
         return qs
 
+    def _parametros_busca(self, request):
+        """(q, limite, cemiterio_id, prefeitura_id) ou Response 400."""
+        q = request.query_params.get("q", "")
+        if len(busca.normalizar(q).replace(" ", "")) < 2:
+            return Response({"detail": "Informe ao menos 2 letras ou números em ?q=."}, status=400)
+        try:
+            limite = min(max(int(request.query_params.get("limite", 20)), 1), 100)
+        except ValueError:
+            return Response({"detail": "?limite= inválido."}, status=400)
+
+        # mesmo escopo do get_queryset (querystring, depois sessão/middleware)
+        cem_id = request.query_params.get("cemiterio") or request.session.get("cemiterio_ativo")
+        pref_id = request.query_params.get("prefeitura") or getattr(
+            getattr(request, "prefeitura_ativa", None), "id", None
+        )
+        cem_id = int(cem_id) if cem_id and str(cem_id).isdigit() else None
+        pref_id = int(pref_id) if pref_id and str(pref_id).isdigit() else None
+        return q, limite, cem_id, None if cem_id else pref_id
+
+    def _resultados_busca(self, ranking, campo):
+        """Serializa os sepultados na ordem do ranking, com a nota em `campo`."""
+        notas = dict(ranking)
+        objetos = {s.pk: s for s in self.filter_queryset(self.get_queryset()).filter(pk__in=notas)}
+        ordenados = [objetos[sid] for sid, _ in ranking if sid in objetos]
+
+        resultados = self.get_serializer(ordenados, many=True).data
+        for item, obj in zip(resultados, ordenados):
+            item[campo] = notas[obj.pk]
+        return Response({"count": len(resultados), "results": resultados})
+
+    @action(detail=False, methods=["get"], url_path="busca", url_name="busca")
+    def buscar(self, request):
+        """
+        /api/sepultados/busca/?q=joao silva&cemiterio=<id> (ou ?prefeitura=<id>)
+        Busca por nome, pai/mãe/cônjuge ou CPF, sem acento e por prefixo de
+        cada palavra, no índice de services/busca.py. Mais relevantes primeiro;
+        ?limite= (padrão 20, máx. 100) e ?fields=/?perfil= como na listagem.
+        """
+        params = self._parametros_busca(request)
+        if isinstance(params, Response):
+            return params
+        q, limite, cem_id, pref_id = params
+        ranking = busca.buscar(q, cemiterio_id=cem_id, prefeitura_id=pref_id, limite=limite)
+        return self._resultados_busca(ranking, "relevancia")
+
+    @action(detail=False, methods=["get"], url_path="busca-aproximada")
+    def busca_aproximada(self, request):
+        """
+        /api/sepultados/busca-aproximada/?q=luis souza&cemiterio=<id>
+        Tolera grafias diferentes (Sousa/Souza, Luis/Luiz, Ellen/Helen): chaves
+        fonéticas no índice + similaridade de trigramas. Cada resultado traz
+        "similaridade" (0 a 1); mesmos parâmetros da /busca/.
+        """
+        params = self._parametros_busca(request)
+        if isinstance(params, Response):
+            return params
+        q, limite, cem_id, pref_id = params
+        ranking = busca.buscar_aproximado(q, cemiterio_id=cem_id, prefeitura_id=pref_id, limite=limite)
+        return self._resultados_busca(ranking, "similaridade")
+
     @action(detail=True, methods=["get"], url_path="pdf")
     def pdf(self, request, pk=None):
         """
@@ -574,6 +757,7 @@ class ExumacaoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
     cemiterio_field = "tumulo__quadra__cemiterio"
     prefeitura_field = "tumulo__quadra__cemiterio__prefeitura"
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ("-data", "-id")
 
     def _prefeitura_from_request_or_relations(self, validated):
         pref = getattr(self.request, "prefeitura_ativa", None) or getattr(self.request.user, "prefeitura", None)
@@ -845,7 +1029,7 @@ class ExumacaoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
 
 from datetime import date
 from django.db import transaction
-from django.core.exceptions import ValidationError as DjangoValidationError, FieldError
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.http import HttpResponse
@@ -864,7 +1048,7 @@ from sepultados_gestao.services.arquivamento import sync_sepultado_status
 from .mixins import ContextoRestritoQuerysetMixin
 
 
-class TransladoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
+class TransladoViewSet(CamposEsparsosMixin, ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
     """
     - Lista por CEMITÉRIO do túmulo ATUAL do sepultado OU do TÚMULO DE DESTINO.
     - Gera PDF em: /api/traslados/<id>/pdf/ (aliases: /relatorio_pdf/ e /report/)
@@ -874,6 +1058,7 @@ class TransladoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
     cemiterio_field = "tumulo_destino__quadra__cemiterio"
     prefeitura_field = "tumulo_destino__quadra__cemiterio__prefeitura"
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ("-data", "-id")
     http_method_names = ["get", "post", "put", "patch", "delete", "head", "options"]
 
     # -------------------- Queryset / Filtros --------------------
@@ -922,12 +1107,7 @@ class TransladoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
         """
         if not tumulo:
             return 0
-        qs = Sepultado.objects.filter(tumulo=tumulo, exumado=False)
-        try:
-            qs = qs.filter(trasladado=False)
-        except FieldError:
-            pass
-        return qs.count()
+        return tumulo.ocupantes_ativos
 
     def _checar_capacidade_destino(self, destino, sepultado=None):
         """
@@ -980,7 +1160,8 @@ class TransladoViewSet(ContextoRestritoQuerysetMixin, viewsets.ModelViewSet):
                 fields.append("data_translado")
 
         if fields:
-            s.save(update_fields=list(set(fields)))
+            # atualizado_em (auto_now) só é gravado se estiver em update_fields: é a marca do backup incremental
+            s.save(update_fields=list(set(fields)) + ["atualizado_em"])
 
     def _render_pdf(self, translado):
         """Gera o PDF (usa prefeitura do destino; se não houver, da origem)."""
@@ -1130,8 +1311,9 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from sepultados_gestao.models import Receita
 from sepultados_gestao.serializers import ReceitaSerializer
+from .mixins import CamposEsparsosMixin
 
-class ReceitaViewSet(viewsets.ModelViewSet):
+class ReceitaViewSet(CamposEsparsosMixin, viewsets.ModelViewSet):
     """
     ViewSet das receitas.
     Filtra por prefeitura via querystring (?prefeitura=) quando informada,
@@ -1140,6 +1322,7 @@ class ReceitaViewSet(viewsets.ModelViewSet):
     queryset = Receita.objects.all().select_related("prefeitura")
     serializer_class = ReceitaSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ("-id",)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -1173,9 +1356,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from rest_framework.response import Response
+
 from .models import RegistroAuditoria
 from .serializers import RegistroAuditoriaSerializer
 from .mixins import PrefeituraRestritaQuerysetMixin
+from .services.arquivo_auditoria import buscar_arquivados
 
 class RegistroAuditoriaViewSet(PrefeituraRestritaQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = RegistroAuditoria.objects.all()
@@ -1183,11 +1369,61 @@ class RegistroAuditoriaViewSet(PrefeituraRestritaQuerysetMixin, viewsets.ReadOnl
     prefeitura_field = "prefeitura"
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication, SessionAuthentication]
+    keyset_ordering = ("-data_hora", "-id")
+
+    ACOES = {
+        "adição":"add","adicao":"add","add":"add","create":"add","criação":"add","criacao":"add",
+        "edição":"change","edicao":"change","change":"change","update":"change","edit":"change",
+        "exclusão":"delete","exclusao":"delete","delete":"delete","remoção":"delete","remocao":"delete","remove":"delete",
+    }
 
     def _parse_date(self, s: str):
         try: return datetime.strptime(s, "%Y-%m-%d").date()
         except Exception: return None
 
+    def _acao_code(self):
+        acao = (self.request.query_params.get("acao") or "").strip().lower()
+        if not acao or acao in {"todas", "todos"}:
+            return None
+        code = self.ACOES.get(acao, acao)
+        return code if code in {"add","change","delete"} else None
+
+    def _arquivados(self):
+        """Registros já movidos para o arquivo frio, quando data_inicio alcança o período."""
+        p = self.request.query_params
+        di = self._parse_date(p.get("data_inicio") or "")
+        if not di:
+            return []
+        pref_id = self.get_prefeitura_id()
+        if pref_id is None:
+            return []
+
+        usuario = (p.get("usuario") or "").strip()
+        entidade = (p.get("entidade") or "").strip()
+        code = self._acao_code()
+        return buscar_arquivados(
+            pref_id, di, self._parse_date(p.get("data_fim") or ""),
+            acoes=[code] if code else None,
+            usuario=usuario if usuario.lower() != "todos" else None,
+            modelo=entidade if entidade.lower() not in {"todas","todos"} else None,
+            q=p.get("q"),
+        )
+
+    def list(self, request, *args, **kwargs):
+        arquivados = self._arquivados()
+        if not arquivados:
+            return super().list(request, *args, **kwargs)
+
+        # quente + arquivado, na mesma ordem (-data_hora, -id) e com o mesmo cursor;
+        # paginado, cada fonte entra só com a janela depois do cursor
+        quentes = self.filter_queryset(self.get_queryset())
+        page = self.paginator.paginate_fontes([quentes, arquivados], request, view=self) if self.paginator else None
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        registros = list(quentes) + arquivados
+        registros.sort(key=lambda r: (r.data_hora, r.pk), reverse=True)
+        return Response(self.get_serializer(registros, many=True).data)
+
     def get_queryset(self):
         qs = super().get_queryset().select_related("usuario", "prefeitura")  # ✅ usa o mixin
 
@@ -1202,16 +1438,9 @@ class RegistroAuditoriaViewSet(PrefeituraRestritaQuerysetMixin, viewsets.ReadOnl
         if di: qs = qs.filter(data_hora__date__gte=di)
         if df: qs = qs.filter(data_hora__date__lte=df)
 
-        acao = (p.get("acao") or "").strip().lower()
-        if acao and acao not in {"todas", "todos"}:
-            mapa = {
-                "adição":"add","adicao":"add","add":"add","create":"add","criação":"add","criacao":"add",
-                "edição":"change","edicao":"change","change":"change","update":"change","edit":"change",
-                "exclusão":"delete","exclusao":"delete","delete":"delete","remoção":"delete","remocao":"delete","remove":"delete",
-            }
-            code = mapa.get(acao, acao)
-            if code in {"add","change","delete"}:
-                qs = qs.filter(acao__iexact=code)
+        code = self._acao_code()
+        if code:
+            qs = qs.filter(acao__iexact=code)
 
         usuario = (p.get("usuario") or "").strip()
         if usuario and usuario.lower() != "todos":
@@ -1718,18 +1947,53 @@ class BaseImportAPIView(APIView):
         # 3) sessão
         return request.session.get("cemiterio_ativo_id")  # <- chave correta
 
-    def _read_dataframe(self, arquivo):
-        nome = arquivo.name.lower()
-        if nome.endswith(".csv"):
-            return pd.read_csv(arquivo)
-        if nome.endswith(".xls") or nome.endswith(".xlsx"):
-            return pd.read_excel(arquivo)
-        raise ValueError("Formato de arquivo não suportado. Use .csv, .xls ou .xlsx.")
+    def _read_lotes(self, arquivo, minusculas=False, simulacao=False):
+        """
+        Lê a planilha em lotes de linhas (services/importacao.ler_planilha).
+        Retorna (primeiro lote, todos os lotes): o primeiro já vem lido para
+        que erros de formato/cabeçalho saiam antes de gravar qualquer coisa.
+        """
+        from .services.importacao import LOTE, LOTE_SIMULACAO, ler_planilha, primeiro_lote
+
+        tamanho = LOTE_SIMULACAO if simulacao else LOTE
+        return primeiro_lote(ler_planilha(arquivo, tamanho=tamanho, minusculas=minusculas))
+
+
+def _opcao_ligada(request, nome):
+    """?nome=1 (ou no form): assincrono, dry_run."""
+    valor = request.query_params.get(nome) or request.data.get(nome)
+    return str(valor or "").strip().lower() in ("1", "true", "sim", "s", "yes")
+
+
+def _agendar_importacao(request, tipo, cemiterio):
+    """
+    Guarda a planilha e cria a ImportacaoPlanilha para o worker
+    (manage.py processar_importacoes). Responde 202 com a URL de acompanhamento.
+    """
+    from .models import ImportacaoPlanilha
+
+    arquivo = request.FILES["arquivo"]
+    arquivo.seek(0)
+    job = ImportacaoPlanilha(
+        prefeitura_id=cemiterio.prefeitura_id,
+        cemiterio=cemiterio,
+        usuario=request.user if request.user.is_authenticated else None,
+        tipo=tipo,
+        nome_arquivo=arquivo.name[:255],
+    )
+    job.arquivo.save(arquivo.name, arquivo, save=False)
+    job.save()
+    return Response(
+        {
+            "id": job.pk,
+            "status": job.status,
+            "url": request.build_absolute_uri(reverse("importacaoplanilha-detail", args=[job.pk])),
+        },
+        status=202,
+    )
 
 
 # sepultados_gestao/views_api.py
-import json
-import re
 import pandas as pd
 from django.db import transaction
 from rest_framework.views import APIView
@@ -1751,160 +2015,26 @@ class ImportQuadrasAPIView(APIView):
       1) Texto com pares: "lat,lng lat,lng lat,lng" (apenas espaço entre pares) — também aceita ; / e quebras de linha
       2) JSON: [{"lat":-23.4,"lng":-51.9}, ...] ou [[-23.4, -51.9], ...]
       3) WKT: POLYGON((lng lat, lng lat, ...))  (atenção: WKT é LON,LAT)
+
+    ?dry_run=1 só simula (sem gravar); ?assincrono=1 agenda para o worker.
     """
     permission_classes = [IsAuthenticated]
 
-    _FLOAT_RE = re.compile(r"[-+]?\d+(?:\.\d+)?")
-    _POLY_COLUMNS = ("poligono_mapa", "limites", "polygon", "wkt", "latlng", "lat_lng")
-
     # ---------- helpers ----------
     @staticmethod
-    def _read_df(uploaded_file):
-        name = uploaded_file.name.lower()
-        if name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        elif name.endswith(".xls") or name.endswith(".xlsx"):
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError("Formato de arquivo não suportado. Use CSV/XLS/XLSX.")
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        return df
-
-    def _parse_pairs(self, s: str):
-        """
-        Varre TODOS os números e agrupa de 2 em 2 (lat,lng).
-        Funciona quando os pares estão apenas separados por ESPAÇO.
-        Também tolera ; / e quebras de linha.
-        """
-        if s is None:
-            return []
-        # normaliza separadores estranhos em espaço (para não atrapalhar a regex)
-        s = str(s).replace("|", " ").replace(";", " ").replace("/", " ").replace("\n", " ")
-        s = " ".join(s.split())  # colapsa múltiplos espaços
-        nums = self._FLOAT_RE.findall(s)
-        pts = []
-        for i in range(0, len(nums) - 1, 2):
-            try:
-                lat = float(nums[i])
-                lng = float(nums[i + 1])
-                pts.append({"lat": lat, "lng": lng})
-            except Exception:
-                # ignora par quebrado no final
-                pass
-        return pts
-
-    def _parse_wkt(self, s: str):
-        txt = s.strip()
-        if txt.upper().startswith("POLYGON"):
-            txt = txt[txt.find("((") + 2 : txt.rfind("))")]
-        pairs = [p.strip() for p in txt.split(",") if p.strip()]
-        pts = []
-        for p in pairs:
-            nums = self._FLOAT_RE.findall(p)
-            if len(nums) >= 2:
-                lng = float(nums[0]); lat = float(nums[1])  # WKT é LON,LAT
-                pts.append({"lat": lat, "lng": lng})
-        return pts
-
-    def _parse_polygon_cell(self, cell):
-        """Retorna list[{'lat','lng'}] ou []. Aceita lista, JSON, WKT ou texto com pares."""
-        if cell is None or (isinstance(cell, float) and pd.isna(cell)):
-            return []
+    def _read_lotes(uploaded_file):
+        # lotes de linhas, colunas em minúsculas (memória limitada ao lote)
+        from .services.importacao import ler_planilha
 
-        # lista já estruturada
-        if isinstance(cell, list):
-            if cell and isinstance(cell[0], dict) and "lat" in cell[0] and "lng" in cell[0]:
-                return [{"lat": float(p["lat"]), "lng": float(p["lng"])} for p in cell]
-            if cell and isinstance(cell[0], (list, tuple)) and len(cell[0]) >= 2:
-                return [{"lat": float(p[0]), "lng": float(p[1])} for p in cell]
-
-        s = str(cell).strip()
-        if not s:
-            return []
-
-        # JSON string
-        if s.startswith("[") or s.startswith("{"):
-            try:
-                j = json.loads(s)
-                return self._parse_polygon_cell(j)
-            except Exception:
-                pass
-
-        # WKT
-        if s.upper().startswith("POLYGON"):
-            try:
-                return self._parse_wkt(s)
-            except Exception:
-                pass
-
-        # Texto livre (pares separados por espaço/;///\n)
-        return self._parse_pairs(s)
+        return ler_planilha(uploaded_file, minusculas=True)
 
     def _process_df(self, df, cemiterio_id: int):
-        total, atualizados, erros = 0, 0, []
-        for idx, row in df.iterrows():
-            try:
-                codigo = str(row.get("codigo") or "").strip()
-                if not codigo:
-                    continue
-
-                # 1) pega a primeira coluna de polígono existente e não vazia
-                pol_cell = None
-                for k in self._POLY_COLUMNS:
-                    if k in df.columns:
-                        pol_cell = row.get(k)
-                        if pol_cell is not None and not (isinstance(pol_cell, float) and pd.isna(pol_cell)):
-                            break
-                poligono = self._parse_polygon_cell(pol_cell) if pol_cell is not None else []
-
-                # 2) grid (cols/rows/angulo)
-                grid = {}
-                if "grid_cols" in df.columns and pd.notna(row.get("grid_cols")):
-                    try:
-                        grid["cols"] = int(float(row.get("grid_cols")))
-                    except Exception:
-                        pass
-                if "grid_rows" in df.columns and pd.notna(row.get("grid_rows")):
-                    try:
-                        grid["rows"] = int(float(row.get("grid_rows")))
-                    except Exception:
-                        pass
-
-                # ângulo: prioriza 'angulo'; se não tiver, usa 'grid_angulo'
-                ang_val = None
-                if "angulo" in df.columns and pd.notna(row.get("angulo")) and str(row.get("angulo")) != "":
-                    ang_val = float(row.get("angulo"))
-                elif "grid_angulo" in df.columns and pd.notna(row.get("grid_angulo")) and str(row.get("grid_angulo")) != "":
-                    ang_val = float(row.get("grid_angulo"))
-                if ang_val is not None:
-                    # normaliza para 0..360 (opcional)
-                    while ang_val < 0:
-                        ang_val += 360.0
-                    while ang_val >= 360.0:
-                        ang_val -= 360.0
-                    grid["angulo"] = ang_val
-
-                # 3) defaults para update_or_create
-                defaults = {}
-                if poligono:
-                    defaults["poligono_mapa"] = poligono
-                if grid:
-                    defaults["grid_params"] = grid
-
-                with transaction.atomic():
-                    obj, created = Quadra.objects.update_or_create(
-                        cemiterio_id=cemiterio_id,
-                        codigo=codigo,
-                        defaults=defaults or {},
-                    )
-
-                total += 1
-                if not created and defaults:
-                    atualizados += 1
+        # conversão (por coluna) e gravação: services/importacao.ImportadorQuadras
+        from .models import Cemiterio
+        from .services.importacao import ImportadorQuadras
 
-            except Exception as e:
-                erros.append(f"Linha {idx + 2}: {e}")
-        return total, atualizados, erros
+        resultado = ImportadorQuadras(Cemiterio.objects.get(pk=cemiterio_id)).processar(df)
+        return resultado["importados"], resultado["atualizados"], resultado["erros"]
 
     # ---------- POST ----------
     def post(self, request):
@@ -1919,9 +2049,29 @@ class ImportQuadrasAPIView(APIView):
         if not cemiterio_id:
             return Response({"detail": "Defina o cemitério (?cemiterio=) ou selecione no sistema."}, status=400)
 
+        dry_run = _opcao_ligada(request, "dry_run")
+        if dry_run or _opcao_ligada(request, "assincrono"):
+            from .models import Cemiterio
+            from .services.importacao import primeiro_lote, simular_importacao
+
+            cemiterio = Cemiterio.objects.filter(pk=cemiterio_id).first()
+            if not cemiterio:
+                return Response({"detail": "Cemitério não encontrado."}, status=400)
+            try:
+                df, lotes = primeiro_lote(self._read_lotes(request.FILES["arquivo"]))
+            except Exception as e:
+                return Response({"detail": f"Erro ao ler planilha: {e}"}, status=400)
+            if "codigo" not in df.columns:
+                return Response({"detail": "Coluna obrigatória ausente: codigo"}, status=400)
+            if dry_run:
+                return Response(simular_importacao("quadras", lotes, cemiterio), status=200)
+            return _agendar_importacao(request, "quadras", cemiterio)
+
         try:
-            df = self._read_df(request.FILES["arquivo"])
-            total, atualizados, erros = self._process_df(df, int(cemiterio_id))
+            total, atualizados, erros = 0, 0, []
+            for df in self._read_lotes(request.FILES["arquivo"]):
+                t, a, e = self._process_df(df, int(cemiterio_id))
+                total, atualizados, erros = total + t, atualizados + a, erros + e
             return Response({"importados": total, "atualizados": atualizados, "erros": erros}, status=200)
         except Exception as e:
             return Response({"detail": f"Erro ao importar: {e}"}, status=400)
@@ -1931,8 +2081,6 @@ class ImportQuadrasAPIView(APIView):
 
 # --- Substitua sua ImportTumulosAPIView por esta versão compatível ---
 
-import re
-from decimal import Decimal, InvalidOperation
 import pandas as pd
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -1942,58 +2090,19 @@ from .models import Tumulo, Quadra
 from .views_api import BaseImportAPIView  # se esta classe já está neste arquivo, pode remover esta linha
 
 class ImportTumulosAPIView(BaseImportAPIView):
+    """
+    Importa/atualiza túmulos (chave: identificador no cemitério).
+    Validação por coluna e gravação em lote: services/importacao.py.
+    ?dry_run=1 só simula (criados/atualizados/inalterados/rejeitados, sem gravar);
+    ?assincrono=1 agenda para o worker.
+    """
     permission_classes = [IsAuthenticated]
 
-    MAPA_TIPO = {
-        "túmulo": "tumulo", "tumulo": "tumulo",
-        "perpétua": "perpetua", "perpetua": "perpetua",
-        "sepultura": "sepultura", "jazigo": "jazigo", "gaveta": "gaveta",
-        "outro": "outro"
-    }
-
-    # -------- helpers (mesmos do backend) --------
-    _NUM_RE = re.compile(r'[-+]?\d+(?:\.\d+)?')
-
-    @staticmethod
-    def _as_decimal(v, allow_none=True):
-        if v is None or (isinstance(v, float) and pd.isna(v)):
-            return None if allow_none else Decimal("0")
-        s = str(v).strip()
-        if not s:
-            return None if allow_none else Decimal("0")
-        s = s.replace(",", ".")
-        try:
-            return Decimal(s)
-        except InvalidOperation:
-            raise ValueError(f"número inválido: {v!r}")
-
-    @staticmethod
-    def _as_int(v, allow_none=True):
-        if v is None or (isinstance(v, float) and pd.isna(v)) or str(v).strip() == "":
-            return None if allow_none else 0
-        try:
-            return int(float(str(v).replace(",", ".").strip()))
-        except Exception:
-            raise ValueError(f"inteiro inválido: {v!r}")
-
-    @staticmethod
-    def _as_bool(v):
-        s = str(v).strip().lower()
-        return s in {"1", "true", "t", "sim", "s", "yes", "y"}
-
-    def _parse_coord(self, s):
-        if s is None or (isinstance(s, float) and pd.isna(s)) or str(s).strip() == "":
-            return None
-        txt = str(s).strip()
-        txt = re.sub(r'^[\(\[]\s*|\s*[\)\]]$', '', txt)
-        nums = self._NUM_RE.findall(txt.replace(",", " ").replace(";", " ").replace("/", " "))
-        if len(nums) >= 2:
-            lat = float(nums[0]); lng = float(nums[1])
-            return {"lat": lat, "lng": lng}
-        raise ValueError(f"coordenada inválida: {s!r}. Use '-23.44, -51.92'")
-
     # -------------- POST --------------
     def post(self, request):
+        from .models import Cemiterio
+        from .services.importacao import COLUNAS_TUMULOS, importar_tumulos, simular_importacao
+
         if "arquivo" not in request.FILES:
             return Response({"detail": "Envie o arquivo em 'arquivo'."}, status=400)
 
@@ -2002,84 +2111,27 @@ class ImportTumulosAPIView(BaseImportAPIView):
             return Response({"detail": "Defina o cemitério (?cemiterio=) ou selecione no sistema."}, status=400)
 
         try:
-            df = self._read_dataframe(request.FILES["arquivo"])
-            df.columns = [str(c).strip().lower() for c in df.columns]
+            df, lotes = self._read_lotes(
+                request.FILES["arquivo"], minusculas=True, simulacao=_opcao_ligada(request, "dry_run")
+            )
         except Exception as e:
             return Response({"detail": f"Erro ao ler planilha: {e}"}, status=400)
 
-        esperados = {
-            "tipo_estrutura","identificador","capacidade","quadra_codigo",
-            "usar_linha","linha","angulo","comprimento_m","largura_m","coordenada"
-        }
-        faltando = [c for c in esperados if c not in df.columns]
+        faltando = [c for c in COLUNAS_TUMULOS if c not in df.columns]
         if faltando:
             return Response({"detail": f"Colunas faltando: {', '.join(faltando)}"}, status=400)
 
-        total, atualizados, erros = 0, 0, []
-        for i, r in df.iterrows():
-            linha = i + 2  # cabeçalho = linha 1
-            try:
-                ident  = str(r.get("identificador") or "").strip()
-                if not ident:
-                    raise ValueError("identificador vazio")
+        cemiterio = Cemiterio.objects.select_related("prefeitura").filter(pk=cemiterio_id).first()
+        if not cemiterio:
+            return Response({"detail": "Cemitério não encontrado."}, status=400)
 
-                qcod = str(r.get("quadra_codigo") or "").strip()
-                if not qcod:
-                    raise ValueError("quadra_codigo vazio")
+        if _opcao_ligada(request, "dry_run"):
+            return Response(simular_importacao("tumulos", lotes, cemiterio), status=200)
+        if _opcao_ligada(request, "assincrono"):
+            return _agendar_importacao(request, "tumulos", cemiterio)
 
-                quadra_id = Quadra.objects.filter(
-                    codigo__iexact=qcod,
-                    cemiterio_id=cemiterio_id
-                ).values_list("id", flat=True).first()
-                if not quadra_id:
-                    raise ValueError(f"quadra '{qcod}' não encontrada neste cemitério")
-
-                tipo_raw   = str(r.get("tipo_estrutura") or "").strip().lower()
-                tipo       = self.MAPA_TIPO.get(tipo_raw, "tumulo")
-                capacidade = self._as_int(r.get("capacidade")) or 1
-                usar_linha = self._as_bool(r.get("usar_linha"))
-                n_linha    = self._as_int(r.get("linha")) if usar_linha else None
-
-                # novos campos
-                angulo_graus  = self._as_decimal(r.get("angulo"))
-                comprimento_m = self._as_decimal(r.get("comprimento_m"))
-                largura_m     = self._as_decimal(r.get("largura_m"))
-                localizacao   = self._parse_coord(r.get("coordenada"))
-
-                defaults = {
-                    "tipo_estrutura": tipo,
-                    "capacidade": capacidade,
-                    "usar_linha": usar_linha,
-                    "linha": n_linha,
-                    "quadra_id": quadra_id,
-                }
-                if angulo_graus is not None:
-                    defaults["angulo_graus"] = angulo_graus
-                if comprimento_m is not None:
-                    defaults["comprimento_m"] = comprimento_m
-                if largura_m is not None:
-                    defaults["largura_m"] = largura_m
-                if localizacao is not None:
-                    defaults["localizacao"] = localizacao
-
-                with transaction.atomic():
-                    obj, created = Tumulo.objects.update_or_create(
-                        cemiterio_id=cemiterio_id,
-                        identificador=ident,
-                        defaults=defaults
-                    )
-
-                total += 1
-                if not created:
-                    atualizados += 1
-
-            except Exception as e:
-                erros.append(f"Linha {linha}: {e}")
-
-        return Response(
-            {"importados": total, "atualizados": atualizados, "erros": erros},
-            status=200
-        )
+        resultado = importar_tumulos(lotes, cemiterio, usuario=request.user)
+        return Response(resultado, status=200)
 
 
 
@@ -2091,6 +2143,12 @@ class ImportSepultadosAPIView(BaseImportAPIView):
       identificador_tumulo, quadra, usar_linha, linha, nome,
       data_falecimento, data_sepultamento, cpf_sepultado, data_nascimento, sexo,
       local_nascimento, local_falecimento, nome_pai, nome_mae
+
+    Com ?modo=lote (ou modo=lote no form), usa a importação em lote de
+    services/importacao.py: sem receitas e com uma auditoria só (acervo antigo).
+    ?dry_run=1 só simula (contagens e erros, sem gravar) e exige modo=lote: a
+    simulação segue as regras da importação em lote, não as da linha a linha
+    (que gera receitas). ?assincrono=1 agenda para o worker (regras do modo lote).
     """
     def post(self, request):
         if "arquivo" not in request.FILES:
@@ -2100,11 +2158,33 @@ class ImportSepultadosAPIView(BaseImportAPIView):
         if not cemiterio_id:
             return Response({"detail": "Defina o cemitério (?cemiterio=) ou selecione no sistema."}, status=400)
 
+        modo = request.query_params.get("modo") or request.data.get("modo")
+        dry_run = _opcao_ligada(request, "dry_run")
+        if dry_run and modo != "lote":
+            return Response(
+                {"detail": "A simulação (dry_run) segue as regras da importação em lote: envie também modo=lote."},
+                status=400,
+            )
+
         try:
-            df = self._read_dataframe(request.FILES["arquivo"])
+            _, lotes = self._read_lotes(request.FILES["arquivo"], simulacao=dry_run)
         except Exception as e:
             return Response({"detail": f"Erro ao ler planilha: {e}"}, status=400)
 
+        if modo == "lote" or _opcao_ligada(request, "assincrono"):
+            from .models import Cemiterio
+            from .services.importacao import importar_sepultados, simular_importacao
+
+            cemiterio = Cemiterio.objects.select_related("prefeitura").filter(pk=cemiterio_id).first()
+            if not cemiterio:
+                return Response({"detail": "Cemitério não encontrado."}, status=400)
+            if dry_run:
+                return Response(simular_importacao("sepultados", lotes, cemiterio), status=200)
+            if _opcao_ligada(request, "assincrono"):
+                return _agendar_importacao(request, "sepultados", cemiterio)
+            resultado = importar_sepultados(lotes, cemiterio, usuario=request.user)
+            return Response(resultado, status=200)
+
         # util de data seguro
         def _date(v):
             try:
@@ -2130,9 +2210,12 @@ class ImportSepultadosAPIView(BaseImportAPIView):
 
         importados = 0
         erros = []
-        tumulos_usados = set()
 
-        for i, row in df.iterrows():
+        # linha a linha, lote a lote (o índice segue a numeração da planilha)
+        from itertools import chain
+        from .services.importacao import iterar_lotes
+
+        for i, row in chain.from_iterable(df.iterrows() for df in iterar_lotes(lotes, erros)):
             try:
                 quadra_codigo = str(row.get("quadra") or "").strip()
                 ident_tumulo  = str(row.get("identificador_tumulo") or "").strip()
@@ -2200,24 +2283,51 @@ class ImportSepultadosAPIView(BaseImportAPIView):
                         sep.numero_sepultamento = gerar_numero_sequencial_global(
                             tumulo.quadra.cemiterio.prefeitura
                         )
-                        sep.save(update_fields=["numero_sepultamento"])
+                        sep.save(update_fields=["numero_sepultamento", "atualizado_em"])
 
-                tumulos_usados.add(tumulo.id)
                 importados += 1
 
             except Exception as e:
                 erros.append(f"Linha {i+2}: {e}")
 
-        # marca túmulos como ocupados (se esse for o status padrão após sepultamento)
-        if tumulos_usados:
-            try:
-                Tumulo.objects.filter(id__in=list(tumulos_usados)).update(status="ocupado")
-            except Exception:
-                pass  # não falha a importação por isso
-
+        # o status dos túmulos já acompanha o contador de ocupantes (Sepultado.save)
         return Response({"importados": importados, "erros": erros}, status=200)
 
 
+class ImportacaoPlanilhaViewSet(PrefeituraRestritaQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Importações em segundo plano (enviadas com assincrono=1): progresso,
+    linhas/s, ETA e erros até agora. POST <id>/retomar/ devolve à fila uma
+    importação que falhou, a partir do último lote confirmado.
+    """
+    queryset = ImportacaoPlanilha.objects.select_related("cemiterio")
+    serializer_class = ImportacaoPlanilhaSerializer
+    prefeitura_field = "prefeitura"
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    lookup_value_regex = r"\d+"  # não colide com importacoes/quadras|tumulos|sepultados/
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        p = self.request.query_params
+        for campo in ("status", "tipo"):
+            if p.get(campo):
+                qs = qs.filter(**{campo: p[campo]})
+        cemiterio = p.get("cemiterio") or p.get("cemiterio_id")
+        if cemiterio and str(cemiterio).isdigit():
+            qs = qs.filter(cemiterio_id=int(cemiterio))
+        return qs
+
+    @action(detail=True, methods=["post"])
+    def retomar(self, request, pk=None):
+        from .services.importacao import retomar_importacao
+
+        job = self.get_object()
+        if not retomar_importacao(job):
+            return Response({"detail": "Só é possível retomar importações que falharam ou pararam."}, status=400)
+        return Response(self.get_serializer(job).data, status=202)
+
+
 # --- CSRF helper (GET) permanece igual ---
 from django.http import JsonResponse, HttpResponseNotAllowed
 from django.middleware.csrf import get_token
@@ -2321,8 +2431,7 @@ def auditorias_pdf_url(request):
 
 
 from datetime import date
-from django.db.models import Q, Sum, Count, Value, IntegerField
-from django.db.models.functions import Coalesce
+from .services.estatisticas import obter_estatisticas
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -2357,62 +2466,34 @@ def dashboard_resumo_api(request):
             status=400,
         )
 
-    # ---------- TÚMULOS ----------
-    tumulos = Tumulo.objects.all()
-    if cem_id:
-        tumulos = tumulos.filter(cemiterio_id=int(cem_id))
-    else:
-        tumulos = tumulos.filter(cemiterio__prefeitura_id=int(pref_id))
-
-    # Definição do filtro para o Ossário (identificador "Ossário" ou "Ossario", ignorando caixa/acentuação)
-    OSSARIO_Q = Q(identificador__iregex=r'^\s*oss[aá]rio\s*$')
-
-    # Conjunto de túmulos que NÃO são Ossário (usado para vagas/ocupação)
-    tumulos_sem_ossario = tumulos.exclude(OSSARIO_Q)
-
-    # Capacidade total (vagas) — **sem Ossário**
-    vagas_totais = tumulos_sem_ossario.aggregate(
-        total=Coalesce(Sum("capacidade"), Value(0, output_field=IntegerField()))
-    )["total"]
-
-    # ---------- SEPULTADOS ----------
-    # Todos os sepultados vinculados a algum túmulo do conjunto (INCLUI Ossário)
-    sep_all = Sepultado.objects.filter(tumulo__in=tumulos)
-    total_sepultados = sep_all.count()
-
-    # Apenas os que AINDA OCUPAM vaga (sem exumação e sem translado, e não marcados como exumado/trasladado)
-    sep_atuais = (
-        sep_all.filter(data_exumacao__isnull=True, data_translado__isnull=True)
-        .exclude(exumado=True)
-        .exclude(trasladado=True)
-    )
-    # Para a conta de vagas/ocupação, **ignore Ossário**
-    sep_atuais_sem_ossario = sep_atuais.filter(tumulo__in=tumulos_sem_ossario)
-
-    # Ocupação por túmulo (quantos ocupantes atuais por tumulo_id) — **sem Ossário**
-    occ_map = dict(
-        sep_atuais_sem_ossario.values("tumulo_id")
-        .annotate(ct=Count("id"))
-        .values_list("tumulo_id", "ct")
+    # versão do cemitério/prefeitura: 304 se o cliente já tem esses números
+    return versoes.com_versao(
+        request,
+        "cemiterio" if cem_id else "prefeitura",
+        int(cem_id) if cem_id else int(pref_id),
+        lambda: _dashboard_resumo(cem_id, pref_id),
+        prefixo="resumo-",
     )
 
-    # Túmulos livres = pelo menos 1 vaga disponível pela capacidade real — **sem Ossário**
-    livres_tumulos = 0
-    for t_id, cap in tumulos_sem_ossario.values_list("id", "capacidade"):
-        if cap - occ_map.get(t_id, 0) > 0:
-            livres_tumulos += 1
+
+def _dashboard_resumo(cem_id, pref_id):
+    # ---------- ESTATÍSTICAS (tabela materializada por cemitério) ----------
+    # Regras de Ossário e contagens ficam em services/estatisticas.py;
+    # aqui é só a leitura da linha do cemitério (ou a soma da prefeitura).
+    est = obter_estatisticas(
+        cemiterio_id=int(cem_id) if cem_id else None,
+        prefeitura_id=None if cem_id else int(pref_id),
+    )
+    total_sepultados = est["total_sepultados"]    # TODOS, inclusive Ossário
+    livres_tumulos = est["tumulos_livres"]        # sem Ossário
+    vagas_totais = est["vagas_totais"]            # sem Ossário
+    contratos_ativos = est["contratos_ativos"]
 
     # Ocupação/vagas (por pessoa) — **sem Ossário**
-    ocupantes_atuais = sep_atuais_sem_ossario.count()
-    vagas_ocupadas = min(ocupantes_atuais, vagas_totais)
+    vagas_ocupadas = min(est["vagas_ocupadas"], vagas_totais)
     vagas_livres = max(vagas_totais - vagas_ocupadas, 0)
     percentual = round((vagas_ocupadas / vagas_totais * 100) if vagas_totais else 0, 1)
 
-    # ---------- CONTRATOS ----------
-    # (mantive com todos os túmulos; se quiser ignorar ossário aqui também, troque para tumulos_sem_ossario)
-    contratos = ConcessaoContrato.objects.filter(tumulo__in=tumulos).distinct()
-    contratos_ativos = contratos.count()
-
     # ---------- RESPOSTA ----------
     data = {
         "total_sepultados": total_sepultados,       # TODOS, inclusive Ossário
@@ -1,14 +1,24 @@
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import FileResponse, HttpResponseForbidden
+from django.http import HttpResponseForbidden, StreamingHttpResponse
 from django.conf import settings
 from django.utils.timezone import localtime, now
-from django.core.management import call_command
 import os
-import zipfile
+import shutil
 import tempfile
 
 @staff_member_required
 def backup_completo(request):
+    """
+    Banco inteiro (services/backup_completo.py: um JSON-lines gzip por
+    modelo, gerados em paralelo, + manifesto) e os arquivos do MEDIA_ROOT,
+    num ZIP enviado em fluxo. Restaurar: `manage.py restaurar_backup_completo`.
+
+    O dump é gerado inteiro antes do primeiro byte sair, dentro do tempo da
+    requisição: em bancos grandes use `manage.py backup_completo` no servidor.
+    """
+    from sepultados_gestao.services.backup import zip_em_fluxo
+    from sepultados_gestao.services.backup_completo import gerar_dump
+
     if not request.user.is_superuser:
         return HttpResponseForbidden("Acesso restrito ao superusuário.")
 
@@ -16,36 +26,46 @@ def backup_completo(request):
     zip_filename = f"backup_completo_{timestamp}.zip"
 
     temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, zip_filename)
-    dump_path = os.path.join(temp_dir, "dump.json")
-
-    # Gera o dump dos dados do banco
-    with open(dump_path, "w", encoding="utf-8") as dump_file:
-        call_command("dumpdata", "--natural-foreign", "--natural-primary", "--indent", "2", stdout=dump_file)
-
-    # Cria o zip com dump + arquivos do MEDIA_ROOT
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Adiciona o dump do banco
-        zipf.write(dump_path, "dump.json")
-
-        # Adiciona os arquivos de mídia
+    try:
+        manifesto = gerar_dump(temp_dir)
+    except BaseException:
+        # sem resposta em fluxo, ninguém mais apaga a pasta
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    def abrir(caminho):
+        return lambda: open(caminho, "rb")
+
+    def entradas():
+        # Dump do banco: arquivos já compactados + manifesto
+        for entrada in manifesto["modelos"]:
+            yield f"dados/{entrada['arquivo']}", abrir(os.path.join(temp_dir, entrada["arquivo"]))
+        yield "dados/manifesto.json", abrir(os.path.join(temp_dir, "manifesto.json"))
+
+        # Arquivos de mídia
         for root, _, files in os.walk(settings.MEDIA_ROOT):
             if "backups" in root.lower():
                 continue
             for file in files:
                 full_path = os.path.join(root, file)
                 arcname = os.path.relpath(full_path, settings.MEDIA_ROOT)
-                zipf.write(full_path, f"media/{arcname}")  # coloca dentro da pasta "media" no zip
+                yield f"media/{arcname}", abrir(full_path)  # dentro da pasta "media" no zip
 
-    return FileResponse(open(zip_path, 'rb'), as_attachment=True, filename=zip_filename)
+    def conteudo():
+        try:
+            yield from zip_em_fluxo(entradas())
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return StreamingHttpResponse(
+        conteudo(),
+        content_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_filename}"'}
+    )
 
 
 import os
-import zipfile
-import io
-from datetime import datetime
 from django.http import HttpResponse
-from openpyxl import Workbook
 from django.contrib.admin.views.decorators import staff_member_required
 from django.conf import settings
 from django.db import models
@@ -57,6 +77,16 @@ from sepultados_gestao.models import (
 
 @staff_member_required
 def backup_prefeitura_ativa(request):
+    """
+    ZIP com as planilhas da prefeitura ativa e os anexos, enviado em fluxo
+    (services/backup.py): consultas, planilhas e arquivos são lidos aos
+    poucos, durante o download, e a memória não cresce com a prefeitura.
+    Com ?incremental=1, só o que mudou desde o último backup (manifesto.json
+    encadeia os arquivos). O incremental parte do último backup confirmado
+    com `manage.py verificar_backups --confirmar <zip>` depois do download.
+    """
+    from sepultados_gestao.services.backup import Planilha, gerar_backup
+
     prefeitura_id = request.session.get("prefeitura_ativa_id")
 
     from django.contrib import messages
@@ -76,20 +106,27 @@ def backup_prefeitura_ativa(request):
         tumulo__quadra__cemiterio__prefeitura_id=prefeitura_id
     ).select_related("tumulo", "tumulo__quadra", "tumulo__quadra__cemiterio")
 
-    contratos = ConcessaoContrato.objects.filter(prefeitura_id=prefeitura_id)
-    exumacoes = Exumacao.objects.filter(prefeitura_id=prefeitura_id)
+    contratos = ConcessaoContrato.objects.filter(prefeitura_id=prefeitura_id).select_related(
+        "tumulo", "tumulo__quadra", "usuario_registro"
+    )
+    exumacoes = Exumacao.objects.filter(prefeitura_id=prefeitura_id).select_related(
+        "sepultado", "tumulo", "tumulo__quadra"
+    )
     translados = Translado.objects.filter(
         tumulo_destino__quadra__cemiterio__prefeitura_id=prefeitura_id
     ).select_related("sepultado", "tumulo_destino", "tumulo_destino__quadra", "tumulo_destino__quadra__cemiterio")
 
-    receitas = Receita.objects.filter(prefeitura_id=prefeitura_id)
+    receitas = Receita.objects.filter(prefeitura_id=prefeitura_id).select_related(
+        "contrato", "exumacao", "translado", "sepultado"
+    )
     auditorias = RegistroAuditoria.objects.filter(prefeitura_id=prefeitura_id).select_related("usuario")
 
 
-    sepultados_ids = sepultados.values_list("id", flat=True)
-    contratos_ids = contratos.values_list("id", flat=True)
-    exumacoes_ids = exumacoes.values_list("id", flat=True)
-    translados_ids = translados.values_list("id", flat=True)
+    # subconsultas: os ids não passam pelo Python
+    sepultados_ids = sepultados.values("id")
+    contratos_ids = contratos.values("id")
+    exumacoes_ids = exumacoes.values("id")
+    translados_ids = translados.values("id")
 
     anexos = Anexo.objects.filter(
         models.Q(content_type__model="sepultado", object_id__in=sepultados_ids) |
@@ -98,12 +135,7 @@ def backup_prefeitura_ativa(request):
         models.Q(content_type__model="translado", object_id__in=translados_ids)
     ).select_related("content_type")
 
-
     # 1 - Planilha SEPULTADOS
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Sepultados"
-
     headers = [
         "Número do Sepultamento", "Nome", "CPF", "Sexo", "Data Nasc.",
         "Local Nascimento", "Nacionalidade", "Cor da Pele", "Estado Civil",
@@ -116,10 +148,9 @@ def backup_prefeitura_ativa(request):
         "Responsável", "CPF Resp.", "Endereço Resp.", "Telefone Resp.",
         "Exumado em", "Trasladado em"
     ]
-    ws.append(headers)
 
-    for s in sepultados:
-        ws.append([
+    def linha_sepultado(s):
+        return [
             s.numero_sepultamento or "",
             s.nome or "",
             s.cpf_sepultado or "",
@@ -159,17 +190,9 @@ def backup_prefeitura_ativa(request):
             s.telefone or "",
             s.data_exumacao.strftime("%d/%m/%Y") if s.data_exumacao else "",
             s.data_translado.strftime("%d/%m/%Y") if s.data_translado else "",
-        ])
-
-    sepultados_buffer = io.BytesIO()
-    wb.save(sepultados_buffer)
-    sepultados_buffer.seek(0)
+        ]
 
     # 2 - Planilha CONTRATOS
-    wb_contratos = Workbook()
-    ws_contratos = wb_contratos.active
-    ws_contratos.title = "Contratos"
-
     headers_contratos = [
         "Número Contrato", "Nome", "CPF/CNPJ", "Telefone",
         "Logradouro", "Número", "Bairro", "Cidade", "Estado", "CEP",
@@ -177,10 +200,9 @@ def backup_prefeitura_ativa(request):
         "Túmulo", "Quadra", "Linha",
         "Forma de Pagamento", "Valor Total", "Parcelas", "Observações", "Usuário"
     ]
-    ws_contratos.append(headers_contratos)
 
-    for c in contratos:
-        ws_contratos.append([
+    def linha_contrato(c):
+        return [
             c.numero_contrato or "",
             c.nome or "",
             c.cpf or "",
@@ -200,15 +222,7 @@ def backup_prefeitura_ativa(request):
             c.quantidade_parcelas or "",
             c.observacoes or "",
             str(c.usuario_registro) if c.usuario_registro else "",
-        ])
-
-    contratos_buffer = io.BytesIO()
-    wb_contratos.save(contratos_buffer)
-    contratos_buffer.seek(0)
-
-    wb_exumacoes = Workbook()
-    ws_exumacoes = wb_exumacoes.active
-    ws_exumacoes.title = "Exumacoes"
+        ]
 
     headers_exumacoes = [
         "Número Documento", "Data", "Motivo", "Observações",
@@ -216,10 +230,9 @@ def backup_prefeitura_ativa(request):
         "Nome Responsável", "CPF", "Endereço", "Telefone",
         "Forma Pagamento", "Valor", "Parcelas"
     ]
-    ws_exumacoes.append(headers_exumacoes)
 
-    for e in exumacoes:
-        ws_exumacoes.append([
+    def linha_exumacao(e):
+        return [
             e.numero_documento or "",
             e.data.strftime("%d/%m/%Y") if e.data else "",
             e.motivo or "",
@@ -235,24 +248,16 @@ def backup_prefeitura_ativa(request):
             e.get_forma_pagamento_display() if e.forma_pagamento else "",
             e.valor or "",
             e.quantidade_parcelas or "",
-        ])
-
-    exumacoes_buffer = io.BytesIO()
-    wb_exumacoes.save(exumacoes_buffer)
-    exumacoes_buffer.seek(0)
+        ]
 
-    # Queryset
-    translados = Translado.objects.filter(
+    # Queryset da planilha (pelo sepultado; os anexos seguem o túmulo de destino, acima)
+    translados_planilha = Translado.objects.filter(
         sepultado__tumulo__quadra__cemiterio__prefeitura_id=prefeitura_id
     ).select_related(
         "sepultado", "tumulo_destino", "tumulo_destino__quadra", "tumulo_destino__quadra__cemiterio"
     )
 
     # Planilha Translados
-    wb_translados = Workbook()
-    ws_translados = wb_translados.active
-    ws_translados.title = "Translados"
-
     headers_translados = [
         "Número Documento", "Data", "Motivo", "Observações", "Sepultado",
         "Destino", "Túmulo Destino", "Quadra", "Linha",
@@ -260,9 +265,8 @@ def backup_prefeitura_ativa(request):
         "Nome Responsável", "CPF", "Endereço", "Telefone",
         "Forma Pagamento", "Valor", "Parcelas"
     ]
-    ws_translados.append(headers_translados)
 
-    for t in translados:
+    def linha_translado(t):
         sepultado_str = str(t.sepultado) if t.sepultado else ""
 
         tumulo_destino = t.tumulo_destino
@@ -274,8 +278,7 @@ def backup_prefeitura_ativa(request):
         )
         cemiterio_endereco = getattr(cemiterio, "endereco", "") if cemiterio else t.cemiterio_endereco or ""
 
-
-        ws_translados.append([
+        return [
             t.numero_documento or "",
             t.data.strftime("%d/%m/%Y") if t.data else "",
             t.motivo or "",
@@ -294,15 +297,7 @@ def backup_prefeitura_ativa(request):
             t.get_forma_pagamento_display() if t.forma_pagamento else "",
             t.valor or "",
             t.quantidade_parcelas or "",
-        ])
-
-    translados_buffer = io.BytesIO()
-    wb_translados.save(translados_buffer)
-    translados_buffer.seek(0)
-
-    wb_receitas = Workbook()
-    ws_receitas = wb_receitas.active
-    ws_receitas.title = "Receitas"
+        ]
 
     headers_receitas = [
         "Número", "Nome", "CPF/CNPJ", "Descrição",
@@ -311,10 +306,9 @@ def backup_prefeitura_ativa(request):
         "Status", "Multa", "Juros", "Mora Diária",
         "Contrato", "Exumação", "Translado", "Sepultado"
     ]
-    ws_receitas.append(headers_receitas)
 
-    for r in receitas:
-        ws_receitas.append([
+    def linha_receita(r):
+        return [
             r.numero_documento or "",
             r.nome or "",
             r.cpf or "",
@@ -333,63 +327,45 @@ def backup_prefeitura_ativa(request):
             str(r.exumacao.numero_documento) if r.exumacao else "",
             str(r.translado.numero_documento) if r.translado else "",
             str(r.sepultado.nome) if r.sepultado else "",
-        ])
-
-    receitas_buffer = io.BytesIO()
-    wb_receitas.save(receitas_buffer)
-    receitas_buffer.seek(0)
-
-    wb_auditoria = Workbook()
-    ws_auditoria = wb_auditoria.active
-    ws_auditoria.title = "Auditoria"
+        ]
 
     headers_auditoria = [
         "Ação", "Usuário", "Modelo", "ID do Objeto", "Representação", "Data e Hora"
     ]
-    ws_auditoria.append(headers_auditoria)
 
-    for reg in auditorias:
-        ws_auditoria.append([
+    def linha_auditoria(reg):
+        return [
             reg.get_acao_display() if reg.acao else "",
             str(reg.usuario) if reg.usuario else "",
             reg.modelo or "",
             reg.objeto_id or "",
             reg.representacao or "",
             reg.data_hora.strftime("%d/%m/%Y %H:%M") if reg.data_hora else "",
-        ])
-
-    auditoria_buffer = io.BytesIO()
-    wb_auditoria.save(auditoria_buffer)
-    auditoria_buffer.seek(0)
-
-
-    # Criar ZIP e adicionar tudo
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-        zip_file.writestr('sepultados.xlsx', sepultados_buffer.getvalue())
-        zip_file.writestr('contratos.xlsx', contratos_buffer.getvalue())
-        zip_file.writestr("exumacoes.xlsx", exumacoes_buffer.read())
-        zip_file.writestr("translados.xlsx", translados_buffer.getvalue())
-        zip_file.writestr("receitas.xlsx", receitas_buffer.read())
-        zip_file.writestr("auditoria.xlsx", auditoria_buffer.getvalue())
-
+        ]
+
+    planilhas = [
+        Planilha("sepultados.xlsx", "Sepultados", headers, sepultados, linha_sepultado),
+        Planilha("contratos.xlsx", "Contratos", headers_contratos, contratos, linha_contrato),
+        Planilha("exumacoes.xlsx", "Exumacoes", headers_exumacoes, exumacoes, linha_exumacao),
+        Planilha("translados.xlsx", "Translados", headers_translados, translados_planilha, linha_translado),
+        Planilha("receitas.xlsx", "Receitas", headers_receitas, receitas, linha_receita),
+        Planilha("auditoria.xlsx", "Auditoria", headers_auditoria, auditorias, linha_auditoria,
+                 campo_alteracao="data_hora"),
+    ]
 
-        # Adicionar os arquivos de mídia
-        for anexo in anexos:
-            if anexo.arquivo:
-                caminho = os.path.join(settings.MEDIA_ROOT, anexo.arquivo.name)
-                if os.path.exists(caminho):
-                    zip_file.write(caminho, arcname=os.path.join('midia', os.path.basename(anexo.arquivo.name)))
+    # ?incremental=1: só o que mudou desde o último backup concluído desta prefeitura
+    incremental = request.GET.get("incremental", "").lower() in ("1", "true", "sim")
 
     from django.utils.timezone import localtime, now
     from django.utils.text import slugify
 
     nome_prefeitura = slugify(prefeitura_ativa.nome)
     agora = localtime(now())
-    filename = f"backup_{nome_prefeitura}_{prefeitura_id}_{agora.strftime('%Y%m%d_%H%M%S')}.zip"
+    tipo = "_incremental" if incremental else ""
+    filename = f"backup_{nome_prefeitura}_{prefeitura_id}{tipo}_{agora.strftime('%Y%m%d_%H%M%S')}.zip"
 
-    return HttpResponse(
-        zip_buffer.getvalue(),
+    return StreamingHttpResponse(
+        gerar_backup(prefeitura_ativa, planilhas, anexos, incremental, request.user, filename),
         content_type="application/zip",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.db.models import Q
 
 from .models import RegistroAuditoria, Prefeitura, Cemiterio
+from .services.arquivo_auditoria import buscar_arquivados
 
 try:
     from weasyprint import HTML
@@ -92,8 +93,8 @@ def auditorias_pdf(request):
     if df:
         qs = qs.filter(data_hora__date__lte=df)
 
+    aliases = {"adicao": "adição", "criacao": "adição", "edição": "edição", "exclusao": "exclusão"}
     if acao_f and acao_f != "todas":
-        aliases = {"adicao": "adição", "criacao": "adição", "edição": "edição", "exclusao": "exclusão"}
         qs = qs.filter(acao__iexact=aliases.get(acao_f, acao_f))
 
     if usuario_f and usuario_f.lower() != "todos":
@@ -129,12 +130,40 @@ def auditorias_pdf(request):
 
     qs = qs.order_by("-data_hora", "-id")
 
+    # Registros já arquivados (segmentos frios) quando o período alcança essa faixa
+    arquivados = []
+    if pref and getattr(pref, "id", None) and di:
+        arquivados = buscar_arquivados(
+            pref.id, di, df,
+            acoes=[aliases.get(acao_f, acao_f)] if acao_f and acao_f != "todas" else None,
+            usuario=usuario_f if usuario_f and usuario_f.lower() != "todos" else None,
+            modelo=entidade_f if entidade_f and entidade_f != "todas" else None,
+            q=busca,
+        )
+
     # ---------------------------- Métricas e linhas -------------------------------
-    total = qs.count()
-    criacoes = qs.filter(acao__in=["adição", "adicao", "add", "criação", "criacao", "create"]).count()
-    atualizacoes = qs.filter(acao__in=["edição", "edicao", "change", "update"]).count()
-    exclusoes = qs.filter(acao__in=["exclusão", "exclusao", "delete"]).count()
-    falhas = qs.filter(acao__in=["falha", "fail", "erro", "error"]).count()
+    ACOES_CRIACAO = ["adição", "adicao", "add", "criação", "criacao", "create"]
+    ACOES_EDICAO = ["edição", "edicao", "change", "update"]
+    ACOES_EXCLUSAO = ["exclusão", "exclusao", "delete"]
+    ACOES_FALHA = ["falha", "fail", "erro", "error"]
+
+    if arquivados:
+        registros = list(qs) + arquivados
+        registros.sort(key=lambda r: (r.data_hora, r.pk), reverse=True)
+
+        def contar(acoes):
+            return sum(1 for r in registros if r.acao in acoes)
+
+        total = len(registros)
+        criacoes, atualizacoes = contar(ACOES_CRIACAO), contar(ACOES_EDICAO)
+        exclusoes, falhas = contar(ACOES_EXCLUSAO), contar(ACOES_FALHA)
+    else:
+        registros = qs
+        total = qs.count()
+        criacoes = qs.filter(acao__in=ACOES_CRIACAO).count()
+        atualizacoes = qs.filter(acao__in=ACOES_EDICAO).count()
+        exclusoes = qs.filter(acao__in=ACOES_EXCLUSAO).count()
+        falhas = qs.filter(acao__in=ACOES_FALHA).count()
 
     def norm(a):
         a = (a or "").lower()
@@ -155,7 +184,7 @@ def auditorias_pdf(request):
         "modelo": r.modelo or "-",
         "objeto_id": r.objeto_id,
         "detalhes": r.representacao or "-",
-    } for r in qs]
+    } for r in registros]
     # -----------------------------------------------------------------------------
 
     # ------------------------------ Cabeçalho (UI) --------------------------------